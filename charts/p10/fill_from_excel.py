@@ -7,16 +7,33 @@ P10 PPT填充脚本 - 从Excel数据填充PPT模板生成最终PPT
 
 import os
 import sys
-import yaml
 import logging
+import io
 import pandas as pd
 from openpyxl import Workbook
-import shutil
-import zipfile
 import xml.etree.ElementTree as ET
 from pathlib import Path
 from datetime import datetime
 
+# 内存 OPC 包编辑器位于仓库根 tools/ 目录
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'tools'))
+from opc_package import OpcPackage
+from page_config import load_page_config
+from chart_patch import NS, ChartPatch, Series, fill_color
+from template_manifest import TemplateManifest
+
+# 模板饼图 dPt 颜色 → 情绪标签（模板缺少 c:cat 时据此识别扇区顺序；严格映射，不做兜底）
+PIE_COLOR_TO_LABEL = {
+    '009FA9': 'Positive',  # 青色
+    '00AFA9': 'Positive',  # 容错近似
+    '10B0AA': 'Positive',  # 容错近似
+    'D81159': 'Negative',  # 品红
+    'F0005B': 'Negative',  # 容错近似
+    'FEC000': 'Neutral',   # 黄色（饼图）
+    'FFBC42': 'Neutral',   # 黄色（折线/散点模板）
+}
+
+
 class P10PPTFiller:
     """P10 PPT填充器"""
     
@@ -28,15 +45,13 @@ class P10PPTFiller:
         self.logger = logging.getLogger(__name__)
         
         # 设置工作目录
-        self.tmp_dir = Path(self.config['project']['tmp_dir'])
         self.output_dir = Path(self.config['project']['output_dir'])
         self.template_file = Path(self.config['project']['template_file'])
         
     def _load_config(self):
         """加载页面级配置文件"""
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+            return load_page_config(self.config_path)
         except Exception as e:
             print(f"错误：无法加载配置文件 {self.config_path}: {e}")
             sys.exit(1)
@@ -66,33 +81,22 @@ class P10PPTFiller:
         )
         
     def _prepare_directories(self):
-        """准备工作目录"""
-        # 清理并创建临时目录
-        if self.tmp_dir.exists():
-            shutil.rmtree(self.tmp_dir)
-        self.tmp_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 创建输出目录
+        """准备输出目录"""
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.logger.info(f"输出目录已准备: {self.output_dir}")
         
-        self.logger.info(f"工作目录已准备: {self.tmp_dir}")
-        
-    def _extract_ppt_template(self):
-        """解压PPT模板到临时目录"""
+    def _open_ppt_template(self):
+        """以内存 OPC 包打开PPT模板（部件按需读取，不解压到临时目录）"""
         if not self.template_file.exists():
             raise FileNotFoundError(f"PPT模板文件不存在: {self.template_file}")
             
-        extracted_dir = self.tmp_dir / "ppt_extracted"
-        
         try:
-            with zipfile.ZipFile(self.template_file, 'r') as zip_ref:
-                zip_ref.extractall(extracted_dir)
-            
-            self.logger.info(f"PPT模板已解压到: {extracted_dir}")
-            return extracted_dir
+            pkg = OpcPackage.open(self.template_file)
+            self.logger.info(f"PPT模板已打开: {self.template_file}（{len(pkg.names())} 个部件）")
+            return pkg
             
         except Exception as e:
-            self.logger.error(f"解压PPT模板失败: {e}")
+            self.logger.error(f"打开PPT模板失败: {e}")
             raise
             
     def _load_excel_data(self):
@@ -117,222 +121,97 @@ class P10PPTFiller:
             self.logger.error(f"加载Excel数据失败: {e}")
             raise
             
-    def _create_embedded_workbook(self, pie_df, line_df, extracted_dir):
+    def _create_embedded_workbook(self, pie_df, line_df, pkg, manifest: TemplateManifest, parts):
         """创建嵌入式工作簿文件
         - 写入饼图数据到 `PieData`
         - 写入折线/散点图数据到 `LineData`（系列顺序以模板为准，不依赖配置）
         - 为散点图增加数值型 X 轴列（便于公式绑定）：X = axis_day_base + 序号
         注意：保持对现有模板的兼容，不移除原有 Date 列；列顺序为 [X, Date(如存在), <模板系列顺序>]
+        模板图表的类别、系列名与颜色取自模板清单（tools/template_manifest.py），parts 为 chart_base -> 部件名。
         """
-        # 创建嵌入对象目录
-        embeddings_dir = extracted_dir / "ppt" / "embeddings"
-        embeddings_dir.mkdir(parents=True, exist_ok=True)
-        
-        # 生成工作簿文件名
-        workbook_file = embeddings_dir / "Microsoft_Excel_Worksheet1.xlsx"
+        # 嵌入工作簿部件名
+        workbook_file = "ppt/embeddings/Microsoft_Excel_Worksheet1.xlsx"
         
         try:
-            # 若存在旧文件，先删除以确保创建全新工作簿（避免继承隐藏工作表状态）
-            if workbook_file.exists():
-                workbook_file.unlink()
-            # 解析模板图表文件以获取饼图类别顺序与折线/散点系列顺序
-            replace_charts = list(self.config['output']['replace_charts'])
-            chart_bases = [c.replace('.xml', '') for c in replace_charts]
-
-            def _detect_type(base: str) -> str:
-                    chart_xml = extracted_dir / 'ppt' / 'charts' / f'{base}.xml'
-                    if not chart_xml.exists():
-                        raise FileNotFoundError(f"图表XML不存在: {chart_xml}")
-                    txt = chart_xml.read_text(encoding='utf-8')
-                    if 'pieChart' in txt:
-                        return 'pie'
-                    if 'scatterChart' in txt:
-                        return 'scatter'
-                    if 'lineChart' in txt:
-                        return 'line'
-                    raise RuntimeError(f"无法识别图表类型: {chart_xml}")
-
-            def _read_pie_labels(base: str) -> list:
-                    chart_xml = extracted_dir / 'ppt' / 'charts' / f'{base}.xml'
-                    tree = ET.parse(chart_xml)
-                    root = tree.getroot()
-                    ns = {'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart'}
-                    ser = root.find('.//c:pieChart//c:ser', ns)
-                    if ser is None:
+            # 始终写入全新工作簿覆盖模板部件（避免继承隐藏工作表状态）
+            # 从模板清单读取饼图类别顺序与折线/散点系列顺序
+            def _read_pie_labels(part: str) -> list:
+                    series = manifest.series(part, 'pieChart')
+                    if not series:
                         raise RuntimeError('模板饼图缺少数据系列 c:ser')
+                    ser = series[0]
 
-                    # 优先：字符串引用的缓存
-                    str_cache = ser.find('.//c:cat//c:strRef//c:strCache', ns)
-                    if str_cache is not None:
-                        labels = []
-                        for pt in str_cache.findall('.//c:pt', ns):
-                            v = pt.find('.//c:v', ns)
-                            if v is None or not v.text:
-                                raise RuntimeError('模板饼图类别点缺少值 c:v')
-                            labels.append(v.text)
+                    # 优先：类别缓存或字面量（字符串/数值，数值转为字符串）
+                    labels = manifest.values(part, 'cat')
+                    if labels is not None:
+                        if any(v is None or v == '' for v in labels):
+                            raise RuntimeError('模板饼图类别点缺少值 c:v')
                         if not labels:
                             raise RuntimeError('模板饼图类别标签为空')
                         return labels
 
-                    # 其次：字符串字面量
-                    str_lit = ser.find('.//c:cat//c:strLit', ns)
-                    if str_lit is not None:
-                        labels = []
-                        for pt in str_lit.findall('.//c:pt', ns):
-                            v = pt.find('.//c:v', ns)
-                            if v is None or v.text is None:
-                                raise RuntimeError('模板饼图字面类别点缺少值 c:v')
-                            labels.append(v.text)
-                        if labels:
-                            return labels
-
-                    # 再次：数字引用或字面量（极少见），转为字符串
-                    num_cache = ser.find('.//c:cat//c:numRef//c:numCache', ns)
-                    if num_cache is not None:
-                        labels = []
-                        for pt in num_cache.findall('.//c:pt', ns):
-                            v = pt.find('.//c:v', ns)
-                            if v is None or v.text is None:
-                                raise RuntimeError('模板饼图数值类别点缺少值 c:v')
-                            labels.append(str(v.text))
-                        if labels:
-                            return labels
-                    num_lit = ser.find('.//c:cat//c:numLit', ns)
-                    if num_lit is not None:
-                        labels = []
-                        for pt in num_lit.findall('.//c:pt', ns):
-                            v = pt.find('.//c:v', ns)
-                            if v is None or v.text is None:
-                                raise RuntimeError('模板饼图数值字面类别点缺少值 c:v')
-                            labels.append(str(v.text))
-                        if labels:
-                            return labels
-
                     # 若上述均不存在，无法从模板解析类别顺序
                     # 尝试读取 dPt 上的文本（部分模板将自定义标签写在数据点上）
-                    a_ns = {'a': 'http://schemas.openxmlformats.org/drawingml/2006/main'}
-                    dpt_nodes = ser.findall('.//c:dPt', ns)
-                    if dpt_nodes:
-                        indexed = []
-                        for dpt in dpt_nodes:
-                            idx_node = dpt.find('.//c:idx', ns)
-                            if idx_node is None or not idx_node.get('val'):
-                                # 若数据点缺少索引，严格报错
-                                raise RuntimeError('模板饼图数据点缺少索引 c:idx')
-                            idx = int(idx_node.get('val'))
-                            # 寻找 dPt 文本
-                            txt = None
-                            # c:tx/c:rich 或 c:tx/c:strRef/c:strCache
-                            tx_rich = dpt.find('.//c:tx//c:rich', ns)
-                            if tx_rich is not None:
-                                # 提取 a:t 文本（可能存在多个段落）
-                                texts = []
-                                for t in tx_rich.findall('.//a:t', a_ns):
-                                    if t.text:
-                                        texts.append(t.text)
-                                if texts:
-                                    txt = ''.join(texts)
-                            if txt is None:
-                                tx_cache = dpt.find('.//c:tx//c:strRef//c:strCache', ns)
-                                if tx_cache is not None:
-                                    pt = tx_cache.find('.//c:pt', ns)
-                                    v = pt.find('.//c:v', ns) if pt is not None else None
-                                    if v is not None and v.text:
-                                        txt = v.text
-                            indexed.append((idx, txt))
-                        # 按 idx 排序，收集非空文本作为标签
-                        indexed.sort(key=lambda x: x[0])
-                        labels = [t for _, t in indexed if t]
-                        if labels:
-                            return labels
+                    indexed = []
+                    for pt in ser['points']:
+                        if pt['idx'] is None:
+                            # 若数据点缺少索引，严格报错
+                            raise RuntimeError('模板饼图数据点缺少索引 c:idx')
+                        indexed.append((pt['idx'], pt['text']))
+                    # 按 idx 排序，收集非空文本作为标签
+                    indexed.sort(key=lambda x: x[0])
+                    labels = [t for _, t in indexed if t]
+                    if labels:
+                        return labels
 
                     raise RuntimeError('模板饼图缺少类别定义（未找到 c:strRef/c:strCache、c:strLit、c:numRef/c:numCache 或 dPt 文本）')
 
-            def _read_pie_labels_by_dpt_color(base: str) -> list:
+            def _read_pie_labels_by_dpt_color(part: str) -> list:
                     """
                     当模板缺少 c:cat 时，按 dPt 颜色顺序识别标签并返回顺序列表。
                     中文注释：严格依据颜色映射识别，若颜色无法识别将报错，不做兜底。
                     """
-                    chart_xml = extracted_dir / 'ppt' / 'charts' / f'{base}.xml'
-                    tree = ET.parse(chart_xml)
-                    root = tree.getroot()
-                    ns = {
-                        'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart',
-                        'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
-                    }
-                    ser = root.find('.//c:pieChart//c:ser', ns)
-                    if ser is None:
+                    series = manifest.series(part, 'pieChart')
+                    if not series:
                         raise RuntimeError('模板饼图缺少数据系列 c:ser')
-                    dpts = ser.findall('.//c:dPt', ns)
+                    dpts = series[0]['points']
                     if not dpts:
                         raise RuntimeError('模板饼图未包含 c:dPt 颜色节点，无法识别顺序')
-                    # 颜色到标签的严格映射（与 _update_pie_chart_xml 保持一致）
-                    color_to_label = {
-                        '009FA9': 'Positive',  # 青色
-                        '00AFA9': 'Positive',
-                        '10B0AA': 'Positive',
-                        'D81159': 'Negative',  # 品红
-                        'F0005B': 'Negative',
-                        'FEC000': 'Neutral',   # 黄色（饼图）
-                        'FFBC42': 'Neutral',   # 黄色（折线/散点模板）
-                    }
                     indexed = []
-                    for dpt in dpts:
-                        idx_elem = dpt.find('.//c:idx', ns)
-                        if idx_elem is None or not idx_elem.get('val'):
+                    for pt in dpts:
+                        if pt['idx'] is None:
                             raise RuntimeError('模板饼图在 dPt 上缺少索引 c:idx')
-                        idx = int(idx_elem.get('val'))
-                        srgb = dpt.find('.//a:srgbClr', ns)
-                        color_hex = srgb.get('val') if srgb is not None else None
+                        color_hex = pt['fill']
                         if not color_hex:
                             raise RuntimeError('模板饼图在 dPt 上缺少颜色 a:srgbClr@val')
-                        label = color_to_label.get(color_hex.upper())
+                        label = PIE_COLOR_TO_LABEL.get(color_hex.upper())
                         if not label:
                             raise RuntimeError(f'无法依据颜色映射识别标签: {color_hex}')
-                        indexed.append((idx, label))
+                        indexed.append((pt['idx'], label))
                     # 按 idx 排序后返回标签顺序
                     indexed.sort(key=lambda x: x[0])
                     return [lbl for _, lbl in indexed]
 
-            def _read_series_labels(base: str, kind: str) -> list:
-                    chart_xml = extracted_dir / 'ppt' / 'charts' / f'{base}.xml'
-                    tree = ET.parse(chart_xml)
-                    root = tree.getroot()
-                    ns = {'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart'}
-                    node = root.find('.//c:scatterChart', ns) if kind == 'scatter' else root.find('.//c:lineChart', ns)
-                    if node is None:
-                        raise RuntimeError(f"未找到 {kind} 图元素")
+            def _read_series_labels(part: str, kind: str) -> list:
                     labels = []
-                    for ser in node.findall('.//c:ser', ns):
-                        tx_v = ser.find('.//c:tx//c:v', ns)
-                        if tx_v is not None and tx_v.text:
-                            labels.append(tx_v.text)
-                            continue
-                        str_cache = ser.find('.//c:tx//c:strRef//c:strCache', ns)
-                        if str_cache is None:
+                    for ser in manifest.series(part, f'{kind}Chart'):
+                        if ser['name'] is None:
                             raise RuntimeError('系列缺少名称 c:tx/c:v 或 c:tx/c:strRef/c:strCache')
-                        pt = str_cache.find('.//c:pt', ns)
-                        v = pt.find('.//c:v', ns) if pt is not None else None
-                        if v is None or not v.text:
-                            raise RuntimeError('系列名称缓存缺少值 c:v')
-                        labels.append(v.text)
+                        labels.append(ser['name'])
                     if not labels:
                         raise RuntimeError('模板未定义任何系列标签')
                     return labels
 
+            kinds = {base: self._chart_kind(manifest.chart_types(part), part) for base, part in parts.items()}
             pie_base = None
             series_base = None
             series_kind = None
-            for base in chart_bases:
-                t = _detect_type(base)
+            for base, t in kinds.items():
                 if t == 'pie':
                     pie_base = base
-                elif t == 'scatter' and series_base is None:
-                    series_base = base
-                    series_kind = 'scatter'
-                elif t == 'line' and series_base is None:
+                elif t in ('scatter', 'line') and series_base is None:
                     series_base = base
-                    series_kind = 'line'
+                    series_kind = t
             if pie_base is None:
                 raise RuntimeError('未在 replace_charts 中发现饼图')
             if series_base is None:
@@ -340,31 +219,24 @@ class P10PPTFiller:
 
             # 尝试读取饼图类别标签；若模板仅包含公式但无缓存/字面量，则改为按 dPt 颜色顺序重排
             try:
-                pie_labels = _read_pie_labels(pie_base)
+                pie_labels = _read_pie_labels(parts[pie_base])
             except RuntimeError as e:
                 msg = str(e)
                 if '模板饼图缺少类别' in msg:
                     # 按 dPt 颜色顺序解析标签
                     self.logger.info(f"模板饼图类别缺失，按 dPt 颜色顺序重排 PieData：{msg}")
-                    pie_labels = _read_pie_labels_by_dpt_color(pie_base)
+                    pie_labels = _read_pie_labels_by_dpt_color(parts[pie_base])
                 else:
                     raise
             # 读取系列标签；若无法解析（如仅存在公式、无缓存），退化为按系列数量驱动
             try:
-                series_labels = _read_series_labels(series_base, series_kind)
+                series_labels = _read_series_labels(parts[series_base], series_kind)
             except RuntimeError as e:
                 msg = str(e)
-                if '系列缺少名称' in msg or '未找到' in msg:
+                if '系列缺少名称' in msg:
                     self.logger.info(f"模板{series_kind}图系列名称不可解析，按系列数量驱动：{msg}")
                     # 直接统计系列数量
-                    chart_xml = extracted_dir / 'ppt' / 'charts' / f'{series_base}.xml'
-                    t = ET.parse(chart_xml)
-                    r = t.getroot()
-                    ns = {'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart'}
-                    node = r.find('.//c:scatterChart', ns) if series_kind == 'scatter' else r.find('.//c:lineChart', ns)
-                    if node is None:
-                        raise RuntimeError(f"未找到 {series_kind} 图元素以统计系列数量")
-                    series_labels = [None] * len(node.findall('.//c:ser', ns))
+                    series_labels = [None] * len(manifest.series(parts[series_base], f'{series_kind}Chart'))
                 else:
                     raise
 
@@ -387,24 +259,13 @@ class P10PPTFiller:
                 ordered_pie_df = pie_df.copy()
 
             # 统计所有相关图表的系列数量，确保 LineData 列覆盖最大系列数
-            def _count_series(base: str, kind: str) -> int:
-                chart_xml = extracted_dir / 'ppt' / 'charts' / f'{base}.xml'
-                t = ET.parse(chart_xml)
-                r = t.getroot()
-                ns = {'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart'}
-                node = r.find('.//c:scatterChart', ns) if kind == 'scatter' else r.find('.//c:lineChart', ns)
-                if node is None:
-                    return 0
-                return len(node.findall('.//c:ser', ns))
-
             scatter_counts = []
             line_counts = []
-            for base in chart_bases:
-                t = _detect_type(base)
+            for base, t in kinds.items():
                 if t == 'scatter':
-                    scatter_counts.append(_count_series(base, 'scatter'))
+                    scatter_counts.append(len(manifest.series(parts[base], 'scatterChart')))
                 elif t == 'line':
-                    line_counts.append(_count_series(base, 'line'))
+                    line_counts.append(len(manifest.series(parts[base], 'lineChart')))
             expected_series_count = max(scatter_counts + line_counts) if (scatter_counts or line_counts) else 0
             if expected_series_count == 0:
                 raise RuntimeError('未能统计到任何折线或散点系列数量')
@@ -474,8 +335,10 @@ class P10PPTFiller:
             except Exception as e:
                 raise RuntimeError(f'设置工作簿活动表失败: {e}')
 
-            # 保存工作簿
-            wb.save(workbook_file)
+            # 保存工作簿到包内部件
+            buf = io.BytesIO()
+            wb.save(buf)
+            pkg.write(workbook_file, buf.getvalue())
                 
             self.logger.info(f"嵌入式工作簿已创建: {workbook_file}")
             return workbook_file
@@ -484,19 +347,19 @@ class P10PPTFiller:
             self.logger.error(f"创建嵌入式工作簿失败: {e}")
             raise
 
-    def _update_content_types(self, extracted_dir: Path, workbook_path: Path):
+    def _update_content_types(self, pkg: OpcPackage, workbook_path: str):
         """更新 [Content_Types].xml 以声明嵌入的 xlsx 工作簿
         - 添加 Default 映射：xlsx -> application/vnd.openxmlformats-officedocument.spreadsheetml.sheet（若缺失）
         - 移除 embeddings 下旧的 .xlsb 覆盖项（避免冲突）
         - 添加 embeddings/{workbook}.xlsx 的 Override 覆盖项（若缺失）
         严格错误策略：缺少 Content_Types.xml 时直接抛错。
         """
-        ct_file = extracted_dir / '[Content_Types].xml'
-        if not ct_file.exists():
+        ct_file = '[Content_Types].xml'
+        if not pkg.exists(ct_file):
             raise FileNotFoundError(f"缺少 Content_Types.xml: {ct_file}")
 
         try:
-            tree = ET.parse(ct_file)
+            tree = pkg.parse(ct_file)
             root = tree.getroot()
             ns_ct = 'http://schemas.openxmlformats.org/package/2006/content-types'
 
@@ -520,7 +383,7 @@ class P10PPTFiller:
                     root.remove(o)
 
             # 3) 添加当前 xlsx 覆盖项（若不存在）
-            target_part = f'/ppt/embeddings/{workbook_path.name}'
+            target_part = f'/ppt/embeddings/{Path(workbook_path).name}'
             has_xlsx_override = any(
                 (o.get('PartName') == target_part)
                 for o in root.findall(f'{{{ns_ct}}}Override')
@@ -533,122 +396,88 @@ class P10PPTFiller:
                     ContentType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
                 )
 
-            tree.write(ct_file, encoding='utf-8', xml_declaration=True)
+            pkg.write_tree(ct_file, tree)
             self.logger.info('Content_Types.xml 已更新')
         except Exception as e:
             self.logger.error(f'更新 Content_Types 失败: {e}')
             raise
             
-    def _update_chart_data_xml(self, extracted_dir, chart_name, data_df, chart_type="pie"):
+    def _chart_kind(self, chart_types, part: str) -> str:
+        """模板图表类型：pie / scatter / line（按 plotArea 下的图表节点识别，chart_types 来自模板清单）"""
+        for kind in ('pie', 'scatter', 'line'):
+            if f'{kind}Chart' in chart_types:
+                return kind
+        raise RuntimeError(f"无法识别图表类型: {part}")
+
+    def _update_chart_data_xml(self, chart: ChartPatch, data_df, chart_type="pie"):
         """更新图表数据XML"""
-        chart_file = extracted_dir / "ppt" / "charts" / f"{chart_name}.xml"
-        
-        if not chart_file.exists():
-            self.logger.warning(f"图表文件不存在: {chart_file}")
-            return False
-            
         try:
-            # 解析XML
-            tree = ET.parse(chart_file)
-            root = tree.getroot()
-            
-            # 定义命名空间
-            namespaces = {
-                'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart',
-                'a': 'http://schemas.openxmlformats.org/drawingml/2006/main'
-            }
-            
             if chart_type == "pie":
-                self._update_pie_chart_xml(root, data_df, namespaces)
+                self._update_pie_chart_xml(chart, data_df)
             elif chart_type == "line":
-                self._update_line_chart_xml(root, data_df, namespaces)
-                
-            # 保存更新后的XML
-            tree.write(chart_file, encoding='utf-8', xml_declaration=True)
-            self.logger.info(f"图表数据已更新: {chart_file}")
+                self._update_line_chart_xml(chart, data_df)
+            self.logger.info(f"图表数据已更新: {chart.part}")
             return True
             
         except Exception as e:
-            self.logger.error(f"更新图表XML失败 {chart_file}: {e}")
+            self.logger.error(f"更新图表XML失败 {chart.part}: {e}")
             return False
             
-    def _update_pie_chart_xml(self, root, pie_df, namespaces):
+    def _update_pie_chart_xml(self, chart: ChartPatch, pie_df):
         """更新饼图XML数据"""
         # 查找饼图数据系列
-        pie_chart = root.find('.//c:pieChart', namespaces)
-        if pie_chart is None:
-            self.logger.warning("未找到饼图元素")
-            return
-            
-        # 查找数据系列
-        ser = pie_chart.find('.//c:ser', namespaces)
-        if ser is None:
-            self.logger.warning("未找到饼图数据系列")
+        series = chart.series_of('pieChart')
+        if not series:
+            self.logger.warning("未找到饼图元素或数据系列")
             return
+        ser = series[0]
             
         # 更新颜色配置
-        self._update_pie_chart_colors(ser, namespaces)
+        self._update_pie_chart_colors(ser)
             
         # 更新类别与数值（严格以模板 dPt 索引顺序为准，确保颜色与数据对应）
-        cat = ser.find('.//c:cat', namespaces)
-        cat_missing = cat is None
-        dpts = ser.findall('.//c:dPt', namespaces)
+        cat = ser.el.find('c:cat', NS)
+        dpts = ser.points
         if not dpts:
             raise RuntimeError("模板饼图未包含 c:dPt 颜色节点，无法确定点顺序")
         # 收集 dPt 的索引顺序
         dpt_order = []
         for dpt in dpts:
-            idx_elem = dpt.find('.//c:idx', namespaces)
+            idx_elem = dpt.find('c:idx', NS)
             if idx_elem is None or not idx_elem.get('val'):
                 raise RuntimeError('模板饼图数据点缺少索引 c:idx')
             dpt_order.append(int(idx_elem.get('val')))
         dpt_order_sorted = sorted(dpt_order)
         # 构建 idx->标签 的映射：优先使用 c:cat/c:strCache；若类别节点缺失，则从 dPt 文本读取
         idx_to_label = {}
-        str_cache = None
-        if not cat_missing:
-            str_ref = cat.find('.//c:strRef', namespaces)
+        if cat is not None:
+            str_ref = ser.ref('cat', 'str')
             if str_ref is None:
                 raise RuntimeError('模板饼图缺少类别引用 c:cat/c:strRef')
-            str_cache = str_ref.find('.//c:strCache', namespaces)
+            str_cache = str_ref.find('c:strCache', NS)
             if str_cache is None:
                 raise RuntimeError('模板饼图缺少类别缓存 c:cat/c:strRef/c:strCache')
-            for pt in str_cache.findall('.//c:pt', namespaces):
+            for pt in str_cache.findall('c:pt', NS):
                 idx_attr = pt.get('idx')
-                v = pt.find('.//c:v', namespaces)
+                v = pt.find('c:v', NS)
                 if idx_attr is None or v is None or not v.text:
                     raise RuntimeError('模板饼图类别缓存点缺少 idx 或值 c:v')
                 idx_to_label[int(idx_attr)] = v.text
         else:
             # 无 c:cat 时读取标签：优先 dPt 文本，其次按颜色映射识别标签
-            color_to_label = {
-                '009FA9': 'Positive',  # 绿色/青色
-                '00AFA9': 'Positive',  # 容错近似
-                '10B0AA': 'Positive',  # 容错近似
-                'D81159': 'Negative',  # 品红
-                'F0005B': 'Negative',  # 容错近似
-                'FEC000': 'Neutral',   # 黄色（饼图）
-                'FFBC42': 'Neutral',   # 黄色（折线图/散点模板）
-            }
             for dpt in dpts:
-                idx_elem = dpt.find('.//c:idx', namespaces)
-                if idx_elem is None or not idx_elem.get('val'):
-                    raise RuntimeError('模板饼图在 dPt 上缺少索引 c:idx')
-                idx = int(idx_elem.get('val'))
+                idx = int(dpt.find('c:idx', NS).get('val'))
                 # 先尝试 dPt/tx 文本
-                tx_text = None
-                t_nodes = dpt.findall('.//c:tx//a:t', namespaces)
-                if t_nodes:
-                    tx_text = ''.join([t.text or '' for t in t_nodes]).strip()
+                tx_text = ''.join([t.text or '' for t in dpt.findall('.//c:tx//a:t', NS)]).strip()
                 if tx_text:
                     idx_to_label[idx] = tx_text
                     continue
                 # 再尝试按颜色识别标签
-                srgb = dpt.find('.//a:srgbClr', namespaces)
+                srgb = dpt.find('.//a:srgbClr', NS)
                 color_hex = srgb.get('val') if srgb is not None else None
                 if not color_hex:
                     raise RuntimeError('模板饼图在 dPt 上缺少颜色 a:srgbClr@val，无法识别标签')
-                mapped_label = color_to_label.get(color_hex.upper())
+                mapped_label = PIE_COLOR_TO_LABEL.get(color_hex.upper())
                 if not mapped_label:
                     raise RuntimeError(f'无法依据颜色映射识别标签: {color_hex}')
                 idx_to_label[idx] = mapped_label
@@ -667,165 +496,70 @@ class P10PPTFiller:
         # 用按颜色顺序重排后的数据替换
         pie_df = pd.DataFrame(ordered_rows)
         # 写回类别缓存（仅在存在 c:cat 时更新；若无 c:cat 则保留模板既有标签来源）
-        if str_cache is not None:
-            for pt in list(str_cache.findall('.//c:pt', namespaces)):
-                str_cache.remove(pt)
-            for idx, lbl in zip(dpt_order_sorted, ordered_labels):
-                pt = ET.SubElement(str_cache, '{http://schemas.openxmlformats.org/drawingml/2006/chart}pt')
-                pt.set('idx', str(idx))
-                v = ET.SubElement(pt, '{http://schemas.openxmlformats.org/drawingml/2006/chart}v')
-                v.text = lbl
+        if cat is not None:
+            ser.set_labels(ordered_labels, indices=dpt_order_sorted)
+        # 更新数值数据（严格按 dPt 索引顺序写入，确保颜色对应）
+        num_ref = ser.ref('val', 'num')
+        if num_ref is not None and num_ref.find('c:numCache', NS) is not None:
+            ser.set_values(list(pie_df['Percentage']), indices=dpt_order_sorted)
                         
-        # 更新数值数据
-        val = ser.find('.//c:val', namespaces)
-        if val is not None:
-            num_ref = val.find('.//c:numRef', namespaces)
-            if num_ref is not None:
-                num_cache = num_ref.find('.//c:numCache', namespaces)
-                if num_cache is not None:
-                    # 清除现有数据点
-                    for pt in list(num_cache.findall('.//c:pt', namespaces)):
-                        num_cache.remove(pt)
-                    # 添加新数据点（严格按 dPt 索引顺序写入，确保颜色对应）
-                    for idx, percentage in zip(dpt_order_sorted, list(pie_df['Percentage'])):
-                        pt = ET.SubElement(num_cache, '{http://schemas.openxmlformats.org/drawingml/2006/chart}pt')
-                        pt.set('idx', str(idx))
-                        v = ET.SubElement(pt, '{http://schemas.openxmlformats.org/drawingml/2006/chart}v')
-                        v.text = str(percentage)
-                        
-    def _update_pie_chart_colors(self, ser, namespaces):
+    def _update_pie_chart_colors(self, ser: Series):
         """更新饼图颜色配置
         - 始终保留模板颜色并严格校验；不依赖也不覆盖为配置颜色。
         - 若模板缺少期望的颜色节点，抛错，不做兜底。
         """
-        dpts = ser.findall('.//c:dPt', namespaces)
+        dpts = ser.points
         if not dpts:
             raise RuntimeError("模板饼图未包含 c:dPt 颜色节点，无法校验颜色")
-        a_ns = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
         for dpt in dpts:
-            idx_elem = dpt.find('.//c:idx', namespaces)
+            idx_elem = dpt.find('c:idx', NS)
             idx = idx_elem.get('val') if idx_elem is not None else '?'
-            sp_pr = dpt.find('.//c:spPr', namespaces)
-            if sp_pr is None:
-                raise RuntimeError("模板饼图缺少 c:spPr 节点")
-            solid_fill = sp_pr.find(f'.//{a_ns}solidFill')
-            if solid_fill is None:
-                raise RuntimeError("模板饼图缺少 a:solidFill 节点")
-            srgb = solid_fill.find(f'.//{a_ns}srgbClr')
-            scheme = solid_fill.find(f'.//{a_ns}schemeClr')
-            val = srgb.get('val') if srgb is not None else scheme.get('val') if scheme is not None else None
+            # 若为 schemeClr，则保持 scheme 方案；若为 srgbClr 则保持具体色值
+            val = fill_color(dpt)
             if val is None:
-                raise RuntimeError("模板饼图颜色节点缺少 srgbClr/schemeClr")
+                raise RuntimeError("模板饼图颜色节点缺失（c:spPr/a:solidFill/a:srgbClr|a:schemeClr）")
             self.logger.info(f"保留模板饼图颜色: dPt[{idx}] -> {val}")
-            # 保持模板颜色，不做任何覆盖
-            # 若为 schemeClr，则保持 scheme 方案；若为 srgbClr 则保持具体色值
             # 本处不进行任何写入，以确保模板颜色严格保留。
                         
-    def _update_line_chart_xml(self, root, line_df, namespaces):
+    def _update_line_chart_xml(self, chart: ChartPatch, line_df):
         """更新折线图XML数据"""
-        # 查找折线图
-        line_chart = root.find('.//c:lineChart', namespaces)
-        if line_chart is None:
+        # 获取所有数据系列
+        series_list = chart.series_of('lineChart')
+        if not series_list:
             self.logger.warning("未找到折线图元素")
             return
-            
-        # 获取所有数据系列
-        series_list = line_chart.findall('.//c:ser', namespaces)
         # 从模板读取系列标签顺序，作为数据-颜色的语义绑定依据
-        tmpl_labels = []
         for ser in series_list:
-            tx_v = ser.find('.//c:tx//c:v', namespaces)
-            if tx_v is not None and tx_v.text:
-                tmpl_labels.append(tx_v.text)
-                continue
-            str_cache = ser.find('.//c:tx//c:strRef//c:strCache', namespaces)
-            if str_cache is None:
+            if ser.name is None:
                 raise RuntimeError('折线系列缺少名称 c:tx/c:v 或 c:tx/c:strRef/c:strCache')
-            pt = str_cache.find('.//c:pt', namespaces)
-            v = pt.find('.//c:v', namespaces) if pt is not None else None
-            if v is None or not v.text:
-                raise RuntimeError('折线系列名称缓存缺少值 c:v')
-            tmpl_labels.append(v.text)
 
-        for i, ser in enumerate(series_list):
-            if i >= len(tmpl_labels):
-                break
-            sentiment = tmpl_labels[i]
+        for ser in series_list:
+            sentiment = ser.name
             if sentiment not in line_df.columns:
                 continue
-                
             # 更新X轴数据（日期）
-            cat = ser.find('.//c:cat', namespaces)
-            if cat is not None:
-                str_ref = cat.find('.//c:strRef', namespaces)
-                if str_ref is not None:
-                    str_cache = str_ref.find('.//c:strCache', namespaces)
-                    if str_cache is not None:
-                        # 清除现有数据点
-                        for pt in str_cache.findall('.//c:pt', namespaces):
-                            str_cache.remove(pt)
-                        
-                        # 添加日期数据点
-                        for j, date in enumerate(line_df['Date']):
-                            pt = ET.SubElement(str_cache, '{http://schemas.openxmlformats.org/drawingml/2006/chart}pt')
-                            pt.set('idx', str(j))
-                            v = ET.SubElement(pt, '{http://schemas.openxmlformats.org/drawingml/2006/chart}v')
-                            v.text = str(date)
-                        # 更新点计数
-                        pt_count = str_cache.find('.//c:ptCount', namespaces)
-                        if pt_count is not None:
-                            pt_count.set('val', str(len(line_df['Date'])))
-                            
+            str_ref = ser.ref('cat', 'str')
+            if str_ref is not None and str_ref.find('c:strCache', NS) is not None:
+                ser.set_labels(list(line_df['Date']))
             # 更新Y轴数据（百分比）
-            val = ser.find('.//c:val', namespaces)
-            if val is not None:
-                num_ref = val.find('.//c:numRef', namespaces)
-                if num_ref is not None:
-                    num_cache = num_ref.find('.//c:numCache', namespaces)
-                    if num_cache is not None:
-                        # 清除现有数据点
-                        for pt in num_cache.findall('.//c:pt', namespaces):
-                            num_cache.remove(pt)
-                        
-                        # 添加百分比数据点
-                        for j, percentage in enumerate(line_df[sentiment]):
-                            pt = ET.SubElement(num_cache, '{http://schemas.openxmlformats.org/drawingml/2006/chart}pt')
-                            pt.set('idx', str(j))
-                            v = ET.SubElement(pt, '{http://schemas.openxmlformats.org/drawingml/2006/chart}v')
-                            v.text = str(percentage)
-                        # 更新点计数
-                        pt_count = num_cache.find('.//c:ptCount', namespaces)
-                        if pt_count is not None:
-                            pt_count.set('val', str(len(line_df[sentiment])))
+            num_ref = ser.ref('val', 'num')
+            if num_ref is not None and num_ref.find('c:numCache', NS) is not None:
+                ser.set_values(list(line_df[sentiment]))
 
         # 同步更新折线图系列颜色（保留模板）
-        self._update_line_chart_colors(root, namespaces)
+        self._update_line_chart_colors(chart)
 
-    def _update_line_chart_colors(self, root, namespaces):
+    def _update_line_chart_colors(self, chart: ChartPatch):
         """更新折线图系列颜色
         - 始终保留模板颜色并严格校验；不依赖也不覆盖为配置颜色。
         """
-        line_chart = root.find('.//c:lineChart', namespaces)
-        if line_chart is None:
+        if not chart.has('lineChart'):
             raise RuntimeError("未找到折线图元素以更新颜色")
-        series_list = line_chart.findall('.//c:ser', namespaces)
-        a_ns = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
         # 保留模板颜色：仅校验并记录
-        for idx, ser in enumerate(series_list):
-            sp_pr = ser.find('.//c:spPr', namespaces)
-            if sp_pr is None:
-                raise RuntimeError("模板折线系列缺少 c:spPr 节点")
-            ln = sp_pr.find(f'.//{a_ns}ln')
-            if ln is None:
-                raise RuntimeError("模板折线系列缺少 a:ln 节点")
-            solid_fill = ln.find(f'.//{a_ns}solidFill')
-            if solid_fill is None:
-                raise RuntimeError("模板折线系列缺少 a:solidFill 节点")
-            srgb = solid_fill.find(f'.//{a_ns}srgbClr')
-            scheme = solid_fill.find(f'.//{a_ns}schemeClr')
-            val = srgb.get('val') if srgb is not None else scheme.get('val') if scheme is not None else None
+        for idx, ser in enumerate(chart.series_of('lineChart')):
+            val = fill_color(ser.el, line=True)
             if val is None:
-                raise RuntimeError("模板折线系列颜色节点缺少 srgbClr/schemeClr")
+                raise RuntimeError("模板折线系列颜色节点缺失（c:spPr/a:ln/a:solidFill/a:srgbClr|a:schemeClr）")
             self.logger.info(f"保留模板折线颜色: ser[{idx}] -> {val}")
 
     # ============================= 图表绑定修复（externalData 与公式） =============================
@@ -840,15 +574,15 @@ class P10PPTFiller:
             letters.append(chr(65 + rem))
         return ''.join(reversed(letters))
 
-    def _get_workbook_rel_id(self, extracted_dir: Path, chart_base: str) -> str:
+    def _get_workbook_rel_id(self, pkg: OpcPackage, chart_base: str) -> str:
         """获取图表与嵌入工作簿的关系ID（rId），严格要求存在"""
-        rels_file = extracted_dir / 'ppt' / 'charts' / '_rels' / f'{chart_base}.xml.rels'
-        if not rels_file.exists():
+        rels_file = f'ppt/charts/_rels/{chart_base}.xml.rels'
+        if not pkg.exists(rels_file):
             # 模板中可能使用 .rels 文件名不带 .xml（兼容处理，但仍按严格抛错）
-            rels_file = extracted_dir / 'ppt' / 'charts' / '_rels' / f'{chart_base}.rels'
-        if not rels_file.exists():
+            rels_file = f'ppt/charts/_rels/{chart_base}.rels'
+        if not pkg.exists(rels_file):
             raise FileNotFoundError(f"缺少图表关系文件: {rels_file}")
-        tree = ET.parse(rels_file)
+        tree = pkg.parse(rels_file)
         root = tree.getroot()
         ns_pkg = 'http://schemas.openxmlformats.org/package/2006/relationships'
         for rel in root.findall(f'.//{{{ns_pkg}}}Relationship'):
@@ -860,145 +594,87 @@ class P10PPTFiller:
                 return rid
         raise RuntimeError("未找到指向嵌入工作簿的 package 关系")
 
-    def _ensure_external_data(self, extracted_dir: Path, chart_base: str, rid: str):
+    def _ensure_external_data(self, chart: ChartPatch, rid: str):
         """确保图表XML存在 externalData 并启用 autoUpdate=1，r:id 指向嵌入工作簿"""
-        chart_file = extracted_dir / 'ppt' / 'charts' / f'{chart_base}.xml'
-        if not chart_file.exists():
-            raise FileNotFoundError(f"图表XML不存在: {chart_file}")
-        tree = ET.parse(chart_file)
-        root = tree.getroot()
-        ns_c = 'http://schemas.openxmlformats.org/drawingml/2006/chart'
-        ns_r = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
-        ext = root.find(f'.//{{{ns_c}}}externalData')
-        if ext is None:
-            # externalData 通常为 chartSpace 的直接子节点
-            ext = ET.SubElement(root, f'{{{ns_c}}}externalData')
-        ext.set(f'{{{ns_r}}}id', rid)
-        # 设置 autoUpdate=1
-        auto = ext.find(f'.//{{{ns_c}}}autoUpdate')
-        if auto is None:
-            auto = ET.SubElement(ext, f'{{{ns_c}}}autoUpdate')
-        auto.set('val', '1')
-        tree.write(chart_file, encoding='utf-8', xml_declaration=True)
-        self.logger.info(f"externalData 已绑定并启用自动更新: {chart_file}")
+        chart.bind_workbook(rid)
+        self.logger.info(f"externalData 已绑定并启用自动更新: {chart.part}")
+
+    @staticmethod
+    def _set_template_formula(ser: Series, role: str, kind: str, formula: str) -> bool:
+        """仅改写模板已有的公式 c:{role}/c:{kind}Ref/c:f；不存在时返回 False（不新建）"""
+        ref = ser.ref(role, kind)
+        if ref is None or ref.find('c:f', NS) is None:
+            return False
+        ser.set_formula(role, formula, kind)
+        return True
 
-    def _update_pie_formulas(self, extracted_dir: Path, chart_base: str, pie_df: pd.DataFrame):
+    def _update_pie_formulas(self, chart: ChartPatch, pie_df: pd.DataFrame):
         """将饼图的公式 c:f 指向嵌入工作簿 PieData 实际区域
         中文注释：部分模板可能不包含类别公式(c:cat/c:strRef/c:f)，此时仅更新数值公式确保绑定到嵌入工作簿，不做静默兜底。
         """
-        chart_file = extracted_dir / 'ppt' / 'charts' / f'{chart_base}.xml'
-        tree = ET.parse(chart_file)
-        root = tree.getroot()
-        ns = {'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart'}
-        pie_chart = root.find('.//c:pieChart', ns)
-        if pie_chart is None:
-            raise RuntimeError("未找到饼图元素以更新公式")
-        ser = pie_chart.find('.//c:ser', ns)
-        if ser is None:
+        series = chart.series_of('pieChart')
+        if not series:
             raise RuntimeError("未找到饼图数据系列以更新公式")
+        ser = series[0]
         n = len(pie_df) + 1  # 含表头，第2行开始
         # 类别公式（可选）：若模板不存在类别公式则记录信息并跳过
-        cat_f = ser.find('.//c:cat/c:strRef/c:f', ns)
-        if cat_f is not None:
-            cat_f.text = f"PieData!$A$2:$A${n}"
-        else:
+        if not self._set_template_formula(ser, 'cat', 'str', f"PieData!$A$2:$A${n}"):
             self.logger.info("模板饼图无 c:cat/c:strRef/c:f，仅更新数值公式以绑定嵌入工作簿")
         # 数值公式
-        val_f = ser.find('.//c:val/c:numRef/c:f', ns)
-        if val_f is None:
+        if not self._set_template_formula(ser, 'val', 'num', f"PieData!$B$2:$B${n}"):
             raise RuntimeError("饼图缺少数值公式 c:val/c:numRef/c:f")
-        val_f.text = f"PieData!$B$2:$B${n}"
-        ET.ElementTree(root).write(chart_file, encoding='utf-8', xml_declaration=True)
-        self.logger.info(f"饼图公式已更新到嵌入工作簿区域: {chart_file}")
+        self.logger.info(f"饼图公式已更新到嵌入工作簿区域: {chart.part}")
 
-    def _update_line_formulas(self, extracted_dir: Path, chart_base: str, line_df: pd.DataFrame):
+    def _update_line_formulas(self, chart: ChartPatch, line_df: pd.DataFrame):
         """将折线图的公式 c:f 指向嵌入工作簿 LineData 实际区域"""
-        chart_file = extracted_dir / 'ppt' / 'charts' / f'{chart_base}.xml'
-        tree = ET.parse(chart_file)
-        root = tree.getroot()
-        ns = {'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart'}
-        line_chart = root.find('.//c:lineChart', ns)
-        if line_chart is None:
+        if not chart.has('lineChart'):
             raise RuntimeError("未找到折线图元素以更新公式")
-        series_list = line_chart.findall('.//c:ser', ns)
         # X轴类别公式：若存在 Date 列则使用 Date，否则回退到 X 数值列
         n = len(line_df) + 1
         x_idx = 1 if 'Date' in line_df.columns else 0
         x_col = self._excel_col_letter(x_idx)
-        for i, ser in enumerate(series_list):
+        for i, ser in enumerate(chart.series_of('lineChart')):
             # 更新 X 轴公式
-            cat_f = ser.find('.//c:cat/c:strRef/c:f', ns)
-            if cat_f is None:
+            if not self._set_template_formula(ser, 'cat', 'str', f"LineData!${x_col}$2:${x_col}${n}"):
                 raise RuntimeError("折线图缺少类别公式 c:cat/c:strRef/c:f")
-            cat_f.text = f"LineData!${x_col}$2:${x_col}${n}"
             # 更新 Y 轴值公式：若存在 Date 列，则从第3列开始，否则从第2列开始
             y_col = self._excel_col_letter(i + (2 if 'Date' in line_df.columns else 1))
-            val_f = ser.find('.//c:val/c:numRef/c:f', ns)
-            if val_f is None:
+            if not self._set_template_formula(ser, 'val', 'num', f"LineData!${y_col}$2:${y_col}${n}"):
                 raise RuntimeError("折线图缺少数值公式 c:val/c:numRef/c:f")
-            val_f.text = f"LineData!${y_col}$2:${y_col}${n}"
-        ET.ElementTree(root).write(chart_file, encoding='utf-8', xml_declaration=True)
-        self.logger.info(f"折线图公式已更新到嵌入工作簿区域: {chart_file}")
+        self.logger.info(f"折线图公式已更新到嵌入工作簿区域: {chart.part}")
 
-    def _update_scatter_formulas(self, extracted_dir: Path, chart_base: str, line_df: pd.DataFrame):
+    def _update_scatter_formulas(self, chart: ChartPatch, line_df: pd.DataFrame):
         """将散点图的 xVal/yVal 公式绑定到嵌入工作簿 LineData
         - xVal 指向 X 数值轴列（A列）：LineData!$A$2:$A${n}
         - yVal 按模板系列顺序依次指向对应列（保持与模板一致）
         中文注释：此函数要求 _create_embedded_workbook 写入列顺序为 [X, Date(可选), <模板系列>]
         """
-        chart_file = extracted_dir / 'ppt' / 'charts' / f'{chart_base}.xml'
-        if not chart_file.exists():
-            raise FileNotFoundError(f"图表XML不存在: {chart_file}")
-        tree = ET.parse(chart_file)
-        root = tree.getroot()
-        ns = {'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart'}
-        scatter_chart = root.find('.//c:scatterChart', ns)
-        if scatter_chart is None:
+        if not chart.has('scatterChart'):
             raise RuntimeError("未找到散点图元素以更新公式")
         n = len(line_df) + 1
-        series_list = scatter_chart.findall('.//c:ser', ns)
         # 列字母映射：X(A)。若存在 Date 列，则 B 为 Date；yVal 从 C 开始按模板顺序对应
         x_col = 'A'
         y_start_idx = 2 if 'Date' in line_df.columns else 1
-        for i, ser in enumerate(series_list):
-            y_idx = y_start_idx + i
-            y_col = self._excel_col_letter(y_idx)
-            # 更新 xVal 公式
-            x_f = ser.find('.//c:xVal/c:numRef/c:f', ns)
-            if x_f is None:
+        for i, ser in enumerate(chart.series_of('scatterChart')):
+            y_col = self._excel_col_letter(y_start_idx + i)
+            if not self._set_template_formula(ser, 'xVal', 'num', f"LineData!${x_col}$2:${x_col}${n}"):
                 raise RuntimeError("散点图缺少 xVal 公式 c:xVal/c:numRef/c:f")
-            x_f.text = f"LineData!${x_col}$2:${x_col}${n}"
-            # 更新 yVal 公式
-            y_f = ser.find('.//c:yVal/c:numRef/c:f', ns)
-            if y_f is None:
+            if not self._set_template_formula(ser, 'yVal', 'num', f"LineData!${y_col}$2:${y_col}${n}"):
                 raise RuntimeError("散点图缺少 yVal 公式 c:yVal/c:numRef/c:f")
-            y_f.text = f"LineData!${y_col}$2:${y_col}${n}"
-        ET.ElementTree(root).write(chart_file, encoding='utf-8', xml_declaration=True)
-        self.logger.info(f"散点图公式已更新到嵌入工作簿区域: {chart_file}")
+        self.logger.info(f"散点图公式已更新到嵌入工作簿区域: {chart.part}")
 
-    def _update_scatter_chart_xml(self, extracted_dir, chart_name, line_df):
+    def _update_scatter_chart_xml(self, chart: ChartPatch, line_df):
         """更新散点图(XML)为每日趋势百分比：X为日索引，Y为百分比"""
-        chart_file = extracted_dir / "ppt" / "charts" / f"{chart_name}.xml"
-        if not chart_file.exists():
-            self.logger.warning(f"散点图文件不存在: {chart_file}")
-            return False
         try:
-            tree = ET.parse(chart_file)
-            root = tree.getroot()
-            namespaces = {
-                'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart',
-                'a': 'http://schemas.openxmlformats.org/drawingml/2006/main'
-            }
-            scatter_chart = root.find('.//c:scatterChart', namespaces)
-            if scatter_chart is None:
+            if not chart.has('scatterChart'):
                 self.logger.warning("未找到散点图元素")
                 return False
+            series_list = chart.series_of('scatterChart')
             # 准备X轴日索引（与 _create_embedded_workbook 保持一致）。
             # 若不存在 Date 列，则严格按行数回退并保持与公式更新一致。
             base = int(self.config.get('fill_policy', {}).get('axis_day_base', 20300))
             length = len(line_df['Date']) if 'Date' in line_df.columns else len(line_df)
             x_values = [base + i for i in range(length)]
-            series_list = scatter_chart.findall('.//c:ser', namespaces)
             # 按列索引绑定 Y：源数据 line_df 不含 X，因此若存在 Date，则 Y 从第2列开始，否则从第1列开始。
             y_start_idx = 1 if 'Date' in line_df.columns else 0
             value_cols = [c for c in line_df.columns if c != 'Date']
@@ -1016,85 +692,46 @@ class P10PPTFiller:
                 except Exception:
                     raise TypeError(f"散点系列第{i+1}列数据非数值类型: {line_df.columns[y_idx]}")
                 sentiment = line_df.columns[y_idx]
-                # 更新X值
-                xval = ser.find('.//c:xVal', namespaces)
-                if xval is not None:
-                    num_ref = xval.find('.//c:numRef', namespaces)
-                    if num_ref is not None:
-                        num_cache = num_ref.find('.//c:numCache', namespaces)
-                        if num_cache is not None:
-                            for pt in num_cache.findall('.//c:pt', namespaces):
-                                num_cache.remove(pt)
-                            for j, xv in enumerate(x_values):
-                                pt = ET.SubElement(num_cache, '{http://schemas.openxmlformats.org/drawingml/2006/chart}pt')
-                                pt.set('idx', str(j))
-                                v = ET.SubElement(pt, '{http://schemas.openxmlformats.org/drawingml/2006/chart}v')
-                                v.text = str(xv)
-                            pt_count = num_cache.find('.//c:ptCount', namespaces)
-                            if pt_count is not None:
-                                pt_count.set('val', str(len(x_values)))
-                # 更新Y值
-                yval = ser.find('.//c:yVal', namespaces)
-                if yval is not None:
-                    num_ref = yval.find('.//c:numRef', namespaces)
-                    if num_ref is not None:
-                        num_cache = num_ref.find('.//c:numCache', namespaces)
-                        if num_cache is not None:
-                            for pt in num_cache.findall('.//c:pt', namespaces):
-                                num_cache.remove(pt)
-                            for j, yv in enumerate(y_series):
-                                pt = ET.SubElement(num_cache, '{http://schemas.openxmlformats.org/drawingml/2006/chart}pt')
-                                pt.set('idx', str(j))
-                                v = ET.SubElement(pt, '{http://schemas.openxmlformats.org/drawingml/2006/chart}v')
-                                v.text = str(yv)
-                            pt_count = num_cache.find('.//c:ptCount', namespaces)
-                            if pt_count is not None:
-                                pt_count.set('val', str(len(y_series)))
+                # 更新X值与Y值（仅在模板已有缓存时改写）
+                for role, values in (('xVal', x_values), ('yVal', list(y_series))):
+                    num_ref = ser.ref(role, 'num')
+                    if num_ref is not None and num_ref.find('c:numCache', NS) is not None:
+                        ser.set_values(values, role=role)
                 
                 # 更新系列颜色（保留模板）
-                self._update_scatter_chart_colors(ser, sentiment, namespaces)
+                self._update_scatter_chart_colors(ser, sentiment)
             
-            tree.write(chart_file, encoding='utf-8', xml_declaration=True)
-            self.logger.info(f"散点图数据已更新: {chart_file}")
+            self.logger.info(f"散点图数据已更新: {chart.part}")
             return True
         except Exception as e:
-            self.logger.error(f"更新散点图XML失败 {chart_file}: {e}")
+            self.logger.error(f"更新散点图XML失败 {chart.part}: {e}")
             return False
 
-    def _update_scatter_chart_colors(self, ser, sentiment, namespaces):
+    def _update_scatter_chart_colors(self, ser: Series, sentiment):
         """更新散点图系列颜色
         - 始终保留模板颜色并严格校验；不依赖也不覆盖为配置颜色。
         """
-        a_ns = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
-        sp_pr = ser.find('.//c:spPr', namespaces)
-        if sp_pr is None:
+        if ser.el.find('c:spPr', NS) is None:
             raise RuntimeError("模板散点系列缺少 c:spPr 节点")
         # 保留模板颜色：仅校验并记录
-        ln = sp_pr.find(f'.//{a_ns}ln')
-        solid_fill = sp_pr.find(f'.//{a_ns}solidFill')
-        srgb_ln = ln.find(f'.//{a_ns}srgbClr') if ln is not None else None
-        srgb_fill = solid_fill.find(f'.//{a_ns}srgbClr') if solid_fill is not None else None
-        scheme_ln = ln.find(f'.//{a_ns}schemeClr') if ln is not None else None
-        scheme_fill = solid_fill.find(f'.//{a_ns}schemeClr') if solid_fill is not None else None
-        val_ln = srgb_ln.get('val') if srgb_ln is not None else scheme_ln.get('val') if scheme_ln is not None else None
-        val_fill = srgb_fill.get('val') if srgb_fill is not None else scheme_fill.get('val') if scheme_fill is not None else None
+        val_ln = fill_color(ser.el, line=True)
+        val_fill = fill_color(ser.el)
         if val_ln is None and val_fill is None:
             raise RuntimeError("模板散点系列颜色节点缺失 srgbClr/schemeClr")
         self.logger.info(f"保留模板散点颜色: {sentiment} -> ln:{val_ln}, fill:{val_fill}")
 
-    def _update_chart_rels(self, extracted_dir, workbook_path):
+    def _update_chart_rels(self, pkg, workbook_path):
         """更新图表关系文件，指向新嵌入工作簿
         严格错误策略：若关系文件缺失则抛出 FileNotFoundError。
         """
         try:
             target = f"../embeddings/{Path(workbook_path).name}"
-            rels_dir = extracted_dir / 'ppt' / 'charts' / '_rels'
             for chart_name in self.config['output']['replace_charts']:
-                rels_file = rels_dir / f"{chart_name}.rels"
-                if not rels_file.exists():
+                rels_file = f"ppt/charts/_rels/{chart_name}.rels"
+                if not pkg.exists(rels_file):
                     raise FileNotFoundError(f"未找到关系文件: {rels_file}")
                 try:
-                    tree = ET.parse(rels_file)
+                    tree = pkg.parse(rels_file)
                     root = tree.getroot()
                     # OOXML package namespace
                     # 默认关系元素无需前缀
@@ -1102,7 +739,7 @@ class P10PPTFiller:
                         t = rel.get('Type', '')
                         if t.endswith('/relationships/package'):
                             rel.set('Target', target)
-                    tree.write(rels_file, encoding='utf-8', xml_declaration=True)
+                    pkg.write_tree(rels_file, tree)
                     self.logger.info(f"关系已更新: {rels_file} -> {target}")
                 except Exception as e:
                     self.logger.error(f"更新关系失败 {rels_file}: {e}")
@@ -1112,19 +749,13 @@ class P10PPTFiller:
             self.logger.error(f"更新图表关系失败: {e}")
             return False
                             
-    def _repackage_ppt(self, extracted_dir):
-        """重新打包PPT文件"""
+    def _repackage_ppt(self, pkg):
+        """一次写出PPT文件（未修改部件原样拷贝，修改部件重新压缩）"""
         output_file = self.output_dir / self.config['output']['final_ppt']
         
         try:
-            with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
-                for root, dirs, files in os.walk(extracted_dir):
-                    for file in files:
-                        file_path = Path(root) / file
-                        arc_name = file_path.relative_to(extracted_dir)
-                        zip_ref.write(file_path, arc_name)
-                        
-            self.logger.info(f"PPT文件已重新打包: {output_file}")
+            pkg.save(output_file)
+            self.logger.info(f"PPT文件已重新打包: {output_file}（修改部件 {len(pkg.modified)} 个）")
             return output_file
             
         except Exception as e:
@@ -1139,82 +770,49 @@ class P10PPTFiller:
             # 1. 准备工作目录
             self._prepare_directories()
             
-            # 2. 解压PPT模板
-            extracted_dir = self._extract_ppt_template()
+            # 2. 打开PPT模板（内存 OPC 包）
+            pkg = self._open_ppt_template()
             
             # 3. 加载Excel数据
             pie_df, line_df = self._load_excel_data()
             
-            # 4. 创建嵌入式工作簿
-            workbook_path = self._create_embedded_workbook(pie_df, line_df, extracted_dir)
-
-            # 4.1 更新关系文件到新工作簿（保留外部数据引用）
-            if self.config.get('fill_policy', {}).get('keep_external_data', True):
-                self._update_chart_rels(extracted_dir, workbook_path)
-                # 4.2 更新 Content_Types，声明新嵌入的 xlsx
-                self._update_content_types(extracted_dir, workbook_path)
-
-            # 4.3 为饼图/折线图/散点图绑定 externalData 并刷新公式引用到嵌入工作簿
+            # 4. 模板图表结构取自模板清单（按模板哈希缓存，模板不变时不再解析图表）
+            manifest = TemplateManifest.load(self.template_file, pkg=pkg, log=self.logger.info)
+            parts = {}
             for chart_name in self.config['output']['replace_charts']:
                 chart_base = chart_name.replace('.xml', '')
-                chart_xml_path = extracted_dir / 'ppt' / 'charts' / f"{chart_base}.xml"
-                if not chart_xml_path.exists():
-                    raise FileNotFoundError(f"图表XML不存在: {chart_xml_path}")
-                # 识别图表类型
-                chart_type = None
-                xml_text = chart_xml_path.read_text(encoding='utf-8')
-                if 'pieChart' in xml_text:
-                    chart_type = 'pie'
-                elif 'lineChart' in xml_text:
-                    chart_type = 'line'
-                elif 'scatterChart' in xml_text:
-                    chart_type = 'scatter'
-                # 查找关系ID并绑定 externalData
-                rid = self._get_workbook_rel_id(extracted_dir, chart_base)
-                self._ensure_external_data(extracted_dir, chart_base, rid)
-                # 更新公式绑定到嵌入工作簿
-                if chart_type == 'pie':
-                    self._update_pie_formulas(extracted_dir, chart_base, pie_df)
-                elif chart_type == 'line':
-                    self._update_line_formulas(extracted_dir, chart_base, line_df)
-                elif chart_type == 'scatter':
-                    self._update_scatter_formulas(extracted_dir, chart_base, line_df)
-            
-            # 5. 更新图表数据XML
-            replace_charts = self.config['output']['replace_charts']
-            for chart_name in replace_charts:
-                chart_base = chart_name.replace('.xml', '')
-                chart_xml_path = extracted_dir / 'ppt' / 'charts' / f"{chart_base}.xml"
-                chart_type = None
-                if chart_xml_path.exists():
-                    try:
-                        xml_text = chart_xml_path.read_text(encoding='utf-8')
-                        if 'pieChart' in xml_text:
-                            chart_type = 'pie'
-                        elif 'lineChart' in xml_text:
-                            chart_type = 'line'
-                        elif 'scatterChart' in xml_text:
-                            chart_type = 'scatter'
-                    except Exception:
-                        pass
-                # 回退规则（模板约定）
-                if chart_type is None:
-                    if chart_base == 'chart1':
-                        chart_type = 'pie'
-                    elif chart_base == 'chart2':
-                        chart_type = 'scatter'
-                    else:
-                        chart_type = 'line'
-                # 按识别类型更新
+                part = f"ppt/charts/{chart_base}.xml"
+                manifest.chart(part)  # 模板中不存在该图表时严格报错
+                parts[chart_base] = part
+
+            # 4.1 创建嵌入式工作簿
+            workbook_path = self._create_embedded_workbook(pie_df, line_df, pkg, manifest, parts)
+
+            # 4.2 更新关系文件到新工作簿（保留外部数据引用）
+            if self.config.get('fill_policy', {}).get('keep_external_data', True):
+                self._update_chart_rels(pkg, workbook_path)
+                # 4.3 更新 Content_Types，声明新嵌入的 xlsx
+                self._update_content_types(pkg, workbook_path)
+
+            # 5. 逐图表（每个部件只解析一次）：绑定 externalData → 公式引用指向嵌入工作簿 → 更新数据缓存 → 一次写回
+            for chart_base, part in parts.items():
+                chart = ChartPatch.open(pkg, part)
+                chart_type = self._chart_kind(manifest.chart_types(part), part)
+                rid = self._get_workbook_rel_id(pkg, chart_base)
+                self._ensure_external_data(chart, rid)
                 if chart_type == 'pie':
-                    self._update_chart_data_xml(extracted_dir, chart_base, pie_df, 'pie')
+                    self._update_pie_formulas(chart, pie_df)
+                    self._update_chart_data_xml(chart, pie_df, 'pie')
                 elif chart_type == 'line':
-                    self._update_chart_data_xml(extracted_dir, chart_base, line_df, 'line')
+                    self._update_line_formulas(chart, line_df)
+                    self._update_chart_data_xml(chart, line_df, 'line')
                 elif chart_type == 'scatter':
-                    self._update_scatter_chart_xml(extracted_dir, chart_base, line_df)
+                    self._update_scatter_formulas(chart, line_df)
+                    self._update_scatter_chart_xml(chart, line_df)
+                chart.save(pkg)
                     
             # 6. 重新打包PPT
-            final_ppt = self._repackage_ppt(extracted_dir)
+            final_ppt = self._repackage_ppt(pkg)
             
             self.logger.info(f"=== P10 PPT填充完成: {final_ppt} ===")
             return True
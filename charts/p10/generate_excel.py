@@ -5,15 +5,21 @@ P10 数据生成脚本 - 从数据库提取法国Lenovo情感分析数据生成E
 基于页面级配置，独立运行，不依赖全局配置
 """
 
-import sqlite3
+import numpy as np
 import pandas as pd
-import yaml
 import logging
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 import sys
 
+# 共享提及立方体位于仓库根 tools/ 目录
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'tools'))
+from neticle_cube import MentionCube
+from page_config import load_page_config
+
+SENTIMENT_LABELS = ['Positive', 'Neutral', 'Negative']
+
 class P10DataGenerator:
     """P10页面数据生成器"""
     
@@ -27,8 +33,7 @@ class P10DataGenerator:
     def _load_config(self):
         """加载页面级配置文件"""
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+            return load_page_config(self.config_path)
         except Exception as e:
             print(f"错误：无法加载配置文件 {self.config_path}: {e}")
             sys.exit(1)
@@ -57,69 +62,58 @@ class P10DataGenerator:
             ]
         )
         
-    def _get_db_connection(self, db_type='neticle'):
-        """获取数据库连接"""
+    def _get_cube(self, db_type='neticle'):
+        """获取共享提及立方体（按 countryId × 月份 只扫描一次宽表）"""
         db_path = self.config['data_sources'][f'{db_type}_db']
         if not os.path.exists(db_path):
             raise FileNotFoundError(f"数据库文件不存在: {db_path}")
-        return sqlite3.connect(db_path)
-        
-    def _convert_timestamp_to_date(self, timestamp_ms):
-        """将毫秒时间戳转换为日期字符串"""
+        return MentionCube(db_path)
+
+    def _sentiment_thresholds(self):
+        """读取情感阈值（缺失或类型错误时严格报错）"""
+        thresholds = self.config['sentiment'].get('thresholds')
+        if not thresholds or 'positive_min' not in thresholds or 'negative_max' not in thresholds:
+            # 不允许兜底，明确报错，避免掩盖错误配置
+            raise ValueError("配置缺少情感阀值：sentiment.thresholds.positive_min / sentiment.thresholds.negative_max")
         try:
-            # 转换毫秒时间戳为datetime对象
-            dt = datetime.fromtimestamp(timestamp_ms / 1000)
-            return dt.strftime('%Y-%m-%d')
+            return float(thresholds['positive_min']), float(thresholds['negative_max'])
         except Exception as e:
-            self.logger.warning(f"时间戳转换失败: {timestamp_ms}, 错误: {e}")
-            return None
-            
+            raise ValueError(f"情感阀值类型错误：{thresholds} -> {e}")
+
     def extract_sentiment_data(self):
-        """从数据库提取情感分析数据"""
+        """从共享立方体提取情感分析数据
+        中文注释：
+        - 立方体单元格为 day × keyword_label × 渠道 × 情感桶，mentions 为提及条数；
+        - 品牌严格按配置的 LIKE 模式（filters.keyword_pattern，如 '%lenovo%'）过滤 keyword_label，不扩展品牌别名
+          （立方体 label_pattern：品牌键整数位 key_mask）；
+        - 时间口径为 UTC 日，范围 [start_date, end_date] 含首尾。
+        """
         self.logger.info("开始提取情感分析数据...")
-        
-        # 构建SQL查询
+
         filters = self.config['filters']
         update_config = self.config['update']
-        
-        # 时间范围转换为毫秒时间戳
-        start_date = datetime.strptime(update_config['start_date'], '%Y-%m-%d')
-        end_date = datetime.strptime(update_config['end_date'], '%Y-%m-%d') + timedelta(days=1)  # 包含结束日期
-        start_timestamp = int(start_date.timestamp() * 1000)
-        end_timestamp = int(end_date.timestamp() * 1000)
-        
-        query = f"""
-        SELECT 
-            id,
-            polarity,
-            createdAtUtcMs,
-            keyword_label,
-            countryId
-        FROM mentions_wide 
-        WHERE countryId = {filters['countryId']}
-          AND keyword_label LIKE '{filters['keyword_pattern']}'
-          AND createdAtUtcMs >= {start_timestamp}
-          AND createdAtUtcMs < {end_timestamp}
-        ORDER BY createdAtUtcMs
-        """
-        
+        pos_min, neg_max = self._sentiment_thresholds()
+
         try:
-            conn = self._get_db_connection('neticle')
-            df = pd.read_sql_query(query, conn)
-            conn.close()
-            
-            self.logger.info(f"成功提取 {len(df)} 条记录")
-            
+            cells = self._get_cube('neticle').frame(
+                filters['countryId'], update_config['start_date'], update_config['end_date'],
+                cuts=[pos_min, neg_max], label_pattern=filters['keyword_pattern'])
+            df = cells[['day', 'polarity_rep', 'mentions']].rename(
+                columns={'day': 'date', 'polarity_rep': 'polarity'}).reset_index(drop=True)
+            total = int(df['mentions'].sum())
+
+            self.logger.info(f"成功提取 {total} 条记录（{len(df)} 个立方体单元格）")
+
             # 数据质量检查
-            if len(df) < self.config['quality']['min_records']:
-                self.logger.warning(f"数据量不足：{len(df)} < {self.config['quality']['min_records']}")
-                
+            if total < self.config['quality']['min_records']:
+                self.logger.warning(f"数据量不足：{total} < {self.config['quality']['min_records']}")
+
             return df
-            
+
         except Exception as e:
             self.logger.error(f"数据提取失败: {e}")
             raise
-            
+
     def process_sentiment_classification(self, df):
         """处理情感分类
         中文注释：
@@ -131,37 +125,19 @@ class P10DataGenerator:
         """
         self.logger.info("开始处理情感分类...")
 
-        sentiment_config = self.config['sentiment']
-        thresholds = sentiment_config.get('thresholds')
-        if not thresholds or 'positive_min' not in thresholds or 'negative_max' not in thresholds:
-            # 不允许兜底，明确报错，避免掩盖错误配置
-            raise ValueError("配置缺少情感阀值：sentiment.thresholds.positive_min / sentiment.thresholds.negative_max")
-        try:
-            pos_min = float(thresholds['positive_min'])
-            neg_max = float(thresholds['negative_max'])
-        except Exception as e:
-            raise ValueError(f"情感阀值类型错误：{thresholds} -> {e}")
-        
-        # 添加日期列
-        df['date'] = df['createdAtUtcMs'].apply(self._convert_timestamp_to_date)
-        df = df.dropna(subset=['date'])  # 移除日期转换失败的记录
-        
-        # 情感分类
-        def classify_sentiment(polarity):
-            # 中文注释：按阀值进行分类，边界值（=pos_min 或 =neg_max）分别归入 Positive/Negative
-            if polarity is None:
-                return None
-            if polarity >= pos_min:
-                return 'Positive'
-            elif polarity <= neg_max:
-                return 'Negative'
-            else:
-                return 'Neutral'
+        pos_min, neg_max = self._sentiment_thresholds()
 
-        df['sentiment'] = df['polarity'].apply(classify_sentiment)
-        df = df.dropna(subset=['sentiment'])
-        
-        self.logger.info(f"情感分布: {df['sentiment'].value_counts().to_dict()}")
+        # 情感分类（polarity 为立方体情感桶的代表值，与逐行判定结果一致）
+        # 中文注释：np.select 向量化判定，边界值（=pos_min 或 =neg_max）分别归入 Positive/Negative；
+        # polarity 为空（NaN）时两个比较均为 False，与原逐行判定一致归入 Neutral
+        polarity = pd.to_numeric(df['polarity'], errors='raise').to_numpy(dtype=float)
+        labels = np.select([polarity >= pos_min, polarity <= neg_max], ['Positive', 'Negative'], default='Neutral')
+        df = df.assign(sentiment=pd.Categorical(labels, categories=SENTIMENT_LABELS))
+        # 单元格已按 day × 情感桶在 SQL 中聚合；此处再合并到 day × 情感
+        df = (df.groupby(['date', 'sentiment'], observed=True, sort=True)['mentions']
+              .sum().reset_index())
+
+        self.logger.info(f"情感分布: {df.groupby('sentiment', observed=True)['mentions'].sum().to_dict()}")
         return df
         
     def generate_pie_chart_data(self, df):
@@ -169,8 +145,8 @@ class P10DataGenerator:
         self.logger.info("生成饼图数据...")
         
         # 计算情感分布
-        sentiment_counts = df['sentiment'].value_counts()
-        total_count = len(df)
+        sentiment_counts = df.groupby('sentiment', observed=True)['mentions'].sum()
+        total_count = int(df['mentions'].sum())
         
         # 按配置顺序生成数据
         labels = self.config['charts']['pie_chart']['labels']
@@ -206,7 +182,7 @@ class P10DataGenerator:
         self.logger.info("生成折线图数据（IndexGlobal）...")
 
         # 按日期和情感分组统计（计数作为强度）
-        daily_sentiment = df.groupby(['date', 'sentiment']).size().unstack(fill_value=0)
+        daily_sentiment = df.groupby(['date', 'sentiment'], observed=True)['mentions'].sum().unstack(fill_value=0)
 
         # 生成完整日期范围（含头尾）
         start_date = datetime.strptime(self.config['update']['start_date'], '%Y-%m-%d')
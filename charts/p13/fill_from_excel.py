@@ -7,30 +7,32 @@ P13 PPT 填充脚本
 功能：
 - 读取页面级配置 charts/p13/config.yaml；
 - 从 output/p13_data.xlsx 读取 PieData 与 LineData；
-- 解压 charts/p13/p13.pptx 到页面级 tmp 目录；
-- 在解压目录下创建嵌入式工作簿 ppt/embeddings/Microsoft_Excel_Worksheet1.xlsx；
+- 以内存 OPC 包打开 charts/p13/p13.pptx（tools/opc_package.py，不解压到磁盘）；
+- 在包内写入嵌入式工作簿 ppt/embeddings/Microsoft_Excel_Worksheet1.xlsx；
 - 更新图表 XML（chart10 饼图、chart11 折线或散点）数据缓存与系列颜色；
 - 更新图表关系文件指向嵌入工作簿，更新 Content_Types 覆盖项；
-- 重新打包为 charts/p13/output/p13-final.pptx。
+- 一次写出 charts/p13/output/p13-final.pptx（未修改部件原样拷贝）。
 
-注意：不修改模板文件本身；所有中间文件仅使用页面级 tmp；遵循色彩与顺序映射。
+注意：不修改模板文件本身；修改仅保存在内存中直至写出；遵循色彩与顺序映射。
 """
 
-import os
+import io
 import sys
-import shutil
-import zipfile
 import logging
-import yaml
 import pandas as pd
 import xml.etree.ElementTree as ET
 from pathlib import Path
 
+# 内存 OPC 包编辑器位于仓库根 tools/ 目录
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / 'tools'))
+from opc_package import OpcPackage
+from page_config import load_page_config
+from chart_patch import NS, ChartPatch, remove_children, set_fill, set_flags
+
 
 class P13PPTFiller:
     def __init__(self, config_path: str = 'config.yaml'):
-        with open(config_path, 'r', encoding='utf-8') as f:
-            self.cfg = yaml.safe_load(f)
+        self.cfg = load_page_config(config_path)
 
         self.page_dir = Path(__file__).resolve().parent
         self.project = self.cfg.get('project', {})
@@ -40,7 +42,6 @@ class P13PPTFiller:
         self.sentiment_cfg = self.cfg.get('sentiment', {})
 
         # 路径
-        self.tmp_dir = self.page_dir / self.project.get('tmp_dir', 'tmp')
         self.output_dir = self.page_dir / self.project.get('output_dir', 'output')
         self.template_file = self.page_dir / self.project.get('template_file', 'p13.pptx')
         # Excel 数据文件改为放置在页面目录，而非 output 子目录。
@@ -49,6 +50,8 @@ class P13PPTFiller:
         self.excel_path = self.page_dir / self.output_cfg.get('excel_file_name', 'p13_data.xlsx')
         self.final_pptx = self.output_dir / self.output_cfg.get('final_pptx_name', 'p13-final.pptx')
         self.embedded_name = self.fill_policy.get('embedded_workbook_name', 'Microsoft_Excel_Worksheet1.xlsx')
+        # 模板包（run() 中打开，所有部件修改仅保存在内存中）
+        self.pkg = None
 
         # 日轴基准
         self.axis_day_base = int(self.fill_policy.get('axis_day_base', 20300))
@@ -94,19 +97,14 @@ class P13PPTFiller:
 
     # -------------------- 基本工具 --------------------
     def _prepare_dirs(self):
-        if self.tmp_dir.exists():
-            shutil.rmtree(self.tmp_dir)
-        self.tmp_dir.mkdir(parents=True, exist_ok=True)
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
-    def _extract_template(self) -> Path:
+    def _open_template(self) -> OpcPackage:
         if not self.template_file.exists():
             raise FileNotFoundError(f"模板不存在: {self.template_file}")
-        extracted = self.tmp_dir / 'ppt_extracted'
-        with zipfile.ZipFile(self.template_file, 'r') as z:
-            z.extractall(extracted)
-        self.logger.info(f"模板已解压: {extracted}")
-        return extracted
+        pkg = OpcPackage.open(self.template_file)
+        self.logger.info(f"模板已打开: {self.template_file}（{len(pkg.names())} 个部件）")
+        return pkg
 
     def _load_excel(self):
         if not self.excel_path.exists():
@@ -118,7 +116,7 @@ class P13PPTFiller:
         self.logger.info(f"Excel 加载成功: Pie={len(pie_df)} 行, Line={len(line_df)} 行")
         return pie_df, line_df
 
-    def _create_embedded_workbook(self, extracted_dir: Path, pie_df, line_df) -> Path:
+    def _create_embedded_workbook(self, pie_df, line_df) -> str:
         """
         创建嵌入式工作簿，并以图表可绑定的结构写入。
 
@@ -128,9 +126,7 @@ class P13PPTFiller:
           其后依次为 `Date`、三条情绪列（按照 line_order 排序，若列不存在将报错）。
         这样我们可以在图表 XML 中以公式（c:f）绑定到这些单元格区域，实现 PPT 内编辑表格即可刷新图表。
         """
-        embeddings_dir = extracted_dir / 'ppt' / 'embeddings'
-        embeddings_dir.mkdir(parents=True, exist_ok=True)
-        workbook_file = embeddings_dir / self.embedded_name
+        workbook_file = f'ppt/embeddings/{self.embedded_name}'
 
         # 构造 LineData 的绑定友好结构
         date_col = self.date_col
@@ -147,295 +143,113 @@ class P13PPTFiller:
         for s in ordered_cols:
             line_out[s] = list(line_df[s])
 
-        with pd.ExcelWriter(workbook_file, engine='openpyxl') as writer:
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf, engine='openpyxl') as writer:
             pie_df.to_excel(writer, sheet_name=self.charts.get('pie', {}).get('sheet_name', 'PieData'), index=False)
             line_out.to_excel(writer, sheet_name=self.charts.get('line', {}).get('sheet_name', 'LineData'), index=False)
+        self.pkg.write(workbook_file, buf.getvalue())
         self.logger.info(f"嵌入式工作簿已写入: {workbook_file}")
         return workbook_file
 
     # -------------------- 图表更新 --------------------
-    def _update_pie_chart_xml(self, chart_file: Path, pie_df):
-        if not chart_file.exists():
-            self.logger.warning(f"缺少图表文件: {chart_file}")
-            return False
+    def _update_pie_chart_xml(self, chart: ChartPatch, pie_df):
         try:
-            tree = ET.parse(chart_file)
-            root = tree.getroot()
-            ns = {'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart',
-                  'a': 'http://schemas.openxmlformats.org/drawingml/2006/main'}
-            pie = root.find('.//c:pieChart', ns)
-            if pie is None:
+            if not chart.has('pieChart'):
                 self.logger.warning("未找到 pieChart 元素")
                 return False
-            ser = pie.find('.//c:ser', ns)
-            if ser is None:
+            series = chart.series_of('pieChart')
+            if not series:
                 self.logger.warning("未找到饼图数据系列 ser")
                 return False
-
-            # 更新类别标签
-            cat = ser.find('.//c:cat', ns)
-            if cat is not None:
-                str_ref = cat.find('.//c:strRef', ns)
-                if str_ref is not None:
-                    str_cache = str_ref.find('.//c:strCache', ns)
-                    if str_cache is not None:
-                        for pt in list(str_cache.findall('.//c:pt', ns)):
-                            str_cache.remove(pt)
-                        for i, lab in enumerate(list(pie_df['Sentiment'])):
-                            ptn = ET.SubElement(str_cache, '{http://schemas.openxmlformats.org/drawingml/2006/chart}pt')
-                            ptn.set('idx', str(i))
-                            v = ET.SubElement(ptn, '{http://schemas.openxmlformats.org/drawingml/2006/chart}v')
-                            v.text = str(lab)
-                        pc = str_cache.find('.//c:ptCount', ns)
-                        if pc is not None:
-                            pc.set('val', str(len(pie_df['Sentiment'])))
-
-            # 更新数值
-            val = ser.find('.//c:val', ns)
-            if val is not None:
-                num_ref = val.find('.//c:numRef', ns)
-                if num_ref is not None:
-                    num_cache = num_ref.find('.//c:numCache', ns)
-                    if num_cache is not None:
-                        for pt in list(num_cache.findall('.//c:pt', ns)):
-                            num_cache.remove(pt)
-                        for i, perc in enumerate(list(pie_df['Percentage'])):
-                            ptn = ET.SubElement(num_cache, '{http://schemas.openxmlformats.org/drawingml/2006/chart}pt')
-                            ptn.set('idx', str(i))
-                            v = ET.SubElement(ptn, '{http://schemas.openxmlformats.org/drawingml/2006/chart}v')
-                            v.text = str(perc)
-                        pc = num_cache.find('.//c:ptCount', ns)
-                        if pc is not None:
-                            pc.set('val', str(len(pie_df['Percentage'])))
-
-            # 更新扇区颜色（按数据点索引）
-            dpts = ser.findall('.//c:dPt', ns)
-            for dpt in dpts:
-                idx_e = dpt.find('.//c:idx', ns)
+            ser = series[0]
+            sentiment_list = list(pie_df['Sentiment'])
+
+            # 更新类别标签与数值（仅在模板已有缓存时改写）
+            cat_ref = ser.ref('cat', 'str')
+            if cat_ref is not None and cat_ref.find('c:strCache', NS) is not None:
+                ser.set_labels(sentiment_list)
+            val_ref = ser.ref('val', 'num')
+            if val_ref is not None and val_ref.find('c:numCache', NS) is not None:
+                ser.set_values(list(pie_df['Percentage']))
+
+            # 更新扇区颜色（按数据点索引，按 Sentiment 顺序定位颜色；清空后重建 solidFill）
+            for dpt in ser.points:
+                idx_e = dpt.find('c:idx', NS)
                 if idx_e is None:
                     continue
                 idx = int(idx_e.get('val')) if idx_e.get('val') else 0
-                # 按 Sentiment 顺序定位颜色
-                sentiment_list = list(pie_df['Sentiment'])
                 if idx >= len(sentiment_list):
                     continue
-                senti = sentiment_list[idx]
-                color_hex = self.color_map.get(senti)
+                color_hex = self.color_map.get(sentiment_list[idx])
                 if not color_hex:
                     continue
-                spPr = dpt.find('.//c:spPr', ns)
-                if spPr is None:
-                    spPr = ET.SubElement(dpt, '{http://schemas.openxmlformats.org/drawingml/2006/chart}spPr')
-                # 清空后重建 solidFill
-                for ch in list(spPr):
-                    spPr.remove(ch)
-                solid = ET.SubElement(spPr, '{http://schemas.openxmlformats.org/drawingml/2006/main}solidFill')
-                rgb = ET.SubElement(solid, '{http://schemas.openxmlformats.org/drawingml/2006/main}srgbClr')
-                rgb.set('val', color_hex)
+                set_fill(dpt, color_hex, reset=True)
 
             # 统一标签显示：启用百分比、关闭数值/系列名/类别名；取消手动定位，改为最佳适配
-            dLbls_ser = ser.find('.//c:dLbls', ns)
-            if dLbls_ser is None:
-                dLbls_ser = ET.SubElement(ser, '{http://schemas.openxmlformats.org/drawingml/2006/chart}dLbls')
+            flags = dict(showLegendKey=0, showVal=0, showCatName=0, showSerName=0, showPercent=1,
+                         showBubbleSize=0, showLeaderLines=0)
+            dLbls_ser = ser.data_labels()
             # 移除所有点级 dLbl（含 delete 与 manualLayout），避免覆盖全局设置
-            for d in list(dLbls_ser.findall('c:dLbl', ns)):
-                dLbls_ser.remove(d)
-            # 设置显示选项
-            def _set_flag(name: str, val: str):
-                el = dLbls_ser.find(f'c:{name}', ns)
-                if el is None:
-                    el = ET.SubElement(dLbls_ser, f'{{http://schemas.openxmlformats.org/drawingml/2006/chart}}{name}')
-                el.set('val', val)
-            _set_flag('showLegendKey', '0')
-            _set_flag('showVal', '0')
-            _set_flag('showCatName', '0')
-            _set_flag('showSerName', '0')
-            _set_flag('showPercent', '1')
-            _set_flag('showBubbleSize', '0')
-            # 标签位置：最佳适配，尽量落在扇形内
-            pos = dLbls_ser.find('c:dLblPos', ns)
-            if pos is None:
-                pos = ET.SubElement(dLbls_ser, '{http://schemas.openxmlformats.org/drawingml/2006/chart}dLblPos')
-            pos.set('val', 'bestFit')
-            # 关闭引导线，避免标签在外部时出现牵引线影响视觉
-            _set_flag('showLeaderLines', '0')
+            remove_children(dLbls_ser, 'c:dLbl')
+            # 标签位置：最佳适配，尽量落在扇形内；关闭引导线，避免标签在外部时出现牵引线影响视觉
+            set_flags(dLbls_ser, dLblPos='bestFit', **flags)
 
             # 同步更新图表级 dLbls（作为默认设置），确保与系列一致
-            dLbls_chart = pie.find('c:dLbls', ns)
-            if dLbls_chart is None:
-                dLbls_chart = ET.SubElement(pie, '{http://schemas.openxmlformats.org/drawingml/2006/chart}dLbls')
-            for d in list(dLbls_chart.findall('c:dLbl', ns)):
-                dLbls_chart.remove(d)
-            def _set_chart_flag(name: str, val: str):
-                el = dLbls_chart.find(f'c:{name}', ns)
-                if el is None:
-                    el = ET.SubElement(dLbls_chart, f'{{http://schemas.openxmlformats.org/drawingml/2006/chart}}{name}')
-                el.set('val', val)
-            _set_chart_flag('showLegendKey', '0')
-            _set_chart_flag('showVal', '0')
-            _set_chart_flag('showCatName', '0')
-            _set_chart_flag('showSerName', '0')
-            _set_chart_flag('showPercent', '1')
-            _set_chart_flag('showBubbleSize', '0')
-            _set_chart_flag('showLeaderLines', '0')
-
-            tree.write(chart_file, encoding='utf-8', xml_declaration=True)
-            self.logger.info(f"饼图 XML 已更新: {chart_file}")
+            dLbls_chart = chart.data_labels('pieChart')
+            remove_children(dLbls_chart, 'c:dLbl')
+            set_flags(dLbls_chart, **flags)
+            self.logger.info(f"饼图 XML 已更新: {chart.part}")
             return True
         except Exception as e:
-            self.logger.error(f"更新饼图失败 {chart_file}: {e}")
+            self.logger.error(f"更新饼图失败 {chart.part}: {e}")
             return False
 
-    def _update_line_chart_xml(self, chart_file: Path, line_df):
-        if not chart_file.exists():
-            self.logger.warning(f"缺少图表文件: {chart_file}")
-            return False
+    def _update_line_chart_xml(self, chart: ChartPatch, line_df):
         try:
-            tree = ET.parse(chart_file)
-            root = tree.getroot()
-            ns = {'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart',
-                  'a': 'http://schemas.openxmlformats.org/drawingml/2006/main'}
-
-            # 优先尝试 lineChart
-            line_chart = root.find('.//c:lineChart', ns)
-            if line_chart is not None:
-                series_list = line_chart.findall('.//c:ser', ns)
-                for i, ser in enumerate(series_list):
-                    if i >= len(self.line_order):
-                        break
-                    sentiment = self.line_order[i]
-                    if sentiment not in line_df.columns:
-                        continue
-                    # 更新 X 轴日期
-                    cat = ser.find('.//c:cat', ns)
-                    if cat is not None:
-                        str_ref = cat.find('.//c:strRef', ns)
-                        if str_ref is not None:
-                            str_cache = str_ref.find('.//c:strCache', ns)
-                            if str_cache is not None:
-                                for pt in list(str_cache.findall('.//c:pt', ns)):
-                                    str_cache.remove(pt)
-                                for j, d in enumerate(list(line_df[self.date_col])):
-                                    ptn = ET.SubElement(str_cache, '{http://schemas.openxmlformats.org/drawingml/2006/chart}pt')
-                                    ptn.set('idx', str(j))
-                                    v = ET.SubElement(ptn, '{http://schemas.openxmlformats.org/drawingml/2006/chart}v')
-                                    v.text = str(d)
-                                pc = str_cache.find('.//c:ptCount', ns)
-                                if pc is not None:
-                                    pc.set('val', str(len(line_df[self.date_col])))
-                    # 更新 Y 轴百分比
-                    val = ser.find('.//c:val', ns)
-                    if val is not None:
-                        num_ref = val.find('.//c:numRef', ns)
-                        if num_ref is not None:
-                            num_cache = num_ref.find('.//c:numCache', ns)
-                            if num_cache is not None:
-                                for pt in list(num_cache.findall('.//c:pt', ns)):
-                                    num_cache.remove(pt)
-                                for j, y in enumerate(list(line_df[sentiment])):
-                                    ptn = ET.SubElement(num_cache, '{http://schemas.openxmlformats.org/drawingml/2006/chart}pt')
-                                    ptn.set('idx', str(j))
-                                    v = ET.SubElement(ptn, '{http://schemas.openxmlformats.org/drawingml/2006/chart}v')
-                                    v.text = str(y)
-                                pc = num_cache.find('.//c:ptCount', ns)
-                                if pc is not None:
-                                    pc.set('val', str(len(line_df[sentiment])))
-
-                    # 更新系列颜色
-                    spPr = ser.find('.//c:spPr', ns)
-                    if spPr is None:
-                        spPr = ET.SubElement(ser, '{http://schemas.openxmlformats.org/drawingml/2006/chart}spPr')
-                    for ch in list(spPr):
-                        spPr.remove(ch)
-                    ln = ET.SubElement(spPr, '{http://schemas.openxmlformats.org/drawingml/2006/main}ln')
-                    ln_sf = ET.SubElement(ln, '{http://schemas.openxmlformats.org/drawingml/2006/main}solidFill')
-                    ln_rgb = ET.SubElement(ln_sf, '{http://schemas.openxmlformats.org/drawingml/2006/main}srgbClr')
-                    ln_rgb.set('val', self.color_map.get(sentiment, '000000'))
-                    sf = ET.SubElement(spPr, '{http://schemas.openxmlformats.org/drawingml/2006/main}solidFill')
-                    rgb = ET.SubElement(sf, '{http://schemas.openxmlformats.org/drawingml/2006/main}srgbClr')
-                    rgb.set('val', self.color_map.get(sentiment, '000000'))
-
-                tree.write(chart_file, encoding='utf-8', xml_declaration=True)
-                self.logger.info(f"折线图 XML 已更新: {chart_file}")
-                return True
-
-            # 其次尝试 scatterChart（若模板为散点）
-            scatter_chart = root.find('.//c:scatterChart', ns)
-            if scatter_chart is not None:
-                series_list = scatter_chart.findall('.//c:ser', ns)
+            # 优先 lineChart（cat 日期 + val），其次 scatterChart（xVal 日轴 + yVal）
+            if chart.has('lineChart'):
+                kind, x_role, y_role = 'lineChart', 'cat', 'val'
+                x_vals = list(line_df[self.date_col])
+            elif chart.has('scatterChart'):
+                kind, x_role, y_role = 'scatterChart', 'xVal', 'yVal'
                 # 构造 X 值（轴基准 + 序号）
                 x_vals = [self.axis_day_base + i for i in range(len(line_df[self.date_col]))]
-                for i, ser in enumerate(series_list):
-                    if i >= len(self.line_order):
-                        break
-                    sentiment = self.line_order[i]
-                    if sentiment not in line_df.columns:
-                        continue
-                    # 更新 xVal
-                    xval = ser.find('.//c:xVal', ns)
-                    if xval is not None:
-                        num_ref = xval.find('.//c:numRef', ns)
-                        if num_ref is not None:
-                            num_cache = num_ref.find('.//c:numCache', ns)
-                            if num_cache is not None:
-                                for pt in list(num_cache.findall('.//c:pt', ns)):
-                                    num_cache.remove(pt)
-                                for j, xv in enumerate(x_vals):
-                                    ptn = ET.SubElement(num_cache, '{http://schemas.openxmlformats.org/drawingml/2006/chart}pt')
-                                    ptn.set('idx', str(j))
-                                    v = ET.SubElement(ptn, '{http://schemas.openxmlformats.org/drawingml/2006/chart}v')
-                                    v.text = str(xv)
-                                pc = num_cache.find('.//c:ptCount', ns)
-                                if pc is not None:
-                                    pc.set('val', str(len(x_vals)))
-                    # 更新 yVal
-                    yval = ser.find('.//c:yVal', ns)
-                    if yval is not None:
-                        num_ref = yval.find('.//c:numRef', ns)
-                        if num_ref is not None:
-                            num_cache = num_ref.find('.//c:numCache', ns)
-                            if num_cache is not None:
-                                for pt in list(num_cache.findall('.//c:pt', ns)):
-                                    num_cache.remove(pt)
-                                for j, y in enumerate(list(line_df[sentiment])):
-                                    ptn = ET.SubElement(num_cache, '{http://schemas.openxmlformats.org/drawingml/2006/chart}pt')
-                                    ptn.set('idx', str(j))
-                                    v = ET.SubElement(ptn, '{http://schemas.openxmlformats.org/drawingml/2006/chart}v')
-                                    v.text = str(y)
-                                pc = num_cache.find('.//c:ptCount', ns)
-                                if pc is not None:
-                                    pc.set('val', str(len(line_df[sentiment])))
-
-                    # 系列颜色
-                    spPr = ser.find('.//c:spPr', ns)
-                    if spPr is None:
-                        spPr = ET.SubElement(ser, '{http://schemas.openxmlformats.org/drawingml/2006/chart}spPr')
-                    for ch in list(spPr):
-                        spPr.remove(ch)
-                    ln = ET.SubElement(spPr, '{http://schemas.openxmlformats.org/drawingml/2006/main}ln')
-                    ln_sf = ET.SubElement(ln, '{http://schemas.openxmlformats.org/drawingml/2006/main}solidFill')
-                    ln_rgb = ET.SubElement(ln_sf, '{http://schemas.openxmlformats.org/drawingml/2006/main}srgbClr')
-                    ln_rgb.set('val', self.color_map.get(sentiment, '000000'))
-                    sf = ET.SubElement(spPr, '{http://schemas.openxmlformats.org/drawingml/2006/main}solidFill')
-                    rgb = ET.SubElement(sf, '{http://schemas.openxmlformats.org/drawingml/2006/main}srgbClr')
-                    rgb.set('val', self.color_map.get(sentiment, '000000'))
-
-                tree.write(chart_file, encoding='utf-8', xml_declaration=True)
-                self.logger.info(f"散点图 XML 已更新: {chart_file}")
-                return True
-
-            self.logger.warning("未找到 lineChart 或 scatterChart 元素")
-            return False
+            else:
+                self.logger.warning("未找到 lineChart 或 scatterChart 元素")
+                return False
+
+            for i, ser in enumerate(chart.series_of(kind)):
+                if i >= len(self.line_order):
+                    break
+                sentiment = self.line_order[i]
+                if sentiment not in line_df.columns:
+                    continue
+                # X 轴（日期字符串或数值日轴）与 Y 轴百分比，仅在模板已有缓存时改写
+                x_ref = ser.ref(x_role)
+                x_cache = 'c:strCache' if x_role == 'cat' else 'c:numCache'
+                if x_ref is not None and x_ref.find(x_cache, NS) is not None:
+                    if x_role == 'cat':
+                        ser.set_labels(x_vals)
+                    else:
+                        ser.set_values(x_vals, role=x_role)
+                y_ref = ser.ref(y_role)
+                if y_ref is not None and y_ref.find('c:numCache', NS) is not None:
+                    ser.set_values(list(line_df[sentiment]), role=y_role)
+                # 系列颜色：清空 spPr 后重建线条色与填充色
+                set_fill(ser.el, self.color_map.get(sentiment, '000000'), line=True, reset=True)
+
+            self.logger.info(f"{'折线图' if kind == 'lineChart' else '散点图'} XML 已更新: {chart.part}")
+            return True
         except Exception as e:
-            self.logger.error(f"更新折线/散点失败 {chart_file}: {e}")
+            self.logger.error(f"更新折线/散点失败 {chart.part}: {e}")
             return False
 
     # -------------------- externalData 与公式绑定 --------------------
-    def _get_workbook_rel_id(self, rels_file: Path) -> str:
+    def _get_workbook_rel_id(self, rels_file: str) -> str:
         """读取某个图表的关系文件，返回嵌入工作簿的 rId（关系类型为 package）。"""
-        if not rels_file.exists():
+        if not self.pkg.exists(rels_file):
             raise FileNotFoundError(f"缺少关系文件: {rels_file}")
-        tree = ET.parse(rels_file)
+        tree = self.pkg.parse(rels_file)
         root = tree.getroot()
         for rel in root.findall('.//{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'):
             typ = rel.get('Type', '')
@@ -446,61 +260,32 @@ class P13PPTFiller:
                 return rid
         raise ValueError(f"未找到指向工作簿的关系（package）: {rels_file}")
 
-    def _ensure_external_data(self, chart_file: Path, rel_id: str):
-        """确保 chart.xml 中存在 externalData 并指向给定 rId；同时开启 autoUpdate。"""
-        if not chart_file.exists():
-            raise FileNotFoundError(f"缺少图表文件: {chart_file}")
-        tree = ET.parse(chart_file)
-        root = tree.getroot()
-        ns_c = 'http://schemas.openxmlformats.org/drawingml/2006/chart'
-        ns_r = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
-        ext = root.find(f'.//{{{ns_c}}}externalData')
-        if ext is None:
-            # externalData 必须是 chartSpace 的直接子元素
-            ext = ET.SubElement(root, f'{{{ns_c}}}externalData')
-        ext.set(f'{{{ns_r}}}id', rel_id)
-        auto = ext.find(f'{{{ns_c}}}autoUpdate')
-        if auto is None:
-            auto = ET.SubElement(ext, f'{{{ns_c}}}autoUpdate')
-        auto.set('val', '1')
-        tree.write(chart_file, encoding='utf-8', xml_declaration=True)
-        self.logger.info(f"externalData 已绑定: {chart_file} -> {rel_id}")
-
-    def _update_pie_formulas(self, chart_file: Path, pie_rows: int, sheet_name: str = 'PieData'):
+    def _ensure_external_data(self, chart: ChartPatch, rel_id: str):
+        """确保 chart.xml 中存在 externalData（chartSpace 直接子元素）并指向给定 rId；同时开启 autoUpdate。"""
+        chart.bind_workbook(rel_id)
+        self.logger.info(f"externalData 已绑定: {chart.part} -> {rel_id}")
+
+    def _update_pie_formulas(self, chart: ChartPatch, pie_rows: int, sheet_name: str = 'PieData'):
         """
         将饼图的数值与类别公式（c:f）绑定到嵌入工作簿的 PieData 区域：
         - 值：B2:B{N+1}（Percentage）
         - 类别：A2:A{N+1}（Sentiment）
         如果模板中不存在 c:cat/strRef，则仅更新数值公式。
         """
-        tree = ET.parse(chart_file)
-        root = tree.getroot()
-        ns = {'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart'}
-        pie = root.find('.//c:pieChart', ns)
-        if pie is None:
+        if not chart.has('pieChart'):
             raise ValueError("模板不包含饼图（pieChart）")
-        ser = pie.find('.//c:ser', ns)
-        if ser is None:
+        series = chart.series_of('pieChart')
+        if not series:
             raise ValueError("饼图缺少数据系列 ser")
-        # 值公式
-        val = ser.find('.//c:val/c:numRef', ns)
-        if val is None:
+        ser = series[0]
+        if ser.ref('val', 'num') is None:
             raise ValueError("饼图缺少数值引用（c:val/c:numRef）")
-        f_el = val.find('c:f', ns)
-        if f_el is None:
-            f_el = ET.SubElement(val, '{http://schemas.openxmlformats.org/drawingml/2006/chart}f')
-        f_el.text = f"{sheet_name}!$B$2:$B${pie_rows + 1}"
-        # 类别公式（若有）
-        cat = ser.find('.//c:cat/c:strRef', ns)
-        if cat is not None:
-            f_cat = cat.find('c:f', ns)
-            if f_cat is None:
-                f_cat = ET.SubElement(cat, '{http://schemas.openxmlformats.org/drawingml/2006/chart}f')
-            f_cat.text = f"{sheet_name}!$A$2:$A${pie_rows + 1}"
-        tree.write(chart_file, encoding='utf-8', xml_declaration=True)
+        ser.set_formula('val', f"{sheet_name}!$B$2:$B${pie_rows + 1}")
+        if ser.ref('cat', 'str') is not None:
+            ser.set_formula('cat', f"{sheet_name}!$A$2:$A${pie_rows + 1}")
         self.logger.info(f"饼图公式已绑定到 {sheet_name}")
 
-    def _update_line_formulas(self, chart_file: Path, line_rows: int, sheet_name: str = 'LineData'):
+    def _update_line_formulas(self, chart: ChartPatch, line_rows: int, sheet_name: str = 'LineData'):
         """
         绑定折线或散点图的系列公式到嵌入工作簿的 LineData：
         - 统一使用列方向：
@@ -508,114 +293,52 @@ class P13PPTFiller:
           各情绪列依次为 C/D/E2:E{N+1}（按 self.line_order 对应）。
         - 若检测到 lineChart：cat 使用 B 列；val 使用 C/D/E。
         - 若检测到 scatterChart：xVal 使用 A 列；yVal 使用 C/D/E。
+        缺失的 cat/val/xVal/yVal 引用按 schema 顺序补齐。
         """
-        tree = ET.parse(chart_file)
-        root = tree.getroot()
-        ns = {'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart'}
-
-        line_chart = root.find('.//c:lineChart', ns)
-        scatter_chart = root.find('.//c:scatterChart', ns)
-        if line_chart is None and scatter_chart is None:
+        if chart.has('lineChart'):
+            kind, x_role, x_col, y_role = 'lineChart', 'cat', 'B', 'val'
+        elif chart.has('scatterChart'):
+            kind, x_role, x_col, y_role = 'scatterChart', 'xVal', 'A', 'yVal'
+        else:
             raise ValueError("模板不包含 lineChart 或 scatterChart")
 
         def _range(col_letter: str) -> str:
             return f"{sheet_name}!${col_letter}$2:${col_letter}${line_rows + 1}"
 
-        if line_chart is not None:
-            series_list = line_chart.findall('.//c:ser', ns)
-            for i, ser in enumerate(series_list):
-                if i >= len(self.line_order):
-                    break
-                # X 轴为日期（字符串）列 B
-                cat_ref = ser.find('.//c:cat/c:strRef', ns)
-                if cat_ref is None:
-                    cat = ser.find('.//c:cat', ns)
-                    if cat is None:
-                        cat = ET.SubElement(ser, '{http://schemas.openxmlformats.org/drawingml/2006/chart}cat')
-                    cat_ref = ET.SubElement(cat, '{http://schemas.openxmlformats.org/drawingml/2006/chart}strRef')
-                f_cat = cat_ref.find('c:f', ns)
-                if f_cat is None:
-                    f_cat = ET.SubElement(cat_ref, '{http://schemas.openxmlformats.org/drawingml/2006/chart}f')
-                f_cat.text = _range('B')
-
-                # Y 轴为对应情绪列 C/D/E
-                val_ref = ser.find('.//c:val/c:numRef', ns)
-                if val_ref is None:
-                    val_el = ser.find('.//c:val', ns)
-                    if val_el is None:
-                        val_el = ET.SubElement(ser, '{http://schemas.openxmlformats.org/drawingml/2006/chart}val')
-                    val_ref = ET.SubElement(val_el, '{http://schemas.openxmlformats.org/drawingml/2006/chart}numRef')
-                f_val = val_ref.find('c:f', ns)
-                if f_val is None:
-                    f_val = ET.SubElement(val_ref, '{http://schemas.openxmlformats.org/drawingml/2006/chart}f')
-                col = chr(ord('C') + i)  # C/D/E...
-                f_val.text = _range(col)
-
-            tree.write(chart_file, encoding='utf-8', xml_declaration=True)
-            self.logger.info("折线图公式已绑定到 LineData")
-            return
-
-        # scatterChart
-        series_list = scatter_chart.findall('.//c:ser', ns)
-        for i, ser in enumerate(series_list):
+        for i, ser in enumerate(chart.series_of(kind)):
             if i >= len(self.line_order):
                 break
-            # xVal 使用 A 列（数值日轴）
-            x_ref = ser.find('.//c:xVal/c:numRef', ns)
-            if x_ref is None:
-                x_el = ser.find('.//c:xVal', ns)
-                if x_el is None:
-                    x_el = ET.SubElement(ser, '{http://schemas.openxmlformats.org/drawingml/2006/chart}xVal')
-                x_ref = ET.SubElement(x_el, '{http://schemas.openxmlformats.org/drawingml/2006/chart}numRef')
-            f_x = x_ref.find('c:f', ns)
-            if f_x is None:
-                f_x = ET.SubElement(x_ref, '{http://schemas.openxmlformats.org/drawingml/2006/chart}f')
-            f_x.text = _range('A')
-
-            # yVal 使用对应情绪列 C/D/E
-            y_ref = ser.find('.//c:yVal/c:numRef', ns)
-            if y_ref is None:
-                y_el = ser.find('.//c:yVal', ns)
-                if y_el is None:
-                    y_el = ET.SubElement(ser, '{http://schemas.openxmlformats.org/drawingml/2006/chart}yVal')
-                y_ref = ET.SubElement(y_el, '{http://schemas.openxmlformats.org/drawingml/2006/chart}numRef')
-            f_y = y_ref.find('c:f', ns)
-            if f_y is None:
-                f_y = ET.SubElement(y_ref, '{http://schemas.openxmlformats.org/drawingml/2006/chart}f')
-            col = chr(ord('C') + i)
-            f_y.text = _range(col)
-
-        tree.write(chart_file, encoding='utf-8', xml_declaration=True)
-        self.logger.info("散点图公式已绑定到 LineData")
+            ser.set_formula(x_role, _range(x_col))
+            ser.set_formula(y_role, _range(chr(ord('C') + i)))  # C/D/E...
+        self.logger.info(f"{'折线图' if kind == 'lineChart' else '散点图'}公式已绑定到 LineData")
 
     # -------------------- 关系与内容类型 --------------------
-    def _update_chart_rels(self, extracted_dir: Path, workbook_path: Path):
-        target = f"../embeddings/{workbook_path.name}"
-        rels_dir = extracted_dir / 'ppt' / 'charts' / '_rels'
+    def _update_chart_rels(self, workbook_path: str):
+        target = f"../embeddings/{Path(workbook_path).name}"
         for chart in self.output_cfg.get('replace_charts', ['chart10.xml', 'chart11.xml']):
-            rels_file = rels_dir / f"{chart}.rels"
-            if not rels_file.exists():
+            rels_file = f"ppt/charts/_rels/{chart}.rels"
+            if not self.pkg.exists(rels_file):
                 self.logger.warning(f"缺少关系文件: {rels_file}")
                 continue
             try:
-                tree = ET.parse(rels_file)
+                tree = self.pkg.parse(rels_file)
                 root = tree.getroot()
                 for rel in root.findall('.//{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'):
                     typ = rel.get('Type', '')
                     if typ.endswith('/relationships/package'):
                         rel.set('Target', target)
-                tree.write(rels_file, encoding='utf-8', xml_declaration=True)
+                self.pkg.write_tree(rels_file, tree)
                 self.logger.info(f"更新关系: {rels_file} -> {target}")
             except Exception as e:
                 self.logger.warning(f"更新关系失败 {rels_file}: {e}")
 
-    def _update_content_types(self, extracted_dir: Path, workbook_path: Path):
-        ct_file = extracted_dir / '[Content_Types].xml'
-        if not ct_file.exists():
+    def _update_content_types(self, workbook_path: str):
+        ct_file = '[Content_Types].xml'
+        if not self.pkg.exists(ct_file):
             self.logger.warning("缺少 Content_Types.xml，跳过更新")
             return
         try:
-            tree = ET.parse(ct_file)
+            tree = self.pkg.parse(ct_file)
             root = tree.getroot()
             ns = 'http://schemas.openxmlformats.org/package/2006/content-types'
             # 移除模板中的 xlsb 覆盖，避免冲突
@@ -624,7 +347,7 @@ class P13PPTFiller:
                 if part.startswith('/ppt/embeddings/') and part.endswith('.xlsb'):
                     root.remove(ov)
             # 添加我们的 xlsx 覆盖项（若不存在）
-            part_name = f'/ppt/embeddings/{workbook_path.name}'
+            part_name = f'/ppt/embeddings/{Path(workbook_path).name}'
             exists = False
             for ov in root.findall(f'{{{ns}}}Override'):
                 if ov.get('PartName', '') == part_name:
@@ -632,52 +355,48 @@ class P13PPTFiller:
                     break
             if not exists:
                 ET.SubElement(root, f'{{{ns}}}Override', PartName=part_name, ContentType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            tree.write(ct_file, encoding='utf-8', xml_declaration=True)
+            self.pkg.write_tree(ct_file, tree)
             self.logger.info("Content_Types.xml 已更新")
         except Exception as e:
             self.logger.warning(f"更新 Content_Types 失败: {e}")
 
     # -------------------- 打包 --------------------
-    def _repackage(self, extracted_dir: Path):
-        with zipfile.ZipFile(self.final_pptx, 'w', zipfile.ZIP_DEFLATED) as z:
-            for root, dirs, files in os.walk(extracted_dir):
-                for f in files:
-                    p = Path(root) / f
-                    z.write(p, p.relative_to(extracted_dir))
-        self.logger.info(f"已生成: {self.final_pptx}")
+    def _repackage(self):
+        self.pkg.save(self.final_pptx)
+        self.logger.info(f"已生成: {self.final_pptx}（修改部件 {len(self.pkg.modified)} 个）")
 
     # -------------------- 主流程 --------------------
     def run(self):
         self.logger.info("=== P13 填充开始 ===")
         self._prepare_dirs()
-        extracted_dir = self._extract_template()
+        self.pkg = self._open_template()
         pie_df, line_df = self._load_excel()
-        workbook_path = self._create_embedded_workbook(extracted_dir, pie_df, line_df)
+        workbook_path = self._create_embedded_workbook(pie_df, line_df)
 
         # 更新关系与类型
         if self.fill_policy.get('keep_external_data', True):
-            self._update_chart_rels(extracted_dir, workbook_path)
-        self._update_content_types(extracted_dir, workbook_path)
+            self._update_chart_rels(workbook_path)
+        self._update_content_types(workbook_path)
 
         # 更新图表 XML（缓存 + 公式 + externalData）
-        charts_dir = extracted_dir / 'ppt' / 'charts'
-        pie_chart = charts_dir / self.charts.get('pie', {}).get('chart_file', 'chart10.xml')
-        line_chart = charts_dir / self.charts.get('line', {}).get('chart_file', 'chart11.xml')
-        self._update_pie_chart_xml(pie_chart, pie_df)
-        self._update_line_chart_xml(line_chart, line_df)
-
-        # 绑定公式与 externalData 指向嵌入工作簿
-        rels_dir = charts_dir / '_rels'
-        pie_rid = self._get_workbook_rel_id(rels_dir / f"{pie_chart.name}.rels")
-        line_rid = self._get_workbook_rel_id(rels_dir / f"{line_chart.name}.rels")
-        self._ensure_external_data(pie_chart, pie_rid)
-        self._ensure_external_data(line_chart, line_rid)
-        # 公式绑定（使 PPT 编辑嵌入工作簿时可刷新图表）
-        self._update_pie_formulas(pie_chart, pie_rows=len(pie_df), sheet_name=self.charts.get('pie', {}).get('sheet_name', 'PieData'))
-        self._update_line_formulas(line_chart, line_rows=len(line_df[self.date_col]), sheet_name=self.charts.get('line', {}).get('sheet_name', 'LineData'))
+        pie_name = self.charts.get('pie', {}).get('chart_file', 'chart10.xml')
+        line_name = self.charts.get('line', {}).get('chart_file', 'chart11.xml')
+        pie_chart = f'ppt/charts/{pie_name}'
+        line_chart = f'ppt/charts/{line_name}'
+        pie_rid = self._get_workbook_rel_id(f"ppt/charts/_rels/{pie_name}.rels")
+        line_rid = self._get_workbook_rel_id(f"ppt/charts/_rels/{line_name}.rels")
+        # 每个图表只解析一次：缓存与颜色 → externalData 指向嵌入工作簿 → 公式绑定（使 PPT 编辑嵌入工作簿时可刷新图表）
+        with ChartPatch.edit(self.pkg, pie_chart) as chart:
+            self._update_pie_chart_xml(chart, pie_df)
+            self._ensure_external_data(chart, pie_rid)
+            self._update_pie_formulas(chart, pie_rows=len(pie_df), sheet_name=self.charts.get('pie', {}).get('sheet_name', 'PieData'))
+        with ChartPatch.edit(self.pkg, line_chart) as chart:
+            self._update_line_chart_xml(chart, line_df)
+            self._ensure_external_data(chart, line_rid)
+            self._update_line_formulas(chart, line_rows=len(line_df[self.date_col]), sheet_name=self.charts.get('line', {}).get('sheet_name', 'LineData'))
 
         # 打包
-        self._repackage(extracted_dir)
+        self._repackage()
 
 
 def main():
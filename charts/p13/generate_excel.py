@@ -16,7 +16,8 @@ P13 页面：Engagement breakdown 数据生成脚本（简化版）
 
 备注（严格报错，不兜底）：
 - 自动探测 mentions_wide 表与字段，若候选互动字段一个都不存在，直接报错；
-- 运行时仅按过滤条件读取必要列；
+- 聚合数据读取共享提及立方体（tools/neticle_cube.py，按 countryId × 月份只扫描一次宽表）；
+- 审计示例行单独以 LIMIT 查询读取，不再全量拉取明细；
 - 所有临时文件放置在页面级 tmp 目录。
 """
 
@@ -40,11 +41,18 @@ except Exception:
     print("缺少依赖：openpyxl。请安装后重试。")
     raise
 
+# 共享提及立方体位于仓库根 tools/ 目录
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools'))
+from neticle_cube import MentionCube, SUM_MEASURES
+from neticle_index import connect_for
+from sqlite_ro import connect_ro
+from period_filter import day_bounds_ms, ms_to_date, range_clause
+from page_config import load_page_config
+
 
 class P13DataGenerator:
     def __init__(self, config_path: str):
-        with open(config_path, 'r', encoding='utf-8') as f:
-            self.cfg = yaml.safe_load(f)
+        self.cfg = load_page_config(config_path)
 
         self.page_root = os.path.dirname(os.path.abspath(config_path))
         self.project = self.cfg.get('project', {})
@@ -81,6 +89,8 @@ class P13DataGenerator:
         # 审计附加列（动态匹配宽表候选列）
         self.audit_post_id_col: Optional[str] = None
         self.audit_channel_col: Optional[str] = None
+        # 审计示例行上限
+        self.audit_row_max = 200
 
     # ---------- 基础工具 ----------
     def _ensure_dirs(self):
@@ -113,22 +123,17 @@ class P13DataGenerator:
             cur += dt.timedelta(days=1)
         return days
 
-    def _date_to_utc_ms_bounds(self, d: dt.date) -> Tuple[int, int]:
-        start_dt = dt.datetime(d.year, d.month, d.day, 0, 0, 0)
-        end_dt = start_dt + dt.timedelta(days=1) - dt.timedelta(milliseconds=1)
-        epoch = dt.datetime(1970, 1, 1)
-        start_ms = int((start_dt - epoch).total_seconds() * 1000)
-        end_ms = int((end_dt - epoch).total_seconds() * 1000)
-        return start_ms, end_ms
-
     # ---------- 数据库探测 ----------
-    def _connect_neticle(self) -> sqlite3.Connection:
+    def _neticle_db_path(self) -> str:
         db_path = os.path.join(self.page_root, self.data_sources.get('neticle_db'))
         if not os.path.isabs(db_path):
             db_path = os.path.abspath(db_path)
         if not os.path.exists(db_path):
             raise FileNotFoundError(f"未找到 Neticle DB: {db_path}")
-        return sqlite3.connect(db_path)
+        return db_path
+
+    def _connect_neticle(self) -> sqlite3.Connection:
+        return connect_ro(self._neticle_db_path())
 
     def _detect_wide_table(self, con: sqlite3.Connection) -> str:
         cur = con.cursor()
@@ -175,13 +180,10 @@ class P13DataGenerator:
         # 时间范围
         created_col = self._pick_first_existing(['createdAtUtcMs', 'createdAtMs', 'createdAt'])
         if created_col:
-            # 整体区间过滤，减少 IO
-            start_d = self._to_date(self.time_range.get('start_date'))
-            end_d = self._to_date(self.time_range.get('end_date'))
-            epoch = dt.datetime(1970, 1, 1)
-            start_ms = int((dt.datetime.combine(start_d, dt.time.min) - epoch).total_seconds() * 1000)
-            end_ms = int((dt.datetime.combine(end_d, dt.time.max) - epoch).total_seconds() * 1000)
-            where_clauses.append(f"{created_col} BETWEEN ? AND ?")
+            # 整体区间过滤（UTC 半开区间，可走索引区间查找）
+            start_ms, end_ms = day_bounds_ms(self._to_date(self.time_range.get('start_date')),
+                                             self._to_date(self.time_range.get('end_date')))
+            where_clauses.append(range_clause(created_col))
             params.extend([start_ms, end_ms])
 
         where_sql = ''
@@ -221,6 +223,16 @@ class P13DataGenerator:
                 seen.add(c)
         return dedup
 
+    def audit_query(self) -> Tuple[str, List, List[str]]:
+        """审计示例行查询：(sql, params, 引用列)。索引顾问（tools/neticle_index.py）也据此检查查询计划。"""
+        where_sql, params = self._build_where()
+        select_cols = self._select_columns()
+        if not select_cols:
+            raise RuntimeError("没有可选取的列，无法生成数据。")
+        sql = f"SELECT {', '.join(select_cols)} FROM {self.wide_table_name} {where_sql} LIMIT {self.audit_row_max}"
+        used = list(dict.fromkeys(select_cols + [c for c in ('countryId', 'country_id', 'country', 'keyword', 'keyword_label', 'keywordLabel', 'createdAtUtcMs', 'createdAtMs', 'createdAt') if c in self.wide_columns]))
+        return sql, params, used
+
     # ---------- 计算逻辑 ----------
     def _classify_sentiment(self, polarity: Optional[float]) -> str:
         if polarity is None:
@@ -265,7 +277,7 @@ class P13DataGenerator:
         return None
 
     def _ms_to_date(self, ms: int) -> dt.date:
-        return dt.datetime.utcfromtimestamp(ms / 1000.0).date()
+        return ms_to_date(ms)
 
     # ---------- 主流程 ----------
     def run(self) -> None:
@@ -290,64 +302,66 @@ class P13DataGenerator:
                 raise RuntimeError(
                     f"互动候选字段不存在：{self.eng_fields_candidates}。请检查数据库列名或更新配置。")
 
-            where_sql, params = self._build_where()
-            select_cols = self._select_columns()
-            if not select_cols:
-                raise RuntimeError("没有可选取的列，无法生成数据。")
-
-            sql = f"SELECT {', '.join(select_cols)} FROM {self.wide_table_name} {where_sql}"
-            cur = con.cursor()
-            cur.execute(sql, params)
+            # 立方体仅物化了固定的求和度量；候选字段超出范围时严格报错
+            missing = [c for c in self.eng_fields_candidates if c in self.wide_columns and c not in SUM_MEASURES]
+            if missing:
+                raise RuntimeError(f"共享立方体未包含互动字段：{missing}（可用：{SUM_MEASURES}）")
+            eng_fields = [c for c in self.eng_fields_candidates if c in self.wide_columns]
 
             # 聚合容器（按参与度进行聚合与归一化）
             pie_eng_sums = {lbl: 0.0 for lbl in self.labels}  # 饼图：各情绪参与度总和
             day_eng_buckets: Dict[dt.date, Dict[str, float]] = {}  # 折线：每日各情绪参与度
-            # 审计示例行（最多 200 行，按时间顺序采样）
-            audit_row_max = 200
-            audit_rows: List[Dict] = []
 
-            for row_t in cur.fetchall():
-                row = {select_cols[i]: row_t[i] for i in range(len(select_cols))}
+            # 参与度聚合：在立方体 sidecar 中按 SQL `GROUP BY day, 情感桶` 对互动字段求和，游标逐组读取，
+            # 内存只与天数 × 情感桶数相关，与当月提及量无关（UTC 日，区间含首尾）
+            # 品牌严格按 keyword_like 过滤（立方体 label_pattern：品牌键整数位，不扩展别名），与 audit_query() 的 LIKE 一致
+            cube = MentionCube(self._neticle_db_path(), table=self.wide_table_name)
+            groups = cube.aggregate(int(self.filters.get('country_id')),
+                                    self.time_range.get('start_date'), self.time_range.get('end_date'),
+                                    measures=eng_fields, by=('day', 'bucket'), cuts=[self.pos_min, self.neg_max],
+                                    label_pattern=self.filters.get('keyword_like') or None)
+            for grp in groups:
+                d = self._to_date(grp['day'])
+                # 情绪分类（polarity_rep 为情感桶代表值，与逐行判定一致）
+                sentiment = self._classify_sentiment(grp['polarity_rep'])
+                # 组参与度：候选互动字段求和
+                eng = sum(float(grp[c] or 0.0) for c in eng_fields)
+                pie_eng_sums[sentiment] = pie_eng_sums.get(sentiment, 0.0) + eng
+                if d not in day_eng_buckets:
+                    day_eng_buckets[d] = {lbl: 0.0 for lbl in self.labels}
+                day_eng_buckets[d][sentiment] += eng
 
-                # 时间
+            # 审计示例行（最多 audit_row_max 行）：单独 LIMIT 查询，逐行读取；覆盖索引 sidecar 可用时走索引区间查找
+            sql, params, used_cols = self.audit_query()
+            select_cols = self._select_columns()
+            audit_rows: List[Dict] = []
+            audit_con = connect_for(self._neticle_db_path(), self.wide_table_name, used_cols)
+            try:
+                audit_raw = audit_con.execute(sql, params).fetchall()
+            finally:
+                audit_con.close()
+            for row_t in audit_raw:
+                row = {select_cols[i]: row_t[i] for i in range(len(select_cols))}
                 ms = self._pick_created_ms(row)
                 if ms is None:
                     continue
                 d = self._ms_to_date(ms)
-
-                # 过滤到配置区间（保险）
-                start_d = self._to_date(self.time_range.get('start_date'))
-                end_d = self._to_date(self.time_range.get('end_date'))
-                if not (start_d <= d <= end_d):
-                    continue
-
-                # 情绪分类
                 sentiment = self._classify_sentiment(row.get('polarity'))
-                # 行级参与度
                 eng = self._calc_row_engagement(row)
-                # 饼图累计（按情绪累加参与度）
-                pie_eng_sums[sentiment] = pie_eng_sums.get(sentiment, 0.0) + eng
-                # 折线桶累计（每日情绪参与度）
-                if d not in day_eng_buckets:
-                    day_eng_buckets[d] = {lbl: 0.0 for lbl in self.labels}
-                day_eng_buckets[d][sentiment] += eng
-
-                # 审计示例行：保留前 audit_row_max 行（含关键原始列与派生值）
-                if len(audit_rows) < audit_row_max:
-                    # 收集候选互动列的原始值
-                    cand_vals = {c: row.get(c) for c in self.eng_fields_candidates}
-                    # 审计附加列值（若存在）
-                    post_id_val = row.get(self.audit_post_id_col) if self.audit_post_id_col else None
-                    channel_val = row.get(self.audit_channel_col) if self.audit_channel_col else None
-                    audit_rows.append({
-                        'Date': d.strftime('%Y-%m-%d'),
-                        'Polarity': row.get('polarity'),
-                        'Sentiment': sentiment,
-                        'PostId': post_id_val,
-                        'Channel': channel_val,
-                        **cand_vals,
-                        'RowEngagement': eng,
-                    })
+                # 收集候选互动列的原始值
+                cand_vals = {c: row.get(c) for c in self.eng_fields_candidates}
+                # 审计附加列值（若存在）
+                post_id_val = row.get(self.audit_post_id_col) if self.audit_post_id_col else None
+                channel_val = row.get(self.audit_channel_col) if self.audit_channel_col else None
+                audit_rows.append({
+                    'Date': d.strftime('%Y-%m-%d'),
+                    'Polarity': row.get('polarity'),
+                    'Sentiment': sentiment,
+                    'PostId': post_id_val,
+                    'Channel': channel_val,
+                    **cand_vals,
+                    'RowEngagement': eng,
+                })
 
         finally:
             con.close()
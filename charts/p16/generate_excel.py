@@ -4,27 +4,31 @@
 P16 数据生成脚本 - 联想法国市场声量份额趋势
 
 实现目标（严格按需求）：
-- 先从模板中抽取数据（优先嵌入 xlsx，其次 chartXML）；模板数据抽取失败直接报错；
+- 先从模板中抽取数据（优先 chartXML 缓存，其次嵌入工作簿）；模板数据抽取失败直接报错；
 - 再计算数据库数据，用能计算到的月份覆盖模板数据；不可计算的月份保留模板值；
 - 在 Excel 中为每条记录增加 `source` 字段，标注 `template` 或 `computed`；
 - 若所有输出均为模板值（没有任何 computed），直接抛错提示检查品牌与月份配置；
-- 使用页面级 tmp 目录并在每次运行前清空已解压旧数据；不在随地生成代码文件。
+- 模板基线按模板哈希缓存（tools/template_baseline.py），运行时不清空/解压 tmp；不在随地生成代码文件。
 """
 
 import os
 import sys
-import sqlite3
-import zipfile
-import shutil
+import io
 import logging
 from datetime import datetime
 from typing import List, Tuple, Dict, Optional
 
 import pandas as pd
-import yaml
-from lxml import etree as ET
 import re
 
+# 共享提及立方体位于仓库根 tools/ 目录
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tools'))
+from neticle_cube import MentionCube
+from period_filter import month_span
+from sqlite_ro import connect_ro
+from page_config import load_page_config
+from template_baseline import load_baseline
+
 # 尝试导入 pyxlsb 以读取嵌入的 xlsb（若模板链接到外部工作簿）
 try:
     from pyxlsb import open_workbook
@@ -35,12 +39,102 @@ except Exception:
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 模板基线抽取器版本：修改 _extract_template_baseline 的输出时递增，旧缓存自动失效
+BASELINE_VERSION = 1
+
+
+def _col_to_idx(col: str) -> int:
+    """列字母转索引（A=1）。"""
+    idx = 0
+    for ch in col:
+        idx = idx * 26 + (ord(ch) - ord('A') + 1)
+    return idx
+
+
+def _read_values_from_embedded_workbook(data: bytes, target: str, formula: str) -> List[str]:
+    """读取嵌入 xlsb（包内部件字节）的数值，依据 chart XML 的 numRef 公式。
+
+    formula 示例："Sheet1!$A$1:$F$1"。返回字符串列表（后续转换为浮点）。
+    若无法读取或定位，抛异常。
+    """
+    # 解析公式，提取工作表名与范围
+    m = re.match(r"([^!]+)!\$(?P<col1>[A-Z]+)\$(?P<row1>\d+):\$(?P<col2>[A-Z]+)\$(?P<row2>\d+)", formula or '')
+    if not m:
+        raise RuntimeError(f'无法识别数值公式范围: {formula}')
+    sheet_name = m.group(1)
+    c1, row1 = _col_to_idx(m.group('col1')), int(m.group('row1'))
+    c2, row2 = _col_to_idx(m.group('col2')), int(m.group('row2'))
+    if not open_workbook:
+        raise RuntimeError('模板图表链接到嵌入工作簿，但当前环境缺少 pyxlsb 依赖，无法读取数值')
+
+    # 读取指定范围的单元格数值（pyxlsb 的 cell 没有显式列索引，逐个收集后按数量截断）
+    values: List[str] = []
+    try:
+        with open_workbook(io.BytesIO(data)) as wb:
+            with wb.get_sheet(sheet_name) as sh:
+                # 仅支持单行或单列范围
+                if row1 == row2:
+                    for i, row in enumerate(sh.rows(), start=1):
+                        if i == row1:
+                            values = [str(cell.v) for cell in row if cell.v is not None][:c2 - c1 + 1]
+                            break
+                elif c1 == c2:
+                    col_values = [str(cell.v) for row in sh.rows() for cell in row if cell.v is not None]
+                    values = col_values[:row2 - row1 + 1]
+                else:
+                    raise RuntimeError(f'暂不支持二维区域读取: {formula}')
+    except Exception as e:
+        raise RuntimeError(f'读取嵌入工作簿失败: {target} - {e}')
+
+    if not values:
+        raise RuntimeError(f'嵌入工作簿返回空值: {target} {formula}')
+    return values
+
+
+def _extract_template_baseline(source) -> dict:
+    """模板基线抽取（结果由 tools/template_baseline.py 按模板哈希缓存，模板不变时不再执行）。
+
+    每个图表取首个系列：
+    - 类别优先 strCache，其次 numCache；可能为空（部分模板隐藏类别轴）；
+    - 数值取 numCache/numLit；XML 中没有数值时按 numRef 公式读取嵌入工作簿；
+    - 数值无法解析为浮点直接抛错。
+    """
+    charts: Dict[str, dict] = {}
+    for part in source.manifest.parts:
+        try:
+            series = source.manifest.series(part)
+            if not series:
+                raise RuntimeError('未找到系列数据')
+            roles = series[0]['roles']
+            cat, val = roles.get('cat') or {}, roles.get('val') or {}
+            categories = [(v or '').strip() for v in cat.get('values') or []] \
+                if cat.get('ref') in ('strRef', 'numRef') else []
+            values_raw = [(v or '').strip() for v in val.get('values') or []] \
+                if val.get('ref') in ('numRef', 'numLit') else []
+
+            # 若 XML 中未取到数值，尝试读取嵌入工作簿（c:externalData）
+            embed = source.manifest.chart(part)['embed']
+            if not values_raw and val.get('formula') and embed and source.manifest.chart(part)['external_rid']:
+                values_raw = _read_values_from_embedded_workbook(
+                    source.read(embed['target']), embed['target'], val['formula'])
+
+            values = []
+            for x in values_raw:
+                try:
+                    values.append(float(x))
+                except Exception:
+                    raise RuntimeError(f'数值无法解析为浮点: {x}')
+        except Exception as e:
+            raise RuntimeError(f'解析模板图表失败: {part} - {e}')
+        charts[part] = {'categories': categories, 'values': values}
+    return {'charts': charts}
+
 
 class P16DataGenerator:
     """P16 数据生成器
 
     职责：
-    - 解压模板到页面 tmp 目录并读取图表数据；
+    - 读取模板基线（按模板哈希缓存的图表类别与数值）；
     - 从数据库计算主趋势与渠道分解数据；
     - 以模板为基线，计算值覆盖并标注来源；
     - 生成 Excel 文件供填充脚本使用；
@@ -55,8 +149,7 @@ class P16DataGenerator:
     def _load_config(self) -> dict:
         """加载配置文件，失败直接抛错。"""
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                return yaml.safe_load(f)
+            return load_page_config(self.config_path)
         except Exception as e:
             raise RuntimeError(f'加载配置文件失败: {e}')
 
@@ -89,183 +182,27 @@ class P16DataGenerator:
         else:
             self.excel_file = os.path.abspath(os.path.join(self.page_dir, os.path.basename(excel_file)))
 
-    # -------------------- 模板抽取与解析 --------------------
-    def _clean_tmp(self) -> None:
-        """清空页面级 tmp 下已解压的旧数据，避免污染。"""
-        # 解压根目录改为 tmp（不再使用 tmp/ppt）
-        extract_dir = self.tmp_dir
-        if os.path.exists(extract_dir):
-            shutil.rmtree(extract_dir)
-
-    def _extract_template(self) -> str:
-        """解压模板 PPT 到页面级 tmp 目录，返回解压根目录。失败直接抛错。"""
+    # -------------------- 模板基线抽取与解析 --------------------
+    def _template_baseline(self) -> Dict[str, dict]:
+        """模板各图表首个系列的类别与数值：按模板哈希缓存（tools/template_baseline.py），不清空/解压 tmp。"""
         if not os.path.exists(self.template_ppt):
             raise FileNotFoundError(f'模板文件不存在: {self.template_ppt}')
-        os.makedirs(self.tmp_dir, exist_ok=True)
-        # 解压根目录为 tmp（其中将包含 ppt/charts 与 ppt/embeddings 等子目录）
-        extract_root = self.tmp_dir
-        with zipfile.ZipFile(self.template_ppt, 'r') as z:
-            z.extractall(extract_root)
-        logger.info(f'模板已解压到: {extract_root}')
-        return extract_root
-
-    def _parse_chart_xml(self, chart_xml_path: str) -> Tuple[List[str], List[float]]:
-        """解析 chart XML 的类别与数值缓存（numCache/strCache）。
-
-        返回: (categories, values)
-        - categories: 字符串标签（如 "May '25"）；可能为空（部分模板隐藏类别轴）。
-        - values: 浮点数列表；若无法解析数值，抛出异常。
-        """
-        ns = {'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart'}
-        try:
-            tree = ET.parse(chart_xml_path)
-            root = tree.getroot()
-            # 取第一个系列 c:ser
-            ser = root.find('.//c:chart/c:plotArea//c:ser', namespaces=ns)
-            if ser is None:
-                raise RuntimeError(f'未找到系列数据: {chart_xml_path}')
-
-            # 类别优先读取 strCache
-            categories = [
-                (v.text or '').strip()
-                for v in ser.findall('.//c:cat//c:strRef//c:strCache//c:pt/c:v', namespaces=ns)
-            ]
-            if not categories:
-                categories = [
-                    (v.text or '').strip()
-                    for v in ser.findall('.//c:cat//c:numRef//c:numCache//c:pt/c:v', namespaces=ns)
-                ]
-
-            # 数值读取 numCache
-            values_raw = [
-                (v.text or '').strip()
-                for v in ser.findall('.//c:val//c:numRef//c:numCache//c:pt/c:v', namespaces=ns)
-            ]
-            if not values_raw:
-                # 某些图表可能使用直接数值缓存（无 numRef）
-                values_raw = [
-                    (v.text or '').strip()
-                    for v in ser.findall('.//c:val//c:numLit//c:pt/c:v', namespaces=ns)
-                ]
-
-            # 若 XML 中未取到数值，尝试读取嵌入工作簿（c:externalData）
-            if not values_raw:
-                # 读取 numRef 的公式以定位范围
-                f_node = ser.find('.//c:val//c:numRef//c:f', namespaces=ns)
-                rel_id_node = root.find('.//c:chart/c:externalData', namespaces=ns)
-                if f_node is not None and rel_id_node is not None:
-                    rel_id = rel_id_node.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id')
-                    if not open_workbook:
-                        raise RuntimeError('模板图表链接到嵌入工作簿，但当前环境缺少 pyxlsb 依赖，无法读取数值')
-                    values_raw = self._read_values_from_embedded_workbook(chart_xml_path, rel_id, f_node.text)
-
-            # 转浮点
-            values = []
-            for x in values_raw:
-                try:
-                    values.append(float(x))
-                except Exception:
-                    raise RuntimeError(f'数值无法解析为浮点: {x} @ {chart_xml_path}')
-
-            # 若类别为空但数值存在，允许返回空类别（某些模板隐藏轴标签），由上层决定推断逻辑
-            if categories:
-                # 对齐长度（若长度不一致，按更短者截断，避免越界）
-                n = min(len(categories), len(values))
-                return categories[:n], values[:n]
-            else:
-                return [], values
-        except Exception as e:
-            raise RuntimeError(f'解析图表XML失败: {chart_xml_path} - {e}')
-
-    def _read_values_from_embedded_workbook(self, chart_xml_path: str, rel_id: str, formula: str) -> List[str]:
-        """读取嵌入 xlsb 的数值，依据 chart XML 的 numRef 公式。
-
-        formula 示例："Sheet1!$A$1:$F$1"。返回字符串列表（后续转换为浮点）。
-        若无法读取或定位，抛异常。
-        """
-        # chart1.xml 的关系文件位于 charts/_rels/chart1.xml.rels
-        chart_dir = os.path.dirname(chart_xml_path)
-        rels_path = os.path.join(chart_dir, '_rels', os.path.basename(chart_xml_path) + '.rels')
-        if not os.path.exists(rels_path):
-            raise RuntimeError(f'缺少关系文件: {rels_path}')
-
-        # 解析 .rels 获取嵌入工作簿相对路径
-        try:
-            rels_tree = ET.parse(rels_path)
-            rels_root = rels_tree.getroot()
-            rel_ns = {'r': 'http://schemas.openxmlformats.org/package/2006/relationships'}
-            # 不使用命名空间查找，直接遍历
-            target_path = None
-            for rel in rels_root:
-                rid = rel.get('Id') or rel.get('ID')
-                if rid == rel_id:
-                    target_path = rel.get('Target')
-                    break
-            if not target_path:
-                raise RuntimeError(f'未找到 externalData 的关系目标: rel_id={rel_id}')
-        except Exception as e:
-            raise RuntimeError(f'解析关系文件失败: {rels_path} - {e}')
-
-        # 解析公式，提取工作表名与范围
-        m = re.match(r"([^!]+)!\$(?P<col1>[A-Z]+)\$(?P<row1>\d+):\$(?P<col2>[A-Z]+)\$(?P<row2>\d+)", formula or '')
-        if not m:
-            raise RuntimeError(f'无法识别数值公式范围: {formula}')
-        sheet_name = m.group(1)
-        col1, row1 = m.group('col1'), int(m.group('row1'))
-        col2, row2 = m.group('col2'), int(m.group('row2'))
-
-        # 列字母转索引（A=1）
-        def col_to_idx(col: str) -> int:
-            idx = 0
-            for ch in col:
-                idx = idx * 26 + (ord(ch) - ord('A') + 1)
-            return idx
-        c1, c2 = col_to_idx(col1), col_to_idx(col2)
-
-        # 计算嵌入工作簿绝对路径
-        # target 是相对到 charts 目录的路径，如 ../embeddings/Workbook1.xlsb
-        wb_path = os.path.abspath(os.path.join(chart_dir, target_path))
-        if not os.path.exists(wb_path):
-            raise RuntimeError(f'嵌入工作簿不存在: {wb_path}')
-        if not open_workbook:
-            raise RuntimeError('当前环境缺少 pyxlsb，无法读取嵌入工作簿')
-
-        # 读取指定范围的单元格数值
-        values: List[str] = []
-        try:
-            with open_workbook(wb_path) as wb:
-                with wb.get_sheet(sheet_name) as sh:
-                    # 仅支持单行或单列范围
-                    if row1 == row2:
-                        # 单行：遍历该行的所有单元格
-                        for i, row in enumerate(sh.rows(), start=1):
-                            if i == row1:
-                                # 收集该行的数值（按列索引过滤）
-                                for cell in row:
-                                    # pyxlsb 的 cell 没有显式列索引，逐个收集后按数量截断
-                                    if cell.v is not None:
-                                        values.append(str(cell.v))
-                                # 按列范围截断
-                                width = c2 - c1 + 1
-                                values = values[:width]
-                                break
-                    elif c1 == c2:
-                        # 单列：遍历所有行，收集该列的数值
-                        col_values = []
-                        for row in sh.rows():
-                            for cell in row:
-                                if cell.v is not None:
-                                    col_values.append(str(cell.v))
-                        height = row2 - row1 + 1
-                        values = col_values[:height]
-                    else:
-                        raise RuntimeError(f'暂不支持二维区域读取: {formula}')
-        except Exception as e:
-            raise RuntimeError(f'读取嵌入工作簿失败: {wb_path} - {e}')
-
-        if not values:
-            raise RuntimeError(f'嵌入工作簿返回空值: {wb_path} {formula}')
-        return values
+        baseline = load_baseline(self.template_ppt, 'p16', _extract_template_baseline,
+                                 version=BASELINE_VERSION, log=logger.info)
+        return baseline['charts']
+
+    def _chart_baseline(self, baseline: Dict[str, dict], chart_file: str) -> Tuple[List[str], List[float]]:
+        """取单个图表的 (categories, values)；图表缺失直接抛错。"""
+        part = f'ppt/charts/{chart_file}'
+        if part not in baseline:
+            raise FileNotFoundError(f'模板中缺少图表: {part}')
+        categories, values = baseline[part]['categories'], baseline[part]['values']
+        # 若类别为空但数值存在，允许返回空类别（某些模板隐藏轴标签），由上层决定推断逻辑
+        if categories:
+            # 对齐长度（若长度不一致，按更短者截断，避免越界）
+            n = min(len(categories), len(values))
+            return categories[:n], values[:n]
+        return [], values
 
     def _infer_months_from_config(self, count: int) -> List[str]:
         """当模板未提供类别标签时，根据配置的 target_month 推断最近 count 个月（含）。"""
@@ -305,13 +242,10 @@ class P16DataGenerator:
                     continue
         raise RuntimeError(f'无法识别的月份标签: {label}')
 
-    def extract_template_main_trend(self, charts_dir: str) -> pd.DataFrame:
-        """从模板 chart1.xml 读取主趋势数据（月份 + 值）。"""
+    def extract_template_main_trend(self, baseline: Dict[str, dict]) -> pd.DataFrame:
+        """从模板基线读取主趋势数据（chart1，月份 + 值）。"""
         chart_file = self.config['chart_mapping']['chart1']['file']
-        chart_path = os.path.join(charts_dir, chart_file)
-        if not os.path.exists(chart_path):
-            raise FileNotFoundError(f'主趋势图表文件缺失: {chart_path}')
-        categories, values = self._parse_chart_xml(chart_path)
+        categories, values = self._chart_baseline(baseline, chart_file)
 
         # 若模板类别缺失，根据 target_month 推断最近 N 个月
         if categories:
@@ -328,8 +262,8 @@ class P16DataGenerator:
             raise RuntimeError('主趋势模板数据为空')
         return df
 
-    def extract_template_channel_breakdown(self, charts_dir: str) -> pd.DataFrame:
-        """从模板 chart2..7.xml 读取渠道分解数据（月份 + 渠道 + 值）。
+    def extract_template_channel_breakdown(self, baseline: Dict[str, dict]) -> pd.DataFrame:
+        """从模板基线读取渠道分解数据（chart2..7，月份 + 渠道 + 值）。
 
         严格策略：
         - 渠道名称优先使用配置中的显式 `channel` 字段；
@@ -342,9 +276,6 @@ class P16DataGenerator:
             if info.get('type') != 'channel_breakdown':
                 continue
             chart_file = info['file']
-            chart_path = os.path.join(charts_dir, chart_file)
-            if not os.path.exists(chart_path):
-                raise FileNotFoundError(f'渠道图表文件缺失: {chart_path}')
 
             # 1) 优先使用显式配置的渠道名称
             allowed_channels = {'Forum', 'Online News', 'Blog', 'Instagram', 'YouTube', 'X'}
@@ -370,7 +301,7 @@ class P16DataGenerator:
                 else:
                     raise RuntimeError(f"无法识别渠道名称（chart_id={chart_id}）。请在 config.yaml 的 chart_mapping 中显式提供 channel 字段")
 
-            categories, values = self._parse_chart_xml(chart_path)
+            categories, values = self._chart_baseline(baseline, chart_file)
             if categories:
                 months = [self._normalize_month_display(c) for c in categories]
             else:
@@ -394,7 +325,7 @@ class P16DataGenerator:
         """从 metrics 数据库计算主趋势（月份 -> SOV%）。失败直接抛错。"""
         logger.info('提取主趋势数据库数据...')
         try:
-            conn = sqlite3.connect(self.metrics_db)
+            conn = connect_ro(self.metrics_db)
         except Exception as e:
             raise RuntimeError(f'连接 metrics 数据库失败: {e}')
 
@@ -432,33 +363,19 @@ class P16DataGenerator:
         """从 neticle 数据库计算渠道分解（月份 + 渠道 -> SOV%）。失败直接抛错。"""
         logger.info('提取渠道分解数据库数据...')
         try:
-            conn = sqlite3.connect(self.neticle_db)
+            cube = MentionCube(self.neticle_db)
         except Exception as e:
             raise RuntimeError(f'连接 neticle 数据库失败: {e}')
 
         try:
-            query = (
-                """
-                SELECT 
-                    strftime('%Y-%m', datetime(createdAtUtcMs/1000, 'unixepoch')) AS month,
-                    sourceLabel,
-                    keyword_label,
-                    COUNT(*) AS mention_count
-                FROM mentions_wide
-                WHERE countryId = ?
-                  AND strftime('%Y-%m', datetime(createdAtUtcMs/1000, 'unixepoch')) = ?
-                GROUP BY month, sourceLabel, keyword_label
-                """
-            )
+            # 共享立方体（UTC 日粒度）→ 目标月份的 sourceLabel × keyword_label 提及数
             # 仅保留目标月份的原始提及数据，避免计算到非目标月份（如 7 月）
-            df = pd.read_sql_query(
-                query,
-                conn,
-                params=[self.config['filters']['country_id'], self.config['filters']['target_month']]
-            )
-            conn.close()
+            target_month = self.config['filters']['target_month']
+            cells = cube.frame(self.config['filters']['country_id'], *month_span(target_month))
+            df = (cells.groupby(['month', 'sourceLabel', 'key_mask'], dropna=False)['mentions']
+                  .sum().reset_index(name='mention_count'))
+            brand_bit = cube.brands.bit(self.config['filters']['brand_name'])
         except Exception as e:
-            conn.close()
             raise RuntimeError(f'查询 neticle 数据库失败: {e}')
 
         if df.empty:
@@ -500,8 +417,8 @@ class P16DataGenerator:
         if df.empty:
             return pd.DataFrame()
 
-        # 品牌识别（lenovo）
-        df['is_lenovo'] = df['keyword_label'].str.lower().str.contains('lenovo', na=False)
+        # 品牌识别（lenovo）：按品牌注册表（tools/brand_dim.py）解析出的品牌键位图判断（不含别名，与子串匹配一致）
+        df['is_lenovo'] = (df['key_mask'].astype('int64') & brand_bit) != 0
 
         # 按月份与渠道计算 SOV%
         rows = []
@@ -580,20 +497,12 @@ class P16DataGenerator:
         """生成 Excel 文件。失败直接抛错，不返回布尔。"""
         logger.info('开始生成 Excel 文件...')
 
-        # 1) 清理并解压模板
-        self._clean_tmp()
-        extract_root = self._extract_template()
-
-        # 兼容两种结构：tmp/ppt/ppt/charts 与 tmp/ppt/charts
-        charts_dir = os.path.join(extract_root, 'ppt', 'charts')
-        if not os.path.exists(charts_dir):
-            charts_dir = os.path.join(extract_root, 'charts')
-        if not os.path.exists(charts_dir):
-            raise FileNotFoundError(f'图表目录不存在: {charts_dir}')
+        # 1) 读取模板基线（按模板哈希缓存，不解压）
+        baseline = self._template_baseline()
 
         # 2) 读取模板数据
-        template_main = self.extract_template_main_trend(charts_dir)
-        template_channel = self.extract_template_channel_breakdown(charts_dir)
+        template_main = self.extract_template_main_trend(baseline)
+        template_channel = self.extract_template_channel_breakdown(baseline)
 
         # 3) 计算数据库数据
         computed_main = self.compute_main_trend()
@@ -3,20 +3,21 @@
 fill_from_excel.py
 
 职责：
-- 读取 `output/p18_data.xlsx`，将数值写入页面级 `template/ppt/charts/chart1..4.xml` 的 `numCache`；
+- 读取 `output/p18_data.xlsx`，将数值写入模板 `ppt/charts/chart1..4.xml` 的 `numCache`；
 - 设置 `externalData/autoUpdate=1`；
 - 写入 `_rels/chartX.xml.rels` 指向页面级嵌入 xlsx；
+- slide1 文本按声明的文本绑定（tools/slide_text.py）一次替换：Ranking 写入排名、静态百分比清空；
 
 说明：
 - 不修改模板文字或样式；仅替换数据缓存与关系目标；
 - 颜色与顺序保持模板配置；
-- 临时文件与处理均在页面级目录内完成。
+- 模板以内存 OPC 包打开（tools/opc_package.py），部件修改仅保存在内存中，最后一次写出 PPTX。
 """
 
+import posixpath
+import sys
 from pathlib import Path
 from lxml import etree as ET
-import zipfile
-import shutil
 
 try:
     from openpyxl import load_workbook
@@ -25,232 +26,84 @@ except Exception:
 
 PAGE_DIR = Path(__file__).resolve().parent
 OUT_XLSX = PAGE_DIR / 'p18_data.xlsx'
-# 使用页面级 tmp 目录，统一使用 tmp/ppt 结构
+TEMPLATE_PPTX = PAGE_DIR / 'p18.pptx'
+# 使用页面级 tmp 目录：generate_excel.py 将 4 份嵌入 xlsx 写入 tmp/ppt/ppt/embeddings
 TMP_DIR = PAGE_DIR / 'tmp'
+EMBED_SRC_DIR = TMP_DIR / 'ppt' / 'ppt' / 'embeddings'
 
-# 路径解析：兼容两种解压结构（tmp/ppt/ppt 与 tmp/ppt）
-def _resolve_tmp_paths():
-    """解析 tmp 下的关键目录路径。
-    返回 (ppt_root, charts_dir, rels_dir, embeddings_dir, slides_dir, content_types_path)
-    """
-    base = TMP_DIR / 'ppt'
-    ppt_root = base / 'ppt' if (base / 'ppt').exists() else base
-    charts_dir = ppt_root / 'charts'
-    rels_dir = charts_dir / '_rels'
-    embeddings_dir = ppt_root / 'embeddings'
-    slides_dir = ppt_root / 'slides'
-    content_types_path = base / '[Content_Types].xml'
-    return ppt_root, charts_dir, rels_dir, embeddings_dir, slides_dir, content_types_path
-
-NS = {
-    'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart',
-    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
-    # 为数据标签文本属性(txPr)提供 a 命名空间
-    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
-}
-
-
-def _ensure_templates():
-    """确保图表模板文件存在于 tmp 解压目录中。"""
-    ppt_root, charts_dir, rels_dir, _, _, _ = _resolve_tmp_paths()
-    charts_dir.mkdir(parents=True, exist_ok=True)
-    rels_dir.mkdir(parents=True, exist_ok=True)
-    for i in range(1, 5):
-        chart_file = charts_dir / f'chart{i}.xml'
-        if not chart_file.exists():
-            print(f'[p18] 警告：图表文件不存在 {chart_file}，请先准备模板解压与嵌入文件（例如先运行 charts/p18/generate_excel.py 或手动解压）')
-        rels_file = rels_dir / f'chart{i}.xml.rels'
-        if not rels_file.exists():
-            print(f'[p18] 警告：关系文件不存在 {rels_file}，请先准备模板解压与嵌入文件（例如先运行 charts/p18/generate_excel.py 或手动解压）')
-
-
-def _set_external_auto_update(tree: ET.ElementTree):
-    ed = tree.find('.//{%(c)s}externalData' % NS)
-    if ed is None:
-        return
-    au = ed.find('{%(c)s}autoUpdate' % NS)
-    if au is None:
-        au = ET.SubElement(ed, '{%(c)s}autoUpdate' % NS)
-    au.set('val', '1')
-
-
-def _write_num_cache_points(num_ref: ET.Element, values):
-    """用给定 values 重写 numCache/pt 节点序列。"""
-    cache = num_ref.find('{%(c)s}numCache' % NS)
-    if cache is None:
-        cache = ET.SubElement(num_ref, '{%(c)s}numCache' % NS)
-    # formatCode 保持模板原样
-    pts = list(cache.findall('{%(c)s}pt' % NS))
-    for p in pts:
-        cache.remove(p)
-    # 重新写 ptCount 与 pt
-    pt_count = cache.find('{%(c)s}ptCount' % NS)
-    if pt_count is None:
-        pt_count = ET.SubElement(cache, '{%(c)s}ptCount' % NS)
-    pt_count.set('val', str(len(values)))
-    for idx, v in enumerate(values):
-        pt = ET.SubElement(cache, '{%(c)s}pt' % NS, idx=str(idx))
-        vv = ET.SubElement(pt, '{%(c)s}v' % NS)
-        vv.text = str(int(round(v)))
-
-
-def _update_chart_values(chart_xml_path: Path, values):
-    tree = ET.fromstring(chart_xml_path.read_bytes())
-    # 找到第一条系列的数值引用
-    num_ref = tree.find('.//{%(c)s}ser/{%(c)s}val/{%(c)s}numRef' % NS)
-    if num_ref is None:
-        raise RuntimeError(f'未找到数值引用: {chart_xml_path.name}')
-    _write_num_cache_points(num_ref, values)
-    # 关键修复：移除固定的Y轴范围(<c:min>/<c:max>)，改为自动缩放，避免最后一个值超出轴范围被裁剪
-    for scaling in list(tree.findall('.//{%(c)s}valAx/{%(c)s}scaling' % NS)):
-        mn = scaling.find('{%(c)s}min' % NS)
-        mx = scaling.find('{%(c)s}max' % NS)
-        if mn is not None:
-            scaling.remove(mn)
-        if mx is not None:
-            scaling.remove(mx)
-    # 启用图表数据标签，使其随数据点移动并显示当前数值
-    line_chart = tree.find('.//{%(c)s}lineChart' % NS)
-    if line_chart is None:
-        raise RuntimeError(f'未找到折线图节点: {chart_xml_path.name}')
-    dLbls = line_chart.find('{%(c)s}dLbls' % NS)
-    if dLbls is None:
-        dLbls = ET.SubElement(line_chart, '{%(c)s}dLbls' % NS)
-    # 统一关闭不需要的标签项，开启数值标签
-    def _set_flag(parent, tag, val):
-        # 正确拼接命名空间前缀，避免格式化错误
-        el = parent.find(f'{{{NS["c"]}}}{tag}')
-        if el is None:
-            el = ET.SubElement(parent, f'{{{NS["c"]}}}{tag}')
-        el.set('val', str(val))
-    _set_flag(dLbls, 'showLegendKey', 0)
-    _set_flag(dLbls, 'showCatName', 0)
-    _set_flag(dLbls, 'showSerName', 0)
-    _set_flag(dLbls, 'showPercent', 0)
-    _set_flag(dLbls, 'showBubbleSize', 0)
-    _set_flag(dLbls, 'showLeaderLines', 0)
-    _set_flag(dLbls, 'showVal', 1)
-    # 标签位置：顶部（随点位变化），并设置数值格式为 0"%"（整数后加%号，不进行百分比缩放）
-    pos = dLbls.find('{%(c)s}dLblPos' % NS)
-    if pos is None:
-        pos = ET.SubElement(dLbls, '{%(c)s}dLblPos' % NS)
-    pos.set('val', 't')
-    numFmt = dLbls.find('{%(c)s}numFmt' % NS)
-    if numFmt is None:
-        numFmt = ET.SubElement(dLbls, '{%(c)s}numFmt' % NS)
-    numFmt.set('formatCode', '0"%"')
-    numFmt.set('sourceLinked', '0')
+# 内存 OPC 包编辑器位于仓库根 tools/ 目录
+sys.path.insert(0, str(PAGE_DIR.parents[1] / 'tools'))
+from opc_package import OpcPackage
+from chart_patch import ChartPatch, ensure, set_flags, set_number_format
+from slide_text import SlideTextBinding, apply_text_bindings
+
+# 包内部件路径
+CHARTS_PART_DIR = 'ppt/charts'
+SLIDE1_PART = 'ppt/slides/slide1.xml'
+CONTENT_TYPES_PART = '[Content_Types].xml'
+
+
+def _configure_value_labels(dLbls):
+    """数据标签：顶部显示数值，格式 0"%"（整数后加%号，不进行百分比缩放），文本不换行不省略。"""
+    set_flags(dLbls, dLblPos='t', showVal=1, showLeaderLines=0)
+    set_number_format(dLbls, '0"%"')
     # 关键：为数据标签增加文本属性，禁用省略号和换行，避免显示为 "4..." 等
     # 在 WPS/Office 渲染中，若继承了轴的 txPr(包含 vertOverflow="ellipsis")，会导致数据标签被省略。
-    txPr = dLbls.find('{%(c)s}txPr' % NS)
-    if txPr is None:
-        txPr = ET.SubElement(dLbls, '{%(c)s}txPr' % NS)
-    bodyPr = txPr.find('{%(a)s}bodyPr' % NS)
-    if bodyPr is None:
-        bodyPr = ET.SubElement(txPr, '{%(a)s}bodyPr' % NS)
+    bodyPr = ensure(dLbls, 'c:txPr', 'a:bodyPr')
     # 明确设置文本渲染行为：不旋转、不换行、不省略，居中对齐
-    bodyPr.set('rot', '0')
-    bodyPr.set('spcFirstLastPara', '0')
-    bodyPr.set('vertOverflow', 'clip')
-    bodyPr.set('vert', 'horz')
-    bodyPr.set('wrap', 'none')
-    bodyPr.set('anchor', 'ctr')
-    bodyPr.set('anchorCtr', '1')
+    for k, v in (('rot', '0'), ('spcFirstLastPara', '0'), ('vertOverflow', 'clip'), ('vert', 'horz'),
+                 ('wrap', 'none'), ('anchor', 'ctr'), ('anchorCtr', '1')):
+        bodyPr.set(k, v)
     # 自动适配文本到容器，进一步避免被截断
-    if bodyPr.find('{%(a)s}spAutoFit' % NS) is None:
-        ET.SubElement(bodyPr, '{%(a)s}spAutoFit' % NS)
-    lstStyle = txPr.find('{%(a)s}lstStyle' % NS)
-    if lstStyle is None:
-        lstStyle = ET.SubElement(txPr, '{%(a)s}lstStyle' % NS)
-    p = txPr.find('{%(a)s}p' % NS)
-    if p is None:
-        p = ET.SubElement(txPr, '{%(a)s}p' % NS)
-    pPr = p.find('{%(a)s}pPr' % NS)
-    if pPr is None:
-        pPr = ET.SubElement(p, '{%(a)s}pPr' % NS)
-    defRPr = pPr.find('{%(a)s}defRPr' % NS)
-    if defRPr is None:
-        defRPr = ET.SubElement(pPr, '{%(a)s}defRPr' % NS)
+    ensure(bodyPr, 'a:spAutoFit')
+    ensure(dLbls, 'c:txPr', 'a:lstStyle')
     # 保持语言为中文，字号沿用模板默认(不强制设置数值，避免样式突然变化)
-    defRPr.set('lang', 'zh-CN')
-    # 系列级也显式开启标签，避免模板默认关闭
-    for ser in list(line_chart.findall('{%(c)s}ser' % NS)):
-        dLbls_ser = ser.find('{%(c)s}dLbls' % NS)
-        if dLbls_ser is None:
-            dLbls_ser = ET.SubElement(ser, '{%(c)s}dLbls' % NS)
-        _set_flag(dLbls_ser, 'showVal', 1)
-        _set_flag(dLbls_ser, 'showLeaderLines', 0)
-        pos_ser = dLbls_ser.find('{%(c)s}dLblPos' % NS)
-        if pos_ser is None:
-            pos_ser = ET.SubElement(dLbls_ser, '{%(c)s}dLblPos' % NS)
-        pos_ser.set('val', 't')
-        numFmt_ser = dLbls_ser.find('{%(c)s}numFmt' % NS)
-        if numFmt_ser is None:
-            numFmt_ser = ET.SubElement(dLbls_ser, '{%(c)s}numFmt' % NS)
-        numFmt_ser.set('formatCode', '0"%"')
-        numFmt_ser.set('sourceLinked', '0')
-        # 系列级同样显式设置文本属性，避免继承导致省略
-        txPr_ser = dLbls_ser.find('{%(c)s}txPr' % NS)
-        if txPr_ser is None:
-            txPr_ser = ET.SubElement(dLbls_ser, '{%(c)s}txPr' % NS)
-        bodyPr_ser = txPr_ser.find('{%(a)s}bodyPr' % NS)
-        if bodyPr_ser is None:
-            bodyPr_ser = ET.SubElement(txPr_ser, '{%(a)s}bodyPr' % NS)
-        bodyPr_ser.set('rot', '0')
-        bodyPr_ser.set('spcFirstLastPara', '0')
-        bodyPr_ser.set('vertOverflow', 'clip')
-        bodyPr_ser.set('vert', 'horz')
-        bodyPr_ser.set('wrap', 'none')
-        bodyPr_ser.set('anchor', 'ctr')
-        bodyPr_ser.set('anchorCtr', '1')
-        # 自动适配文本到容器，进一步避免被截断
-        if bodyPr_ser.find('{%(a)s}spAutoFit' % NS) is None:
-            ET.SubElement(bodyPr_ser, '{%(a)s}spAutoFit' % NS)
-        lstStyle_ser = txPr_ser.find('{%(a)s}lstStyle' % NS)
-        if lstStyle_ser is None:
-            lstStyle_ser = ET.SubElement(txPr_ser, '{%(a)s}lstStyle' % NS)
-        p_ser = txPr_ser.find('{%(a)s}p' % NS)
-        if p_ser is None:
-            p_ser = ET.SubElement(txPr_ser, '{%(a)s}p' % NS)
-        pPr_ser = p_ser.find('{%(a)s}pPr' % NS)
-        if pPr_ser is None:
-            pPr_ser = ET.SubElement(p_ser, '{%(a)s}pPr' % NS)
-        defRPr_ser = pPr_ser.find('{%(a)s}defRPr' % NS)
-        if defRPr_ser is None:
-            defRPr_ser = ET.SubElement(pPr_ser, '{%(a)s}defRPr' % NS)
-        defRPr_ser.set('lang', 'zh-CN')
-    _set_external_auto_update(ET.ElementTree(tree))
-    chart_xml_path.write_bytes(ET.tostring(tree, xml_declaration=True, encoding='UTF-8', standalone='yes'))
-
-
-def _write_rels(chart_idx: int, rels_dir: Path):
+    ensure(dLbls, 'c:txPr', 'a:p', 'a:pPr', 'a:defRPr').set('lang', 'zh-CN')
+
+
+def _update_chart_values(pkg: OpcPackage, chart_part: str, values):
+    """单次解析：第一条系列的 numCache、Y 轴自动缩放、数据标签与 externalData/autoUpdate。"""
+    with ChartPatch.edit(pkg, chart_part) as chart:
+        if not chart.has('lineChart'):
+            raise RuntimeError(f'未找到折线图节点: {posixpath.basename(chart_part)}')
+        series = chart.series_of()
+        if not series or series[0].ref('val', 'num') is None:
+            raise RuntimeError(f'未找到数值引用: {posixpath.basename(chart_part)}')
+        # formatCode 保持模板原样
+        series[0].set_values(values, fmt=lambda v: str(int(round(v))))
+        # 关键修复：移除固定的Y轴范围(<c:min>/<c:max>)，改为自动缩放，避免最后一个值超出轴范围被裁剪
+        chart.auto_scale_value_axes()
+        # 启用图表数据标签，使其随数据点移动并显示当前数值；统一关闭不需要的标签项
+        dLbls = chart.data_labels('lineChart')
+        set_flags(dLbls, showLegendKey=0, showCatName=0, showSerName=0, showPercent=0, showBubbleSize=0)
+        _configure_value_labels(dLbls)
+        # 系列级也显式开启标签，避免模板默认关闭
+        for ser in chart.series_of('lineChart'):
+            _configure_value_labels(ser.data_labels())
+        chart.bind_workbook(create=False)
+
+
+def _write_rels(pkg: OpcPackage, chart_idx: int):
     rels = ET.Element('Relationships', xmlns='http://schemas.openxmlformats.org/package/2006/relationships')
     r = ET.SubElement(rels, 'Relationship')
     r.set('Id', 'rId1')
     r.set('Type', 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/package')
     r.set('Target', f'../embeddings/Microsoft_Office_Excel_Binary_Worksheet{chart_idx}.xlsx')
-    path = rels_dir / f'chart{chart_idx}.xml.rels'
-    path.write_bytes(ET.tostring(rels, xml_declaration=True, encoding='UTF-8', standalone='yes'))
-
-
-def _clean_tmp_extracted():
-    """清理 tmp 中已解压的模板，防止污染。"""
-    extract_dir = TMP_DIR / 'ppt'
-    if extract_dir.exists():
-        shutil.rmtree(extract_dir)
+    part = f'{CHARTS_PART_DIR}/_rels/chart{chart_idx}.xml.rels'
+    pkg.write(part, ET.tostring(rels, xml_declaration=True, encoding='UTF-8', standalone='yes'))
 
 
 # 注意：本文件不再调用 generate_excel.py，以保持相对独立。
-# 运行顺序建议：先执行 charts/p18/generate_excel.py 以准备 tmp/ppt 与 p18_data.xlsx，
+# 运行顺序建议：先执行 charts/p18/generate_excel.py 以准备嵌入 xlsx 与 p18_data.xlsx，
 # 再运行本脚本进行填充与打包；若前置文件缺失，将在后续校验中直接报错。
 
 
-def _update_content_types_for_xlsx(ct_path: Path, embed_names: list[str]):
+def _update_content_types_for_xlsx(pkg: OpcPackage, embed_names: list[str]):
     """更新 Content_Types，使嵌入引用 xlsx，而非 xlsb。"""
-    if not ct_path.exists():
-        raise FileNotFoundError(f'缺少 Content_Types 文件: {ct_path}')
+    if not pkg.exists(CONTENT_TYPES_PART):
+        raise FileNotFoundError(f'缺少 Content_Types 文件: {CONTENT_TYPES_PART}')
     ns_ct = 'http://schemas.openxmlformats.org/package/2006/content-types'
-    root = ET.fromstring(ct_path.read_bytes())
+    root = ET.fromstring(pkg.read(CONTENT_TYPES_PART))
     # 移除 xlsb 的覆盖项
     for o in list(root.findall('{%s}Override' % ns_ct)):
         part = o.get('PartName') or ''
@@ -262,7 +115,7 @@ def _update_content_types_for_xlsx(ct_path: Path, embed_names: list[str]):
         if part not in existing:
             ET.SubElement(root, '{%s}Override' % ns_ct, PartName=part,
                           ContentType='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    ct_path.write_bytes(ET.tostring(root, xml_declaration=True, encoding='UTF-8', standalone='yes'))
+    pkg.write(CONTENT_TYPES_PART, ET.tostring(root, xml_declaration=True, encoding='UTF-8', standalone='yes'))
 
 
 def _read_ranking_values() -> list[int]:
@@ -289,20 +142,15 @@ def _read_ranking_values() -> list[int]:
     return vals
 
 
-def _update_ranking_in_slide(slide_xml_path: Path, ranks: list[int]):
-    """将 slide1.xml 中的 #数字 文本替换为给定排名。"""
-    root = ET.fromstring(slide_xml_path.read_bytes())
-    ns_a = 'http://schemas.openxmlformats.org/drawingml/2006/main'
-    nodes = []
-    for t in root.findall('.//{%s}t' % ns_a):
-        text = (t.text or '')
-        if text.startswith('#') and text[1:].isdigit():
-            nodes.append(t)
-    if len(nodes) != len(ranks):
-        raise RuntimeError(f'[p18] Ranking 文本节点数量({len(nodes)})与数据数量({len(ranks)})不一致')
-    for i, t in enumerate(nodes):
-        t.text = f'#{int(ranks[i])}'
-    slide_xml_path.write_bytes(ET.tostring(root, xml_declaration=True, encoding='UTF-8', standalone='yes'))
+def _slide1_text_bindings(ranks: list[int]) -> list[SlideTextBinding]:
+    """slide1 的文本占位：
+    - Ranking：#数字 文本（按 a:t 原文匹配，不去空白）依次替换为给定排名，数量须与数据一致；
+    - 主趋势静态百分比（NN%）：改用图表数据标签，为避免位置与数值不同步，统一清空（至少命中 1 处）。
+    """
+    return [
+        SlideTextBinding('[p18] Ranking', r'#\d+', ranks, fmt='#{:d}', strip=False),
+        SlideTextBinding('[p18] 静态百分比', r'\d+%', fill=''),
+    ]
 
 
 def _read_main_values() -> list[int]:
@@ -329,49 +177,24 @@ def _read_main_values() -> list[int]:
     return vals
 
 
-def _update_main_percent_texts(slide_xml_path: Path, values: list[int]):
-    """已弃用：使用图表数据标签替代静态文本。
-    为避免位置与数值不同步，这里改为清空这些静态百分比文本。
-    """
-    import re as _re
-    root = ET.fromstring(slide_xml_path.read_bytes())
-    ns_a = 'http://schemas.openxmlformats.org/drawingml/2006/main'
-    cleared = 0
-    for t in root.findall('.//{%s}t' % ns_a):
-        tx = (t.text or '').strip()
-        if _re.fullmatch(r'\d+%$', tx):
-            t.text = ''
-            cleared += 1
-    if cleared == 0:
-        raise RuntimeError('[p18] 未发现可清理的静态百分比文本节点')
-    slide_xml_path.write_bytes(ET.tostring(root, xml_declaration=True, encoding='UTF-8', standalone='yes'))
-
-
-def _package_final(output_path: Path):
-    """将 tmp/ppt 目录打包为目标 PPTX。"""
-    base = TMP_DIR / 'ppt'
-    if not base.exists():
-        raise FileNotFoundError('打包失败：tmp/ppt 不存在，请确保已解压模板')
-    with zipfile.ZipFile(str(output_path), 'w', compression=zipfile.ZIP_DEFLATED) as z:
-        for p in base.rglob('*'):
-            if p.is_file():
-                arc = p.relative_to(base)
-                z.write(p, arcname=str(arc))
-    print(f'[p18] 已生成: {output_path}')
+def _package_final(pkg: OpcPackage, output_path: Path):
+    """一次写出目标 PPTX：未修改部件原样拷贝，修改部件重新压缩。"""
+    pkg.save(output_path)
+    print(f'[p18] 已生成: {output_path}（修改部件 {len(pkg.modified)} 个）')
 
 
 def main():
     """端到端流程：校验 → 填充 → 文本更新 → 内容类型修正 → 打包。
 
-    说明：本脚本不负责解压模板与生成数据文件。请在运行前确保：
-    - 已存在 tmp/ppt 结构及相关 chart/slides/embeddings；
+    说明：本脚本不负责生成数据文件。请在运行前确保：
+    - 已由 generate_excel.py 生成 4 份嵌入 xlsx（tmp/ppt/ppt/embeddings）；
     - 已生成 charts/p18/p18_data.xlsx。
     缺失任何前置条件将直接报错，不做兜底。"""
 
-    # 3) 路径解析与存在性校验
-    ppt_root, charts_dir, rels_dir, embeddings_dir, slides_dir, ct_path = _resolve_tmp_paths()
-    if not charts_dir.exists() or not slides_dir.exists():
-        raise RuntimeError('[p18] 模板解压不完整，缺少 charts 或 slides 目录')
+    # 3) 打开模板（内存 OPC 包）并校验关键部件
+    pkg = OpcPackage.open(TEMPLATE_PPTX)
+    if not pkg.glob(f'{CHARTS_PART_DIR}/*') or not pkg.glob('ppt/slides/*'):
+        raise RuntimeError('[p18] 模板不完整，缺少 charts 或 slides 部件')
 
     # 4) 加载数据，写 chart1..4.xml 的 numCache
     wb = load_workbook(str(OUT_XLSX), data_only=True)
@@ -382,38 +205,35 @@ def main():
     lovers_values = row_values('Lovers')
     neutral_values = row_values('Neutral')
     haters_values = row_values('Haters')
-    _update_chart_values(charts_dir / 'chart1.xml', main_values)
-    _update_chart_values(charts_dir / 'chart2.xml', lovers_values)
-    _update_chart_values(charts_dir / 'chart3.xml', neutral_values)
-    _update_chart_values(charts_dir / 'chart4.xml', haters_values)
+    _update_chart_values(pkg, f'{CHARTS_PART_DIR}/chart1.xml', main_values)
+    _update_chart_values(pkg, f'{CHARTS_PART_DIR}/chart2.xml', lovers_values)
+    _update_chart_values(pkg, f'{CHARTS_PART_DIR}/chart3.xml', neutral_values)
+    _update_chart_values(pkg, f'{CHARTS_PART_DIR}/chart4.xml', haters_values)
 
-    # 5) 更新 chart rels 到嵌入 xlsx，并校验嵌入文件存在
+    # 5) 更新 chart rels 到嵌入 xlsx，并把生成的嵌入工作簿写入包内
     for i in range(1, 5):
-        _write_rels(i, rels_dir)
+        _write_rels(pkg, i)
         embed_name = f'Microsoft_Office_Excel_Binary_Worksheet{i}.xlsx'
-        if not (embeddings_dir / embed_name).exists():
-            raise FileNotFoundError(f'[p18] 缺少嵌入工作簿: {embeddings_dir / embed_name}')
+        if not (EMBED_SRC_DIR / embed_name).exists():
+            raise FileNotFoundError(f'[p18] 缺少嵌入工作簿: {EMBED_SRC_DIR / embed_name}')
+        pkg.write(f'ppt/embeddings/{embed_name}', (EMBED_SRC_DIR / embed_name).read_bytes())
 
     # 6) 更新 slide1 文本：仅更新 Ranking，并清空主趋势静态百分比文本（改用图表数据标签）
-    slide1 = slides_dir / 'slide1.xml'
-    if not slide1.exists():
-        raise FileNotFoundError(f'[p18] 模板缺少 slide1.xml: {slide1}')
+    if not pkg.exists(SLIDE1_PART):
+        raise FileNotFoundError(f'[p18] 模板缺少 slide1.xml: {SLIDE1_PART}')
     ranks = _read_ranking_values()
-    _update_ranking_in_slide(slide1, ranks)
-    main_vals = _read_main_values()
-    _update_main_percent_texts(slide1, main_vals)
+    _read_main_values()  # 仅校验 MainTrend 完整（静态百分比已改由图表数据标签显示）
+    apply_text_bindings(pkg, SLIDE1_PART, _slide1_text_bindings(ranks), log=print)
 
     # 7) 修正 Content_Types 为 xlsx 嵌入
-    embed_files = [f.name for f in embeddings_dir.glob('Microsoft_Office_Excel_Binary_Worksheet*.xlsx')]
+    embed_files = [posixpath.basename(n) for n in pkg.glob('ppt/embeddings/Microsoft_Office_Excel_Binary_Worksheet*.xlsx')]
     if len(embed_files) != 4:
         raise RuntimeError(f'[p18] 嵌入 xlsx 数量异常：{len(embed_files)}，期望 4')
-    _update_content_types_for_xlsx(ct_path, embed_files)
+    _update_content_types_for_xlsx(pkg, embed_files)
 
     # 8) 打包为最终 PPTX到页面级 output 目录
-    output_dir = PAGE_DIR / 'output'
-    output_dir.mkdir(parents=True, exist_ok=True)
-    out_path = output_dir / 'p18-final.pptx'
-    _package_final(out_path)
+    out_path = PAGE_DIR / 'output' / 'p18-final.pptx'
+    _package_final(pkg, out_path)
     print('[p18] 填充完成：chartXML 与 rels 已更新，autoUpdate=1；文本与内容类型已修正；已打包。')
 
 
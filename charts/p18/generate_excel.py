@@ -3,8 +3,9 @@
 generate_excel.py
 
 职责：
-- 解压模板PPT到tmp目录，读取模板中的Excel数据作为基础；
-- 从 `input/neticle-v4-08.sqlite` 的宽表 `mentions_wide` 聚合生成法国市场的月度情感百分比；
+- 读取模板基线数据（按模板哈希缓存于 template_baselines，不解压模板）作为基础；
+- 从 `input/neticle-v4-08.sqlite` 的宽表 `mentions_wide` 聚合生成法国市场的月度情感百分比
+  （读取共享提及立方体 tools/neticle_cube.py，每个国家 × 月份只扫描一次宽表；月份按 UTC 划分）；
 - 计算 Net Lovers%（Lovers%-Haters%）以及 Lenovo 的排名；
 - 用最新数据替换模板数据中对应的部分；
 - 写出一份可检验的汇总 Excel：`p18_data.xlsx`；
@@ -21,11 +22,9 @@ generate_excel.py
 
 from pathlib import Path
 import sqlite3
+import sys
 from datetime import datetime
-import yaml
-import zipfile
-import shutil
-import tempfile
+from functools import lru_cache
 
 # 仅依赖 openpyxl 写 xlsx；若无法导入，给出降级提示并退出
 try:
@@ -34,6 +33,14 @@ except Exception as e:
     raise RuntimeError("需要 openpyxl 才能生成 xlsx，请安装后重试") from e
 
 PAGE_DIR = Path(__file__).resolve().parent
+# 共享提及立方体位于仓库根 tools/ 目录
+sys.path.insert(0, str(PAGE_DIR.parents[1] / 'tools'))
+from neticle_cube import MentionCube
+from neticle_index import connect_for
+from period_filter import discover_months as _discover_months_ms, month_span
+from page_config import load_page_config
+from template_manifest import TemplateManifest
+from template_baseline import load_baseline
 # 使用页面级tmp目录，统一使用tmp/ppt结构
 TMP_DIR = PAGE_DIR / 'tmp'
 TMP_DIR.mkdir(parents=True, exist_ok=True)
@@ -45,8 +52,7 @@ TEMPLATE_EMBED_DIR.mkdir(parents=True, exist_ok=True)
 CFG_PATH = PAGE_DIR / 'config.yaml'
 if not CFG_PATH.exists():
     raise FileNotFoundError('缺少页面配置文件 charts/p18/config.yaml')
-with CFG_PATH.open('r', encoding='utf-8') as f:
-    CFG = yaml.safe_load(f) or {}
+CFG = load_page_config(CFG_PATH)
 
 def _resolve_path(p: str) -> Path:
     q = Path(p)
@@ -92,16 +98,6 @@ def _get_available_date_columns(conn: sqlite3.Connection):
     return candidates
 
 
-def _month_match_clause_sql(date_cols: list[str]) -> str:
-    """生成按月份匹配的 SQL 片段，支持文本/epoch 两种存储。"""
-    parts = []
-    for c in date_cols:
-        parts.append(f"strftime('%Y-%m', {c}) = :ym")
-        parts.append(f"strftime('%Y-%m', datetime({c}, 'unixepoch')) = :ym")
-        parts.append(f"substr(COALESCE({c},''),1,7) = :ym")
-    return ' OR '.join(parts) if parts else "1=0"  # 无日期列则不匹配
-
-
 def _get_available_brand_columns(conn: sqlite3.Connection):
     """检测用于品牌匹配的列，仅允许 `keyword_label`。若不存在则返回空列表。"""
     cur = conn.execute(f"PRAGMA table_info({TABLE_NAME})")
@@ -109,28 +105,6 @@ def _get_available_brand_columns(conn: sqlite3.Connection):
     return ['keyword_label'] if 'keyword_label' in cols else []
 
 
-def _brand_where_and_params(brand_columns: list[str], brand: str):
-    """仅使用 `keyword_label` 的 LIKE 模式进行品牌匹配。
-    - 若缺少 `keyword_label` 列，调用方应在更高层抛错。
-    - Lenovo（配置中的 `filters.brand_key`）使用 `filters.keyword_like` 模式；
-      其他品牌使用 `'%{brand.lower()}%'`。
-    """
-    if 'keyword_label' not in brand_columns:
-        return '1=0', {}
-    brand_key_cfg = str(CFG.get('filters', {}).get('brand_key', '')).lower()
-    keyword_like_cfg = CFG.get('filters', {}).get('keyword_like', '%lenovo%')
-    pat = keyword_like_cfg if brand.lower() == brand_key_cfg else f"%{brand.lower()}%"
-    return "LOWER(keyword_label) LIKE LOWER(:brand_pat)", {'brand_pat': pat}
-
-
-def _brand_match_clause_sql(brand_columns: list[str]) -> str:
-    """仅返回 `LOWER(keyword_label) LIKE LOWER(:keyword_like)`。
-    若缺少 `keyword_label`，调用方应抛错。"""
-    if 'keyword_label' not in brand_columns:
-        return '1=0'
-    return '(LOWER(keyword_label) LIKE LOWER(:keyword_like))'
-
-
 def _get_country_column(conn: sqlite3.Connection):
     """返回国家列名，仅允许使用配置中的 `country_column`（默认 `countryId`）。
     若列不存在则抛出异常，避免兜底。"""
@@ -141,80 +115,58 @@ def _get_country_column(conn: sqlite3.Connection):
     raise RuntimeError(f"mentions_wide 缺少国家列: {CFG_COUNTRY_COL}")
 
 
-def _query_monthly_sentiment(conn: sqlite3.Connection, brand: str, ym: str):
-    """在 mentions_wide 中聚合某品牌某月的情感计数。
-    识别规则：文本包含品牌关键字；国家=指定country_id。
+@lru_cache(maxsize=None)
+def _get_cube() -> MentionCube:
+    """共享提及立方体（仅支持 createdAtUtcMs / countryId / polarity 口径，其余配置严格报错）。"""
+    if CFG_DATE_COL and CFG_DATE_COL != 'createdAtUtcMs':
+        raise RuntimeError(f'共享立方体仅支持 createdAtUtcMs 时间列，当前配置: {CFG_DATE_COL}')
+    if CFG_COUNTRY_COL and CFG_COUNTRY_COL != 'countryId':
+        raise RuntimeError(f'共享立方体仅支持 countryId 国家列，当前配置: {CFG_COUNTRY_COL}')
+    if CFG_SENTIMENT_COL != 'polarity':
+        raise RuntimeError(f'共享立方体仅支持 polarity 情感列，当前配置: {CFG_SENTIMENT_COL}')
+    return MentionCube(NETICLE_DB, table=TABLE_NAME)
+
+
+@lru_cache(maxsize=None)
+def _month_cells(ym: str) -> tuple:
+    """某月（UTC）的立方体单元格：(key_mask, polarity_rep, mentions)。"""
+    rows = _get_cube().rows(COUNTRY_ID, *month_span(ym), cuts=[POS_MIN, NEG_MAX])
+    return tuple((int(r['key_mask']), r['polarity_rep'], int(r['mentions'])) for r in rows)
+
+
+def _brand_bit(brand: str) -> int:
+    """品牌在 key_mask 中的位（tools/brand_dim.py 注册表；不含别名，与 _available_months 的 LIKE 一致）。
+    Lenovo（配置中的 `filters.brand_key`）由 `filters.keyword_like` 模式映射；其他品牌按品牌键查找。"""
+    reg = _get_cube().brands
+    brand_key_cfg = str(CFG.get('filters', {}).get('brand_key', '')).lower()
+    if brand.lower() == brand_key_cfg:
+        return 1 << (reg.brand_id_for_pattern(KEYWORD_LIKE) - 1)
+    return reg.bit(brand)
+
+
+def _query_monthly_sentiment(cube: MentionCube, brand: str, ym: str):
+    """在共享立方体中聚合某品牌某月的情感计数。
+    识别规则：keyword_label 预先解析为整数 key_mask（品牌键子串，不含别名），按品牌位过滤；国家=指定country_id。
     返回 (pos, neu, neg, total) 或 None。
     """
-    date_cols = _get_available_date_columns(conn)
-    if not date_cols:
-        print(f"警告：未找到可用的日期列")
-        return None
-    
-    brand_cols = _get_available_brand_columns(conn)
-    if not brand_cols:
-        raise RuntimeError('mentions_wide 缺少 keyword_label 列，无法进行品牌匹配')
-    
-    country_col = _get_country_column(conn)
-    # 如缺少国家列，_get_country_column 已抛异常
-    
-    # 构建时间过滤条件 - 支持时间戳格式
-    date_col = date_cols[0]  # 使用第一个可用的日期列
-    if 'UtcMs' in date_col:
-        # 时间戳格式（毫秒）
-        year, month = ym.split('-')
-        start_ts = int(datetime(int(year), int(month), 1).timestamp() * 1000)
-        if int(month) == 12:
-            end_ts = int(datetime(int(year) + 1, 1, 1).timestamp() * 1000)
+    bit = _brand_bit(brand)
+    pos = neu = neg = total = 0
+    for mask, polarity, n in _month_cells(ym):
+        if not mask & bit:
+            continue
+        total += n
+        # polarity 为情感桶代表值；NULL 仅计入总数（与 SQL CASE 口径一致）
+        if polarity is None:
+            continue
+        if polarity > POS_MIN:
+            pos += n
+        elif polarity < NEG_MAX:
+            neg += n
         else:
-            end_ts = int(datetime(int(year), int(month) + 1, 1).timestamp() * 1000)
-        month_clause = f"{date_col} >= {start_ts} AND {date_col} < {end_ts}"
-    else:
-        # 字符串格式
-        month_clause = _month_match_clause_sql(date_cols)
-    
-    brand_clause, brand_params = _brand_where_and_params(brand_cols, brand)
-    
-    # 构建WHERE条件
-    where_conditions = []
-    if country_col:
-        where_conditions.append(f"{country_col} = :country")
-    where_conditions.append(f"( {month_clause} )")
-    where_conditions.append(f"( {brand_clause} )")
-    
-    where_clause = " AND ".join(where_conditions)
-    
-    # 使用sentiment列进行情感分类
-    sentiment_col = CFG_SENTIMENT_COL
-    
-    sql = f'''
-    SELECT
-      SUM(CASE WHEN {sentiment_col} > :pos_min THEN 1 ELSE 0 END) AS pos,
-      SUM(CASE WHEN {sentiment_col} BETWEEN :neg_max AND :pos_min THEN 1 ELSE 0 END) AS neu,
-      SUM(CASE WHEN {sentiment_col} < :neg_max THEN 1 ELSE 0 END) AS neg,
-      COUNT(*) AS total
-    FROM {TABLE_NAME}
-    WHERE {where_clause}
-    '''
-    
-    # 构建参数字典 - 使用配置中的keyword_like而不是传入的brand参数
-    params = {
-        'pos_min': POS_MIN,
-        'neg_max': NEG_MAX,
-        'country': COUNTRY_ID,
-    }
-    # 合并品牌匹配参数（keyword_label 或 LIKE 模式）
-    params.update(brand_params)
-    
-    # 只有在使用字符串格式时才添加ym参数
-    if 'UtcMs' not in date_col:
-        params['ym'] = ym
-    
-    cur = conn.execute(sql, params)
-    row = cur.fetchone()
-    if not row or row[3] is None or row[3] == 0:
+            neu += n
+    if total == 0:
         return None
-    return int(row[0] or 0), int(row[1] or 0), int(row[2] or 0), int(row[3] or 0)
+    return pos, neu, neg, total
 
 
 def _pct(a: int, b: int) -> int:
@@ -224,14 +176,14 @@ def _pct(a: int, b: int) -> int:
     return round(100.0 * a / b)
 
 
-def compute_for_brand(conn: sqlite3.Connection, brand: str, months: list[str]):
+def compute_for_brand(cube: MentionCube, brand: str, months: list[str]):
     """返回指定品牌的月度百分比：lovers/neutral/haters 以及 net_lovers。"""
     lovers = {}
     neutral = {}
     haters = {}
     net_lovers = {}
     for ym in months:
-        q = _query_monthly_sentiment(conn, brand, ym)
+        q = _query_monthly_sentiment(cube, brand, ym)
         if q is None:
             continue
         pos, neu, neg, total = q
@@ -242,34 +194,26 @@ def compute_for_brand(conn: sqlite3.Connection, brand: str, months: list[str]):
     return lovers, neutral, haters, net_lovers
 
 
-def discover_months(conn: sqlite3.Connection, brand: str, need_main: int, need_split: int):
-    """从数据库发现有数据的月份，返回升序列表。若不足则报错。"""
-    # 动态联合查询，基于存在的日期列生成月份
+def _available_months(conn: sqlite3.Connection) -> list[str]:
+    """发现 Lenovo（keyword_like）在目标国家有数据的月份（UTC，升序）。
+    使用 tools/period_filter.py：MIN/MAX 定界 + 逐月区间 EXISTS 探测，不对每行求值 strftime。"""
     date_cols = _get_available_date_columns(conn)
     brand_cols = _get_available_brand_columns(conn)
     if not date_cols:
         raise ValueError('无法识别日期列，mentions_wide 不包含已知日期字段')
     if 'keyword_label' not in brand_cols:
         raise ValueError('mentions_wide 缺少 keyword_label 列，无法进行品牌匹配')
+    date_col = date_cols[0]
+    if 'ms' not in date_col.lower():
+        raise ValueError(f'月份发现仅支持毫秒时间戳列（如 createdAtUtcMs），当前: {date_col}')
     country_col = _get_country_column(conn)
-    country_filter = f"{country_col} = :country AND "
-    selects = []
-    brand_where = "LOWER(keyword_label) LIKE LOWER(:keyword_like)"
-    base_where = f"{country_filter}( {brand_where} )"
-    for c in date_cols:
-        # 处理毫秒时间戳（createdAtUtcMs）
-        if 'ms' in c.lower() or c == 'createdAtUtcMs':
-            selects.append(f"SELECT strftime('%Y-%m', datetime({c}/1000, 'unixepoch')) AS ym FROM {TABLE_NAME} WHERE {base_where}")
-        else:
-            # 处理其他日期格式
-            selects.append(f"SELECT strftime('%Y-%m', {c}) AS ym FROM {TABLE_NAME} WHERE {base_where}")
-            selects.append(f"SELECT strftime('%Y-%m', datetime({c}, 'unixepoch')) AS ym FROM {TABLE_NAME} WHERE {base_where}")
-            selects.append(f"SELECT substr(COALESCE({c},''),1,7) AS ym FROM {TABLE_NAME} WHERE {base_where}")
-    union_sql = ' UNION '.join(selects)
-    sql = f"SELECT DISTINCT ym FROM ( {union_sql} ) WHERE ym IS NOT NULL ORDER BY ym ASC;"
-    # 使用keyword_like参数而不是brand参数
-    cur = conn.execute(sql, {'country': COUNTRY_ID, 'keyword_like': KEYWORD_LIKE})
-    months = [r[0] for r in cur.fetchall() if r and r[0]]
+    where = f"{country_col} = ? AND LOWER(keyword_label) LIKE LOWER(?)"
+    return _discover_months_ms(conn, TABLE_NAME, where, [COUNTRY_ID, KEYWORD_LIKE], column=date_col)
+
+
+def discover_months(conn: sqlite3.Connection, brand: str, need_main: int, need_split: int):
+    """从数据库发现有数据的月份，返回升序列表。若不足则报错。"""
+    months = _available_months(conn)
     if len(months) < need_main:
         raise ValueError(f'可用月份不足 {need_main} 个，仅发现: {months}')
     main = months[-need_main:]
@@ -277,121 +221,88 @@ def discover_months(conn: sqlite3.Connection, brand: str, need_main: int, need_s
     return main, split
 
 
-def extract_template_data():
-    """解压模板PPT，读取其中的Excel或chart XML数据作为基础数据。
-    实现策略：
-    1) 首选读取嵌入的 xlsx（tmp/ppt/ppt/embeddings）。
-    2) 若无法读取或为空，回退解析 chartXML 的 numCache（tmp/ppt/ppt/charts/chart1..4.xml）。
-    3) 若两种方式均失败，抛出异常（不使用默认兜底以避免掩盖问题）。
-    """
-    template_pptx = PAGE_DIR / 'p18.pptx'
-    if not template_pptx.exists():
-        raise FileNotFoundError(f'[p18] 模板文件不存在：{template_pptx}')
-
-    # 创建临时目录解压PPT - 统一使用tmp/ppt目录
-    extract_dir = TMP_DIR / 'ppt'
-    if extract_dir.exists():
-        shutil.rmtree(extract_dir)
-    extract_dir.mkdir(parents=True, exist_ok=True)
-
-    # 内部辅助：解析 chart XML 的数值
-    def _parse_chart_values(xml_path: Path) -> list[int]:
-        import xml.etree.ElementTree as ET
-        ns = {'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart'}
+TEMPLATE_PPTX = PAGE_DIR / 'p18.pptx'
+# 模板基线抽取器版本：修改 _extract_template_baseline 的输出时递增，旧缓存自动失效
+BASELINE_VERSION = 1
+BASELINE_CHARTS = {
+    'main': 'ppt/charts/chart1.xml',
+    'lovers': 'ppt/charts/chart2.xml',
+    'neutral': 'ppt/charts/chart3.xml',
+    'haters': 'ppt/charts/chart4.xml',
+}
+
+
+def _to_ints(raw) -> list[int]:
+    """数值文本/单元格转整数（四舍五入），忽略空值与非数值。"""
+    values: list[int] = []
+    for v in raw or []:
+        if v is None:
+            continue
         try:
-            tree = ET.parse(str(xml_path))
-            root = tree.getroot()
-            # 查找第一个系列的数值缓存
-            # 路径：c:chart/c:plotArea//c:ser//c:val//c:numCache//c:pt/c:v
-            ser = root.find('.//c:chart/c:plotArea//c:ser', ns)
-            if ser is None:
-                # 有些模板结构不同，尝试直接在 plotArea 下找
-                pass
-            vals = []
-            for v in root.findall('.//c:chart/c:plotArea//c:ser//c:val//c:numCache//c:pt/c:v', ns):
-                try:
-                    # 将数值转为 int，保留四舍五入
-                    vals.append(int(round(float(v.text))))
-                except Exception:
-                    continue
-            return vals
-        except Exception as e:
-            print(f'[p18] 解析 chartXML 失败 {xml_path.name}: {e}')
-            return []
+            values.append(int(round(float(v))))
+        except Exception:
+            continue
+    return values
+
+
+def _extract_template_baseline(source) -> dict:
+    """模板基线抽取（结果由 tools/template_baseline.py 按模板哈希缓存，模板不变时不再执行）：
+    1) 图表的嵌入工作簿为 xlsx 时，读取其活动表第一行；
+    2) 否则（或读取为空）取模板清单中全部系列 val 的数值缓存；
+    3) Ranking 取 slide1.xml 中形如 #3 的文本。
+    """
+    import io
+    import xml.etree.ElementTree as ET
+    manifest = source.manifest
+    data: dict = {}
+    for key, part in BASELINE_CHARTS.items():
+        values: list[int] = []
+        embed = manifest.chart(part)['embed'] if manifest.has(part) else None
+        if embed and embed['target'].endswith('.xlsx') and source.exists(embed['target']):
+            try:
+                ws = load_workbook(io.BytesIO(source.read(embed['target'])), data_only=True).active
+                values = _to_ints(c.value for c in next(ws.iter_rows(min_row=1, max_row=1)))
+            except Exception as e:
+                print(f"[p18] 读取嵌入xlsx失败 {embed['target']}: {e}，将使用图表数值缓存")
+        if not values and manifest.has(part):
+            values = _to_ints(manifest.values(part, 'val', series=None))
+        data[key] = values
 
+    ns_a = {'a': 'http://schemas.openxmlformats.org/drawingml/2006/main'}
+    ranks: list[int] = []
     try:
-        # 解压PPT文件
-        with zipfile.ZipFile(template_pptx, 'r') as zip_ref:
-            zip_ref.extractall(extract_dir)
-
-        # 路径准备
-        embeddings_dir = extract_dir / 'ppt' / 'ppt' / 'embeddings'
-        charts_dir = extract_dir / 'ppt' / 'ppt' / 'charts'
-        if not embeddings_dir.exists():
-            # 尝试备用路径
-            embeddings_dir = extract_dir / 'ppt' / 'embeddings'
-        if not charts_dir.exists():
-            charts_dir = extract_dir / 'ppt' / 'charts'
-
-        template_data: dict[str, list[int]] = {}
-
-        # 先尝试读取嵌入xlsx
-        excel_files = {
-            'main': 'Microsoft_Office_Excel_Binary_Worksheet1.xlsx',
-            'lovers': 'Microsoft_Office_Excel_Binary_Worksheet2.xlsx',
-            'neutral': 'Microsoft_Office_Excel_Binary_Worksheet3.xlsx',
-            'haters': 'Microsoft_Office_Excel_Binary_Worksheet4.xlsx',
-        }
-
-        for key, filename in excel_files.items():
-            values: list[int] = []
-            excel_path = embeddings_dir / filename if embeddings_dir.exists() else None
-            if excel_path and excel_path.exists():
-                try:
-                    wb = load_workbook(str(excel_path), data_only=True)
-                    ws = wb.active
-                    # 读取第一行数据（A1:... 一个行向量）
-                    row = list(ws.iter_rows(min_row=1, max_row=1))[0]
-                    for cell in row:
-                        if cell.value is None:
-                            continue
-                        try:
-                            values.append(int(round(float(cell.value))))
-                        except Exception:
-                            # 忽略非数值单元格
-                            pass
-                except Exception as e:
-                    print(f'[p18] 读取嵌入xlsx失败 {filename}: {e}，将尝试解析chartXML')
-            else:
-                print(f'[p18] 未找到嵌入xlsx {filename}，将尝试解析chartXML')
-
-            # 若嵌入读取失败或为空，回退解析 chartXML
-            if not values:
-                chart_map = {
-                    'main': 'chart1.xml',
-                    'lovers': 'chart2.xml',
-                    'neutral': 'chart3.xml',
-                    'haters': 'chart4.xml',
-                }
-                chart_file = charts_dir / chart_map[key]
-                if chart_file.exists():
-                    values = _parse_chart_values(chart_file)
-                else:
-                    print(f'[p18] 未找到 chartXML {chart_map[key]}')
+        root = ET.fromstring(source.read('ppt/slides/slide1.xml'))
+        for t in root.findall('.//a:t', ns_a):
+            txt = (t.text or '').strip()
+            if txt.startswith('#') and txt[1:].isdigit():
+                ranks.append(int(txt[1:]))
+    except Exception as e:
+        print(f"[p18] 读取模板 Ranking 失败: {e}")
+    data['ranking'] = ranks
+    return data
 
-            template_data[key] = values
-            print(f'[p18] 模板 {key} 数据: {values}')
 
-        # 严格校验：若任一数据为空，则抛错，避免默认兜底掩盖问题
-        missing = [k for k, v in template_data.items() if not v]
-        if missing:
-            raise RuntimeError(f'[p18] 模板数据提取失败，缺少: {missing}，请检查模板嵌入或chartXML')
+def _template_baseline() -> dict:
+    if not TEMPLATE_PPTX.exists():
+        raise FileNotFoundError(f'[p18] 模板文件不存在：{TEMPLATE_PPTX}')
+    return load_baseline(TEMPLATE_PPTX, 'p18', _extract_template_baseline, version=BASELINE_VERSION, log=print)
 
-        return template_data
 
-    except Exception as e:
-        # 显式抛错，避免使用默认值掩盖问题
-        raise
+def extract_template_data():
+    """读取模板基线数据（main/lovers/neutral/haters）。
+    基线按模板哈希缓存（tools/template_baseline.py），不再清空并解压 tmp/ppt；
+    若任一数据为空，抛出异常（不使用默认兜底以避免掩盖问题）。
+    """
+    baseline = _template_baseline()
+    template_data: dict[str, list[int]] = {key: list(baseline[key]) for key in BASELINE_CHARTS}
+    for key, values in template_data.items():
+        print(f'[p18] 模板 {key} 数据: {values}')
+
+    # 严格校验：若任一数据为空，则抛错，避免默认兜底掩盖问题
+    missing = [k for k, v in template_data.items() if not v]
+    if missing:
+        raise RuntimeError(f'[p18] 模板数据提取失败，缺少: {missing}，请检查模板嵌入或chartXML')
+    return template_data
 
 
 from typing import Optional
@@ -426,56 +337,29 @@ def _normalize_month_label_to_ym(label: str) -> Optional[str]:
 def read_template_months(chart_idx: int) -> list[str]:
     """读取指定图表的类别标签并转为 YYYY-MM 列表。
     chart_idx: 1=主趋势, 2=Lovers, 3=Neutral, 4=Haters
-    依赖：extract_template_data 已经将模板解压到 tmp/ppt。
+    类别取自模板清单（tools/template_manifest.py，按模板哈希缓存），模板不变时不再解析图表。
     """
-    charts_dir = TMP_DIR / 'ppt' / 'ppt' / 'charts'
-    if not charts_dir.exists():
-        charts_dir = TMP_DIR / 'ppt' / 'charts'
-    chart1 = charts_dir / f'chart{chart_idx}.xml'
-    import xml.etree.ElementTree as ET
-    ns = {'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart'}
     labels: list[str] = []
     try:
-        tree = ET.parse(str(chart1))
-        root = tree.getroot()
+        manifest = TemplateManifest.load(PAGE_DIR / 'p18.pptx')
+        cats = [ser['roles'].get('cat') for ser in manifest.series(f'ppt/charts/chart{chart_idx}.xml')]
         # 优先读取字符串缓存 strCache
-        for v in root.findall('.//c:chart/c:plotArea//c:ser//c:cat//c:strRef//c:strCache//c:pt/c:v', ns):
-            ym = _normalize_month_label_to_ym(v.text)
-            if ym:
-                labels.append(ym)
-        # 若没读到，尝试 numCache（轴为数字型日期）
+        for cat in cats:
+            if cat and cat['ref'] == 'strRef':
+                labels += [ym for ym in map(_normalize_month_label_to_ym, cat['values'] or []) if ym]
+        # 若没读到，尝试 numCache（轴为数字型日期；Excel 序列日仍需通过 config.axis_day_base 还原，这里不处理）
         if not labels:
-            for v in root.findall('.//c:chart/c:plotArea//c:ser//c:cat//c:numRef//c:numCache//c:pt/c:v', ns):
-                try:
-                    # 数字日期转为 Excel 序列日，仍需通过 config.axis_day_base 还原，这里不处理
-                    labels.append(str(v.text))
-                except Exception:
-                    pass
+            for cat in cats:
+                if cat and cat['ref'] == 'numRef':
+                    labels += [str(v) for v in cat['values'] or []]
     except Exception as e:
         print(f'[p18] 读取模板类别失败 chart{chart_idx}: {e}')
     return labels
 
 
 def read_template_ranking_values() -> list[int]:
-    """从模板 slide1.xml 中读取 Ranking 文本（形如 #3），返回整数列表。
-    依赖：extract_template_data 已经将模板解压到 tmp/ppt。
-    """
-    slides_dir = TMP_DIR / 'ppt' / 'ppt' / 'slides'
-    if not slides_dir.exists():
-        slides_dir = TMP_DIR / 'ppt' / 'slides'
-    slide1 = slides_dir / 'slide1.xml'
-    import xml.etree.ElementTree as ET
-    ns_a = {'a': 'http://schemas.openxmlformats.org/drawingml/2006/main'}
-    values: list[int] = []
-    try:
-        root = ET.parse(str(slide1)).getroot()
-        for t in root.findall('.//a:t', ns_a):
-            txt = (t.text or '').strip()
-            if txt.startswith('#') and txt[1:].isdigit():
-                values.append(int(txt[1:]))
-    except Exception as e:
-        print(f"[p18] 读取模板 Ranking 失败: {e}")
-    return values
+    """模板 slide1.xml 中的 Ranking 文本（形如 #3）对应的整数列表，取自模板基线缓存。"""
+    return list(_template_baseline()['ranking'])
 
 
 def create_default_template_data():
@@ -520,8 +404,8 @@ def load_fallback_data():
 def main():
     print('[p18] 开始生成 Excel 数据文件')
     
-    # 1) 解压模板，读取模板数据作为基础
-    print('[p18] 解压模板PPT，读取基础数据...')
+    # 1) 读取模板基线数据（按模板哈希缓存，不解压）
+    print('[p18] 读取模板基线数据...')
     template_data = extract_template_data()
     
     # 2) 取消示例后备，严格以模板为基线、数据库为覆盖来源。
@@ -573,26 +457,11 @@ def main():
     if NETICLE_DB.exists():
         try:
             print('[p18] 连接数据库，计算最新数据...')
-            with sqlite3.connect(str(NETICLE_DB)) as conn:
-                if AUTO_MONTHS:
+            if AUTO_MONTHS:
+                with connect_for(NETICLE_DB, TABLE_NAME, [CFG_COUNTRY_COL or 'countryId', 'keyword_label', CFG_DATE_COL or 'createdAtUtcMs']) as conn:
                     try:
-                        # 先查询所有可用月份
-                        date_cols = _get_available_date_columns(conn)
-                        brand_cols = _get_available_brand_columns(conn)
-                        country_col = _get_country_column(conn)
-                        country_filter = f"{country_col} = :country AND " if country_col else ""
-                        brand_where = _brand_match_clause_sql(brand_cols)
-                        base_where = f"{country_filter}( {brand_where} )"
-                        
-                        selects = []
-                        for c in date_cols:
-                            if 'ms' in c.lower() or c == 'createdAtUtcMs':
-                                selects.append(f"SELECT strftime('%Y-%m', datetime({c}/1000, 'unixepoch')) AS ym FROM {TABLE_NAME} WHERE {base_where}")
-                        
-                        union_sql = ' UNION '.join(selects)
-                        sql = f"SELECT DISTINCT ym FROM ( {union_sql} ) WHERE ym IS NOT NULL ORDER BY ym ASC;"
-                        cur = conn.execute(sql, {'country': COUNTRY_ID, 'keyword_like': KEYWORD_LIKE})
-                        available_months = [r[0] for r in cur.fetchall() if r and r[0]]
+                        # 先查询所有可用月份（区间探测，可走覆盖索引）
+                        available_months = _available_months(conn)
                         
                         if len(available_months) >= 2:
                             # 使用实际可用的月份
@@ -605,41 +474,42 @@ def main():
                         # 自动发现失败直接抛出，避免静默兜底
                         raise
                 
-                # 计算品牌的数据
-                lv_l, lv_n, lv_h, lv_net = compute_for_brand(conn, BRAND_KEY, months_main)
-                
-                # 更新主趋势数据
-                for i, ym in enumerate(months_main):
-                    if i < len(main_values):
-                        v = lv_net.get(ym)
-                        if v is not None:
-                            main_values[i] = v
-                            main_sources[i] = 'computed'
-                            print(f'[p18] 更新 Net Lovers% 数据：{ym} = {v}%')
-                        # 无数据库数据则保持模板值（来源为 template），不做示例兜底。
-                
-                # 更新三小图数据
-                for i, ym in enumerate(months_split):
-                    if i < len(lovers_values):
-                        lv = lv_l.get(ym)
-                        ne = lv_n.get(ym)
-                        ha = lv_h.get(ym)
-                        
-                        if lv is not None:
-                            lovers_values[i] = lv
-                            lovers_sources[i] = 'computed'
-                            print(f'[p18] 更新 Lovers% 数据：{ym} = {lv}%')
-                        
-                        if ne is not None:
-                            neutral_values[i] = ne
-                            neutral_sources[i] = 'computed'
-                            print(f'[p18] 更新 Neutral% 数据：{ym} = {ne}%')
-                        
-                        if ha is not None:
-                            haters_values[i] = ha
-                            haters_sources[i] = 'computed'
-                            print(f'[p18] 更新 Haters% 数据：{ym} = {ha}%')
-                
+            # 计算品牌的数据（共享立方体）
+            cube = _get_cube()
+            lv_l, lv_n, lv_h, lv_net = compute_for_brand(cube, BRAND_KEY, months_main)
+            
+            # 更新主趋势数据
+            for i, ym in enumerate(months_main):
+                if i < len(main_values):
+                    v = lv_net.get(ym)
+                    if v is not None:
+                        main_values[i] = v
+                        main_sources[i] = 'computed'
+                        print(f'[p18] 更新 Net Lovers% 数据：{ym} = {v}%')
+                    # 无数据库数据则保持模板值（来源为 template），不做示例兜底。
+            
+            # 更新三小图数据
+            for i, ym in enumerate(months_split):
+                if i < len(lovers_values):
+                    lv = lv_l.get(ym)
+                    ne = lv_n.get(ym)
+                    ha = lv_h.get(ym)
+                    
+                    if lv is not None:
+                        lovers_values[i] = lv
+                        lovers_sources[i] = 'computed'
+                        print(f'[p18] 更新 Lovers% 数据：{ym} = {lv}%')
+                    
+                    if ne is not None:
+                        neutral_values[i] = ne
+                        neutral_sources[i] = 'computed'
+                        print(f'[p18] 更新 Neutral% 数据：{ym} = {ne}%')
+                    
+                    if ha is not None:
+                        haters_values[i] = ha
+                        haters_sources[i] = 'computed'
+                        print(f'[p18] 更新 Haters% 数据：{ym} = {ha}%')
+            
         except Exception as e:
             # 严格模式：数据库连接或查询失败直接抛出
             raise
@@ -661,30 +531,30 @@ def main():
 
     computed_ranking_count = 0
     if NETICLE_DB.exists():
-        with sqlite3.connect(str(NETICLE_DB)) as conn:
-            for i, ym in enumerate(months_main):
-                scores = []
-                for b in BRANDS_FOR_RANK:
-                    _, _, _, net = compute_for_brand(conn, b, [ym])
-                    s = net.get(ym)
-                    if s is not None:
-                        scores.append((b, s))
-                if not scores:
-                    # 保持模板值，记录来源
-                    print(f"[p18] {ym} 排名使用模板值: #{ranking_values[i]}")
-                    continue
-                scores.sort(key=lambda x: x[1], reverse=True)
-                pos = None
-                for j, (b, _) in enumerate(scores, start=1):
-                    if b.lower() == BRAND_KEY.lower():
-                        pos = j
-                        break
-                if pos is not None:
-                    ranking_values[i] = pos
-                    ranking_sources[i] = 'computed'
-                    computed_ranking_count += 1
-                else:
-                    print(f"[p18] {ym} 排名未找到 {BRAND_KEY}，沿用模板值: #{ranking_values[i]}")
+        cube = _get_cube()
+        for i, ym in enumerate(months_main):
+            scores = []
+            for b in BRANDS_FOR_RANK:
+                _, _, _, net = compute_for_brand(cube, b, [ym])
+                s = net.get(ym)
+                if s is not None:
+                    scores.append((b, s))
+            if not scores:
+                # 保持模板值，记录来源
+                print(f"[p18] {ym} 排名使用模板值: #{ranking_values[i]}")
+                continue
+            scores.sort(key=lambda x: x[1], reverse=True)
+            pos = None
+            for j, (b, _) in enumerate(scores, start=1):
+                if b.lower() == BRAND_KEY.lower():
+                    pos = j
+                    break
+            if pos is not None:
+                ranking_values[i] = pos
+                ranking_sources[i] = 'computed'
+                computed_ranking_count += 1
+            else:
+                print(f"[p18] {ym} 排名未找到 {BRAND_KEY}，沿用模板值: #{ranking_values[i]}")
     else:
         print('[p18] 数据库不可用，Ranking 保持模板值')
     
@@ -732,33 +602,33 @@ def main():
     raw_data_rows = []
     
     if NETICLE_DB.exists():
-        with sqlite3.connect(str(NETICLE_DB)) as conn:
-            for ym in all_months:
-                try:
-                    result = _query_monthly_sentiment(conn, BRAND_KEY, ym)
-                    if result and len(result) == 4:
-                        pos_count, neu_count, neg_count, total_count = result
-                        
-                        pos_pct = _pct(pos_count, total_count)
-                        neu_pct = _pct(neu_count, total_count)
-                        neg_pct = _pct(neg_count, total_count)
-                        net_pct = pos_pct - neg_pct
-                        
-                        raw_data_rows.append([
-                            ym,
-                            pos_count,
-                            neu_count, 
-                            neg_count,
-                            total_count,
-                            f"{pos_count}/{total_count}*100 = {pos_pct}%",
-                            f"{neu_count}/{total_count}*100 = {neu_pct}%", 
-                            f"{neg_count}/{total_count}*100 = {neg_pct}%",
-                            f"{pos_pct} - {neg_pct} = {net_pct}%"
-                        ])
-                    else:
-                        raw_data_rows.append([ym, 0, 0, 0, 0, '无数据', '无数据', '无数据', '无数据'])
-                except Exception as e:
-                    raw_data_rows.append([ym, 'ERROR', 'ERROR', 'ERROR', 'ERROR', str(e), '', '', ''])
+        cube = _get_cube()
+        for ym in all_months:
+            try:
+                result = _query_monthly_sentiment(cube, BRAND_KEY, ym)
+                if result and len(result) == 4:
+                    pos_count, neu_count, neg_count, total_count = result
+                    
+                    pos_pct = _pct(pos_count, total_count)
+                    neu_pct = _pct(neu_count, total_count)
+                    neg_pct = _pct(neg_count, total_count)
+                    net_pct = pos_pct - neg_pct
+                    
+                    raw_data_rows.append([
+                        ym,
+                        pos_count,
+                        neu_count, 
+                        neg_count,
+                        total_count,
+                        f"{pos_count}/{total_count}*100 = {pos_pct}%",
+                        f"{neu_count}/{total_count}*100 = {neu_pct}%", 
+                        f"{neg_count}/{total_count}*100 = {neg_pct}%",
+                        f"{pos_pct} - {neg_pct} = {net_pct}%"
+                    ])
+                else:
+                    raw_data_rows.append([ym, 0, 0, 0, 0, '无数据', '无数据', '无数据', '无数据'])
+            except Exception as e:
+                raw_data_rows.append([ym, 'ERROR', 'ERROR', 'ERROR', 'ERROR', str(e), '', '', ''])
     
     ws_raw.append(['月份', '正向提及数', '中性提及数', '负向提及数', '总提及数', 'Lovers%计算', 'Neutral%计算', 'Haters%计算', 'NetLovers%计算'])
     for row in raw_data_rows:
@@ -5,11 +5,9 @@ P29页面Excel数据生成器
 根据数据库数据生成Excel文件，供人工检验和修改
 """
 
-import sqlite3
+import sys
 import pandas as pd
-import yaml
 from pathlib import Path
-from datetime import datetime, timedelta, timezone
 from collections import defaultdict
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
@@ -20,12 +18,15 @@ import math
 # 项目路径配置
 ROOT = Path(__file__).resolve().parent
 
+# 共享提及立方体位于仓库根 tools/ 目录
+sys.path.insert(0, str(ROOT.parents[1] / 'tools'))
+from neticle_cube import MentionCube
+from page_config import load_page_config
+
 def load_config():
     """加载页面级配置文件"""
     config_path = ROOT / 'config.yaml'
-    with open(config_path, 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
-    return config
+    return load_page_config(config_path)
 
 def get_database_paths(config):
     """获取数据库路径（相对于P29目录）"""
@@ -33,11 +34,6 @@ def get_database_paths(config):
     metrics_db = ROOT / config['data_sources']['metrics_db']
     return neticle_db, metrics_db
 
-def to_utc_ms(date_str):
-    """将日期字符串转换为UTC毫秒时间戳"""
-    dt = datetime.strptime(date_str, '%Y-%m-%d').replace(tzinfo=timezone.utc)
-    return int(dt.timestamp() * 1000)
-
 def extract_channel_data(config):
     """从neticle数据库提取渠道数据"""
     neticle_db, _ = get_database_paths(config)
@@ -56,36 +52,27 @@ def extract_channel_data(config):
         raise KeyError('配置缺少 channel_map，请在 charts/p29/config.yaml 中定义渠道映射')
     channel_mapping = config['channel_map']
     
-    # 时间范围转换
-    start_ms = to_utc_ms(start_date)
-    end_ms = to_utc_ms((datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d'))
-    
     # 创建渠道映射字典
     source_to_channel = {}
     for channel, sources in channel_mapping.items():
         for source in sources:
             source_to_channel[str(source).lower()] = channel
     
-    # 查询数据
-    with sqlite3.connect(neticle_db) as conn:
-        # 获取所有相关数据
-        sql = """
-        SELECT 
-            m.sourceName,
-            m.keyword_label,
-            COUNT(*) as mention_count,
-            SUM(m.sumInteractions) as total_interactions,
-            AVG(m.polarity) as avg_sentiment
-        FROM mentions_wide m
-        WHERE m.countryId = ?
-          AND m.createdAtUtcMs >= ? 
-          AND m.createdAtUtcMs < ?
-          AND m.keyword_label IS NOT NULL
-        GROUP BY m.sourceName, m.keyword_label
-        ORDER BY m.sourceName, m.keyword_label
-        """
-        
-        df = pd.read_sql_query(sql, conn, params=[country_id, start_ms, end_ms])
+    # 查询数据：共享立方体（UTC 日，[start_date, end_date] 含首尾）→ sourceName × key_mask
+    # keyword_label 已由品牌注册表（tools/brand_dim.py）预先解析为品牌键位图（不含别名，与品牌子串匹配一致）
+    cube = MentionCube(neticle_db)
+    cells = cube.frame(country_id, start_date, end_date)
+    cells = cells[cells['key_mask'] != 0]
+    grouped = cells.groupby(['sourceName', 'key_mask'], dropna=False, sort=True)
+    df = pd.DataFrame({
+        'mention_count': grouped['mentions'].sum(),
+        'total_interactions': grouped['sumInteractions'].sum(min_count=1),
+        'polarity_sum': grouped['polarity_sum'].sum(min_count=1),
+        'polarity_n': grouped['polarity_n'].sum(),
+    }).reset_index()
+    # AVG(polarity) 口径：仅统计非空 polarity
+    df['avg_sentiment'] = (df['polarity_sum'] / df['polarity_n'].where(df['polarity_n'] > 0)).astype(object)
+    df = df.astype(object).where(df.notna(), None)
     
     # 数据处理
     processed_data = []
@@ -94,11 +81,11 @@ def extract_channel_data(config):
         source_name = row['sourceName'].lower() if row['sourceName'] else ''
         channel = source_to_channel.get(source_name, 'Other')
         
-        # 提取并归一化品牌名称
-        keyword_label = row['keyword_label']
+        # 提取并归一化品牌名称：按本页 brands 顺序取首个命中的品牌位
+        key_mask = int(row['key_mask'])
         brand = None
         for b in brands:
-            if keyword_label and b.lower() in keyword_label.lower():
+            if key_mask & cube.brands.bit(b):
                 # 使用映射后的展示名，避免大小写不一致造成聚合漏算
                 brand = brand_norm_map.get(b.lower(), b.title())
                 break
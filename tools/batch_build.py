@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+批量构建：按 (国家, 品牌集, 月份) 矩阵扇出整套报告，每个单元格输出一份最终稿
+
+背景：
+- 管道按根/页面 config.yaml 固定一个 filters.countryId（39，法国）与一个统计区间；同一份报告要按多个国家、
+  多个月份出稿时只能逐次改写配置重跑，N 个国家就是 N 次完整构建：每次重新扫描 mentions_wide、
+  重新导入页面依赖并打开模板。
+
+做法：
+- 矩阵：countries × brand_sets × periods（矩阵文件或命令行），每个组合为一个单元格；
+- 共享扫描（主进程，扇出前）：在各单元格的配置覆盖下按页面配置汇总 {neticle_db: {countryId: 月份}}，
+  构建并校验覆盖索引（tools/neticle_index.py）、导出列式快照（tools/neticle_snapshot.py），再由 MentionCube.ensure_many 对每个月份以一条
+  `GROUP BY countryId` 查询物化全部国家的立方体切片（tools/neticle_cube.py）；单元格内页面读取立方体时不再扫描宽表；
+- 扇出：单元格在进程池（spawn，--jobs）中运行，每个单元格使用独立工作区 `<output_root>/batch/<单元格>/work`：
+  复制 charts/ 与根 config.yaml，input/ 以符号链接共享（只读输入与各 sidecar）；
+  在 config_overrides(period, country, country_name, brands)（tools/page_config.py）下进程内依次执行页面插件
+  （tools/page_plugin.py），页面产物收集到 `<单元格>/pages/`，再按 tools/build.py 的合成流程写出
+  `<单元格>/LRTBH-final.pptx`（任一页面失败时不合成）：各页单页 PPTX 的图表按幻灯片关系 Id 映射回原始模板
+  对应幻灯片的图表部件（collect_page_chart_parts），因此每个单元格的最终稿只含本单元格的数据；成功后删除工作区（--keep-work 保留），失败时保留以便排查；
+- 立方体 sidecar 的 label_brand 侧表同一时刻只对应一个品牌注册表，因此不同品牌集的单元格分组依次运行，
+  同一品牌集内的单元格并发；
+- 单元格失败不影响其它单元格（--fail-fast 时不再启动排队中的单元格）；结束时汇总，存在失败时返回非零退出码。
+
+用法：
+    python tools/batch_build.py --matrix batch.yaml --jobs 4
+    python tools/batch_build.py --country 39:France --country 40:Germany --period 2025-07 --period 2025-08
+    python tools/batch_build.py --country 39 --period 2025-08 --brands pc3=lenovo,dell,hp --pages p10 p29
+
+矩阵文件（YAML）：
+    countries:
+      - {id: 39, name: France}
+      - {id: 40, name: Germany}
+    periods: ["2025-07", "2025-08"]
+    brand_sets:                 # 可选；缺省沿用配置中的品牌
+      pc7: [lenovo, dell, hp, asus, acer, apple, samsung]
+    pages: [p10, p29]           # 可选；缺省为全部页面
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import os
+import re
+import shutil
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from page_config import config_overrides, load_page_config, validate_brands, validate_period
+from page_plugin import append_page_log, discover_pages, page_name
+
+ROOT = Path(__file__).resolve().parents[1]
+_SET_NAME_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+_MATRIX_KEYS = {'countries', 'periods', 'brand_sets', 'pages'}
+
+
+class BatchCell:
+    """矩阵中的一个单元格：国家 × 品牌集 × 月份。"""
+
+    def __init__(self, country_id: int, period: str, country_name: Optional[str] = None,
+                 brand_set: Optional[str] = None, brands: Optional[List[str]] = None):
+        self.country_id = int(country_id)
+        self.period = validate_period(period)
+        self.country_name = country_name
+        self.brand_set = brand_set
+        self.brands = validate_brands(brands) if brands else None
+
+    @property
+    def cell_id(self) -> str:
+        base = f'{self.country_id}_{self.period}'
+        return f'{base}_{self.brand_set}' if self.brand_set else base
+
+    def overrides(self):
+        return config_overrides(period=self.period, country=self.country_id, country_name=self.country_name,
+                                brands=self.brands)
+
+    def __repr__(self) -> str:
+        name = f'（{self.country_name}）' if self.country_name else ''
+        brands = f' 品牌集 {self.brand_set}' if self.brand_set else ''
+        return f'countryId={self.country_id}{name} {self.period}{brands}'
+
+
+# ---- 矩阵 ----
+def parse_country(text: str) -> Tuple[int, Optional[str]]:
+    """'39' / '39:France' → (39, 'France')。"""
+    cid, _, name = str(text).partition(':')
+    if not cid.strip().isdigit():
+        raise ValueError(f'国家须为 <countryId>[:名称]: {text!r}')
+    return int(cid), (name.strip() or None)
+
+
+def parse_brand_set(text: str) -> Tuple[str, List[str]]:
+    """'pc3=lenovo,dell,hp' → ('pc3', ['lenovo', 'dell', 'hp'])。"""
+    name, sep, brands = str(text).partition('=')
+    if not sep:
+        raise ValueError(f'品牌集须为 <名称>=<品牌,品牌,...>: {text!r}')
+    return name.strip(), [b for b in brands.split(',') if b.strip()]
+
+
+def load_matrix(path: Path) -> Dict[str, Any]:
+    """读取矩阵文件，返回 {'countries': [(id, name)], 'periods': [...], 'brand_sets': {名: [...]}, 'pages': [...]}。"""
+    raw = load_page_config(path)
+    if not isinstance(raw, dict):
+        raise ValueError(f'{path} 顶层必须为映射')
+    unknown = set(raw) - _MATRIX_KEYS
+    if unknown:
+        raise ValueError(f'{path} 包含未知键: {sorted(unknown)}')
+    countries = []
+    for c in raw.get('countries') or []:
+        if isinstance(c, dict):
+            if 'id' not in c or set(c) - {'id', 'name'}:
+                raise ValueError(f'{path} 的 countries 项须为 {{id, name}}: {c!r}')
+            countries.append(parse_country(f"{c['id']}:{c.get('name') or ''}"))
+        else:
+            countries.append(parse_country(c))
+    brand_sets = raw.get('brand_sets') or {}
+    if not isinstance(brand_sets, dict):
+        raise ValueError(f'{path} 的 brand_sets 必须为 {{名称: [品牌, ...]}}')
+    return {'countries': countries, 'periods': [str(p) for p in raw.get('periods') or []],
+            'brand_sets': {str(k): list(v or []) for k, v in brand_sets.items()},
+            'pages': [str(p) for p in raw.get('pages') or []]}
+
+
+def build_cells(countries: List[Tuple[int, Optional[str]]], periods: List[str],
+                brand_sets: Optional[Dict[str, List[str]]] = None) -> List[BatchCell]:
+    """矩阵展开为单元格（品牌集 → 国家 → 月份 顺序）；重复单元格严格报错。"""
+    if not countries or not periods:
+        raise ValueError('批量矩阵至少需要一个国家与一个月份')
+    for name in brand_sets or {}:
+        if not _SET_NAME_RE.match(name):
+            raise ValueError(f'品牌集名称只能包含字母、数字、下划线与连字符: {name!r}')
+    sets: List[Tuple[Optional[str], Optional[List[str]]]] = list((brand_sets or {}).items()) or [(None, None)]
+    cells, seen = [], set()
+    for set_name, brands in sets:
+        for cid, cname in countries:
+            for period in periods:
+                cell = BatchCell(cid, period, cname, set_name, brands)
+                if cell.cell_id in seen:
+                    raise ValueError(f'批量矩阵包含重复单元格: {cell.cell_id}')
+                seen.add(cell.cell_id)
+                cells.append(cell)
+    return cells
+
+
+# ---- 共享扫描 ----
+def plan_cells(root: Path, cells: List[BatchCell], pages: List[str]) -> Dict[Path, Dict[int, List[str]]]:
+    """各单元格（配置覆盖下）的立方体需求合并为 {neticle_db: {countryId: 月份}}。"""
+    from neticle_cube import plan_from_configs
+    merged: Dict[Path, Dict[int, List[str]]] = {}
+    for cell in cells:
+        with cell.overrides():
+            plan = plan_from_configs(root, pages)
+        for db, by_country in plan.items():
+            for country, months in by_country.items():
+                bucket = merged.setdefault(db, {}).setdefault(int(country), [])
+                bucket.extend(m for m in months if m not in bucket)
+    return merged
+
+
+def prepare_shared_scan(root: Path, cells: List[BatchCell], pages: List[str], log=print) -> Dict[str, int]:
+    """扇出前物化全部单元格所需的立方体切片：同一月份的多个国家共享一次宽表扫描。"""
+    from neticle_cube import MentionCube
+    from neticle_index import prepare_indexes
+    from neticle_snapshot import prepare_snapshots
+    plan = plan_cells(root, cells, pages)
+    stats = {'databases': 0, 'slices': 0, 'built': 0, 'scans': 0, 'exported': 0}
+    present = {db: by_country for db, by_country in plan.items() if db.exists()}
+    for db in plan:
+        if db not in present:
+            log(f'[batch] 跳过缺失的数据库: {db}')
+    if not present:
+        return stats
+    prepare_indexes(root, pages, log=log, plan=present)
+    # 列式快照：单元格内页面以自身切点请求立方体而需重建切片时，从快照聚合而不回到数据库
+    stats['exported'] = prepare_snapshots(root, pages, log=log, plan=present)['exported']
+    for db, by_country in present.items():
+        cube = MentionCube(db, root=root, log=log)
+        stats['databases'] += 1
+        stats['slices'] += sum(len(months) for months in by_country.values())
+        stats['built'] += cube.ensure_many(by_country)
+        stats['scans'] += cube.scans
+    return stats
+
+
+# ---- 单元格 ----
+def make_workspace(root: Path, work: Path) -> Path:
+    """单元格工作区：charts/ 与根 config.yaml 的副本（不含页面产物），input/ 为指向原目录的符号链接。"""
+    if work.exists():
+        shutil.rmtree(work)
+    work.mkdir(parents=True)
+    shutil.copytree(root / 'charts', work / 'charts',
+                    ignore=shutil.ignore_patterns('output', 'logs', 'tmp', '__pycache__'))
+    shutil.copy2(root / 'config.yaml', work / 'config.yaml')
+    try:
+        os.symlink(root / 'input', work / 'input', target_is_directory=True)
+    except OSError as e:
+        raise RuntimeError(f'无法在工作区创建 input 符号链接（{work / "input"}）：{e}')
+    return work
+
+
+def page_decks(pages_dir: Path) -> Dict[int, Path]:
+    """单元格页面产物中的单页 PPTX：{幻灯片序号: 路径}（页面 pN 对应原始模板第 N 张幻灯片）。"""
+    decks: Dict[int, Path] = {}
+    for page_dir in sorted(pages_dir.iterdir()) if pages_dir.is_dir() else []:
+        m = re.match(r'^p(\d+)$', page_dir.name)
+        found = sorted(page_dir.glob('*.pptx'))
+        if not m or not found:
+            continue
+        if len(found) > 1:
+            raise ValueError(f'{page_dir.name} 输出了多个 PPTX，无法确定合成来源: {[p.name for p in found]}')
+        decks[int(m.group(1))] = found[0]
+    return decks
+
+
+def run_cell(root: str, cell: BatchCell, pages: List[str], out_dir: str, keep_work: bool = False,
+             template: Optional[str] = None, unzipped: Optional[str] = None) -> Dict[str, Any]:
+    """在独立工作区中构建一个单元格（进程池任务）：页面插件 → 收集页面产物 → 合成最终稿。
+
+    最终稿的图表取自本单元格 pages/ 下的页面产物（collect_page_chart_parts），不读取其它单元格或共享目录的输出；
+    template / unzipped 缺省为根配置的原始模板与解压目录。
+    """
+    from build import UNZIPPED, collect_page_chart_parts, compose_final, load_original_ppt, load_out_path_and_mode
+    from page_plugin import PageRuntime
+    from zip_policy import default_policy
+    root_p, cell_dir = Path(root), Path(out_dir) / cell.cell_id
+    t_cell = time.perf_counter()
+    res: Dict[str, Any] = {'cell': cell.cell_id, 'label': repr(cell), 'ok': True, 'pages': [], 'deck': None,
+                           'error': None}
+    if cell_dir.exists():
+        shutil.rmtree(cell_dir)
+    work = make_workspace(root_p, cell_dir / 'work')
+    runtime = PageRuntime(work, log=lambda msg: None)
+    try:
+        with cell.overrides():
+            for page in pages:
+                buf = io.StringIO()
+                t0 = time.perf_counter()
+                rec = {'page': page, 'ok': True, 'elapsed': 0.0, 'error': None}
+                try:
+                    with contextlib.redirect_stdout(buf), contextlib.redirect_stderr(buf):
+                        outputs = runtime.run_page(page)
+                    for o in outputs:
+                        dst = cell_dir / 'pages' / page / Path(o).name
+                        dst.parent.mkdir(parents=True, exist_ok=True)
+                        shutil.copy2(o, dst)
+                except Exception:
+                    rec['ok'] = False
+                    rec['error'] = traceback.format_exc()
+                    buf.write(rec['error'])
+                rec['elapsed'] = time.perf_counter() - t0
+                append_page_log(work / 'charts' / page, buf.getvalue())
+                res['pages'].append(rec)
+            # 页面失败时不合成最终稿（严格：不输出部分更新的报告）
+            if all(p['ok'] for p in res['pages']):
+                out_path, mode, charts = load_out_path_and_mode()
+                template_p = Path(template) if template else load_original_ppt()
+                parts = collect_page_chart_parts(template_p, page_decks(cell_dir / 'pages'))
+                deck = cell_dir / out_path.name
+                with contextlib.redirect_stdout(io.StringIO()):
+                    compose_final(template_p, deck, mode, charts, policy=default_policy(),
+                                  unzipped=Path(unzipped) if unzipped else UNZIPPED, chart_parts=parts)
+                res['deck'] = str(deck)
+    except Exception:
+        res['error'] = traceback.format_exc()
+    finally:
+        runtime.close()
+    res['ok'] = res['error'] is None and all(p['ok'] for p in res['pages'])
+    if res['ok'] and not keep_work:
+        shutil.rmtree(work)
+    res['work'] = None if (res['ok'] and not keep_work) else str(work)
+    res['elapsed'] = time.perf_counter() - t_cell
+    return res
+
+
+# ---- 扇出 ----
+def _report_cell(res: Dict[str, Any], log=print) -> None:
+    failed = [p for p in res['pages'] if not p['ok']]
+    log(f"[batch] {res['cell']} {'OK' if res['ok'] else 'FAILED'} {res['elapsed']:.2f}s："
+        f"页面 {len(res['pages']) - len(failed)}/{len(res['pages'])} 成功"
+        + (f"，最终稿 {res['deck']}" if res['deck'] else ''))
+    for p in failed:
+        log(f"[batch]   {p['page']} 失败（日志见 {res['work']}/charts/{p['page']}/logs/build.log）：\n{p['error']}")
+    if res['error']:
+        log(f"[batch]   单元格失败：\n{res['error']}")
+
+
+def run_batch(cells: List[BatchCell], pages: List[str], out_dir: Path, jobs: int = 1, fail_fast: bool = False,
+              keep_work: bool = False, root: Path = ROOT, log=print, template: Optional[Path] = None,
+              unzipped: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """按品牌集分组依次扇出单元格；组内以进程池并发（jobs=1 时在本进程内串行）。"""
+    roots = (str(template) if template else None, str(unzipped) if unzipped else None)
+    groups: Dict[Optional[str], List[BatchCell]] = {}
+    for cell in cells:
+        groups.setdefault(cell.brand_set, []).append(cell)
+    results: List[Dict[str, Any]] = []
+    for set_name, group in groups.items():
+        if fail_fast and any(not r['ok'] for r in results):
+            break
+        workers = max(1, min(int(jobs or 1), len(group)))
+        if set_name:
+            log(f'[batch] 品牌集 {set_name}：{len(group)} 个单元格（并发 {workers}）')
+        if workers == 1:
+            for cell in group:
+                if fail_fast and any(not r['ok'] for r in results):
+                    break
+                results.append(run_cell(str(root), cell, pages, str(out_dir), keep_work, *roots))
+                _report_cell(results[-1], log)
+            continue
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        # spawn：子进程不继承主进程的 SQLite 连接与线程状态（各平台行为一致）
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [pool.submit(run_cell, str(root), cell, pages, str(out_dir), keep_work, *roots)
+                       for cell in group]
+            for fut in as_completed(futures):
+                if fut.cancelled():
+                    continue
+                results.append(fut.result())
+                _report_cell(results[-1], log)
+                if fail_fast and not results[-1]['ok']:
+                    for f in futures:
+                        f.cancel()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description='批量构建：按 (国家, 品牌集, 月份) 矩阵扇出，每个单元格一份最终稿')
+    ap.add_argument('--matrix', type=Path, help='矩阵文件（YAML：countries / periods / brand_sets / pages）')
+    ap.add_argument('--country', action='append', default=[], help='国家 <countryId>[:名称]（可重复，追加到矩阵）')
+    ap.add_argument('--period', action='append', default=[], help='统计月份 YYYY-MM（可重复，追加到矩阵）')
+    ap.add_argument('--brands', action='append', default=[], help='品牌集 <名称>=<品牌,品牌,...>（可重复，追加到矩阵）')
+    ap.add_argument('--pages', nargs='*', help='仅构建指定页面（默认取矩阵文件 pages，否则全部页面）')
+    ap.add_argument('--jobs', '-j', type=int, default=1, help='并发单元格数（默认 1，即本进程内串行）')
+    ap.add_argument('--out', type=Path, help='输出目录（默认 <output_root>/batch）')
+    ap.add_argument('--fail-fast', action='store_true', help='任一单元格失败后不再启动其余单元格')
+    ap.add_argument('--keep-work', action='store_true', help='保留成功单元格的工作区')
+    args = ap.parse_args(argv)
+    if args.jobs < 1:
+        ap.error(f'--jobs 必须 ≥ 1: {args.jobs}')
+
+    matrix = load_matrix(args.matrix) if args.matrix else {'countries': [], 'periods': [], 'brand_sets': {}, 'pages': []}
+    countries = matrix['countries'] + [parse_country(c) for c in args.country]
+    periods = matrix['periods'] + args.period
+    brand_sets = dict(matrix['brand_sets'])
+    for text in args.brands:
+        name, brands = parse_brand_set(text)
+        if name in brand_sets:
+            raise ValueError(f'品牌集重复定义: {name}')
+        brand_sets[name] = brands
+    cells = build_cells(countries, periods, brand_sets)
+    available = discover_pages(ROOT)
+    pages = [page_name(p) for p in (args.pages or matrix['pages'])] or available
+    missing = [p for p in pages if p not in available]
+    if missing:
+        raise FileNotFoundError(f'页面不存在或无可执行入口: {missing}')
+
+    from build import OUT_DEFAULT, UNZIPPED, ensure_unzipped, load_original_ppt, load_out_path_and_mode
+    out_dir = args.out or (OUT_DEFAULT.parent / 'batch')
+    print(f'[batch] {len(cells)} 个单元格 × {len(pages)} 页 → {out_dir}')
+    t0 = time.perf_counter()
+    template = load_original_ppt()
+    ensure_unzipped(template, UNZIPPED, load_out_path_and_mode()[2])
+    stats = prepare_shared_scan(ROOT, cells, pages)
+    print(f"[batch] 共享扫描：数据库 {stats['databases']} 个，切片 {stats['slices']} 个，本次物化 {stats['built']} 个，"
+          f"宽表查询 {stats['scans']} 次，快照导出 {stats['exported']} 个，用时 {time.perf_counter() - t0:.2f}s")
+    results = run_batch(cells, pages, out_dir, jobs=args.jobs, fail_fast=args.fail_fast, keep_work=args.keep_work,
+                        template=template, unzipped=UNZIPPED)
+    failed = [r for r in results if not r['ok']]
+    skipped = len(cells) - len(results)
+    print(f'[batch] 完成：单元格 {len(cells)} 个，成功 {len(results) - len(failed)}，失败 {len(failed)}'
+          + (f'，跳过 {skipped}' if skipped else '') + f'，用时 {time.perf_counter() - t0:.2f}s')
+    return 0 if not failed and not skipped else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -49,6 +49,8 @@ if str(TOOLS_DIR) not in sys.path:
     sys.path.insert(0, str(TOOLS_DIR))
 
 # 尝试导入 make_micro_template；若缺失则提供轻量级 _find_repo_root 回退，并在主流程中跳过微模板生成，仅做 .xlsb 强制与快照生成
+from template_manifest import TemplateManifest
+
 HAVE_MAKE_MICRO = True
 try:
     from make_micro_template import make_micro_template_for_page, _find_repo_root  # type: ignore
@@ -65,36 +67,21 @@ except Exception:
         return start.parent.parent
 
 
-def _detect_chart_type(chart_xml_path: Path) -> str:
-    """根据 chart*.xml 内容检测图表类型。
+def _detect_chart_type(manifest: Optional[TemplateManifest], chart_xml_name: str) -> str:
+    """根据模板清单（tools/template_manifest.py，按微模板 ppt/charts 内容哈希缓存）检测图表类型。
     返回值之一：barChart/pieChart/areaChart/doughnutChart/lineChart/scatterChart/unknown。
     约定：若同时存在多种节点，按常见优先序返回第一个匹配。
     """
-    if not chart_xml_path.exists():
+    if manifest is None:
         return 'unknown'
-    try:
-        root = ET.fromstring(chart_xml_path.read_bytes())
-    except Exception:
+    part = f'ppt/charts/{chart_xml_name}'
+    if not manifest.has(part):
         return 'unknown'
-    ns = {
-        'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart'
-    }
-    # 常见类型按优先序检查
-    if root.findall('.//c:barChart', ns):
-        return 'barChart'
-    if root.findall('.//c:pieChart', ns):
-        # doughnut 在 Office XML 仍然是 pieChart 的一类，这里区分不强制
-        return 'pieChart'
-    if root.findall('.//c:areaChart', ns):
-        return 'areaChart'
-    if root.findall('.//c:lineChart', ns):
-        return 'lineChart'
-    if root.findall('.//c:scatterChart', ns):
-        return 'scatterChart'
-    # 非标准命名尝试（某些脚本约定）
-    txt = chart_xml_path.read_text(encoding='utf-8', errors='ignore')
-    if 'doughnutChart' in txt:
-        return 'doughnutChart'
+    types = manifest.chart_types(part)
+    # 常见类型按优先序检查（doughnut 在 Office XML 仍然是 pieChart 的一类，这里区分不强制）
+    for t in ('barChart', 'pieChart', 'areaChart', 'lineChart', 'scatterChart', 'doughnutChart'):
+        if t in types:
+            return t
     return 'unknown'
 
 
@@ -114,24 +101,15 @@ def _resolve_chart_xml_name(chart_dir: Path) -> Optional[str]:
     return name
 
 
-def _chart_to_embed_name(tpl_dir: Path, chart_xml_name: str) -> Optional[str]:
-    """读取微模板中的 chart*.xml.rels，返回该图表引用的 embeddings 文件名（如 oleObject1.bin / worksheet1.xlsb / embedding3.xlsx）。
+def _chart_to_embed_name(manifest: Optional[TemplateManifest], chart_xml_name: str) -> Optional[str]:
+    """从模板清单读取该图表引用的 embeddings 文件名（如 oleObject1.bin / worksheet1.xlsb / embedding3.xlsx）。
     若无嵌入引用则返回 None。
     """
-    rels = tpl_dir / 'ppt' / 'charts' / '_rels' / f'{chart_xml_name}.rels'
-    if not rels.exists():
+    if manifest is None:
         return None
-    try:
-        root = ET.fromstring(rels.read_bytes())
-    except Exception:
-        return None
-    for rel in root.findall('{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'):
-        typ = rel.get('Type') or ''
-        tgt = rel.get('Target') or ''
-        # 两种方式：Type 为 oleObject 或 Target 指向 ../embeddings/
-        if typ.endswith('/oleObject') or ('embeddings/' in tgt):
-            return Path(tgt).name
-    return None
+    part = f'ppt/charts/{chart_xml_name}'
+    embed = manifest.chart(part).get('embed') if manifest.has(part) else None
+    return Path(embed['target']).name if embed else None
 
 
 def _new_embed_xlsx_name(old_embed_name: str) -> str:
@@ -383,6 +361,12 @@ def _generate_xlsx_for_page(page_dir: Path) -> int:
         print(f'[{page_dir.name}] 微模板未生成或结构不完整，跳过 xlsx：{tpl_dir}')
         return 0
     snapshots_root.mkdir(parents=True, exist_ok=True)
+    # 微模板图表结构（类型、嵌入目标）取自模板清单，整页只计算一次指纹
+    try:
+        manifest: Optional[TemplateManifest] = TemplateManifest.load(tpl_dir)
+    except Exception as e:
+        print(f'[{page_dir.name}] 读取模板清单失败：{e}')
+        manifest = None
 
     chart_dirs = _collect_chart_dirs(page_dir)
     # 每个嵌入一个工作簿
@@ -395,9 +379,8 @@ def _generate_xlsx_for_page(page_dir: Path) -> int:
         if not chart_xml_name:
             print(f'[{page_dir.name}] 未解析 chart XML 名：{cdir}')
             continue
-        chart_xml_path = charts_root / chart_xml_name
-        chart_type = _detect_chart_type(chart_xml_path)
-        embed_name = _chart_to_embed_name(tpl_dir, chart_xml_name) or f'{Path(chart_xml_name).stem}.bin'
+        chart_type = _detect_chart_type(manifest, chart_xml_name)
+        embed_name = _chart_to_embed_name(manifest, chart_xml_name) or f'{Path(chart_xml_name).stem}.bin'
         new_xlsx_name = _new_embed_xlsx_name(embed_name)
         wb = wb_map.get(new_xlsx_name)
         if wb is None:
@@ -461,14 +444,14 @@ def _generate_xlsx_for_page(page_dir: Path) -> int:
 
 
 def _zip_template_dir(tpl_dir: Path, out_pptx: Path) -> None:
-    """将微模板目录打包为 pptx 文件（用于离线预览）。"""
-    import zipfile
+    """将微模板目录打包为 pptx 文件（用于离线预览）；XML deflate，图片与嵌入工作簿按压缩策略 STORE。"""
+    from zip_policy import PolicyZipFile
     out_pptx.parent.mkdir(parents=True, exist_ok=True)
-    with zipfile.ZipFile(out_pptx, 'w') as z:
+    with PolicyZipFile(out_pptx, 'w') as z:
         for p in tpl_dir.rglob('*'):
             if p.is_dir():
                 continue
-            z.write(p, str(p.relative_to(tpl_dir)))
+            z.write(p, p.relative_to(tpl_dir).as_posix())
 
 
 def main() -> int:
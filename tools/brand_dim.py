@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+品牌维度：把 keyword_label 一次性解析为整数 brand_id / brand_mask
+
+背景：
+- 各页面分别用 `keyword_label LIKE '%lenovo%'`、`str.contains('lenovo')`、按 brands 顺序的子串循环识别品牌，
+  每次构建都对每个单元格重复字符串匹配，口径也分散在各页面。
+
+做法：
+- 品牌注册表取自根 config.yaml 的 filters：brands（顺序即 brand_id，从 1 开始）、brands_display、
+  brand_key + brand_alias（别名并入 brand_key 对应品牌的匹配词）；
+- 匹配规则：keyword_label 包含匹配词，仅 ASCII 字母不区分大小写（like_fold()，与 SQLite LIKE '%词%' 一致）；
+- 每个不同的 keyword_label 只解析一次，写入侧表 label_brand(keyword_label, brand_id, brand_mask, key_mask)：
+  - key_mask：只按品牌键（不含别名）命中的位图（bit = brand_id - 1），与页面 `LIKE '%lenovo%'`、
+    品牌键子串匹配的口径完全一致；页面统一按 key_mask 过滤（立方体 label_pattern / key_mask 列）；
+  - brand_mask：同上但计入 brand_alias（如 "联想"），比页面的单一 LIKE 模式更宽，仅供需要别名口径的分析；
+  - brand_id：按 brands 顺序的首个命中品牌（含别名），未命中为 0；
+- 侧表与注册表摘要一起保存在共享立方体 sidecar 中，注册表变化时整体重算。
+
+用法：
+    python tools/brand_dim.py --db input/neticle-v5-08-etl.sqlite   # 打印 keyword_label → 品牌解析结果
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from page_config import load_page_config
+
+
+_ASCII_FOLD = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+LABEL_SCHEMA = 2
+
+
+def like_fold(text: str) -> str:
+    """与 SQLite LIKE 相同的大小写折叠：仅 ASCII 字母转小写（str.lower() 还会改写非 ASCII 字符）。"""
+    return str(text).translate(_ASCII_FOLD)
+
+
+def pattern_term(pattern: str) -> str:
+    """页面配置的 LIKE 模式（'%lenovo%'）→ 折叠后的匹配词；非 '%词%' 形式时报错。"""
+    p = str(pattern or '').strip()
+    if len(p) < 3 or not (p.startswith('%') and p.endswith('%')) or any(ch in p[1:-1] for ch in '%_'):
+        raise ValueError(f"品牌模式仅支持 '%词%' 形式: {pattern}")
+    return like_fold(p[1:-1])
+
+
+class BrandRegistry:
+    """品牌注册表：brand_id（从 1 开始）→ key / display / 匹配词。"""
+
+    def __init__(self, brands: Sequence[str], displays: Optional[Sequence[str]] = None,
+                 aliases: Optional[Dict[str, Sequence[str]]] = None):
+        if not brands:
+            raise ValueError('品牌注册表为空：请在根 config.yaml 的 filters.brands 中配置品牌')
+        if len(brands) > 62:
+            raise ValueError(f'品牌数量过多（{len(brands)}），brand_mask 仅支持 62 个品牌')
+        self.keys = [like_fold(str(b).strip()) for b in brands]
+        if len(set(self.keys)) != len(self.keys):
+            raise ValueError(f'filters.brands 存在重复品牌: {brands}')
+        if displays is not None and len(displays) != len(self.keys):
+            raise ValueError('filters.brands_display 与 filters.brands 数量不一致')
+        self.displays = [str(d) for d in displays] if displays is not None else [k.title() for k in self.keys]
+        self.terms: List[List[str]] = [[k] for k in self.keys]
+        for key, words in (aliases or {}).items():
+            idx = self.index(key)
+            for w in words:
+                t = like_fold(str(w).strip())
+                if t and t not in self.terms[idx]:
+                    self.terms[idx].append(t)
+
+    @classmethod
+    def from_root(cls, root: Path) -> 'BrandRegistry':
+        cfg = load_page_config(Path(root) / 'config.yaml')
+        f = cfg.get('filters') or {}
+        aliases = {}
+        if f.get('brand_key') and f.get('brand_alias'):
+            aliases[str(f['brand_key'])] = list(f['brand_alias'])
+        return cls(f.get('brands') or [], f.get('brands_display'), aliases)
+
+    def index(self, key: str) -> int:
+        k = like_fold(str(key).strip())
+        if k not in self.keys:
+            raise KeyError(f'品牌不在注册表中: {key}（filters.brands={self.keys}）')
+        return self.keys.index(k)
+
+    def brand_id(self, key: str) -> int:
+        return self.index(key) + 1
+
+    def bit(self, key: str) -> int:
+        return 1 << self.index(key)
+
+    def brand_id_for_pattern(self, pattern: str, aliases: bool = False) -> int:
+        """把页面配置的 LIKE 模式（'%lenovo%'）映射到 brand_id；非 '%词%' 形式或未注册时报错。
+
+        aliases=False（默认）时模式必须是品牌键本身，按 key_mask 过滤即与该 LIKE 模式逐条一致；
+        aliases=True 时别名也可映射（对应 brand_mask 口径）。
+        """
+        term = pattern_term(pattern)
+        for i, terms in enumerate(self.terms):
+            if term == self.keys[i] or (aliases and term in terms):
+                return i + 1
+        raise KeyError(f'品牌模式 {pattern} 未对应注册表中的品牌键（filters.brands={self.keys}）')
+
+    def resolve(self, label: Optional[str]) -> Tuple[int, int, int]:
+        """返回 (brand_id, brand_mask, key_mask)；未命中为 (0, 0, 0)。"""
+        if label is None:
+            return 0, 0, 0
+        low = like_fold(label)
+        mask = key_mask = 0
+        for i, terms in enumerate(self.terms):
+            if terms[0] in low:
+                key_mask |= 1 << i
+            if any(t in low for t in terms):
+                mask |= 1 << i
+        if not mask:
+            return 0, 0, 0
+        return (mask & -mask).bit_length(), mask, key_mask
+
+    def digest(self) -> str:
+        payload = json.dumps({'schema': LABEL_SCHEMA, 'keys': self.keys, 'displays': self.displays,
+                              'terms': self.terms}, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def ensure_label_brands(con: sqlite3.Connection, registry: BrandRegistry, labels: Iterable[Optional[str]]) -> int:
+    """在 con 中维护 brand_dim / label_brand 侧表：注册表变化时重算，新标签增量解析。返回新增标签数。"""
+    con.execute('CREATE TABLE IF NOT EXISTS brand_meta (key TEXT PRIMARY KEY, value TEXT)')
+    row = con.execute("SELECT value FROM brand_meta WHERE key='registry'").fetchone()
+    if not row or row[0] != registry.digest():
+        # 注册表或侧表结构（LABEL_SCHEMA）变化：整体重建
+        with con:
+            con.execute('DROP TABLE IF EXISTS label_brand')
+            con.execute('DROP TABLE IF EXISTS brand_dim')
+    con.execute('''CREATE TABLE IF NOT EXISTS brand_dim (
+        brand_id INTEGER PRIMARY KEY, brand_key TEXT NOT NULL, display TEXT NOT NULL, terms TEXT NOT NULL)''')
+    con.execute('''CREATE TABLE IF NOT EXISTS label_brand (
+        keyword_label TEXT PRIMARY KEY, brand_id INTEGER NOT NULL, brand_mask INTEGER NOT NULL,
+        key_mask INTEGER NOT NULL)''')
+    con.execute('CREATE INDEX IF NOT EXISTS label_brand_id ON label_brand(brand_id)')
+    with con:
+        if not row or row[0] != registry.digest():
+            con.executemany('INSERT INTO brand_dim VALUES (?,?,?,?)', [
+                (i + 1, k, registry.displays[i], json.dumps(registry.terms[i], ensure_ascii=False))
+                for i, k in enumerate(registry.keys)])
+            con.execute("INSERT OR REPLACE INTO brand_meta VALUES ('registry', ?)", (registry.digest(),))
+        known = {r[0] for r in con.execute('SELECT keyword_label FROM label_brand')}
+        fresh = [l for l in set(labels) if l is not None and l not in known]
+        con.executemany('INSERT INTO label_brand VALUES (?,?,?,?)', [(l,) + registry.resolve(l) for l in fresh])
+    return len(fresh)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description='打印 keyword_label → 品牌解析结果（依据根 config.yaml filters）')
+    ap.add_argument('--db', type=Path, required=True, help='Neticle 数据库路径')
+    ap.add_argument('--table', default='mentions_wide')
+    args = ap.parse_args(argv)
+    root = Path(__file__).resolve().parents[1]
+    reg = BrandRegistry.from_root(root)
+    from sqlite_ro import connect_ro
+    con = connect_ro(args.db)
+    try:
+        labels = [r[0] for r in con.execute(f'SELECT DISTINCT keyword_label FROM {args.table}')]
+    finally:
+        con.close()
+    for label in sorted(labels, key=lambda x: (x is None, str(x))):
+        bid, mask, key_mask = reg.resolve(label)
+        hits = [reg.displays[i] + ('' if key_mask >> i & 1 else '（别名）') for i in range(len(reg.keys)) if mask >> i & 1]
+        print(f'{label!s:40} brand_id={bid:<2} {",".join(hits)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
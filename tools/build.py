@@ -1,15 +1,26 @@
 #!/usr/bin/env python3
 import zipfile
+import posixpath
 import shutil
 from pathlib import Path
-import yaml
-import subprocess
 import sys
 import argparse
 import re
 import logging
 import warnings
-from typing import List, Optional, Dict, Any
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# 仅合成最终稿（不跑逐页构建）时只需以下模块；逐页构建相关模块（numpy 立方体、构建缓存、页面插件、
+# subprocess/线程池）在 run_page_builders/main 的逐页分支中按需导入，见 tools/startup_bench.py
+from page_config import load_page_config
+from zip_policy import CompressionPolicy, PolicyZipFile, default_policy
+from zip_rawcopy import ZipComposer
+
+try:
+    import resource  # POSIX：用于统计子进程 CPU 时间
+except ImportError:
+    resource = None
 
 # 找到 gen_ppt 根目录（需同时包含 config.yaml 与 input 目录）
 ROOT = Path(__file__).resolve().parent
@@ -22,9 +33,15 @@ else:
 
 CONFIG = ROOT / 'config.yaml'
 
+
+def _root_config() -> dict:
+    """根 config.yaml（tools/page_config.py 缓存解析结果；缺失时为空映射）。"""
+    return load_page_config(CONFIG) if CONFIG.exists() else {}
+
+
 # 从配置读取公共路径，提供合理的回退
 try:
-    _cfg = yaml.safe_load(CONFIG.read_text(encoding='utf-8')) or {}
+    _cfg = _root_config()
 except Exception:
     _cfg = {}
 _proj = _cfg.get('project') or {}
@@ -37,16 +54,17 @@ DEFAULT_TEMPLATE_PPT = _resolve(_proj.get('original_ppt', 'input/LRTBH.pptx'))
 UNZIPPED = _resolve(_proj.get('template_root', 'input/LRTBH-unzip'))
 _out_root = _proj.get('output_root', 'output')
 OUT_DEFAULT = _resolve(_out_root) / 'LRTBH-final.pptx'
+BUILD_CACHE_PATH = _resolve(_out_root) / 'build_cache.json'
 
 # REPLACE_MAP 由配置驱动
 
-def path_in_unzipped(*parts: str) -> Path:
-    """优先返回 UNZIPPED/ppt/... 子树中的路径，若不存在则回退至 UNZIPPED 顶层。"""
-    nested = UNZIPPED / 'ppt'
-    candidate = nested.joinpath(*parts)
+def path_in_unzipped(*parts: str, unzipped: Optional[Path] = None) -> Path:
+    """优先返回 <unzipped>/ppt/... 子树中的路径，若不存在则回退至 <unzipped> 顶层（缺省为 UNZIPPED）。"""
+    base = unzipped or UNZIPPED
+    candidate = (base / 'ppt').joinpath(*parts)
     if candidate.exists():
         return candidate
-    return UNZIPPED.joinpath(*parts)
+    return base.joinpath(*parts)
 
 
 def collect_page_replace_charts() -> list:
@@ -61,7 +79,7 @@ def collect_page_replace_charts() -> list:
             cfg = p / 'config.yaml'
             if cfg.exists():
                 try:
-                    data = yaml.safe_load(cfg.read_text(encoding='utf-8')) or {}
+                    data = load_page_config(cfg)
                 except Exception:
                     data = {}
                 charts = (data.get('output') or {}).get('replace_charts') or []
@@ -73,7 +91,7 @@ def collect_page_replace_charts() -> list:
 
 def load_out_path_and_mode():
     if CONFIG.exists():
-        cfg = yaml.safe_load(CONFIG.read_text(encoding='utf-8')) or {}
+        cfg = _root_config()
         out = cfg.get('output', {}).get('final_ppt')
         mode = cfg.get('output', {}).get('final_mode', 'updated')
         charts = cfg.get('output', {}).get('replace_charts', [])
@@ -93,37 +111,95 @@ def load_out_path_and_mode():
     return OUT_DEFAULT, mode, charts
 
 
-def compose_final(template: Path, out_path: Path, mode: str, charts: list):
+_NS_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_REL_CHART = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/chart'
+
+
+def _slide_chart_rels(z: zipfile.ZipFile, slide_part: str) -> Dict[str, str]:
+    """幻灯片的图表关系：{rId: 'ppt/charts/chartN.xml'}。"""
+    from lxml import etree as ET
+    base, name = slide_part.rsplit('/', 1)
+    rels_part = f'{base}/_rels/{name}.rels'
+    if rels_part not in z.namelist():
+        raise FileNotFoundError(f'{z.filename} 缺少 {rels_part}')
+    out = {}
+    for rel in ET.fromstring(z.read(rels_part)).findall('{%s}Relationship' % _NS_REL):
+        if rel.get('Type') == _REL_CHART and rel.get('TargetMode') != 'External':
+            out[rel.get('Id')] = posixpath.normpath(posixpath.join(base, rel.get('Target')))
+    return out
+
+
+def collect_page_chart_parts(template: Path, page_decks: Dict[int, Path]) -> Dict[str, bytes]:
+    """单页 PPTX（{幻灯片序号: 路径}）中的图表按 slide1 的关系 Id 映射回原始模板同序号幻灯片的图表部件。
+
+    返回 {'ppt/charts/chartN.xml': 图表 XML}，供 compose_final(chart_parts=...) 覆盖；
+    关系 Id 在模板幻灯片中不存在、或两个页面映射到同一图表时严格报错。
+    """
+    parts: Dict[str, bytes] = {}
+    owner: Dict[str, int] = {}
+    with zipfile.ZipFile(template, 'r') as zt:
+        for slide_no, deck in sorted(page_decks.items()):
+            master = _slide_chart_rels(zt, f'ppt/slides/slide{slide_no}.xml')
+            with zipfile.ZipFile(deck, 'r') as zp:
+                for rid, target in _slide_chart_rels(zp, 'ppt/slides/slide1.xml').items():
+                    name = master.get(rid)
+                    if name is None:
+                        raise ValueError(f'{deck.name} 的图表关系 {rid} 在模板 slide{slide_no} 中不存在')
+                    if name in owner:
+                        raise ValueError(f'{name} 同时由 slide{owner[name]} 与 slide{slide_no} 的页面产物提供')
+                    owner[name] = slide_no
+                    parts[name] = zp.read(target)
+    return parts
+
+
+def compose_final(template: Path, out_path: Path, mode: str, charts: list,
+                  policy: Optional[CompressionPolicy] = None, threads: int = 1,
+                  unzipped: Optional[Path] = None, chart_parts: Optional[Dict[str, bytes]] = None):
+    """合成最终稿：模板成员原样拷贝，updated 模式下替换图表部件。
+
+    图表来源依次为 chart_parts（页面产物，见 collect_page_chart_parts）与 unzipped 解压目录（缺省为 UNZIPPED）
+    中 charts 所列的图表；批量构建的各单元格传入各自的页面产物，互不共享输出。
+    """
+    chart_parts = chart_parts or {}
     if not template.exists():
         raise FileNotFoundError(template)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
-    with zipfile.ZipFile(template, 'r') as zin, zipfile.ZipFile(out_path, 'w', zipfile.ZIP_DEFLATED) as zout:
+    # 未替换的成员原样拷贝压缩字节（CRC/大小不变），仅替换的 chart 部件与 rels 重新压缩（tools/zip_rawcopy.py）；
+    # 重新写入的部件按压缩策略选择 STORE/deflate 级别（tools/zip_policy.py）；threads > 1 时在线程池中并行压缩
+    t0 = time.perf_counter()
+    with zipfile.ZipFile(template, 'r') as zin, \
+            ZipComposer(out_path, zin_path=template, policy=policy, threads=threads) as zout:
         names = set(zin.namelist())
-        # 需要覆盖的 rels 名称集合，避免重复写入导致 zipfile UserWarning: Duplicate name
+        # 需要覆盖的 rels 名称集合，避免重复写入 ZIP 成员
         rels_to_override = set(f'ppt/charts/_rels/{chart_name}.rels' for chart_name in (charts or []))
-        for name in zin.namelist():
+        for info in zin.infolist():
+            name = info.filename
             # 跳过将被覆盖的 charts rels，避免重复写入
             if name in rels_to_override:
                 continue
-            if mode == 'updated' and name.startswith('ppt/charts/') and Path(name).name in charts:
-                src = path_in_unzipped('charts', Path(name).name)
+            if mode == 'updated' and name in chart_parts:
+                zout.write(name, chart_parts[name])
+            elif mode == 'updated' and name.startswith('ppt/charts/') and Path(name).name in charts:
+                src = path_in_unzipped('charts', Path(name).name, unzipped=unzipped)
                 if src.exists():
-                    zout.writestr(name, src.read_bytes())
+                    zout.write(name, src.read_bytes())
                 else:
-                    zout.writestr(name, zin.read(name))
+                    zout.copy(info)
             else:
-                zout.writestr(name, zin.read(name))
+                zout.copy(info)
         # 同步 chart 关系：优先使用 UNZIPPED 的 rels，否则保留模板
         for chart_name in charts:
             rel_name = f'ppt/charts/_rels/{chart_name}.rels'
-            src_rels = path_in_unzipped('charts', '_rels', f'{chart_name}.rels')
+            src_rels = path_in_unzipped('charts', '_rels', f'{chart_name}.rels', unzipped=unzipped)
             if src_rels.exists():
-                zout.writestr(rel_name, src_rels.read_bytes())
+                zout.write(rel_name, src_rels.read_bytes())
             elif rel_name in names:
-                zout.writestr(rel_name, zin.read(rel_name))
+                zout.copy(zin.getinfo(rel_name))
 
-    print('Composed', out_path, 'mode=', mode, 'charts=', charts)
+    print('Composed', out_path, 'mode=', mode, 'charts=', charts, 'page_charts=', len(chart_parts))
+    print(f'Compose stats: copied={zout.copied} written={zout.written} deflated_bytes={zout.deflated_bytes} '
+          f'stored_bytes={zout.stored_bytes} zip_threads={zout.threads} seconds={time.perf_counter() - t0:.3f}')
 
 
 def _validate_replaced_charts(out_ppt: Path, template: Path, chart_names: List[str]) -> Dict[str, Any]:
@@ -368,8 +444,8 @@ def compose_without_template(out_path: Path):
         '</Properties>'
     )
 
-    # 写入 ZIP
-    with zipfile.ZipFile(out_path, 'w', zipfile.ZIP_DEFLATED) as z:
+    # 写入 ZIP：图片与嵌入工作簿已是压缩格式，按压缩策略 STORE（tools/zip_policy.py）
+    with PolicyZipFile(out_path, 'w') as z:
         z.writestr('[Content_Types].xml', ct_xml)
         z.writestr('_rels/.rels', rels_top)
         z.writestr('docProps/core.xml', core_xml)
@@ -424,6 +500,21 @@ def compose_without_template(out_path: Path):
         pass
 
 
+def data_prep_pages(pages: Optional[List[str]] = None) -> List[str]:
+    """需要数据准备的页面：可进程内执行（page_plugin.discover_pages）且配置声明 data_sources.neticle_db，
+    限定在 pages 范围内（为空表示全部）；返回空列表表示无需准备（各 prepare_* 的空参数表示全部页面，调用方需跳过）。"""
+    from page_plugin import discover_pages
+    out = []
+    for page in discover_pages(ROOT):
+        if pages and page not in pages:
+            continue
+        cfg_path = ROOT / 'charts' / page / 'config.yaml'
+        cfg = load_page_config(cfg_path) if cfg_path.exists() else {}
+        if (cfg.get('data_sources') or {}).get('neticle_db'):
+            out.append(page)
+    return out
+
+
 def discover_page_builders() -> List[Path]:
     roots = [ROOT / 'charts']
     candidates = []
@@ -443,8 +534,122 @@ def discover_page_builders() -> List[Path]:
     return [uniq[k] for k in sorted(uniq.keys())]
 
 
-def run_page_builders(pages: Optional[List[str]], logger: Optional[logging.Logger] = None, fail_fast: bool = False) -> dict:
-    import time, shlex
+def _append_page_stream(log_file_path: Optional[Path], page: str, label: str, text: str) -> None:
+    """将单页子进程的完整输出作为一个整体块追加到文件日志，避免多页输出交错。"""
+    if not log_file_path or not text:
+        return
+    try:
+        log_file_path.parent.mkdir(parents=True, exist_ok=True)
+        with log_file_path.open('a', encoding='utf-8') as f:
+            f.write(f"\n----- BEGIN [{page}] {label} ({len(text)} bytes) -----\n")
+            f.write(text + ("\n" if not text.endswith('\n') else ''))
+            f.write(f"----- END [{page}] {label} -----\n")
+    except Exception:
+        pass
+
+
+def _snippet(text: str) -> str:
+    return text if len(text) <= 800 else (text[:400] + '\n...\n' + text[-400:])
+
+
+def _run_page_builder(builder: Path, log: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """以子进程运行单页 build.py，捕获完整输出（输出不在此处写日志，由调度线程统一串行记录）。
+
+    log：页面真正开始运行时（而非提交到线程池时）记录一行启动信息。
+    """
+    import shlex
+    import subprocess
+    cmd = [sys.executable, str(builder)]
+    if log:
+        log(f"Running page builder for {builder.parent.name}: {' '.join(shlex.quote(x) for x in cmd)}")
+    t0 = time.time()
+    res = subprocess.run(cmd, cwd=str(builder.parent), capture_output=True, text=True)
+    return {
+        'page': builder.parent.name,
+        'cmd': cmd,
+        'returncode': res.returncode,
+        'stdout': (res.stdout or '').strip(),
+        'stderr': (res.stderr or '').strip(),
+        'elapsed': time.time() - t0,
+    }
+
+
+def _run_page_in_process(runtime: 'PageRuntime', builder: Path,
+                         log: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """进程内执行页面插件（generate → fill → package），捕获输出；结果格式与 _run_page_builder 相同。"""
+    import contextlib
+    import io
+    import traceback
+    from page_plugin import append_page_log
+    page = builder.parent.name
+    if log:
+        log(f'Running page builder for {page} in-process')
+    out, err = io.StringIO(), io.StringIO()
+    t0 = time.time()
+    returncode = 0
+    try:
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            runtime.run_page(page)
+    except Exception:
+        returncode = 1
+        err.write(traceback.format_exc())
+    # 与子进程模式一致：页面输出同时写入页面 logs/build.log
+    append_page_log(builder.parent, out.getvalue() + err.getvalue())
+    return {
+        'page': page,
+        'cmd': ['<in-process>', str(builder)],
+        'returncode': returncode,
+        'stdout': out.getvalue().strip(),
+        'stderr': err.getvalue().strip(),
+        'elapsed': time.time() - t0,
+    }
+
+
+def _report_page_result(logger: logging.Logger, log_file_path: Optional[Path], res: Dict[str, Any]) -> None:
+    """按页整体输出 stdout/stderr 摘要与全量日志；调用方保证串行调用。"""
+    page, out, err = res['page'], res['stdout'], res['stderr']
+    if res['returncode'] == 0:
+        if out:
+            logger.info('[%s] stdout (%d bytes)\n%s', page, len(out), _snippet(out))
+            _append_page_stream(log_file_path, page, 'stdout', out)
+        if err:
+            logger.warning('[%s] stderr (%d bytes)\n%s', page, len(err), _snippet(err))
+            _append_page_stream(log_file_path, page, 'stderr', err)
+        logger.info('Page builder OK for %s in %.2fs', page, res['elapsed'])
+    else:
+        if out:
+            logger.error('[%s] stdout on failure (%d bytes)\n%s', page, len(out), _snippet(out))
+            _append_page_stream(log_file_path, page, 'stdout on failure', out)
+        if err:
+            logger.error('[%s] stderr on failure (%d bytes)\n%s', page, len(err), _snippet(err))
+            _append_page_stream(log_file_path, page, 'stderr on failure', err)
+        logger.error('Page builder FAILED for %s in %.2fs (rc=%s)', page, res['elapsed'], res['returncode'])
+
+
+def _children_cpu_seconds() -> Optional[float]:
+    """已回收子进程的累计 CPU 时间（user+sys）；非 POSIX 平台返回 None。"""
+    if resource is None:
+        return None
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime
+
+
+def run_page_builders(pages: Optional[List[str]], logger: Optional[logging.Logger] = None, fail_fast: bool = False, jobs: int = 1,
+                      cache: Optional['BuildCache'] = None, force: bool = False, isolate: bool = False) -> dict:
+    """运行逐页构建。
+
+    - jobs=1 且未要求隔离时，在本进程内依次调用各页插件 generate/fill/package（tools/page_plugin.py），
+      共享已导入的库、页面配置缓存、原始模板与只读数据库连接；
+    - isolate=True 或 jobs>1 时每页以子进程运行 build.py；jobs>1 时以有界线程池并发启动子进程（各页互相独立）。
+    - 每页输出在页面结束后由调度线程整体写入日志，保证不同页面的输出不交错。
+    - fail_fast：任一页面失败后不再启动排队中的页面，等待已启动页面结束后抛出 CalledProcessError。
+    - 结束时汇总墙钟时间与 CPU 时间（本进程 + 子进程），便于评估并发收益。
+    - cache：提供时按页面输入指纹跳过未变化的页面并复用其上次产物；force=True 时忽略缓存强制重建（仍会刷新缓存）。
+    """
+    import subprocess
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from build_cache import page_fingerprint
+    from page_plugin import PageRuntime
     logger = logger or _get_logger(None)
     # 尝试获取文件日志路径，以便将子进程 stdout/stderr 全量写入文件日志
     log_file_path: Optional[Path] = None
@@ -460,92 +665,86 @@ def run_page_builders(pages: Optional[List[str]], logger: Optional[logging.Logge
     if pages:
         name_set = set(pages)
         builders = [b for b in builders if b.parent.name in name_set]
-    logger.info('Discovered %d page builders: %s', len(builders), ', '.join(b.parent.name for b in builders))
+    jobs = max(1, min(int(jobs or 1), len(builders) or 1))
+    in_process = not isolate and jobs == 1
+    logger.info('Discovered %d page builders: %s (jobs=%d, %s)', len(builders), ', '.join(b.parent.name for b in builders),
+                jobs, 'in-process' if in_process else 'subprocess')
     executed = 0
     succeeded = 0
     failed = 0
-    for b in builders:
-        executed += 1
-        # 始终执行每页的 build.py（不传 mode）
-        cmd = [sys.executable, str(b)]
-        cmd_str = ' '.join(shlex.quote(x) for x in cmd)
-        logger.info('Running page builder for %s: %s', b.parent.name, cmd_str)
-        t0 = time.time()
-        try:
-            res = subprocess.run(cmd, cwd=str(b.parent), check=True, capture_output=True, text=True)
-            dt = time.time() - t0
-            succeeded += 1
-            # 记录输出摘要（避免日志过大，仅输出前/后若干行）
-            out = (res.stdout or '').strip()
-            err = (res.stderr or '').strip()
-            if out:
-                snippet = out if len(out) <= 800 else (out[:400] + '\n...\n' + out[-400:])
-                logger.info('[%s] stdout (%d bytes)\n%s', b.parent.name, len(out), snippet)
-                # 追加全量 stdout 到文件日志
-                if log_file_path and out:
-                    try:
-                        log_file_path.parent.mkdir(parents=True, exist_ok=True)
-                        with log_file_path.open('a', encoding='utf-8') as f:
-                            f.write(f"\n----- BEGIN [{b.parent.name}] stdout ({len(out)} bytes) -----\n")
-                            f.write(out + ("\n" if not out.endswith('\n') else ''))
-                            f.write(f"----- END [{b.parent.name}] stdout -----\n")
-                    except Exception:
-                        pass
-            if err:
-                snippet = err if len(err) <= 800 else (err[:400] + '\n...\n' + err[-400:])
-                logger.warning('[%s] stderr (%d bytes)\n%s', b.parent.name, len(err), snippet)
-                # 追加全量 stderr 到文件日志
-                if log_file_path and err:
-                    try:
-                        log_file_path.parent.mkdir(parents=True, exist_ok=True)
-                        with log_file_path.open('a', encoding='utf-8') as f:
-                            f.write(f"\n----- BEGIN [{b.parent.name}] stderr ({len(err)} bytes) -----\n")
-                            f.write(err + ("\n" if not err.endswith('\n') else ''))
-                            f.write(f"----- END [{b.parent.name}] stderr -----\n")
-                    except Exception:
-                        pass
-            logger.info('Page builder OK for %s in %.2fs', b.parent.name, dt)
-        except subprocess.CalledProcessError as e:
-            dt = time.time() - t0
+    skipped = 0
+    digests: Dict[str, str] = {}
+    if cache is not None:
+        template_ppt = load_original_ppt()
+        pending = []
+        for b in builders:
+            fp = page_fingerprint(b.parent, ROOT, template_ppt)
+            digests[b.parent.name] = fp['digest']
+            if not force and cache.is_fresh(b.parent.name, b.parent, fp['digest']):
+                skipped += 1
+                logger.info('Page %s unchanged (fingerprint %s), reusing previous outputs', b.parent.name, fp['digest'][:12])
+                continue
+            pending.append(b)
+        builders = pending
+    first_failure: Optional[Dict[str, Any]] = None
+    page_wall_total = 0.0
+    cpu0 = _children_cpu_seconds()
+    self0 = time.process_time()
+    t_start = time.time()
+    runtime = PageRuntime(ROOT, log=logger.info) if in_process else None
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {}
+        # 启动日志由工作线程在页面真正开始时记录：有界线程池排队中、或 fail_fast 取消的页面不会记为已启动
+        for b in builders:
+            if runtime is not None:
+                futures[pool.submit(_run_page_in_process, runtime, b, logger.info)] = b
+                continue
+            # 始终执行每页的 build.py（不传 mode）
+            futures[pool.submit(_run_page_builder, b, logger.info)] = b
+        for fut in as_completed(futures):
+            if fut.cancelled():
+                continue
+            res = fut.result()
+            executed += 1
+            page_wall_total += res['elapsed']
+            _report_page_result(logger, log_file_path, res)
+            if res['returncode'] == 0:
+                succeeded += 1
+                if cache is not None:
+                    cache.record(res['page'], futures[fut].parent, digests[res['page']])
+                continue
             failed += 1
-            out = (e.stdout or '').strip()
-            err = (e.stderr or '').strip()
-            if out:
-                snippet = out if len(out) <= 800 else (out[:400] + '\n...\n' + out[-400:])
-                logger.error('[%s] stdout on failure (%d bytes)\n%s', b.parent.name, len(out), snippet)
-                if log_file_path and out:
-                    try:
-                        log_file_path.parent.mkdir(parents=True, exist_ok=True)
-                        with log_file_path.open('a', encoding='utf-8') as f:
-                            f.write(f"\n----- BEGIN [{b.parent.name}] stdout on failure ({len(out)} bytes) -----\n")
-                            f.write(out + ("\n" if not out.endswith('\n') else ''))
-                            f.write(f"----- END [{b.parent.name}] stdout on failure -----\n")
-                    except Exception:
-                        pass
-            if err:
-                snippet = err if len(err) <= 800 else (err[:400] + '\n...\n' + err[-400:])
-                logger.error('[%s] stderr on failure (%d bytes)\n%s', b.parent.name, len(err), snippet)
-                if log_file_path and err:
-                    try:
-                        log_file_path.parent.mkdir(parents=True, exist_ok=True)
-                        with log_file_path.open('a', encoding='utf-8') as f:
-                            f.write(f"\n----- BEGIN [{b.parent.name}] stderr on failure ({len(err)} bytes) -----\n")
-                            f.write(err + ("\n" if not err.endswith('\n') else ''))
-                            f.write(f"----- END [{b.parent.name}] stderr on failure -----\n")
-                    except Exception:
-                        pass
-            logger.error('Page builder FAILED for %s in %.2fs (rc=%s): %s', b.parent.name, dt, e.returncode, e)
-            # 失败即停
+            if cache is not None:
+                cache.forget(res['page'])
+            if first_failure is None:
+                first_failure = res
+            # 失败即停：取消尚未启动的页面，已启动的页面自然结束后再抛出
             if fail_fast:
-                raise
-            # 否则继续执行后续页面，最终仍会汇总失败数量
-            continue
-    return {'executed': executed, 'succeeded': succeeded, 'failed': failed}
+                for f in futures:
+                    f.cancel()
+    wall = time.time() - t_start
+    if runtime is not None:
+        runtime.close()
+    if cache is not None:
+        cache.save()
+    cpu1 = _children_cpu_seconds()
+    cpu = (cpu1 - cpu0 + time.process_time() - self0) if (cpu0 is not None and cpu1 is not None) else None
+    if cpu is not None:
+        logger.info('Page builders timing: wall=%.2fs cpu=%.2fs sum(page wall)=%.2fs jobs=%d parallelism=%.2fx',
+                    wall, cpu, page_wall_total, jobs, (page_wall_total / wall) if wall > 0 else 0.0)
+    else:
+        logger.info('Page builders timing: wall=%.2fs sum(page wall)=%.2fs jobs=%d parallelism=%.2fx',
+                    wall, page_wall_total, jobs, (page_wall_total / wall) if wall > 0 else 0.0)
+    if fail_fast and first_failure is not None:
+        raise subprocess.CalledProcessError(first_failure['returncode'], first_failure['cmd'],
+                                            output=first_failure['stdout'], stderr=first_failure['stderr'])
+    # 否则继续执行后续页面，最终仍会汇总失败数量
+    return {'executed': executed, 'succeeded': succeeded, 'failed': failed, 'skipped': skipped, 'wall': wall, 'cpu': cpu}
 
 def load_original_ppt() -> Path:
     if CONFIG.exists():
         try:
-            cfg = yaml.safe_load(CONFIG.read_text(encoding='utf-8')) or {}
+            cfg = _root_config()
             val = (cfg.get('project') or {}).get('original_ppt')
             if val:
                 p = Path(val)
@@ -640,7 +839,19 @@ def main():
     ap.add_argument('--log-file', type=Path, default=default_log, help='日志输出文件路径')
     ap.add_argument('--log-level', default='INFO', choices=['DEBUG','INFO','WARNING','ERROR','CRITICAL'], help='日志级别')
     ap.add_argument('--fail-fast', action='store_true', help='出现页面构建失败时立即停止')
+    ap.add_argument('--jobs', '-j', type=int, default=1, help='逐页构建的并发进程数（默认 1，即串行）；大于 1 时每页以子进程运行')
+    ap.add_argument('--isolate', action='store_true', help='逐页构建改为每页独立子进程运行 build.py（默认在本进程内调用页面插件）')
+    ap.add_argument('--force', action='store_true', help='忽略构建缓存，强制重建所有页面')
+    ap.add_argument('--no-cache', action='store_true', help='不读写构建缓存（output/build_cache.json）')
+    ap.add_argument('--index-sidecar', action='store_true',
+                    help='逐页构建前为声明 neticle_db 的数据页（--pages 范围内）构建覆盖索引 sidecar，并校验其查询均为索引区间查找（存在全表扫描则报错）')
+    ap.add_argument('--zip-level', type=int, choices=range(0, 10), metavar='0-9',
+                    help='合成最终稿时 XML 部件的 deflate 级别（默认取 config.yaml packaging.xml_level，未配置为 6）')
+    ap.add_argument('--zip-threads', type=int, default=1,
+                    help='合成最终稿时并行压缩部件的线程数（默认 1 即串行；0 表示 CPU 核数）')
     args = ap.parse_args()
+    if args.zip_threads < 0:
+        ap.error(f'--zip-threads 不能为负: {args.zip_threads}')
 
     logger = _get_logger(args.log_file, getattr(logging, args.log_level.upper(), logging.INFO))
     logger.info('Starting build_all with pages=%s', args.pages)
@@ -656,13 +867,39 @@ def main():
     # 触发逐页构建的条件：显式 --build-pages 或提供了 --pages（表示希望跑指定页面）
     should_build_pages = bool(args.build_pages or (args.pages and len(args.pages) > 0))
     if should_build_pages:
+        from build_cache import BuildCache
+        from neticle_cube import prepare_shared_cube
+        from neticle_index import prepare_indexes
+        from neticle_snapshot import prepare_snapshots
+        # 数据准备针对声明 neticle_db 的数据页（p10/p13/p16/p18/p29 等，在 --pages 范围内）：
+        # 这些页面没有 build.py，由页面脚本、build_server 或 batch_build 运行，读取此处准备的 sidecar 与快照
+        scheduled = data_prep_pages(args.pages)
+        if scheduled:
+            logger.info('Data preparation pages: %s', ', '.join(scheduled))
+            if args.index_sidecar:
+                # 覆盖索引 sidecar：构建/刷新后校验页面查询均为索引区间查找（存在全表扫描则严格报错）
+                indexed = prepare_indexes(ROOT, scheduled, log=logger.info)
+                logger.info('Covering index sidecars ready: %d', indexed)
+            # 列式快照：每个 (countryId, 月份) 只读一次源库；立方体切片重建（阈值等配置变化）时读取快照
+            snap_stats = prepare_snapshots(ROOT, scheduled, log=logger.info)
+            logger.info('Neticle snapshots: databases=%d slices=%d exported=%d', snap_stats['databases'], snap_stats['slices'], snap_stats['exported'])
+            # 共享聚合阶段：各页面读取同一份提及立方体，每个 (countryId, 月份) 只扫描一次宽表
+            cube_stats = prepare_shared_cube(ROOT, scheduled, log=logger.info)
+            logger.info('Shared mention cube: databases=%d slices=%d scanned=%d', cube_stats['databases'], cube_stats['slices'], cube_stats['scanned'])
+        else:
+            logger.info('No neticle data pages in scope; skipping data preparation')
         logger.info('Running per-page builders...')
-        stats = run_page_builders(args.pages, logger=logger, fail_fast=args.fail_fast)
-        logger.info('Per-page builders summary: executed=%d succeeded=%d failed=%d', stats['executed'], stats['succeeded'], stats['failed'])
+        cache = None if args.no_cache else BuildCache(BUILD_CACHE_PATH)
+        stats = run_page_builders(args.pages, logger=logger, fail_fast=args.fail_fast, jobs=args.jobs, cache=cache, force=args.force,
+                                  isolate=args.isolate)
+        logger.info('Per-page builders summary: executed=%d succeeded=%d failed=%d skipped=%d', stats['executed'], stats['succeeded'], stats['failed'], stats['skipped'])
 
     # 始终合成最终稿；当模板损坏/不可读时严格报错（不允许回退 UNZIPPED）
     if _is_readable_zip(template_ppt):
-        compose_final(template_ppt, out_path, mode, charts)
+        policy = default_policy()
+        if args.zip_level is not None:
+            policy = CompressionPolicy(args.zip_level, policy.other_level, policy.store_extensions)
+        compose_final(template_ppt, out_path, mode, charts, policy=policy, threads=args.zip_threads)
         # 记录与终端一致的合成信息
         logger.info('Composed %s mode=%s charts=%s', out_path, mode, charts)
         # 轻量一致性校验（仅针对被替换的图表）
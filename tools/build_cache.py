@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+逐页构建缓存（内容指纹 → 复用上次产物）
+
+用途：
+- 为每个页面计算输入指纹：页面 config.yaml、根 config.yaml、页面脚本（*.py）、
+  页面模板（*.pptx 与 template/ 微模板）、根原始模板 PPT，以及配置中引用的数据库文件；
+- 页面脚本（含其导入的 tools/ 模块，递归）实际导入的共享模块（tools/*.py）一并计入，所有页面类型一致；
+  所有页面共用的进程内运行器（tools/page_plugin.py 及其依赖）同样计入；
+  带 build.py 的页面另固定计入共享单页构建引擎（tools/slide_build.py 及其依赖模块）；
+- 指纹未变化且上次记录的产物（output/*、*_data.xlsx）仍然完好时，跳过该页构建；
+- 缓存文件位于根输出目录 `build_cache.json`，由 tools/build.py 读写（经 write_json_atomic 原子替换）。
+
+说明：
+- 小文件（配置/脚本/模板）按内容做 sha256；数据库文件体积大，按 size + mtime_ns 识别；
+- 同一进程内对同一文件的哈希结果做记忆化（LRTBH.pptx 被所有页面共享，只哈希一次）。
+"""
+
+from __future__ import annotations
+
+import ast
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from page_config import load_page_config
+
+CACHE_VERSION = 3
+# 页面目录下不参与输入指纹的子目录（均为构建产物或临时文件）
+_SKIP_DIRS = {'output', 'tmp', 'logs', '__pycache__'}
+_DB_SUFFIXES = ('.sqlite', '.sqlite3', '.db')
+# 页面 build.py 为薄封装，实际构建逻辑位于以下共享模块（tools/ 下）
+# 所有页面共用的进程内运行器（tools/page_plugin.py）
+_RUNNER_MODULES = ('page_plugin.py',)
+_SLIDE_BUILD_MODULES = ('slide_build.py', 'slide_closure.py', 'zip_rawcopy.py', 'zip_policy.py', 'page_plugin.py', 'page_config.py')
+
+_hash_memo: Dict[Tuple[str, int, int], str] = {}
+_imports_memo: Dict[Tuple[str, int, int], Tuple[str, ...]] = {}
+
+
+def _file_sha256(p: Path) -> str:
+    st = p.stat()
+    key = (str(p.resolve()), st.st_size, st.st_mtime_ns)
+    cached = _hash_memo.get(key)
+    if cached:
+        return cached
+    h = hashlib.sha256()
+    with p.open('rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _hash_memo[key] = digest
+    return digest
+
+
+def _stat_token(p: Path) -> str:
+    st = p.stat()
+    return f'size={st.st_size};mtime_ns={st.st_mtime_ns}'
+
+
+def _load_yaml(p: Path) -> dict:
+    try:
+        return load_page_config(p)
+    except Exception:
+        return {}
+
+
+def _referenced_dbs(cfg: dict, base: Path) -> List[Path]:
+    """收集配置 data_sources 中引用的数据库路径（相对 base 解析）。"""
+    out: List[Path] = []
+    for v in (cfg.get('data_sources') or {}).values():
+        if isinstance(v, str) and v.lower().endswith(_DB_SUFFIXES):
+            p = Path(v)
+            out.append(p if p.is_absolute() else (base / p).resolve())
+    return out
+
+
+def _page_input_files(page_dir: Path) -> Iterable[Path]:
+    for p in sorted(page_dir.rglob('*')):
+        if not p.is_file():
+            continue
+        rel = p.relative_to(page_dir)
+        if rel.parts[0] in _SKIP_DIRS:
+            continue
+        # 生成的数据表属于产物，不计入输入
+        if p.suffix == '.xlsx' and p.stem.endswith('_data'):
+            continue
+        if p.suffix in ('.py', '.yaml', '.yml', '.pptx') or rel.parts[0] == 'template':
+            yield p
+
+
+def _imported_modules(p: Path) -> Tuple[str, ...]:
+    """脚本中导入的顶层模块名（含函数内的延迟导入）；无法解析时返回空。"""
+    st = p.stat()
+    key = (str(p.resolve()), st.st_size, st.st_mtime_ns)
+    cached = _imports_memo.get(key)
+    if cached is not None:
+        return cached
+    names = []
+    try:
+        tree = ast.parse(p.read_bytes(), filename=str(p))
+    except (SyntaxError, ValueError):
+        tree = None
+    for node in ast.walk(tree) if tree is not None else ():
+        if isinstance(node, ast.Import):
+            names += [a.name.split('.')[0] for a in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module.split('.')[0])
+    _imports_memo[key] = tuple(dict.fromkeys(names))
+    return _imports_memo[key]
+
+
+def _tools_dependencies(scripts: Iterable[Path], tools_dir: Path) -> List[str]:
+    """页面脚本递归导入的 tools/*.py 文件名（按名称排序）。"""
+    found: Dict[str, None] = {}
+    pending = list(scripts)
+    while pending:
+        for name in _imported_modules(pending.pop()):
+            mod = tools_dir / f'{name}.py'
+            if name not in found and mod.is_file():
+                found[name] = None
+                pending.append(mod)
+    return sorted(f'{name}.py' for name in found)
+
+
+def page_fingerprint(page_dir: Path, root: Path, original_ppt: Optional[Path] = None) -> Dict[str, Any]:
+    """计算页面输入指纹，返回 {'digest': str, 'inputs': {标识: token}}。"""
+    inputs: Dict[str, str] = {}
+    page_files = list(_page_input_files(page_dir))
+    for p in page_files:
+        inputs[f'page:{p.relative_to(page_dir).as_posix()}'] = _file_sha256(p)
+    tools_dir = root / 'tools'
+    # 页面（含数据页）均经 page_plugin 在进程内运行：运行器及其依赖模块一并计入
+    runner = [tools_dir / name for name in _RUNNER_MODULES]
+    modules = _tools_dependencies([p for p in page_files if p.suffix == '.py'] + runner, tools_dir)
+    modules = sorted(set(modules) | set(_RUNNER_MODULES))
+    if (page_dir / 'build.py').exists():
+        modules = sorted(set(modules) | set(_SLIDE_BUILD_MODULES))
+    for name in modules:
+        p = tools_dir / name
+        inputs[f'tools:{name}'] = _file_sha256(p) if p.exists() else 'missing'
+    root_cfg_path = root / 'config.yaml'
+    root_cfg = _load_yaml(root_cfg_path) if root_cfg_path.exists() else {}
+    if root_cfg_path.exists():
+        inputs['root:config.yaml'] = _file_sha256(root_cfg_path)
+    if original_ppt is not None:
+        inputs['root:original_ppt'] = _file_sha256(original_ppt) if original_ppt.exists() else 'missing'
+    page_cfg_path = page_dir / 'config.yaml'
+    page_cfg = _load_yaml(page_cfg_path) if page_cfg_path.exists() else {}
+    dbs = _referenced_dbs(page_cfg, page_dir) + _referenced_dbs(root_cfg, root)
+    for db in dict.fromkeys(dbs):
+        inputs[f'db:{db}'] = _stat_token(db) if db.exists() else 'missing'
+    h = hashlib.sha256()
+    for k in sorted(inputs):
+        h.update(f'{k}={inputs[k]}\n'.encode('utf-8'))
+    return {'digest': h.hexdigest(), 'inputs': inputs}
+
+
+def page_outputs(page_dir: Path) -> Dict[str, str]:
+    """收集页面产物（output/ 下文件与页面根的 *_data.xlsx）及其 size/mtime 标识。"""
+    outs: Dict[str, str] = {}
+    out_dir = page_dir / 'output'
+    if out_dir.exists():
+        for p in sorted(out_dir.rglob('*')):
+            if p.is_file():
+                outs[p.relative_to(page_dir).as_posix()] = _stat_token(p)
+    for p in sorted(page_dir.glob('*_data.xlsx')):
+        outs[p.name] = _stat_token(p)
+    return outs
+
+
+class BuildCache:
+    """页面指纹缓存：{page: {'digest':..., 'outputs': {...}}}，以 JSON 持久化。"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding='utf-8'))
+                if data.get('version') == CACHE_VERSION:
+                    self.entries = data.get('pages') or {}
+            except Exception:
+                self.entries = {}
+
+    def is_fresh(self, page: str, page_dir: Path, digest: str) -> bool:
+        """指纹一致且记录的产物全部存在且未被改动时视为可复用。"""
+        ent = self.entries.get(page)
+        if not ent or ent.get('digest') != digest:
+            return False
+        recorded = ent.get('outputs') or {}
+        if not recorded:
+            return False
+        current = page_outputs(page_dir)
+        return all(current.get(k) == v for k, v in recorded.items())
+
+    def record(self, page: str, page_dir: Path, digest: str) -> None:
+        self.entries[page] = {'digest': digest, 'outputs': page_outputs(page_dir)}
+
+    def forget(self, page: str) -> None:
+        self.entries.pop(page, None)
+
+    def save(self) -> None:
+        # 同目录唯一临时文件 + os.replace：并发构建（或与 build_server 同时运行）不会互相覆盖临时文件
+        from template_manifest import write_json_atomic
+        write_json_atomic(self.path, {'version': CACHE_VERSION, 'pages': self.entries})
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+常驻构建服务：模板、页面脚本与数据库连接在进程内保持热状态，按任务“构建页面 X（月份 Y）”
+
+背景：
+- 每个页面构建都要付出解释器启动、导入 pandas/openpyxl/lxml、重新解析 YAML、
+  重新打开 LRTBH.pptx 与 SQLite 的代价；20 页的一份报告要重复 40 余次，
+  反复调试单个页面时几秒的固定开销远大于页面本身的计算。
+
+做法：
+- `serve` 启动常驻进程，在本地端点上监听（POSIX 为 <output_root>/build-server.sock，
+  Windows 为命名管道），连接经随机 authkey 认证（<output_root>/build-server.key，仅属主可读）；
+- 热状态（tools/page_plugin.py 的 PageRuntime）：
+  - 原始模板 DeckTemplate（tools/slide_build.py）只打开一次，文件变化（size/mtime）后自动重开；
+  - 页面脚本按 (size, mtime_ns) 缓存编译后的代码对象，未修改的脚本不再重新编译，
+    已导入的 pandas/openpyxl/lxml 与共享工具模块常驻；
+  - 只读 SQLite 连接由 tools/sqlite_ro.py 的连接池按线程复用（任务一律在服务主线程串行执行）；
+  - 页面配置经 tools/page_config.py 缓存解析结果；
+- 任务：逐页进程内执行页面插件 generate → fill → package（tools/page_plugin.py）；
+  - period（YYYY-MM）经 page_config.config_overrides() 作用于本任务读取的页面配置，不改写 config.yaml；
+  - 页面输出（stdout/stderr）随结果返回客户端；
+- 客户端子命令只导入标准库、page_config（yaml）与 page_plugin，服务端模块（slide_build 等）按需导入；
+- 任务失败只影响本页（fail_fast 时跳过其余页面），服务继续运行；客户端中途断开只记录日志，不影响服务；
+  构建缓存（build_cache.json）不参与。
+
+用法：
+    python tools/build_server.py serve                      # 前台常驻（Ctrl-C 退出）
+    python tools/build_server.py build p14 p10 --period 2025-08
+    python tools/build_server.py status
+    python tools/build_server.py stop
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import os
+import sys
+import time
+import traceback
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from page_config import load_page_config
+from page_plugin import PageRuntime, page_name
+
+ROOT = Path(__file__).resolve().parents[1]
+PIPE_ADDRESS = r'\\.\pipe\gen_ppt-build-server'
+
+
+def _output_root(root: Path) -> Path:
+    cfg = load_page_config(root / 'config.yaml')
+    out = Path((cfg.get('project') or {}).get('output_root', 'output'))
+    return out if out.is_absolute() else root / out
+
+
+def server_address(root: Path = ROOT) -> str:
+    """本地监听端点：POSIX 为 Unix 套接字文件，Windows 为命名管道。"""
+    if os.name == 'nt':
+        return PIPE_ADDRESS
+    return str(_output_root(root) / 'build-server.sock')
+
+
+def key_path(root: Path = ROOT) -> Path:
+    return _output_root(root) / 'build-server.key'
+
+
+def _write_key(path: Path) -> bytes:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    key = os.urandom(32)
+    fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(key)
+    return key
+
+
+class BuildServer:
+    """常驻构建进程的热状态与任务处理。"""
+
+    def __init__(self, root: Path = ROOT, log=print):
+        self.root = Path(root)
+        self.log = log
+        self.started = time.time()
+        self.jobs = 0
+        self.runtime = PageRuntime(self.root, log=log)
+        self._stop = False
+
+    # ---- 热状态 ----
+    def warm(self) -> None:
+        """预热：导入页面共用的重型库并打开原始模板（模板缺失时仅记录）。"""
+        t0 = time.perf_counter()
+        import lxml.etree  # noqa: F401
+        import openpyxl  # noqa: F401
+        import pandas  # noqa: F401
+        try:
+            self.runtime.deck()
+        except FileNotFoundError as e:
+            self.log(f'[build-server] 暂不载入模板：{e}')
+        self.log(f'[build-server] 预热完成，用时 {time.perf_counter() - t0:.2f}s')
+
+    def close(self) -> None:
+        self.runtime.close()
+
+    def run_job(self, pages: List[str], period: Optional[str] = None, fail_fast: bool = False) -> Dict[str, Any]:
+        from page_config import config_overrides, validate_period
+        names = [page_name(p) for p in pages]
+        if not names:
+            raise ValueError('任务未指定页面')
+        if period:
+            period = validate_period(period)
+        self.jobs += 1
+        t_job = time.perf_counter()
+        results = []
+        with config_overrides(period=period):
+            for page in names:
+                if fail_fast and any(not r['ok'] for r in results):
+                    results.append({'page': page, 'ok': False, 'skipped': True, 'elapsed': 0.0,
+                                    'output': '', 'error': 'fail_fast：前序页面失败，已跳过', 'outputs': []})
+                    continue
+                buf = io.StringIO()
+                t0 = time.perf_counter()
+                res = {'page': page, 'ok': True, 'skipped': False, 'error': None, 'outputs': []}
+                try:
+                    with contextlib.redirect_stdout(buf), contextlib.redirect_stderr(buf):
+                        res['outputs'] = self.runtime.run_page(page)
+                except BaseException as e:
+                    if isinstance(e, KeyboardInterrupt):
+                        raise
+                    res['ok'] = False
+                    res['error'] = ''.join(traceback.format_exception(type(e), e, e.__traceback__))
+                res['elapsed'] = time.perf_counter() - t0
+                res['output'] = buf.getvalue()
+                results.append(res)
+                self.log(f"[build-server] job#{self.jobs} {page}{' ' + period if period else ''}: "
+                         f"{'OK' if res['ok'] else 'FAILED'} {res['elapsed']:.2f}s")
+        return {'ok': all(r['ok'] for r in results), 'period': period, 'results': results,
+                'elapsed': time.perf_counter() - t_job}
+
+    def status(self) -> Dict[str, Any]:
+        return {'ok': True, 'pid': os.getpid(), 'uptime': time.time() - self.started, 'jobs': self.jobs,
+                'template': str(self.runtime.deck_loaded) if self.runtime.deck_loaded else None,
+                'compiled_scripts': self.runtime.compiled_scripts}
+
+    # ---- 服务循环 ----
+    def handle(self, msg: Any) -> Dict[str, Any]:
+        if not isinstance(msg, dict):
+            return {'ok': False, 'error': f'无效请求: {msg!r}'}
+        cmd = msg.get('cmd')
+        try:
+            if cmd == 'build':
+                return self.run_job(msg.get('pages') or [], msg.get('period'), bool(msg.get('fail_fast')))
+            if cmd == 'status':
+                return self.status()
+            if cmd == 'stop':
+                self._stop = True
+                return {'ok': True}
+            return {'ok': False, 'error': f'未知命令: {cmd!r}'}
+        except Exception as e:
+            return {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+
+    def serve(self, address: Optional[str] = None, warm: bool = True) -> None:
+        address = address or server_address(self.root)
+        kp = key_path(self.root)
+        if os.name != 'nt' and Path(address).exists():
+            try:
+                request({'cmd': 'status'}, self.root, address)
+            except RuntimeError:
+                Path(address).unlink()   # 上次异常退出遗留的套接字文件
+            else:
+                raise RuntimeError(f'构建服务已在运行: {address}')
+        authkey = _write_key(kp)
+        if warm:
+            self.warm()
+        try:
+            with Listener(address, authkey=authkey) as listener:
+                self.log(f'[build-server] 监听 {address}（pid={os.getpid()}）')
+                while not self._stop:
+                    try:
+                        conn = listener.accept()
+                    except Exception as e:
+                        self.log(f'[build-server] 拒绝连接: {e}')
+                        continue
+                    # 单个客户端中断（未发请求即断开、等待应答时断开、认证失败）只影响本连接，服务继续运行
+                    try:
+                        with conn:
+                            msg = conn.recv()
+                            conn.send(self.handle(msg))
+                    except (OSError, EOFError, AuthenticationError) as e:
+                        self.log(f'[build-server] 连接中断: {type(e).__name__}: {e}')
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+            with contextlib.suppress(FileNotFoundError):
+                kp.unlink()
+            self.log('[build-server] 已停止')
+
+
+# ---- 客户端 ----
+def request(msg: Dict[str, Any], root: Path = ROOT, address: Optional[str] = None) -> Dict[str, Any]:
+    """向运行中的构建服务发送请求并返回应答；服务未运行时抛 RuntimeError。"""
+    address = address or server_address(root)
+    kp = key_path(root)
+    if not kp.exists():
+        raise RuntimeError(f'构建服务未运行（缺少 {kp}），请先执行: python tools/build_server.py serve')
+    try:
+        conn = Client(address, authkey=kp.read_bytes())
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise RuntimeError(f'构建服务未运行（{address}）：{e}')
+    with conn:
+        conn.send(msg)
+        return conn.recv()
+
+
+def _print_job(reply: Dict[str, Any]) -> None:
+    for r in reply.get('results') or []:
+        state = 'SKIPPED' if r.get('skipped') else ('OK' if r['ok'] else 'FAILED')
+        print(f"----- [{r['page']}] {state} {r['elapsed']:.2f}s -----")
+        if r.get('output'):
+            print(r['output'], end='' if r['output'].endswith('\n') else '\n')
+        for o in r.get('outputs') or []:
+            print(f'  → {o}')
+        if r.get('error'):
+            print(r['error'], end='' if r['error'].endswith('\n') else '\n', file=sys.stderr)
+    results = reply.get('results') or []
+    failed = sum(1 for r in results if not r['ok'])
+    period = f"（{reply['period']}）" if reply.get('period') else ''
+    print(f"[build-server] {len(results)} 页{period}：成功 {len(results) - failed}，失败 {failed}，"
+          f"用时 {reply.get('elapsed', 0.0):.2f}s")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description='常驻构建服务（热模板/热数据库连接，按任务构建页面）')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    sp = sub.add_parser('serve', help='前台启动构建服务')
+    sp.add_argument('--no-warm', action='store_true', help='启动时不预热（不预先导入重型库与打开模板）')
+    bp = sub.add_parser('build', help='提交构建任务')
+    bp.add_argument('pages', nargs='+', help='页面（如 p10 p14 或 10 14）')
+    bp.add_argument('--period', help='统计月份 YYYY-MM（覆盖页面配置中的区间，不改写 config.yaml）')
+    bp.add_argument('--fail-fast', action='store_true', help='任一页面失败后跳过其余页面')
+    sub.add_parser('status', help='查看服务状态')
+    sub.add_parser('stop', help='停止服务')
+    args = ap.parse_args(argv)
+
+    if args.cmd == 'serve':
+        BuildServer().serve(warm=not args.no_warm)
+        return 0
+    if args.cmd == 'build':
+        if args.period:
+            from page_config import validate_period
+            validate_period(args.period)
+        reply = request({'cmd': 'build', 'pages': args.pages, 'period': args.period, 'fail_fast': args.fail_fast})
+        if reply.get('results') is None:
+            raise RuntimeError(f"构建任务被拒绝: {reply.get('error')}")
+        _print_job(reply)
+        return 0 if reply['ok'] else 1
+    reply = request({'cmd': args.cmd})
+    if not reply.get('ok'):
+        raise RuntimeError(f"请求失败: {reply.get('error')}")
+    if args.cmd == 'status':
+        print(f"[build-server] pid={reply['pid']} 运行 {reply['uptime']:.0f}s，已处理任务 {reply['jobs']} 个，"
+              f"缓存脚本 {reply['compiled_scripts']} 个，模板 {reply['template'] or '未载入'}")
+    else:
+        print('[build-server] 已请求停止')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
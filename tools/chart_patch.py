@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""
+图表部件补丁引擎：每个 chart 部件只解析一次，在同一棵树上完成缓存、公式、标签与颜色修改后一次序列化
+
+背景：
+- numCache/strCache 改写在页面填充脚本里有五份实现（p10 _update_pie_chart_xml/_update_line_chart_xml/
+  _update_scatter_chart_xml、p13 _update_line_chart_xml、p16 _overwrite_num_cache/_overwrite_str_cache、
+  p18 _write_num_cache_points、p29 update_chart_xml_caches），行为各不相同（ptCount 是否同步、formatCode 是否保留）；
+- 同一 chart 部件在一次填充中被 externalData 绑定、公式、缓存、标签、颜色等步骤各自解析、序列化一次，
+  每步都用 `.//c:ser` 之类的后代搜索重新定位节点；
+- 缺失节点一律追加到父节点末尾，新建的 c:f、c:dLbls、a:solidFill 等会落在 schema 规定的位置之后。
+
+做法：
+- ChartPatch：lxml 解析部件一次，用预编译的 etree.XPath 建立图表类型（c:plotArea 下的 *Chart）与
+  系列索引（Series：所属图表类型、在图表内的序号、c:idx、名称）；
+- 编辑直接作用于同一棵树：
+  - Series.set_values()/set_labels()：重写 numCache/strCache 的 c:pt，ptCount 同步，保留 formatCode/extLst，
+    同一角色下的 numLit/strLit 移除；Series.set_formula()/set_name()；读取用 Series.cache()/formula()/name；
+  - ChartPatch.bind_workbook()（externalData r:id 与 autoUpdate）、auto_scale_value_axes()、remove_extensions()；
+  - ensure()/set_flags()/set_number_format()/set_fill()：缺失节点按 schema 子元素顺序插入；
+- save()/ChartPatch.edit()：一次序列化写回 OpcPackage（XML 声明 UTF-8、standalone=yes，与模板一致）；
+- ChartTransaction：按部件排队多个编辑操作（标签 + 函数），commit() 时在同一棵树上依次执行并写回一次，
+  日志记录该部件的解析/序列化/写回次数；失败策略二选一：严格（任一操作失败抛 ChartEditError，部件不写回）
+  或 keep_going（记录失败继续执行，可只在有操作报告改动时写回）；
+- 严格报错：部件缺失、角色已是另一种引用（如 c:cat 为 numRef 却写字符串缓存）时抛错。
+
+用法：
+    with ChartPatch.edit(pkg, 'ppt/charts/chart1.xml') as chart:
+        chart.bind_workbook('rId1')
+        for ser in chart.series_of('lineChart'):
+            ser.set_labels(months)
+            ser.set_values(values, fmt=lambda v: f'{float(v):.1f}')
+            ser.set_formula('val', 'Sheet1!$B$2:$B$7')
+
+    tx = ChartTransaction(pkg, 'ppt/charts/chart2.xml', log=logger.info)
+    tx.add('刷新缓存', update_caches, values).add('移除扩展', lambda c: c.remove_extensions())
+    tx.commit()
+"""
+
+from __future__ import annotations
+
+import contextlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from lxml import etree
+
+NS = {
+    'c': 'http://schemas.openxmlformats.org/drawingml/2006/chart',
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+}
+C = '{%s}' % NS['c']
+A = '{%s}' % NS['a']
+R_ID = '{%s}id' % NS['r']
+
+_X_PLOT_AREA = etree.XPath('c:chart/c:plotArea/*', namespaces=NS)
+_X_SER = etree.XPath('c:ser', namespaces=NS)
+_X_PTS = etree.XPath('c:pt', namespaces=NS)
+_X_NAME = etree.XPath('string((c:tx/c:strRef/c:strCache/c:pt/c:v | c:tx/c:v)[1])', namespaces=NS)
+_X_VAL_AX = etree.XPath('c:chart/c:plotArea/c:valAx', namespaces=NS)
+_X_EXT_LST = etree.XPath('//c:extLst', namespaces=NS)
+
+# 角色（c:ser 下的数据节点）默认的引用类型
+_REF_KIND = {'tx': 'str', 'cat': 'str', 'val': 'num', 'xVal': 'num', 'yVal': 'num', 'bubbleSize': 'num'}
+_FILLS = ('noFill', 'solidFill', 'gradFill', 'blipFill', 'pattFill', 'grpFill')
+
+# 父节点（按本地名）→ 子元素 schema 顺序；各图表类型的 ser / *Chart 取并集（相对顺序在各类型中一致）
+_PLOT_ORDER = ('barDir', 'grouping', 'scatterStyle', 'radarStyle', 'varyColors', 'ser', 'dLbls', 'gapWidth',
+               'overlap', 'serLines', 'dropLines', 'hiLowLines', 'upDownBars', 'marker', 'smooth',
+               'firstSliceAng', 'holeSize', 'axId', 'extLst')
+_RPR_ORDER = ('ln',) + _FILLS + ('effectLst', 'effectDag', 'highlight', 'uLnTx', 'uLn', 'uFillTx', 'uFill',
+                                 'latin', 'ea', 'cs', 'sym', 'hlinkClick', 'hlinkMouseOver', 'rtl', 'extLst')
+_CHILD_ORDER: Dict[str, Sequence[str]] = {
+    'chartSpace': ('date1904', 'lang', 'roundedCorners', 'AlternateContent', 'clrMapOvr', 'pivotSource',
+                   'protection', 'chart', 'spPr', 'txPr', 'externalData', 'printSettings', 'userShapes', 'extLst'),
+    'ser': ('idx', 'order', 'tx', 'spPr', 'invertIfNegative', 'pictureOptions', 'marker', 'explosion', 'dPt',
+            'dLbls', 'trendline', 'errBars', 'cat', 'val', 'xVal', 'yVal', 'smooth', 'shape', 'bubbleSize',
+            'bubble3D', 'extLst'),
+    'dPt': ('idx', 'invertIfNegative', 'marker', 'bubble3D', 'explosion', 'spPr', 'pictureOptions', 'extLst'),
+    'dLbls': ('dLbl', 'delete', 'numFmt', 'spPr', 'txPr', 'dLblPos', 'showLegendKey', 'showVal', 'showCatName',
+              'showSerName', 'showPercent', 'showBubbleSize', 'separator', 'showLeaderLines', 'leaderLines',
+              'extLst'),
+    'dLbl': ('idx', 'delete', 'layout', 'tx', 'numFmt', 'spPr', 'txPr', 'dLblPos', 'showLegendKey', 'showVal',
+             'showCatName', 'showSerName', 'showPercent', 'showBubbleSize', 'separator', 'extLst'),
+    'numRef': ('f', 'numCache', 'extLst'),
+    'strRef': ('f', 'strCache', 'extLst'),
+    'numCache': ('formatCode', 'ptCount', 'pt', 'extLst'),
+    'strCache': ('ptCount', 'pt', 'extLst'),
+    'scaling': ('logBase', 'orientation', 'max', 'min', 'extLst'),
+    'spPr': ('xfrm', 'custGeom', 'prstGeom') + _FILLS + ('ln', 'effectLst', 'effectDag', 'scene3d', 'sp3d', 'extLst'),
+    'ln': _FILLS + ('prstDash', 'custDash', 'round', 'bevel', 'miter', 'headEnd', 'tailEnd', 'extLst'),
+    'txPr': ('bodyPr', 'lstStyle', 'p'),
+    'bodyPr': ('prstTxWarp', 'noAutofit', 'normAutofit', 'spAutoFit', 'scene3d', 'sp3d', 'flatTx', 'extLst'),
+    'p': ('pPr', 'r', 'br', 'fld', 'endParaRPr'),
+    'pPr': ('lnSpc', 'spcBef', 'spcAft', 'buClrTx', 'buClr', 'buSzTx', 'buSzPct', 'buSzPts', 'buFontTx', 'buFont',
+            'buNone', 'buAutoNum', 'buChar', 'buBlip', 'tabLst', 'defRPr', 'extLst'),
+    'r': ('rPr', 't'),
+    'rPr': _RPR_ORDER,
+    'defRPr': _RPR_ORDER,
+}
+_RANKS = {parent: {name: i for i, name in enumerate(order)} for parent, order in _CHILD_ORDER.items()}
+_PLOT_RANKS = {name: i for i, name in enumerate(_PLOT_ORDER)}
+
+
+def local_name(el) -> str:
+    tag = el.tag if isinstance(el.tag, str) else ''
+    return tag.rpartition('}')[2]
+
+
+def _qname(tag: str) -> str:
+    """'c:ser' → '{...chart}ser'；已是 Clark 形式时原样返回。"""
+    prefix, sep, name = tag.partition(':')
+    return f'{{{NS[prefix]}}}{name}' if sep else tag
+
+
+def _ranks_for(parent) -> Optional[Dict[str, int]]:
+    name = local_name(parent)
+    return _RANKS.get(name) or (_PLOT_RANKS if name.endswith('Chart') else None)
+
+
+def insert_child(parent, child):
+    """按 schema 子元素顺序把 child 插入 parent（未登记的父节点或子元素追加到末尾）。"""
+    ranks = _ranks_for(parent)
+    rank = ranks.get(local_name(child)) if ranks else None
+    if rank is not None:
+        for i, existing in enumerate(parent):
+            r = ranks.get(local_name(existing))
+            if r is not None and r > rank:
+                parent.insert(i, child)
+                return child
+    parent.append(child)
+    return child
+
+
+def ensure(parent, *path: str):
+    """逐级取直接子元素（'c:dLbls'、'a:bodyPr' 等），缺失时按 schema 顺序创建；返回最后一级。"""
+    el = parent
+    for tag in path:
+        q = _qname(tag)
+        child = el.find(q)
+        el = child if child is not None else insert_child(el, etree.Element(q))
+    return el
+
+
+def remove_children(parent, *tags: str) -> int:
+    """删除 parent 下指定的直接子元素，返回删除个数。"""
+    removed = 0
+    for tag in tags:
+        for child in parent.findall(_qname(tag)):
+            parent.remove(child)
+            removed += 1
+    return removed
+
+
+def set_flags(parent, **flags: Any) -> None:
+    """设置 `<c:name val="..."/>` 形式的子元素（如 dLbls 的 showVal=1、dLblPos='t'）；布尔值写作 1/0。"""
+    for name, value in flags.items():
+        if isinstance(value, bool):
+            value = int(value)
+        ensure(parent, f'c:{name}').set('val', str(value))
+
+
+def set_number_format(parent, code: str, source_linked: bool = False) -> None:
+    """设置 c:numFmt（数据标签、坐标轴的数字格式）。"""
+    fmt = ensure(parent, 'c:numFmt')
+    fmt.set('formatCode', code)
+    fmt.set('sourceLinked', '1' if source_linked else '0')
+
+
+def set_fill(owner, rgb: str, line: bool = False, fill: bool = True, reset: bool = False) -> None:
+    """为系列/数据点（owner 为 c:ser 或 c:dPt）设置纯色：fill 为区域填充，line 为线条颜色；reset 先清空 c:spPr。"""
+    sp_pr = ensure(owner, 'c:spPr')
+    if reset:
+        for child in list(sp_pr):
+            sp_pr.remove(child)
+    targets = ([sp_pr] if fill else []) + ([ensure(sp_pr, 'a:ln')] if line else [])
+    for target in targets:
+        remove_children(target, *(f'a:{f}' for f in _FILLS))
+        ensure(target, 'a:solidFill', 'a:srgbClr').set('val', str(rgb).lstrip('#').upper())
+
+
+def fill_color(owner, line: bool = False) -> Optional[str]:
+    """读取系列/数据点的纯色（srgbClr 或 schemeClr 的 val）；line=True 时读取线条颜色。"""
+    sp_pr = owner.find(C + 'spPr')
+    if sp_pr is None:
+        return None
+    host = sp_pr.find(A + 'ln') if line else sp_pr
+    solid = host.find(A + 'solidFill') if host is not None else None
+    if solid is None:
+        return None
+    for tag in ('srgbClr', 'schemeClr'):
+        clr = solid.find(A + tag)
+        if clr is not None:
+            return clr.get('val')
+    return None
+
+
+def _write_points(cache, values: Sequence[Any], fmt: Callable[[Any], str],
+                  indices: Optional[Sequence[int]] = None) -> None:
+    if indices is not None and len(indices) != len(values):
+        raise ValueError(f'点索引数量({len(indices)})与值数量({len(values)})不一致')
+    for pt in _X_PTS(cache):
+        cache.remove(pt)
+    idxs = list(indices) if indices is not None else list(range(len(values)))
+    count = ensure(cache, 'c:ptCount')
+    count.set('val', str(max(idxs) + 1 if idxs else 0))
+    pos = cache.index(count) + 1
+    for i, (idx, value) in enumerate(zip(idxs, values)):
+        pt = etree.Element(C + 'pt', idx=str(idx))
+        etree.SubElement(pt, C + 'v').text = fmt(value)
+        cache.insert(pos + i, pt)
+
+
+class Series:
+    """系列索引项：所属图表类型、在该图表内的序号（index）与 c:ser 元素。"""
+
+    __slots__ = ('chart', 'el', 'plot', 'chart_type', 'index')
+
+    def __init__(self, chart: 'ChartPatch', el, plot, index: int):
+        self.chart = chart
+        self.el = el
+        self.plot = plot
+        self.chart_type = local_name(plot)
+        self.index = index
+
+    def __repr__(self) -> str:
+        return f'<Series {self.chart_type}[{self.index}] {self.name!r}>'
+
+    @property
+    def idx(self) -> Optional[int]:
+        node = self.el.find(C + 'idx')
+        return int(node.get('val')) if node is not None and node.get('val') is not None else None
+
+    @property
+    def name(self) -> Optional[str]:
+        """系列名（c:tx 的 strCache 首点或 c:v），缺失时为 None。"""
+        return _X_NAME(self.el).strip() or None
+
+    @property
+    def points(self) -> List[Any]:
+        """数据点节点 c:dPt（文档顺序）。"""
+        return self.el.findall(C + 'dPt')
+
+    # ---- 读取 ----
+    def ref(self, role: str, kind: Optional[str] = None, create: bool = False):
+        """角色（tx/cat/val/xVal/yVal）下的 c:numRef/c:strRef；create=True 时补齐缺失结构。"""
+        kind = kind or _REF_KIND[role]
+        node = self.el.find(C + role)
+        if node is None:
+            if not create:
+                return None
+            node = insert_child(self.el, etree.Element(C + role))
+        ref = node.find(f'{C}{kind}Ref')
+        if ref is None and create:
+            other = 'num' if kind == 'str' else 'str'
+            if node.find(f'{C}{other}Ref') is not None:
+                raise ValueError(f'{self.chart.part} 系列 {self.index} 的 c:{role} 为 {other}Ref，不能写入 {kind}Ref')
+            remove_children(node, 'c:numLit', 'c:strLit')
+            ref = insert_child(node, etree.Element(f'{C}{kind}Ref'))
+        return ref
+
+    def cache(self, role: str) -> Optional[List[str]]:
+        """角色的缓存/字面量文本（按 pt@idx 排序）；不存在时为 None。"""
+        node = self.el.find(C + role)
+        if node is None:
+            return None
+        for path in ('c:strRef/c:strCache', 'c:numRef/c:numCache', 'c:strLit', 'c:numLit'):
+            store = node.find(path, NS)
+            if store is not None:
+                pts = sorted(_X_PTS(store), key=lambda p: int(p.get('idx', 0)))
+                return [p.findtext(C + 'v') for p in pts]
+        return None
+
+    def formula(self, role: str) -> Optional[str]:
+        node = self.el.find(C + role)
+        if node is None:
+            return None
+        f = node.find('c:strRef/c:f', NS)
+        if f is None:
+            f = node.find('c:numRef/c:f', NS)
+        return f.text if f is not None else None
+
+    # ---- 写入 ----
+    def set_values(self, values: Sequence[Any], role: str = 'val', fmt: Callable[[Any], str] = str,
+                   indices: Optional[Sequence[int]] = None):
+        """重写数值缓存（numRef/numCache），返回 c:numCache。"""
+        cache = ensure(self.ref(role, 'num', create=True), 'c:numCache')
+        _write_points(cache, values, fmt, indices)
+        return cache
+
+    def set_labels(self, labels: Sequence[Any], role: str = 'cat', indices: Optional[Sequence[int]] = None):
+        """重写字符串缓存（strRef/strCache），返回 c:strCache。"""
+        cache = ensure(self.ref(role, 'str', create=True), 'c:strCache')
+        _write_points(cache, labels, lambda v: '' if v is None else str(v), indices)
+        return cache
+
+    def set_formula(self, role: str, formula: str, kind: Optional[str] = None):
+        """设置角色引用的公式 c:f（位于 numRef/strRef 的首位）。"""
+        f = ensure(self.ref(role, kind, create=True), 'c:f')
+        f.text = formula
+        return f
+
+    def set_name(self, name: str, formula: Optional[str] = None) -> None:
+        """系列名：c:tx/c:strRef 的单点缓存（可同时设置公式）。"""
+        if formula is not None:
+            self.set_formula('tx', formula)
+        self.set_labels([name], role='tx')
+
+    def data_labels(self):
+        """系列级 c:dLbls（缺失时创建）。"""
+        return ensure(self.el, 'c:dLbls')
+
+
+class ChartPatch:
+    """一个 chart 部件的解析树、系列索引与一次性写回。"""
+
+    def __init__(self, xml: bytes, part: str = ''):
+        self.part = part
+        self.serializations = 0
+        self.root = etree.fromstring(xml)
+        self.plots = [el for el in _X_PLOT_AREA(self.root) if local_name(el).endswith('Chart')]
+        self.series = [Series(self, ser, plot, i) for plot in self.plots for i, ser in enumerate(_X_SER(plot))]
+
+    @classmethod
+    def open(cls, pkg, part: str) -> 'ChartPatch':
+        if not pkg.exists(part):
+            raise FileNotFoundError(f'图表部件不存在: {part}')
+        return cls(pkg.read(part), part)
+
+    @classmethod
+    @contextlib.contextmanager
+    def edit(cls, pkg, part: str) -> Iterator['ChartPatch']:
+        """打开 → 修改 → 正常退出时一次写回（异常时不写回）。"""
+        chart = cls.open(pkg, part)
+        yield chart
+        chart.save(pkg)
+
+    # ---- 索引 ----
+    @property
+    def chart_types(self) -> List[str]:
+        return [local_name(p) for p in self.plots]
+
+    def has(self, chart_type: str) -> bool:
+        return chart_type in self.chart_types
+
+    def plot(self, chart_type: str):
+        """首个指定类型的图表节点（如 'pieChart'）；不存在时严格报错。"""
+        for p in self.plots:
+            if local_name(p) == chart_type:
+                return p
+        raise KeyError(f'{self.part} 未包含 c:{chart_type}')
+
+    def series_of(self, chart_type: Optional[str] = None) -> List[Series]:
+        return [s for s in self.series if chart_type is None or s.chart_type == chart_type]
+
+    def data_labels(self, chart_type: str):
+        """图表级 c:dLbls（缺失时按顺序插在系列之后）。"""
+        return ensure(self.plot(chart_type), 'c:dLbls')
+
+    # ---- 图表级修改 ----
+    def bind_workbook(self, rel_id: Optional[str] = None, auto_update: bool = True, create: bool = True):
+        """externalData：设置 r:id（给定时）与 c:autoUpdate；create=False 且节点缺失时返回 None。"""
+        ext = self.root.find(C + 'externalData')
+        if ext is None:
+            if not create:
+                return None
+            ext = insert_child(self.root, etree.Element(C + 'externalData'))
+        if rel_id is not None:
+            ext.set(R_ID, rel_id)
+        if auto_update:
+            ensure(ext, 'c:autoUpdate').set('val', '1')
+        ext.attrib.pop('autoUpdate', None)   # 非法属性（只能用子元素）
+        return ext
+
+    def auto_scale_value_axes(self, major_unit: bool = False) -> int:
+        """删除数值轴 scaling 的 min/max（major_unit=True 时同时删除 majorUnit），返回处理的轴数。"""
+        axes = _X_VAL_AX(self.root)
+        for ax in axes:
+            scaling = ax.find(C + 'scaling')
+            if scaling is not None:
+                remove_children(scaling, 'c:min', 'c:max')
+            if major_unit:
+                remove_children(ax, 'c:majorUnit')
+        return len(axes)
+
+    def remove_extensions(self, match: Optional[Callable[[Any], bool]] = None) -> int:
+        """删除扩展：match 为 None 时删除全部 c:extLst；否则只删除 match(ext) 为真的 c:ext（空 extLst 一并删除）。"""
+        removed = 0
+        for ext_lst in _X_EXT_LST(self.root):
+            parent = ext_lst.getparent()
+            if parent is None:
+                continue
+            if match is None:
+                parent.remove(ext_lst)
+                removed += 1
+                continue
+            hits = [ext for ext in ext_lst if match(ext)]
+            for ext in hits:
+                ext_lst.remove(ext)
+            removed += len(hits)
+            if hits and len(ext_lst) == 0:
+                parent.remove(ext_lst)
+        return removed
+
+    # ---- 写回 ----
+    def to_bytes(self) -> bytes:
+        self.serializations += 1
+        return etree.tostring(self.root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+    def save(self, pkg) -> None:
+        pkg.write(self.part, self.to_bytes())
+
+
+class ChartEditError(RuntimeError):
+    """事务内某个编辑操作失败（label 为操作名，__cause__ 为原始异常）。"""
+
+    def __init__(self, part: str, label: str, error: Exception):
+        super().__init__(f'{label}失败: {error}')
+        self.part = part
+        self.label = label
+
+
+def _is_change(res: Any) -> bool:
+    """操作返回值是否表示有改动；不对元素做真值测试（lxml 元素的真值取决于是否有子节点）。"""
+    if res is None or res is False:
+        return False
+    if isinstance(res, (int, float)):
+        return res != 0
+    return True
+
+
+class ChartTransaction:
+    """一个 chart 部件的编辑事务：构造时解析一次，排队的操作在 commit() 时依次作用于同一棵树，最后写回一次。"""
+
+    def __init__(self, pkg, part: str, log: Optional[Callable[[str], None]] = None,
+                 keep_going: bool = False, only_if_changed: bool = False):
+        self.pkg = pkg
+        self.chart = ChartPatch.open(pkg, part)
+        self.log = log
+        self.keep_going = keep_going
+        self.only_if_changed = only_if_changed
+        self.ops: List[Tuple[str, Callable[..., Any], tuple, dict]] = []
+        self.errors: List[ChartEditError] = []
+        self.committed = False
+
+    @property
+    def part(self) -> str:
+        return self.chart.part
+
+    def add(self, label: str, op: Callable[..., Any], *args: Any, **kwargs: Any) -> 'ChartTransaction':
+        """排队一个操作：commit() 时调用 op(chart, *args, **kwargs)。
+
+        返回 None/False 表示无改动；数值（如删除的节点数）按是否非零判断；其它返回值（含元素对象）均视为有改动。
+        """
+        if self.committed:
+            raise RuntimeError(f'{self.part} 事务已提交，不能再添加操作: {label}')
+        self.ops.append((label, op, args, kwargs))
+        return self
+
+    def commit(self) -> bool:
+        """依次执行排队操作并写回，返回是否写回。严格模式下任一操作失败抛 ChartEditError（部件不写回）。"""
+        if self.committed:
+            raise RuntimeError(f'{self.part} 事务重复提交')
+        self.committed = True
+        changed = False
+        try:
+            for label, op, args, kwargs in self.ops:
+                try:
+                    changed = _is_change(op(self.chart, *args, **kwargs)) or changed
+                except Exception as e:
+                    err = ChartEditError(self.part, label, e)
+                    if not self.keep_going:
+                        raise err from e
+                    self.errors.append(err)
+                    if self.log:
+                        self.log(f'[chart-patch] {self.part}: {err}')
+            written = changed or not self.only_if_changed
+            if written:
+                self.chart.save(self.pkg)
+        finally:
+            if self.log:
+                self.log(self._summary())
+        return written
+
+    def _summary(self) -> str:
+        counts = getattr(self.pkg, 'write_counts', None)
+        writes = f'，包内累计写回 {counts[self.part]} 次' if counts is not None else ''
+        failed = f'，失败 {len(self.errors)} 项' if self.errors else ''
+        return (f'[chart-patch] {self.part}: {len(self.ops)} 项操作{failed}，'
+                f'解析 1 次，序列化 {self.chart.serializations} 次{writes}')
@@ -0,0 +1,644 @@
+#!/usr/bin/env python3
+"""
+共享提及立方体（mention cube）：一次扫描 mentions_wide，供 p10/p13/p16/p18/p29 共用
+
+背景：
+- 各页面分别打开 mentions_wide，对同一国家/月份切片按不同维度重复 GROUP BY（每日情感、每日互动、
+  sourceLabel × keyword_label、sourceName × keyword_label）；
+- 本模块按 (countryId, 月份) 只扫描一次宽表，物化为紧凑立方体，页面改为读取立方体；
+- 同一月份需要多个国家的切片时（批量构建 tools/batch_build.py），以一条 `countryId IN (...)` 查询
+  `GROUP BY countryId, ...` 一次扫描该月区间，拆分为各国切片（ensure_many）。
+
+立方体结构（每个单元格）：
+- 维度：day（UTC 日）× keyword_label（读取时关联 tools/brand_dim.py 的整数 brand_id/brand_mask/key_mask）
+  × sourceName/sourceLabel（渠道）× 情感桶 bucket；
+- 度量：mentions（行数）、sumInteractions/sumLikes/sumShares/sumComments/reach 求和、
+  polarity_sum/polarity_n（用于 AVG）、authors（作者去重 HyperLogLog 草图，可合并）。
+- authors 草图每个单元格 1 KiB，且当前没有页面读取，默认不构建（author_sketch=False，该列为 NULL）；
+  需要作者去重的页面以 MentionCube(..., author_sketch=True) 打开，缺少草图的切片会自动重建。
+
+情感桶（bucket）：
+- 以所有页面配置的情感阈值为切点 cuts（升序）。对每个切点区分 “< c”“= c”“> c”，因此无论页面使用
+  >=、>、<=、<、BETWEEN 哪种边界，按桶聚合后的结果与逐行判定完全一致；
+- bucket=-1 表示 polarity 为 NULL；每个桶提供代表值 polarity_rep，页面沿用自己的分类函数即可。
+
+存储：
+- 立方体物化在数据库旁的 sidecar：`<neticle_db>.cube.sqlite`；切片以 (countryId, 月份) 为键，
+  并记录源库的 size/mtime 标识，源库变化时自动重建；
+- 已存切片的 cuts 不覆盖所需 cuts 时，按并集重建该切片。
+
+时间口径：统一使用 UTC（tools/period_filter.py：createdAtUtcMs 半开区间 [月初, 次月初)）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from brand_dim import BrandRegistry, ensure_label_brands
+from neticle_index import connect_for
+from neticle_snapshot import SnapshotSlice, load_slice
+from page_config import load_page_config
+from sqlite_ro import connect_ro
+from period_filter import DAY_MS, month_bounds_ms, month_span, months_between, range_clause, to_date
+
+TABLE_NAME = 'mentions_wide'
+# 立方体求和度量（宽表中缺失的列按 NULL 处理）
+SUM_MEASURES = ['sumInteractions', 'sumLikes', 'sumShares', 'sumComments', 'reach']
+CUBE_COLUMNS = ['day', 'keyword_label', 'sourceName', 'sourceLabel', 'bucket', 'mentions'] + SUM_MEASURES + ['polarity_sum', 'polarity_n', 'authors']
+FRAME_COLUMNS = ['month'] + CUBE_COLUMNS + ['brand_id', 'brand_mask', 'key_mask', 'polarity_rep']
+# aggregate() 可用的分组维度与求和度量
+AGG_DIMENSIONS = ['month', 'day', 'keyword_label', 'sourceName', 'sourceLabel', 'bucket']
+AGG_MEASURES = ['mentions'] + SUM_MEASURES + ['polarity_sum', 'polarity_n']
+SCHEMA_VERSION = 2
+
+# ---------------- 作者去重草图（HyperLogLog） ----------------
+HLL_P = 10
+HLL_M = 1 << HLL_P
+
+
+def _hll_hash(value: Any) -> int:
+    return int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class _AuthorSketch:
+    """SQLite 聚合函数：对 author 构建 HLL 寄存器（bytes，长度 HLL_M）。"""
+
+    def __init__(self):
+        self.reg = bytearray(HLL_M)
+
+    def step(self, value):
+        if value is None or value == '':
+            return
+        h = _hll_hash(value)
+        idx = h >> (64 - HLL_P)
+        rest = h & ((1 << (64 - HLL_P)) - 1)
+        rank = (64 - HLL_P) - rest.bit_length() + 1
+        if rank > self.reg[idx]:
+            self.reg[idx] = rank
+
+    def finalize(self):
+        return bytes(self.reg)
+
+
+def register_sql_functions(con: sqlite3.Connection) -> None:
+    """在连接上注册立方体扫描用到的自定义 SQL 函数。"""
+    con.create_aggregate('author_sketch', 1, _AuthorSketch)
+
+
+def merge_sketches(sketches: Iterable[Optional[bytes]]) -> bytes:
+    """按寄存器取最大值合并多个草图。"""
+    reg = bytearray(HLL_M)
+    for s in sketches:
+        if not s:
+            continue
+        for i, r in enumerate(s):
+            if r > reg[i]:
+                reg[i] = r
+    return bytes(reg)
+
+
+def estimate_distinct(sketches: Iterable[Optional[bytes]]) -> int:
+    """估算合并后草图的去重数量（标准 HLL 估计 + 小基数线性计数修正）。"""
+    import math
+    reg = merge_sketches(sketches)
+    alpha = 0.7213 / (1 + 1.079 / HLL_M)
+    z = sum(2.0 ** -r for r in reg)
+    est = alpha * HLL_M * HLL_M / z
+    zeros = reg.count(0)
+    if est <= 2.5 * HLL_M and zeros:
+        est = HLL_M * math.log(HLL_M / zeros)
+    return int(round(est))
+
+
+# ---------------- 情感桶 ----------------
+def normalize_cuts(cuts: Iterable[float]) -> List[float]:
+    return sorted({float(c) for c in cuts})
+
+
+def bucket_case_sql(cuts: Sequence[float], column: str = 'polarity') -> str:
+    """生成情感桶 CASE 表达式：NULL→-1；对第 i 个切点，< c_i→2i，= c_i→2i+1；大于全部切点→2k。"""
+    parts = [f'WHEN {column} IS NULL THEN -1']
+    for i, c in enumerate(cuts):
+        parts.append(f'WHEN {column} < {c!r} THEN {2 * i}')
+        parts.append(f'WHEN {column} = {c!r} THEN {2 * i + 1}')
+    return 'CASE ' + ' '.join(parts) + f' ELSE {2 * len(cuts)} END'
+
+
+def bucket_representatives(cuts: Sequence[float]) -> Dict[int, Optional[float]]:
+    """每个桶的代表 polarity：等值桶取切点本身，区间桶取区间中点（两端各外扩 1）。
+    由于页面阈值均为切点，按代表值比较与逐行比较结果一致。"""
+    reps: Dict[int, Optional[float]] = {-1: None}
+    k = len(cuts)
+    for i in range(k + 1):
+        lo = cuts[i - 1] if i > 0 else (cuts[0] - 2.0 if k else -1.0)
+        hi = cuts[i] if i < k else (cuts[-1] + 2.0 if k else 1.0)
+        reps[2 * i] = (lo + hi) / 2.0
+        if i < k:
+            reps[2 * i + 1] = cuts[i]
+    return reps
+
+
+# ---------------- 配置工具 ----------------
+def _db_token(db_path: Path) -> str:
+    st = db_path.stat()
+    return f'size={st.st_size};mtime_ns={st.st_mtime_ns}'
+
+
+def _load_yaml(p: Path) -> dict:
+    try:
+        return load_page_config(p)
+    except Exception:
+        return {}
+
+
+def collect_sentiment_cuts(root: Path) -> List[float]:
+    """收集根配置与全部页面配置中的情感阈值，作为共享立方体的切点。"""
+    cuts = set()
+    cfgs = [root / 'config.yaml'] + sorted((root / 'charts').glob('p*/config.yaml'))
+    for p in cfgs:
+        if not p.exists():
+            continue
+        th = ((_load_yaml(p).get('sentiment') or {}).get('thresholds') or {})
+        for k in ('positive_min', 'negative_max'):
+            if th.get(k) is not None:
+                cuts.add(float(th[k]))
+    return normalize_cuts(cuts)
+
+
+# ---------------- 立方体 ----------------
+class MentionCube:
+    """mentions_wide 的共享聚合立方体（sidecar 持久化，按 (countryId, 月份) 切片）。"""
+
+    def __init__(self, db_path, sidecar: Optional[Path] = None, table: str = TABLE_NAME,
+                 author_sketch: bool = False, root: Optional[Path] = None, log: Callable[[str], None] = print):
+        self.db_path = Path(db_path).resolve()
+        if not self.db_path.exists():
+            raise FileNotFoundError(f'未找到 Neticle DB: {self.db_path}')
+        self.sidecar = Path(sidecar) if sidecar else Path(str(self.db_path) + '.cube.sqlite')
+        self.table = table
+        self.author_sketch = author_sketch
+        self.log = log
+        self.root = Path(root) if root else Path(__file__).resolve().parents[1]
+        self._shared_cuts: Optional[List[float]] = None
+        self._brands: Optional[BrandRegistry] = None
+        self.scans = 0
+
+    def _token(self) -> str:
+        """源库标识：表名 + 文件 size/mtime（任一变化即视为切片过期）。"""
+        return f'table={self.table};' + _db_token(self.db_path)
+
+    # ---- sidecar ----
+    def _open_sidecar(self) -> sqlite3.Connection:
+        self.sidecar.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(str(self.sidecar), timeout=60)
+        con.execute('''CREATE TABLE IF NOT EXISTS cube_meta (
+            country_id INTEGER NOT NULL, month TEXT NOT NULL, db_token TEXT NOT NULL,
+            cuts TEXT NOT NULL, columns TEXT NOT NULL, authors INTEGER NOT NULL,
+            schema INTEGER NOT NULL, source_rows INTEGER NOT NULL, cells INTEGER NOT NULL,
+            built_at TEXT NOT NULL, scan_seconds REAL NOT NULL,
+            PRIMARY KEY (country_id, month))''')
+        con.execute(f'''CREATE TABLE IF NOT EXISTS cube (
+            country_id INTEGER NOT NULL, month TEXT NOT NULL, day TEXT NOT NULL,
+            keyword_label TEXT, sourceName TEXT, sourceLabel TEXT, bucket INTEGER NOT NULL,
+            mentions INTEGER NOT NULL, {', '.join(f'{m} REAL' for m in SUM_MEASURES)},
+            polarity_sum REAL, polarity_n INTEGER NOT NULL, authors BLOB)''')
+        con.execute('CREATE INDEX IF NOT EXISTS cube_slice ON cube(country_id, month, day)')
+        return con
+
+    def shared_cuts(self, extra: Iterable[float] = ()) -> List[float]:
+        if self._shared_cuts is None:
+            self._shared_cuts = collect_sentiment_cuts(self.root)
+        return normalize_cuts(list(self._shared_cuts) + list(extra))
+
+    def _slice_meta(self, con: sqlite3.Connection, country_id: int, month: str) -> Optional[dict]:
+        row = con.execute(
+            'SELECT db_token, cuts, columns, authors, schema FROM cube_meta WHERE country_id=? AND month=?',
+            (country_id, month)).fetchone()
+        if not row:
+            return None
+        return {'db_token': row[0], 'cuts': json.loads(row[1]), 'columns': json.loads(row[2]),
+                'authors': bool(row[3]), 'schema': row[4]}
+
+    def _is_fresh(self, meta: Optional[dict], cuts: Sequence[float]) -> bool:
+        if not meta or meta['schema'] != SCHEMA_VERSION:
+            return False
+        if meta['db_token'] != self._token():
+            return False
+        if self.author_sketch and not meta['authors']:
+            return False
+        return set(cuts).issubset(set(meta['cuts']))
+
+    # ---- 扫描 ----
+    def _table_columns(self, src: sqlite3.Connection) -> List[str]:
+        return [r[1] for r in src.execute(f"PRAGMA table_info('{self.table}')").fetchall()]
+
+    def scan_columns(self, cols: Sequence[str]) -> List[str]:
+        """扫描查询引用的宽表列（用于选择覆盖索引 sidecar）。"""
+        wanted = ['countryId', 'createdAtUtcMs', 'keyword_label', 'polarity', 'sourceName', 'sourceLabel'] + SUM_MEASURES
+        if self.author_sketch:
+            wanted.append('author')
+        return [c for c in wanted if c in cols]
+
+    def scan_query(self, cols: Sequence[str], country_id: int, month: str, cuts: Sequence[float]) -> Tuple[str, List[Any]]:
+        """构造单个 (countryId, 月份) 切片的聚合扫描 SQL 与参数。"""
+        return self._scan_sql(cols, [country_id], month, cuts, by_country=False)
+
+    def scan_query_countries(self, cols: Sequence[str], country_ids: Sequence[int], month: str,
+                             cuts: Sequence[float]) -> Tuple[str, List[Any]]:
+        """构造多个国家同一月份的共享扫描 SQL：一次区间查找，首列为 countryId，按国家拆分为切片。"""
+        return self._scan_sql(cols, country_ids, month, cuts, by_country=True)
+
+    def _scan_sql(self, cols: Sequence[str], country_ids: Sequence[int], month: str, cuts: Sequence[float],
+                  by_country: bool) -> Tuple[str, List[Any]]:
+        for required in ('countryId', 'createdAtUtcMs', 'keyword_label', 'polarity'):
+            if required not in cols:
+                raise RuntimeError(f'{self.table} 缺少必需列: {required}')
+        start_ms, end_ms = month_bounds_ms(month)
+        sums = [f'SUM({m})' if m in cols else 'NULL' for m in SUM_MEASURES]
+        src_name = 'sourceName' if 'sourceName' in cols else 'NULL'
+        src_label = 'sourceLabel' if 'sourceLabel' in cols else 'NULL'
+        author = 'author_sketch(author)' if (self.author_sketch and 'author' in cols) else 'NULL'
+        lead = 'countryId, ' if by_country else ''
+        country_sql = f'countryId IN ({", ".join("?" * len(country_ids))})' if by_country else 'countryId = ?'
+        sql = f'''
+            SELECT {lead}CAST(createdAtUtcMs / {DAY_MS} AS INTEGER) AS day_no,
+                   keyword_label, {src_name} AS source_name, {src_label} AS source_label,
+                   {bucket_case_sql(cuts)} AS bucket,
+                   COUNT(*), {', '.join(sums)}, SUM(polarity), COUNT(polarity), {author}
+            FROM {self.table}
+            WHERE {country_sql} AND {range_clause('createdAtUtcMs')}
+            GROUP BY {lead}day_no, keyword_label, source_name, source_label, bucket
+        '''
+        return sql, [int(c) for c in country_ids] + [start_ms, end_ms]
+
+    @staticmethod
+    def _cube_row(country_id: int, month: str, r: Sequence[Any]) -> tuple:
+        """扫描结果行（day_no, 维度..., 度量...）→ 立方体行。"""
+        day_str = (date(1970, 1, 1) + timedelta(days=int(r[0]))).isoformat()
+        return (country_id, month, day_str) + tuple(r[1:])
+
+    def _scan_month(self, src: sqlite3.Connection, cols: List[str], country_id: int, month: str, cuts: Sequence[float]) -> Tuple[List[tuple], int]:
+        sql, params = self.scan_query(cols, country_id, month, cuts)
+        rows = []
+        source_rows = 0
+        for r in src.execute(sql, params):
+            rows.append(self._cube_row(country_id, month, r))
+            source_rows += int(r[5] or 0)
+        return rows, source_rows
+
+    def _scan_month_countries(self, src: sqlite3.Connection, cols: List[str], country_ids: Sequence[int], month: str,
+                              cuts: Sequence[float]) -> Dict[int, Tuple[List[tuple], int]]:
+        """一次扫描多个国家同月的宽表区间；无数据的国家得到空切片。"""
+        sql, params = self.scan_query_countries(cols, country_ids, month, cuts)
+        out: Dict[int, Tuple[List[tuple], int]] = {int(c): ([], 0) for c in country_ids}
+        for r in src.execute(sql, params):
+            country = int(r[0])
+            rows, n = out[country]
+            rows.append(self._cube_row(country, month, r[1:]))
+            out[country] = (rows, n + int(r[6] or 0))
+        return out
+
+    def _scan_snapshot(self, snap: SnapshotSlice, country_id: int, month: str, cuts: Sequence[float]) -> Tuple[List[tuple], int]:
+        """从列式快照（tools/neticle_snapshot.py）聚合切片，口径与 scan_query() 的 SQL 完全一致。"""
+        import numpy as np
+        import pandas as pd
+        n = snap.rows
+        cut_arr = np.asarray(list(cuts), dtype=np.float64)
+        pol = np.asarray(snap.values('polarity'))
+        # 情感桶：与 bucket_case_sql 相同（首个满足 polarity <= c_i 的切点 i；相等为 2i+1，否则 2i）
+        idx = np.searchsorted(cut_arr, pol, side='left')
+        eq = np.zeros(n, dtype=bool)
+        if len(cut_arr):
+            inside = idx < len(cut_arr)
+            eq[inside] = cut_arr[idx[inside]] == pol[inside]
+        bucket = np.where(np.isnan(pol), -1, 2 * idx + eq)
+        none_codes = np.full(n, -1, dtype=np.int32)
+        keys = {
+            'day_no': np.asarray(snap.values('createdAtUtcMs')) // DAY_MS,
+            'keyword_label': np.asarray(snap.codes('keyword_label')),
+            'sourceName': np.asarray(snap.codes('sourceName')) if 'sourceName' in snap.columns else none_codes,
+            'sourceLabel': np.asarray(snap.codes('sourceLabel')) if 'sourceLabel' in snap.columns else none_codes,
+            'bucket': bucket,
+        }
+        measures = [m for m in SUM_MEASURES if m in snap.columns]
+        df = pd.DataFrame({**keys, **{m: np.asarray(snap.values(m)) for m in measures}, 'polarity': pol})
+        g = df.groupby(list(keys), sort=False)
+        agg = g.size().rename('mentions').to_frame()
+        for m in measures:
+            agg[m] = g[m].sum(min_count=1)
+        agg['polarity_sum'] = g['polarity'].sum(min_count=1)
+        agg['polarity_n'] = g['polarity'].count()
+        agg = agg.reset_index()
+
+        sketches: Optional[np.ndarray] = None
+        if self.author_sketch and 'author' in snap.columns:
+            # 每个作者只哈希一次：vocab → (寄存器, rank)；再按 (组, 寄存器) 取 rank 最大值
+            vocab = snap.vocab('author')
+            reg_of = np.zeros(len(vocab), dtype=np.intp)
+            rank_of = np.zeros(len(vocab), dtype=np.uint8)
+            for i, v in enumerate(vocab):
+                if v == '':
+                    continue
+                h = _hll_hash(v)
+                rest = h & ((1 << (64 - HLL_P)) - 1)
+                reg_of[i] = h >> (64 - HLL_P)
+                rank_of[i] = (64 - HLL_P) - rest.bit_length() + 1
+            codes = np.asarray(snap.codes('author'))
+            gid = g.ngroup().to_numpy()
+            valid = codes >= 0
+            sketches = np.zeros((len(agg), HLL_M), dtype=np.uint8)
+            np.maximum.at(sketches, (gid[valid], reg_of[codes[valid]]), rank_of[codes[valid]])
+        # agg 行顺序与 ngroup() 编号一致（sort=False 均按首次出现顺序）
+        epoch = date(1970, 1, 1)
+        days = [(epoch + timedelta(days=d)).isoformat() for d in agg['day_no'].tolist()]
+        texts = []
+        for c in ('keyword_label', 'sourceName', 'sourceLabel'):
+            vocab = snap.vocab(c) if c in snap.columns else []
+            texts.append([vocab[i] if i >= 0 else None for i in agg[c].tolist()])
+        sums = [agg[m].astype(object).where(agg[m].notna(), None).tolist() if m in measures else [None] * len(agg)
+                for m in SUM_MEASURES]
+        psum = agg['polarity_sum'].astype(object).where(agg['polarity_sum'].notna(), None).tolist()
+        authors = [row.tobytes() for row in sketches] if sketches is not None else [None] * len(agg)
+        rows = list(zip([country_id] * len(agg), [month] * len(agg), days, *texts,
+                        agg['bucket'].tolist(), agg['mentions'].tolist(), *sums, psum,
+                        agg['polarity_n'].tolist(), authors))
+        return rows, n
+
+    def ensure(self, country_id: int, months: Iterable[str], cuts: Iterable[float] = ()) -> int:
+        """确保指定国家与月份的切片已物化且满足 cuts；返回本次实际扫描的月份数。"""
+        return self.ensure_many({int(country_id): months}, cuts)
+
+    def ensure_many(self, slices: Dict[int, Iterable[str]], cuts: Iterable[float] = ()) -> int:
+        """确保 {countryId: 月份} 的全部切片已物化且满足 cuts；返回本次物化的切片数。
+
+        同一月份有多个国家的切片过期时，以一条 GROUP BY countryId 查询共享扫描该月区间；
+        列式快照新鲜的切片仍从快照聚合。
+        """
+        need_cuts = self.shared_cuts(cuts)
+        wanted: Dict[str, List[int]] = {}
+        for country, months in slices.items():
+            for m in dict.fromkeys(months):
+                wanted.setdefault(m, [])
+                if int(country) not in wanted[m]:
+                    wanted[m].append(int(country))
+        con = self._open_sidecar()
+        try:
+            stale = {m: [c for c in countries if not self._is_fresh(self._slice_meta(con, c, m), need_cuts)]
+                     for m, countries in wanted.items()}
+            stale = {m: cs for m, cs in stale.items() if cs}
+            if not stale:
+                return 0
+            # 宽表列以源库为准；覆盖索引 sidecar（tools/neticle_index.py）新鲜且包含所需列时从 sidecar 扫描
+            probe = connect_ro(self.db_path)
+            try:
+                cols = self._table_columns(probe)
+            finally:
+                probe.close()
+            snap_cols = [c for c in self.scan_columns(cols) if c != 'countryId']
+            src = connect_for(self.db_path, self.table, self.scan_columns(cols))
+            if self.author_sketch:
+                register_sql_functions(src)
+            built = 0
+            try:
+                for m in sorted(stale):
+                    # 切点取所需切点与各切片已有切点（源库未变时）的并集，同月共享扫描使用同一组切点
+                    old_cuts = []
+                    for c in stale[m]:
+                        meta = self._slice_meta(con, c, m)
+                        if meta and meta['db_token'] == self._token():
+                            old_cuts += meta['cuts']
+                    cuts_m = normalize_cuts(need_cuts + old_cuts)
+                    scan = []
+                    for c in stale[m]:
+                        # 列式快照新鲜时从快照聚合（零拷贝内存映射），否则扫描数据库
+                        snap = load_slice(self.db_path, self.table, c, m, snap_cols)
+                        if snap is None:
+                            scan.append(c)
+                            continue
+                        t0 = time.time()
+                        rows, source_rows = self._scan_snapshot(snap, c, m, cuts_m)
+                        self._store_slice(con, c, m, cuts_m, cols, rows, source_rows, time.time() - t0, 'snapshot')
+                        built += 1
+                    if not scan:
+                        continue
+                    t0 = time.time()
+                    if len(scan) == 1:
+                        results = {scan[0]: self._scan_month(src, cols, scan[0], m, cuts_m)}
+                        origin = self.table
+                    else:
+                        results = self._scan_month_countries(src, cols, scan, m, cuts_m)
+                        origin = f'{self.table}（共享扫描 {len(scan)} 个国家）'
+                    dt = time.time() - t0
+                    self.scans += 1
+                    for c in scan:
+                        rows, source_rows = results[c]
+                        self._store_slice(con, c, m, cuts_m, cols, rows, source_rows, dt, origin)
+                        built += 1
+            finally:
+                src.close()
+            return built
+        finally:
+            con.close()
+
+    def _store_slice(self, con: sqlite3.Connection, country_id: int, month: str, cuts: List[float], cols: List[str],
+                     rows: List[tuple], source_rows: int, dt: float, origin: str) -> None:
+        with con:
+            con.execute('DELETE FROM cube WHERE country_id=? AND month=?', (country_id, month))
+            con.executemany(f'INSERT INTO cube VALUES ({", ".join("?" * (3 + len(CUBE_COLUMNS) - 1))})', rows)
+            con.execute('INSERT OR REPLACE INTO cube_meta VALUES (?,?,?,?,?,?,?,?,?,?,?)', (
+                country_id, month, self._token(), json.dumps(cuts), json.dumps(cols),
+                int(self.author_sketch), SCHEMA_VERSION, source_rows, len(rows),
+                datetime.now().strftime('%Y-%m-%d %H:%M:%S'), dt))
+        self.log(f'[cube] 扫描 {origin} countryId={country_id} month={month}: {source_rows} 行 → {len(rows)} 单元格，用时 {dt:.2f}s')
+
+    def slice_columns(self, country_id: int, month: str) -> List[str]:
+        """返回构建该切片时宽表可用的列（用于页面做列存在性校验）。"""
+        con = self._open_sidecar()
+        try:
+            meta = self._slice_meta(con, int(country_id), month)
+            return meta['columns'] if meta else []
+        finally:
+            con.close()
+
+    @property
+    def brands(self) -> BrandRegistry:
+        """品牌注册表（根 config.yaml filters.brands / brand_alias）。"""
+        if self._brands is None:
+            self._brands = BrandRegistry.from_root(self.root)
+        return self._brands
+
+    def _cell_filter(self, con: sqlite3.Connection, country_id: int, start, end, months: List[str],
+                     brand_ids: Optional[Iterable[int]], label_pattern: Optional[str] = None) -> Tuple[str, List[Any]]:
+        """单元格过滤条件（别名 c=cube、lb=label_brand）；顺带为切片内新标签补齐品牌解析。"""
+        s, e = to_date(start).isoformat(), to_date(end).isoformat()
+        month_in = ",".join("?" * len(months))
+        labels = [r[0] for r in con.execute(
+            f'SELECT DISTINCT keyword_label FROM cube WHERE country_id=? AND month IN ({month_in})',
+            [int(country_id)] + months)]
+        ensure_label_brands(con, self.brands, labels)
+        where = f'c.country_id=? AND c.month IN ({month_in}) AND c.day BETWEEN ? AND ?'
+        params: List[Any] = [int(country_id)] + months + [s, e]
+        if brand_ids is not None:
+            mask = 0
+            for bid in brand_ids:
+                mask |= 1 << (int(bid) - 1)
+            where += ' AND (COALESCE(lb.brand_mask, 0) & ?) != 0'
+            params.append(mask)
+        if label_pattern is not None:
+            # 页面配置的 '%词%' 模式映射到品牌键的整数位，按不含别名的 key_mask 过滤（与该 LIKE 模式逐条一致）
+            where += ' AND (COALESCE(lb.key_mask, 0) & ?) != 0'
+            params.append(1 << (self.brands.brand_id_for_pattern(label_pattern) - 1))
+        return where, params
+
+    def rows(self, country_id: int, start, end, cuts: Iterable[float] = (),
+             brand_ids: Optional[Iterable[int]] = None, label_pattern: Optional[str] = None) -> List[Dict[str, Any]]:
+        """读取 [start, end]（UTC 日，含首尾）范围内的立方体单元格；必要时先物化缺失切片。
+        每行包含 CUBE_COLUMNS、month、polarity_rep（情感桶代表值）与 brand_id/brand_mask/key_mask（tools/brand_dim.py）。
+        brand_ids 非空时仅返回命中其中任一品牌的单元格（按 brand_mask 整数位过滤，品牌别名计入）；
+        label_pattern（'%品牌键%'）非空时仅返回 keyword_label 匹配该模式的单元格（按 key_mask 整数位过滤，
+        与 SQL LIKE 一致，不扩展别名）。页面统一使用 label_pattern 或 key_mask 列。"""
+        months = months_between(start, end)
+        self.ensure(country_id, months, cuts)
+        con = self._open_sidecar()
+        try:
+            metas = {m: self._slice_meta(con, int(country_id), m) for m in months}
+            where, params = self._cell_filter(con, country_id, start, end, months, brand_ids, label_pattern)
+            cur = con.execute(
+                f'SELECT c.month, {", ".join("c." + col for col in CUBE_COLUMNS)}, '
+                f'COALESCE(lb.brand_id, 0), COALESCE(lb.brand_mask, 0), COALESCE(lb.key_mask, 0) '
+                f'FROM cube c LEFT JOIN label_brand lb ON lb.keyword_label = c.keyword_label WHERE {where}',
+                params)
+            names = ['month'] + CUBE_COLUMNS + ['brand_id', 'brand_mask', 'key_mask']
+            out = []
+            reps_by_month = {m: bucket_representatives(metas[m]['cuts']) for m in months}
+            for r in cur:
+                rec = dict(zip(names, r))
+                rec['polarity_rep'] = reps_by_month[rec['month']].get(rec['bucket'])
+                out.append(rec)
+            return out
+        finally:
+            con.close()
+
+    def aggregate(self, country_id: int, start, end, measures: Sequence[str],
+                  by: Sequence[str] = ('day', 'bucket'), cuts: Iterable[float] = (),
+                  brand_ids: Optional[Iterable[int]] = None,
+                  label_pattern: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """在 sidecar 内以 SQL `GROUP BY by` 对立方体单元格求和，逐组产出（游标流式读取，内存与提及量无关）。
+
+        - by 取自 AGG_DIMENSIONS；含 bucket 时按月分组（各月切片的切点可能不同），并附带 polarity_rep；
+        - measures 取自 AGG_MEASURES，全部为 NULL 的组求和结果为 None（与 SQL SUM 一致）；
+        - 过滤口径与 rows() 相同。
+        """
+        bad = [d for d in by if d not in AGG_DIMENSIONS] + [m for m in measures if m not in AGG_MEASURES]
+        if bad:
+            raise ValueError(f'不支持的聚合维度/度量: {bad}（维度 {AGG_DIMENSIONS}，度量 {AGG_MEASURES}）')
+        keys = list(by)
+        if 'bucket' in keys and 'month' not in keys:
+            keys.insert(0, 'month')
+        months = months_between(start, end)
+        self.ensure(country_id, months, cuts)
+        con = self._open_sidecar()
+        try:
+            metas = {m: self._slice_meta(con, int(country_id), m) for m in months}
+            reps_by_month = {m: bucket_representatives(metas[m]['cuts']) for m in months}
+            where, params = self._cell_filter(con, country_id, start, end, months, brand_ids, label_pattern)
+            key_sql = ', '.join('c.' + k for k in keys)
+            sum_sql = ', '.join(f'SUM(c.{m})' for m in measures)
+            cur = con.execute(
+                f'SELECT {key_sql}, {sum_sql} FROM cube c '
+                f'LEFT JOIN label_brand lb ON lb.keyword_label = c.keyword_label '
+                f'WHERE {where} GROUP BY {key_sql} ORDER BY {key_sql}', params)
+            names = keys + list(measures)
+            for r in cur:
+                rec = dict(zip(names, r))
+                if 'bucket' in rec:
+                    rec['polarity_rep'] = reps_by_month[rec['month']].get(rec['bucket'])
+                yield rec
+        finally:
+            con.close()
+
+    def frame(self, country_id: int, start, end, cuts: Iterable[float] = (),
+              brand_ids: Optional[Iterable[int]] = None, label_pattern: Optional[str] = None):
+        """与 rows() 相同，返回 pandas DataFrame（按需导入 pandas）。"""
+        import pandas as pd
+        recs = self.rows(country_id, start, end, cuts, brand_ids, label_pattern)
+        return pd.DataFrame.from_records(recs, columns=FRAME_COLUMNS)
+
+
+# ---------------- 共享聚合阶段（tools/build.py 调用） ----------------
+def _page_periods(cfg: dict) -> Tuple[Optional[str], Optional[str], List[str]]:
+    """从页面配置推断所需的 [start, end] 与额外月份列表。"""
+    rng = cfg.get('update') or cfg.get('time_range') or {}
+    start, end = rng.get('start_date'), rng.get('end_date')
+    months: List[str] = []
+    tm = (cfg.get('filters') or {}).get('target_month')
+    if tm:
+        months.append(str(tm))
+    for k in ('main', 'split'):
+        months.extend(str(m) for m in ((cfg.get('months') or {}).get(k) or []))
+    return (str(start) if start else None), (str(end) if end else None), months
+
+
+def plan_from_configs(root: Path, pages: Optional[Iterable[str]] = None) -> Dict[Path, Dict[int, List[str]]]:
+    """汇总页面对 (neticle_db, countryId) → 月份 的需求；pages 为空表示全部页面。"""
+    plan: Dict[Path, Dict[int, List[str]]] = {}
+    root_cfg = _load_yaml(root / 'config.yaml')
+    wanted = set(pages) if pages else None
+    for cfg_path in sorted((root / 'charts').glob('p*/config.yaml')):
+        if wanted is not None and cfg_path.parent.name not in wanted:
+            continue
+        cfg = _load_yaml(cfg_path)
+        db = (cfg.get('data_sources') or {}).get('neticle_db')
+        f = cfg.get('filters') or {}
+        country = f.get('countryId', f.get('country_id'))
+        if not db or country is None:
+            continue
+        start, end, months = _page_periods(cfg)
+        if start and end:
+            months = months_between(start, end) + months
+        if not months:
+            rs, re_ = _page_periods(root_cfg)[:2]
+            if rs and re_:
+                months = months_between(rs, re_)
+        dbp = Path(db) if Path(db).is_absolute() else (cfg_path.parent / db).resolve()
+        bucket = plan.setdefault(dbp, {}).setdefault(int(country), [])
+        for m in months:
+            if m not in bucket:
+                bucket.append(m)
+    return plan
+
+
+def prepare_shared_cube(root: Path, pages: Optional[Iterable[str]] = None, log=print) -> Dict[str, Any]:
+    """共享聚合阶段：按页面配置汇总需求，每个 (countryId, 月份) 仅扫描一次宽表（同月多国共享一次扫描）。"""
+    stats = {'databases': 0, 'slices': 0, 'scanned': 0}
+    for db, by_country in plan_from_configs(root, pages).items():
+        if not db.exists():
+            log(f'[cube] 跳过缺失的数据库: {db}')
+            continue
+        cube = MentionCube(db, root=root, log=log)
+        stats['databases'] += 1
+        stats['slices'] += sum(len(months) for months in by_country.values())
+        stats['scanned'] += cube.ensure_many({c: sorted(months) for c, months in by_country.items()})
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description='预构建共享提及立方体（按页面配置汇总国家与月份）')
+    ap.add_argument('--pages', nargs='*', help='仅为指定页面准备（默认全部页面）')
+    args = ap.parse_args(argv)
+    root = Path(__file__).resolve().parents[1]
+    stats = prepare_shared_cube(root, args.pages)
+    print(f"[cube] 完成：数据库 {stats['databases']} 个，切片 {stats['slices']} 个，本次扫描 {stats['scanned']} 个")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
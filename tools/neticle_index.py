@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+mentions_wide 索引顾问与覆盖索引 sidecar
+
+背景：
+- 页面对 mentions_wide 的查询均按 countryId + createdAtUtcMs 区间过滤，再按 keyword_label /
+  sourceLabel / sourceName 分组；源库未建任何索引，每次都是全表扫描；
+- 源库属于输入数据（只读），不在其上直接建索引。
+
+做法：
+- 在数据库旁生成 sidecar：`<neticle_db>.idx.sqlite`，内含同名表 mentions_wide（仅页面需要的列）
+  与覆盖索引 (countryId, createdAtUtcMs, keyword_label, sourceLabel, sourceName, polarity,
+  sumInteractions, ...)，并记录源库 size/mtime 标识，源库变化时重建；
+- connect_for() 在 sidecar 新鲜且包含所需列时返回 sidecar 连接，否则返回源库连接，查询 SQL 不变；
+- 顾问收集页面实际发出的查询（共享立方体扫描、p13 审计行查询），输出源库与 sidecar 上的
+  EXPLAIN QUERY PLAN，并校验每条查询都是索引区间查找（SEARCH ... INDEX），而非全表扫描。
+
+用法：
+    python tools/neticle_index.py            # 报告查询计划
+    python tools/neticle_index.py --build    # 构建/刷新 sidecar 后报告
+    python tools/neticle_index.py --verify   # 存在全表扫描时以非零退出码结束
+    python tools/build.py --build-pages --index-sidecar   # 逐页构建前为范围内的数据页构建并校验（显式开启）
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlite_ro import connect_ro, ro_uri
+
+TABLE_NAME = 'mentions_wide'
+INDEX_NAME = 'ix_mentions_country_time_cover'
+# 覆盖索引列顺序：等值列 → 区间列 → 分组/过滤列 → 度量列
+INDEX_COLUMNS = [
+    'countryId', 'createdAtUtcMs', 'keyword_label', 'sourceLabel', 'sourceName', 'polarity',
+    'sumInteractions', 'sumLikes', 'sumShares', 'sumComments', 'reach', 'author', 'id',
+]
+SIDECAR_SCHEMA = 1
+
+
+def sidecar_path(db_path: Path) -> Path:
+    return Path(str(Path(db_path).resolve()) + '.idx.sqlite')
+
+
+def _source_token(db_path: Path, table: str) -> str:
+    st = Path(db_path).stat()
+    return f'table={table};size={st.st_size};mtime_ns={st.st_mtime_ns};schema={SIDECAR_SCHEMA}'
+
+
+def _columns(con: sqlite3.Connection, table: str) -> List[str]:
+    return [r[1] for r in con.execute(f"PRAGMA table_info('{table}')").fetchall()]
+
+
+def sidecar_columns(db_path: Path, table: str = TABLE_NAME) -> Optional[List[str]]:
+    """sidecar 新鲜时返回其包含的列，否则返回 None。"""
+    side = sidecar_path(db_path)
+    if not side.exists():
+        return None
+    con = connect_ro(side)
+    try:
+        row = con.execute("SELECT value FROM sidecar_meta WHERE key='source_token'").fetchone()
+        if not row or row[0] != _source_token(db_path, table):
+            return None
+        return _columns(con, table)
+    except sqlite3.Error:
+        return None
+    finally:
+        con.close()
+
+
+def build_sidecar(db_path: Path, table: str = TABLE_NAME, force: bool = False, log=print) -> Path:
+    """构建覆盖索引 sidecar：投影页面所需列 + 覆盖索引。已新鲜时直接返回。"""
+    db_path = Path(db_path).resolve()
+    if not db_path.exists():
+        raise FileNotFoundError(f'未找到 Neticle DB: {db_path}')
+    side = sidecar_path(db_path)
+    if not force and sidecar_columns(db_path, table) is not None:
+        return side
+    t0 = time.time()
+    tmp = side.with_name(side.name + '.tmp')
+    if tmp.exists():
+        tmp.unlink()
+    con = sqlite3.connect(str(tmp), uri=True)
+    try:
+        con.execute('ATTACH DATABASE ? AS src', (ro_uri(db_path),))
+        src_cols = [r[1] for r in con.execute(f"PRAGMA src.table_info('{table}')").fetchall()]
+        if not src_cols:
+            raise RuntimeError(f'源库缺少表: {table}')
+        for required in ('countryId', 'createdAtUtcMs'):
+            if required not in src_cols:
+                raise RuntimeError(f'{table} 缺少必需列: {required}')
+        cols = [c for c in INDEX_COLUMNS if c in src_cols]
+        col_sql = ', '.join(cols)
+        decl = {r[1]: (r[2] or '') for r in con.execute(f"PRAGMA src.table_info('{table}')").fetchall()}
+        col_defs = ', '.join(f'{c} {decl[c]}'.strip() for c in cols)
+        con.execute(f'CREATE TABLE main.{table} ({col_defs})')
+        con.execute(f'INSERT INTO main.{table} ({col_sql}) SELECT {col_sql} FROM src.{table}')
+        con.execute(f'CREATE INDEX main.{INDEX_NAME} ON {table} ({col_sql})')
+        con.execute('CREATE TABLE main.sidecar_meta (key TEXT PRIMARY KEY, value TEXT)')
+        con.execute("INSERT INTO main.sidecar_meta VALUES ('source_token', ?)", (_source_token(db_path, table),))
+        con.execute("INSERT INTO main.sidecar_meta VALUES ('index_columns', ?)", (','.join(cols),))
+        con.commit()
+        con.execute('DETACH DATABASE src')
+        con.execute('ANALYZE')
+        con.commit()
+    finally:
+        con.close()
+    tmp.replace(side)
+    log(f'[index] 已构建覆盖索引 sidecar: {side}（{time.time() - t0:.2f}s）')
+    return side
+
+
+def connect_for(db_path: Path, table: str = TABLE_NAME, columns: Iterable[str] = ()) -> sqlite3.Connection:
+    """返回执行页面查询的只读连接（tools/sqlite_ro.py）：sidecar 新鲜且包含所需列时使用 sidecar，否则使用源库。"""
+    db_path = Path(db_path).resolve()
+    cols = sidecar_columns(db_path, table)
+    if cols is not None and set(columns).issubset(cols):
+        return connect_ro(sidecar_path(db_path))
+    return connect_ro(db_path)
+
+
+# ---------------- 查询计划 ----------------
+def explain(con: sqlite3.Connection, sql: str, params: Sequence[Any] = ()) -> List[str]:
+    from neticle_cube import register_sql_functions
+    register_sql_functions(con)
+    return [r[3] for r in con.execute('EXPLAIN QUERY PLAN ' + sql, list(params)).fetchall()]
+
+
+def is_range_scan(plan: Sequence[str], table: str = TABLE_NAME) -> bool:
+    """计划中对 table 的访问均为 SEARCH ... INDEX（区间/等值查找）时返回 True。"""
+    hits = [d for d in plan if d.split(' ')[1:2] == [table]]
+    if not hits:
+        return False
+    return all(d.startswith('SEARCH ') and 'INDEX' in d for d in hits)
+
+
+def _load_page_module(path: Path, name: str):
+    spec = importlib.util.spec_from_file_location(name, str(path))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def page_queries(root: Path, pages: Optional[Iterable[str]] = None,
+                 plan: Optional[Dict[Path, Dict[int, List[str]]]] = None) -> List[Dict[str, Any]]:
+    """收集页面发出的 mentions_wide 查询：{'label','db','sql','params','columns'}。
+
+    plan：{neticle_db: {countryId: 月份}}，缺省按页面配置汇总（neticle_cube.plan_from_configs）；
+    同一月份有多个国家时收集共享扫描查询（GROUP BY countryId）。
+    """
+    from neticle_cube import MentionCube, plan_from_configs
+    out: List[Dict[str, Any]] = []
+    for db, by_country in (plan if plan is not None else plan_from_configs(root, pages)).items():
+        if not db.exists():
+            continue
+        cube = MentionCube(db, root=root)
+        src = connect_ro(db)
+        try:
+            cols = _columns(src, cube.table)
+        finally:
+            src.close()
+        by_month: Dict[str, List[int]] = {}
+        for country, months in by_country.items():
+            for m in months:
+                by_month.setdefault(m, []).append(int(country))
+        for m in sorted(by_month):
+            countries = sorted(set(by_month[m]))
+            if len(countries) == 1:
+                sql, params = cube.scan_query(cols, countries[0], m, cube.shared_cuts())
+                label = f'cube scan countryId={countries[0]} month={m}'
+            else:
+                sql, params = cube.scan_query_countries(cols, countries, m, cube.shared_cuts())
+                label = f'cube shared scan countryId IN {countries} month={m}'
+            out.append({'label': label, 'db': db, 'sql': sql, 'params': params, 'columns': cube.scan_columns(cols)})
+    # p13 审计行查询（由页面生成器自身构造）
+    p13_dir = root / 'charts' / 'p13'
+    if (not pages or 'p13' in set(pages)) and (p13_dir / 'generate_excel.py').exists():
+        mod = _load_page_module(p13_dir / 'generate_excel.py', 'p13_generate_excel')
+        gen = mod.P13DataGenerator(str(p13_dir / 'config.yaml'))
+        db = Path(gen._neticle_db_path())
+        con = connect_ro(db)
+        try:
+            gen.wide_table_name = gen._detect_wide_table(con)
+            gen.wide_columns = _columns(con, gen.wide_table_name)
+        finally:
+            con.close()
+        sql, params, cols = gen.audit_query()
+        out.append({'label': 'p13 audit rows', 'db': db.resolve(), 'sql': sql, 'params': params, 'columns': cols})
+    return out
+
+
+def verify_page_queries(root: Path, pages: Optional[Iterable[str]] = None, log=print,
+                        plan: Optional[Dict[Path, Dict[int, List[str]]]] = None) -> List[Dict[str, Any]]:
+    """在页面实际使用的连接上检查每条查询的计划；返回全表扫描的查询列表。"""
+    bad = []
+    for q in page_queries(root, pages, plan):
+        con = connect_for(q['db'], columns=q['columns'])
+        try:
+            plan = explain(con, q['sql'], q['params'])
+        finally:
+            con.close()
+        ok = is_range_scan(plan)
+        log(f"[index] {'range' if ok else 'FULL SCAN'}: {q['label']} -> {' | '.join(plan)}")
+        if not ok:
+            bad.append({**q, 'plan': plan})
+    return bad
+
+
+def report(root: Path, pages: Optional[Iterable[str]] = None) -> None:
+    """打印每条页面查询在源库与 sidecar 上的 EXPLAIN QUERY PLAN。"""
+    for q in page_queries(root, pages):
+        print(f"== {q['label']}")
+        print(q['sql'].strip())
+        con = connect_ro(q['db'])
+        try:
+            for d in explain(con, q['sql'], q['params']):
+                print(f'  source : {d}')
+        finally:
+            con.close()
+        if sidecar_columns(q['db']) is not None:
+            con = connect_for(q['db'], columns=q['columns'])
+            try:
+                for d in explain(con, q['sql'], q['params']):
+                    print(f'  sidecar: {d}')
+            finally:
+                con.close()
+        else:
+            print('  sidecar: (未构建或已过期，使用 --build 生成)')
+
+
+def prepare_indexes(root: Path, pages: Optional[Iterable[str]] = None, log=print,
+                    plan: Optional[Dict[Path, Dict[int, List[str]]]] = None) -> int:
+    """为页面引用的 Neticle 库构建 sidecar，并严格校验页面查询均为索引区间查找（plan 同 page_queries）。"""
+    from neticle_cube import plan_from_configs
+    if plan is None:
+        plan = plan_from_configs(root, pages)
+    built = 0
+    for db in plan:
+        if db.exists():
+            build_sidecar(db, log=log)
+            built += 1
+    bad = verify_page_queries(root, pages, log=log, plan=plan)
+    if bad:
+        raise RuntimeError('以下页面查询仍为全表扫描: ' + '; '.join(q['label'] for q in bad))
+    return built
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description='mentions_wide 索引顾问：报告页面查询计划并维护覆盖索引 sidecar')
+    ap.add_argument('--pages', nargs='*', help='仅检查指定页面（默认全部页面）')
+    ap.add_argument('--build', action='store_true', help='构建/刷新覆盖索引 sidecar')
+    ap.add_argument('--force', action='store_true', help='与 --build 搭配：忽略新鲜度强制重建')
+    ap.add_argument('--verify', action='store_true', help='校验页面查询均为索引区间查找，否则返回非零')
+    args = ap.parse_args(argv)
+    root = Path(__file__).resolve().parents[1]
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    if args.build:
+        from neticle_cube import plan_from_configs
+        for db in plan_from_configs(root, args.pages):
+            if db.exists():
+                build_sidecar(db, force=args.force)
+    if args.verify:
+        return 1 if verify_page_queries(root, args.pages) else 0
+    report(root, args.pages)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+mentions_wide 列式快照：按 (countryId, 月份) 导出所需列为可内存映射的 .npy
+
+背景：
+- 共享立方体（tools/neticle_cube.py）的切片在源库变化、或情感阈值等配置变化（切点不再覆盖）时
+  需要重建，每次重建都要回到 SQLite 逐行经 Python 对象读取宽表；
+- 反复构建与“改配置试算”应命中本地快照，而不是数据库。
+
+做法：
+- `snapshot` 命令按页面配置汇总 (neticle_db, countryId, 月份)，每个切片只读一次源库，
+  仅导出立方体扫描需要的列，写入 `<neticle_db>.snapshot/<指纹>/c<countryId>/<YYYY-MM>/`：
+  - 数值列：`<col>.npy`（createdAtUtcMs 为 int64，其余 float64，NULL 记为 NaN）；
+  - 文本列：字典编码 `<col>.codes.npy`（int32，-1 表示 NULL）+ `<col>.vocab.json`；
+  - `manifest.json`：表名、列、行数、源库指纹，最后写入，作为切片完整性标记；
+- 指纹由表名与源库 size/mtime 派生；源库变化后旧指纹目录整体删除；
+- load_slice() 以 `np.load(mmap_mode='r')` 零拷贝映射各列，立方体重建切片时优先读取快照，
+  仅在快照缺失或过期时才扫描数据库；
+- 管道接入：tools/build.py 逐页构建前为声明 neticle_db 的数据页（build.data_prep_pages）导出，
+  tools/batch_build.py 扇出前为全部单元格的 (国家, 月份) 导出；页面运行时以自身切点请求立方体，
+  切片需重建时即读取这些快照。
+
+用法：
+    python tools/neticle_snapshot.py snapshot                 # 为全部页面导出快照
+    python tools/neticle_snapshot.py snapshot --pages p10 p13 # 仅为指定页面导出
+    python tools/neticle_snapshot.py list                     # 列出已有快照切片
+    python tools/build.py --build-pages                       # 逐页构建前为数据页导出（随立方体准备）
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from neticle_index import connect_for
+from period_filter import TIME_COLUMN, month_bounds_ms, range_clause
+from sqlite_ro import connect_ro
+
+SNAPSHOT_SCHEMA = 1
+TEXT_COLUMNS = {'keyword_label', 'sourceName', 'sourceLabel', 'author'}
+FETCH_ROWS = 50000
+
+
+def snapshot_root(db_path: Path) -> Path:
+    return Path(str(Path(db_path).resolve()) + '.snapshot')
+
+
+def fingerprint(db_path: Path, table: str) -> str:
+    """源库指纹：表名 + 文件 size/mtime（任一变化即视为快照过期）。"""
+    st = Path(db_path).stat()
+    raw = f'table={table};size={st.st_size};mtime_ns={st.st_mtime_ns};schema={SNAPSHOT_SCHEMA}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def slice_dir(db_path: Path, table: str, country_id: int, month: str) -> Path:
+    return snapshot_root(db_path) / fingerprint(db_path, table) / f'c{int(country_id)}' / month
+
+
+class SnapshotSlice:
+    """单个 (countryId, 月份) 快照切片：各列以只读内存映射方式打开。"""
+
+    def __init__(self, path: Path, manifest: Dict[str, Any]):
+        self.path = path
+        self.manifest = manifest
+        self.columns: List[str] = list(manifest['columns'])
+        self.rows = int(manifest['rows'])
+
+    def values(self, col: str) -> np.ndarray:
+        """数值列（内存映射，零拷贝）。"""
+        if col in TEXT_COLUMNS:
+            raise KeyError(f'{col} 为文本列，请使用 codes()/vocab()')
+        return np.load(self.path / f'{col}.npy', mmap_mode='r')
+
+    def codes(self, col: str) -> np.ndarray:
+        """文本列的字典编码（int32，-1 为 NULL；内存映射，零拷贝）。"""
+        return np.load(self.path / f'{col}.codes.npy', mmap_mode='r')
+
+    def vocab(self, col: str) -> List[str]:
+        return json.loads((self.path / f'{col}.vocab.json').read_text(encoding='utf-8'))
+
+
+def load_slice(db_path: Path, table: str, country_id: int, month: str,
+               columns: Iterable[str] = ()) -> Optional[SnapshotSlice]:
+    """快照新鲜且包含所需列时返回切片，否则返回 None。"""
+    path = slice_dir(db_path, table, country_id, month)
+    mf = path / 'manifest.json'
+    if not mf.exists():
+        return None
+    manifest = json.loads(mf.read_text(encoding='utf-8'))
+    if manifest.get('schema') != SNAPSHOT_SCHEMA or manifest.get('table') != table:
+        return None
+    if not set(columns).issubset(manifest.get('columns') or []):
+        return None
+    return SnapshotSlice(path, manifest)
+
+
+def export_slice(db_path: Path, table: str, country_id: int, month: str, columns: Sequence[str],
+                 force: bool = False, log=print) -> Path:
+    """导出单个切片；已存在且包含所需列时直接返回。"""
+    db_path = Path(db_path).resolve()
+    if not force and load_slice(db_path, table, country_id, month, columns) is not None:
+        return slice_dir(db_path, table, country_id, month)
+    if TIME_COLUMN not in columns:
+        raise ValueError(f'快照列必须包含 {TIME_COLUMN}: {list(columns)}')
+    path = slice_dir(db_path, table, country_id, month)
+    tmp = path.with_name(path.name + '.tmp')
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+    t0 = time.time()
+    start_ms, end_ms = month_bounds_ms(month)
+    vocabs: Dict[str, Dict[str, int]] = {c: {} for c in columns if c in TEXT_COLUMNS}
+    chunks: Dict[str, List[np.ndarray]] = {c: [] for c in columns}
+    con = connect_for(db_path, table, ['countryId'] + list(columns))
+    try:
+        cur = con.execute(
+            f'SELECT {", ".join(columns)} FROM {table} WHERE countryId = ? AND {range_clause(TIME_COLUMN)}',
+            [int(country_id), start_ms, end_ms])
+        while True:
+            batch = cur.fetchmany(FETCH_ROWS)
+            if not batch:
+                break
+            for i, col in enumerate(columns):
+                vals = [r[i] for r in batch]
+                if col in vocabs:
+                    vocab = vocabs[col]
+                    chunks[col].append(np.fromiter(
+                        (-1 if v is None else vocab.setdefault(str(v), len(vocab)) for v in vals),
+                        dtype=np.int32, count=len(vals)))
+                elif col == TIME_COLUMN:
+                    chunks[col].append(np.asarray(vals, dtype=np.int64))
+                else:
+                    chunks[col].append(np.asarray(vals, dtype=np.float64))
+    finally:
+        con.close()
+    rows = 0
+    for col in columns:
+        if col in vocabs:
+            arr = np.concatenate(chunks[col]) if chunks[col] else np.empty(0, dtype=np.int32)
+            np.save(tmp / f'{col}.codes.npy', arr)
+            (tmp / f'{col}.vocab.json').write_text(json.dumps(list(vocabs[col]), ensure_ascii=False), encoding='utf-8')
+        else:
+            dtype = np.int64 if col == TIME_COLUMN else np.float64
+            arr = np.concatenate(chunks[col]) if chunks[col] else np.empty(0, dtype=dtype)
+            np.save(tmp / f'{col}.npy', arr)
+        rows = len(arr)
+    manifest = {'schema': SNAPSHOT_SCHEMA, 'table': table, 'country_id': int(country_id), 'month': month,
+                'columns': list(columns), 'rows': rows, 'fingerprint': fingerprint(db_path, table),
+                'export_seconds': round(time.time() - t0, 3)}
+    (tmp / 'manifest.json').write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding='utf-8')
+    if path.exists():
+        shutil.rmtree(path)
+    tmp.replace(path)
+    log(f'[snapshot] 导出 {table} countryId={country_id} month={month}: {rows} 行，'
+        f'{len(columns)} 列，用时 {time.time() - t0:.2f}s')
+    return path
+
+
+def prune_stale(db_path: Path, table: str) -> int:
+    """删除与当前源库指纹不一致的快照目录；返回删除数量。"""
+    root = snapshot_root(db_path)
+    if not root.exists():
+        return 0
+    keep = fingerprint(db_path, table)
+    removed = 0
+    for d in root.iterdir():
+        if d.is_dir() and d.name != keep:
+            shutil.rmtree(d)
+            removed += 1
+    return removed
+
+
+def prepare_snapshots(root: Path, pages: Optional[Iterable[str]] = None, force: bool = False, log=print,
+                      plan: Optional[Dict[Path, Dict[int, List[str]]]] = None) -> Dict[str, int]:
+    """按页面配置导出快照：每个 (countryId, 月份) 只读一次源库，列与立方体扫描所需一致。
+
+    plan：{neticle_db: {countryId: 月份}}，缺省按页面配置汇总（neticle_cube.plan_from_configs）。
+    """
+    from neticle_cube import MentionCube, plan_from_configs
+    stats = {'databases': 0, 'slices': 0, 'exported': 0}
+    for db, by_country in (plan if plan is not None else plan_from_configs(root, pages)).items():
+        if not db.exists():
+            log(f'[snapshot] 跳过缺失的数据库: {db}')
+            continue
+        cube = MentionCube(db, root=root)
+        con = connect_ro(db)
+        try:
+            cols = [r[1] for r in con.execute(f"PRAGMA table_info('{cube.table}')").fetchall()]
+        finally:
+            con.close()
+        columns = [c for c in cube.scan_columns(cols) if c != 'countryId']
+        prune_stale(db, cube.table)
+        stats['databases'] += 1
+        for country, months in by_country.items():
+            for m in sorted(months):
+                stats['slices'] += 1
+                if force or load_slice(db, cube.table, country, m, columns) is None:
+                    export_slice(db, cube.table, country, m, columns, force=True, log=log)
+                    stats['exported'] += 1
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description='mentions_wide 列式快照（.npy，可内存映射）')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    sp = sub.add_parser('snapshot', help='按页面配置导出国家/月份切片')
+    sp.add_argument('--pages', nargs='*', help='仅为指定页面导出（默认全部页面）')
+    sp.add_argument('--force', action='store_true', help='忽略已有快照强制重新导出')
+    lp = sub.add_parser('list', help='列出已有快照切片')
+    lp.add_argument('--pages', nargs='*', help='仅列出指定页面引用的数据库')
+    args = ap.parse_args(argv)
+    root = Path(__file__).resolve().parents[1]
+    if args.cmd == 'snapshot':
+        stats = prepare_snapshots(root, args.pages, force=args.force)
+        print(f"[snapshot] 完成：数据库 {stats['databases']} 个，切片 {stats['slices']} 个，本次导出 {stats['exported']} 个")
+        return 0
+    from neticle_cube import plan_from_configs
+    for db in plan_from_configs(root, args.pages):
+        for mf in sorted(snapshot_root(db).glob('*/c*/*/manifest.json')):
+            m = json.loads(mf.read_text(encoding='utf-8'))
+            state = 'fresh' if m['fingerprint'] == fingerprint(db, m['table']) else 'stale'
+            print(f"{db.name} countryId={m['country_id']} month={m['month']} rows={m['rows']} "
+                  f"cols={len(m['columns'])} {state}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
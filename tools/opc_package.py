@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+内存 OPC 包编辑器：按需读取 PPTX 部件、记录修改，一次写出新 PPTX
+
+背景：
+- 各页面填充脚本先把模板 PPTX `extractall` 到 tmp/ 下，逐文件改写后再 `os.walk` 重新压缩整个目录，
+  每页都要向磁盘写出并读回数百个文件。
+
+做法：
+- OpcPackage.open(pptx)：仅读取 ZIP 中央目录；部件内容在首次 read() 时才解压并缓存；
+- write()/delete() 只在内存中记录修改；save() 一次写出：未修改部件原样拷贝压缩字节
+  （tools/zip_rawcopy.py），修改与新增部件重新压缩，部件顺序沿用模板，新增部件追加在末尾；
+- write_counts 记录每个部件被写回的次数（用于核对「每个部件只写回一次」）；
+- 部件名使用包内路径（如 `ppt/charts/chart1.xml`），不带前导斜杠；
+- parse()/write_tree() 供 xml.etree 与 lxml 共用：以字节解析，序列化时带 XML 声明（utf-8），
+  与原先 `tree.write(path, encoding='utf-8', xml_declaration=True)` 的输出一致。
+
+用法：
+    pkg = OpcPackage.open('p10.pptx')
+    tree = pkg.parse('ppt/charts/chart1.xml')
+    ...
+    pkg.write_tree('ppt/charts/chart1.xml', tree)
+    pkg.save('output/p10.pptx')
+"""
+
+from __future__ import annotations
+
+import collections
+import fnmatch
+import io
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from zip_policy import CompressionPolicy
+from zip_rawcopy import ZipComposer
+
+
+class OpcPackage:
+    """PPTX/OPC 包的内存编辑视图。"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f'PPT模板文件不存在: {self.path}')
+        self._zip = zipfile.ZipFile(self.path, 'r')
+        self._infos: Dict[str, zipfile.ZipInfo] = {i.filename: i for i in self._zip.infolist() if not i.is_dir()}
+        self._order: List[str] = list(self._infos)
+        self._cache: Dict[str, bytes] = {}
+        self._modified: Dict[str, bytes] = {}
+        self._deleted = set()
+        self.write_counts: Dict[str, int] = collections.Counter()
+
+    @classmethod
+    def open(cls, path) -> 'OpcPackage':
+        return cls(Path(path))
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def __enter__(self) -> 'OpcPackage':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---- 部件访问 ----
+    @staticmethod
+    def _norm(name: str) -> str:
+        return str(name).lstrip('/')
+
+    def names(self) -> List[str]:
+        """当前包内全部部件名（模板顺序，新增部件在后）。"""
+        out = [n for n in self._order if n not in self._deleted]
+        out += [n for n in self._modified if n not in self._infos]
+        return out
+
+    def glob(self, pattern: str) -> List[str]:
+        """按路径段匹配部件名（`*` 不跨越 `/`），如 `ppt/charts/chart*.xml`。"""
+        segs = self._norm(pattern).split('/')
+        return [n for n in self.names()
+                if n.count('/') == len(segs) - 1
+                and all(fnmatch.fnmatchcase(a, b) for a, b in zip(n.split('/'), segs))]
+
+    def exists(self, name: str) -> bool:
+        n = self._norm(name)
+        return n in self._modified or (n in self._infos and n not in self._deleted)
+
+    def read(self, name: str) -> bytes:
+        n = self._norm(name)
+        if n in self._modified:
+            return self._modified[n]
+        if n in self._deleted or n not in self._infos:
+            raise FileNotFoundError(f'包内不存在部件: {n}（{self.path}）')
+        if n not in self._cache:
+            self._cache[n] = self._zip.read(self._infos[n])
+        return self._cache[n]
+
+    def read_text(self, name: str, encoding: str = 'utf-8') -> str:
+        return self.read(name).decode(encoding)
+
+    def write(self, name: str, data: bytes) -> None:
+        n = self._norm(name)
+        if not isinstance(data, (bytes, bytearray)):
+            raise TypeError(f'部件内容必须为 bytes: {n}')
+        self._deleted.discard(n)
+        self._modified[n] = bytes(data)
+        self.write_counts[n] += 1
+
+    def write_text(self, name: str, text: str, encoding: str = 'utf-8') -> None:
+        self.write(name, text.encode(encoding))
+
+    def delete(self, name: str) -> None:
+        n = self._norm(name)
+        if not self.exists(n):
+            raise FileNotFoundError(f'包内不存在部件: {n}（{self.path}）')
+        self._modified.pop(n, None)
+        if n in self._infos:
+            self._deleted.add(n)
+
+    # ---- XML 辅助 ----
+    def parse(self, name: str, etree=ET):
+        """把部件解析为 ElementTree（etree 可传入 lxml.etree）。"""
+        return etree.ElementTree(etree.fromstring(self.read(name)))
+
+    def write_tree(self, name: str, tree, encoding: str = 'utf-8', standalone: Optional[bool] = None) -> None:
+        """序列化 ElementTree（xml.etree 或 lxml）并写回部件；standalone 仅 lxml 支持。"""
+        buf = io.BytesIO()
+        if standalone is None:
+            tree.write(buf, encoding=encoding, xml_declaration=True)
+        else:
+            tree.write(buf, encoding=encoding, xml_declaration=True, standalone=standalone)
+        self.write(name, buf.getvalue())
+
+    # ---- 输出 ----
+    @property
+    def modified(self) -> List[str]:
+        return list(self._modified)
+
+    def save(self, out_path, policy: Optional[CompressionPolicy] = None) -> Path:
+        """一次写出新包：未修改部件原样拷贝，修改/新增部件按压缩策略重新写入。"""
+        out_path = Path(out_path)
+        if out_path.resolve() == self.path.resolve():
+            raise ValueError(f'输出路径不能与模板相同: {out_path}')
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        with ZipComposer(out_path, zin_path=self.path, policy=policy) as zc:
+            for n in self._order:
+                if n in self._deleted:
+                    continue
+                if n in self._modified:
+                    zc.write(n, self._modified[n])
+                else:
+                    zc.copy(self._infos[n])
+            for n, data in self._modified.items():
+                if n not in self._infos:
+                    zc.write(n, data)
+        return out_path
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+页面插件接口：编排器在进程内依次调用各页面的 generate(ctx) / fill(ctx) / package(ctx)
+
+背景：
+- run_page_builders 为每页启动 `python build.py` 子进程，页面钩子（make_data.py、chartN/fill.py）
+  再各起子进程；小页面的构建时间主要花在解释器启动、重复导入 pandas/lxml 与重复解析配置/模板上。
+
+做法：
+- PageRuntime：一次构建（或常驻构建服务）内共享的进程状态：
+  - 原始模板 DeckTemplate（tools/slide_build.py）惰性打开，文件变化（size/mtime）后重开；
+  - 页面脚本按 (size, mtime_ns) 缓存编译后的代码对象；run_script() 以 __main__ 身份在全新模块命名空间中执行，
+    等价于 `python script.py`（非零退出码视为失败）；
+- PageContext：传给插件的上下文：页面目录/编号、页面配置（tools/page_config.py 缓存）、根配置、
+  共享模板（ctx.deck）、只读数据库连接（ctx.db()，tools/sqlite_ro.py 连接池）、run_script()；
+- PageRuntime.plugin()：
+  - 页面 build.py 定义 generate/fill/package（任一即可，缺省阶段为空操作）→ 直接采用；
+  - 无 build.py 时按 generate_excel.py → fill_from_excel.py 约定，两阶段分别执行对应脚本；
+  - 两者皆无时严格报错；
+- 页面代码在 page_sandbox() 中运行：切到页面目录，结束后恢复 cwd、sys.path、sys.argv 与根 logger 处理器
+  （页面 logging.basicConfig 每次都能生效，且不会把日志写进上一页的文件）；
+- 进程内执行为默认路径；子进程隔离为可选回退（tools/build.py --isolate），并发（--jobs>1）仍按页起子进程。
+
+用法：
+    rt = PageRuntime(ROOT)
+    outputs = rt.run_page('p14')                 # generate → fill → package
+    rt.close()
+
+    # 页面 build.py（薄封装）
+    from slide_build import generate, fill, package, run_page
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+import sys
+import types
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+STAGES = ('generate', 'fill', 'package')
+FILLER_SCRIPTS = {'generate': 'generate_excel.py', 'fill': 'fill_from_excel.py'}
+
+
+def page_name(page) -> str:
+    """'p14' / '14' / 14 → 'p14'。"""
+    s = str(page).strip()
+    num = s[1:] if s[:1] in ('p', 'P') else s
+    if not num.isdigit():
+        raise ValueError(f'无法识别的页面: {page!r}')
+    return f'p{int(num)}'
+
+
+def discover_pages(root: Path = ROOT) -> List[str]:
+    """可进程内执行的页面（有 build.py，或同时有 generate_excel.py/fill_from_excel.py），按编号升序。"""
+    pages = []
+    for d in (Path(root) / 'charts').glob('p*'):
+        if not (d.is_dir() and d.name[1:].isdigit()):
+            continue
+        if (d / 'build.py').exists() or all((d / f).exists() for f in FILLER_SCRIPTS.values()):
+            pages.append(d.name)
+    return sorted(pages, key=lambda p: int(p[1:]))
+
+
+def _file_token(p: Path) -> Tuple[int, int]:
+    st = p.stat()
+    return st.st_size, st.st_mtime_ns
+
+
+@contextlib.contextmanager
+def page_sandbox(cwd: Path, script: Optional[Path] = None):
+    """进程内运行页面代码的隔离：cwd、sys.path、sys.argv 与根 logger 处理器在结束后恢复。"""
+    saved_cwd = os.getcwd()
+    saved_path = list(sys.path)
+    saved_argv = list(sys.argv)
+    root_logger = logging.getLogger()
+    saved_handlers = list(root_logger.handlers)
+    os.chdir(cwd)
+    if script is not None:
+        sys.argv = [str(script)]
+    try:
+        yield
+    finally:
+        for h in list(root_logger.handlers):
+            if h not in saved_handlers:
+                root_logger.removeHandler(h)
+                try:
+                    h.close()
+                except Exception:
+                    pass
+        os.chdir(saved_cwd)
+        sys.path[:] = saved_path
+        sys.argv = saved_argv
+
+
+def append_page_log(page_dir: Path, text: str) -> None:
+    """把进程内执行时捕获的页面输出追加到页面 logs/build.log（格式同 slide_build.init_page_logging）。"""
+    logs_dir = Path(page_dir) / 'logs'
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.utcnow().isoformat()
+    with open(logs_dir / 'build.log', 'a', encoding='utf-8') as fh:
+        fh.write(f'[log] start {stamp}Z (in-process)\n')
+        fh.write(text if not text or text.endswith('\n') else text + '\n')
+        fh.write(f'[log] end {datetime.utcnow().isoformat()}Z\n')
+
+
+class PageContext:
+    """插件上下文：页面信息、配置、共享模板与数据库连接。"""
+
+    def __init__(self, runtime: 'PageRuntime', page: str):
+        self.runtime = runtime
+        self.root = runtime.root
+        self.page = page_name(page)
+        self.page_dir = self.root / 'charts' / self.page
+        if not self.page_dir.is_dir():
+            raise FileNotFoundError(f'页面目录不存在: {self.page_dir}')
+        self.slide_no = int(self.page[1:])
+        self._config: Optional[Dict[str, Any]] = None
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        """页面 config.yaml（经 page_config 缓存并叠加当前覆盖；缺失时为空映射）。"""
+        if self._config is None:
+            from page_config import load_page_config
+            p = self.page_dir / 'config.yaml'
+            self._config = load_page_config(p) if p.exists() else {}
+        return self._config
+
+    @property
+    def root_config(self) -> Dict[str, Any]:
+        from page_config import load_page_config
+        return load_page_config(self.root / 'config.yaml')
+
+    @property
+    def deck(self):
+        return self.runtime.deck()
+
+    def db(self, key: str = 'neticle_db'):
+        """页面配置 data_sources.<key> 指向的只读连接（同线程复用）。"""
+        from sqlite_ro import connect_ro
+        val = (self.config.get('data_sources') or {}).get(key)
+        if not val:
+            raise KeyError(f'[{self.page}] config.yaml 未配置 data_sources.{key}')
+        p = Path(val)
+        return connect_ro(p if p.is_absolute() else (self.page_dir / p).resolve())
+
+    def run_script(self, script: Path, cwd: Optional[Path] = None) -> None:
+        self.runtime.run_script(Path(script), cwd or Path(script).parent)
+
+
+class PagePlugin:
+    """页面三阶段入口（缺省阶段为 None）。"""
+
+    def __init__(self, page: str, source: str, generate: Optional[Callable] = None,
+                 fill: Optional[Callable] = None, package: Optional[Callable] = None, module=None):
+        self.page = page
+        self.source = source
+        self.generate = generate
+        self.fill = fill
+        self.package = package
+        self._module = module   # 保持 build.py 模块存活（阶段函数引用其全局命名空间）
+
+    def stages(self) -> List[Tuple[str, Callable]]:
+        return [(s, getattr(self, s)) for s in STAGES if getattr(self, s) is not None]
+
+
+def _snapshot(d: Path) -> Dict[Path, Tuple[int, int]]:
+    return {p: _file_token(p) for p in d.rglob('*') if p.is_file()} if d.exists() else {}
+
+
+def _filler_stage(script: str) -> Callable[[PageContext], None]:
+    def stage(ctx: PageContext) -> None:
+        print(f'[{ctx.page}] run {script}')
+        ctx.run_script(ctx.page_dir / script)
+    return stage
+
+
+class PageRuntime:
+    """进程内共享状态与页面执行。"""
+
+    def __init__(self, root: Path = ROOT, log=print):
+        self.root = Path(root)
+        self.log = log
+        self._codes: Dict[Path, Tuple[Tuple[int, int], types.CodeType]] = {}
+        self._deck = None
+        self._deck_token: Optional[tuple] = None
+
+    # ---- 共享状态 ----
+    def deck(self):
+        """共享的原始模板；模板文件变化后重新打开。"""
+        from slide_build import DeckTemplate, load_project_paths
+        paths = load_project_paths(self.root)
+        tpl = paths['original_ppt']
+        if not tpl.exists():
+            raise FileNotFoundError(f'原始模板不存在: {tpl}')
+        token = (str(tpl), str(paths['template_root'])) + _file_token(tpl)
+        if self._deck is None or self._deck_token != token:
+            if self._deck is not None:
+                self._deck.close()
+            self._deck = DeckTemplate(tpl, paths['template_root'])
+            self._deck_token = token
+            self.log(f'[page-plugin] 载入模板 {tpl}')
+        return self._deck
+
+    @property
+    def deck_loaded(self) -> Optional[Path]:
+        return self._deck.path if self._deck is not None else None
+
+    @property
+    def compiled_scripts(self) -> int:
+        return len(self._codes)
+
+    def close(self) -> None:
+        if self._deck is not None:
+            self._deck.close()
+            self._deck = None
+
+    # ---- 脚本执行 ----
+    def code_for(self, script: Path) -> types.CodeType:
+        """页面脚本的编译结果（脚本未修改时复用）。"""
+        token = _file_token(script)
+        hit = self._codes.get(script)
+        if hit is not None and hit[0] == token:
+            return hit[1]
+        code = compile(script.read_bytes(), str(script), 'exec')
+        self._codes[script] = (token, code)
+        return code
+
+    @contextlib.contextmanager
+    def _fresh_module(self, script: Path, name: str):
+        """为脚本创建全新模块并在执行期间登记到 sys.modules[name]（结束后恢复原值）。"""
+        if not script.exists():
+            raise FileNotFoundError(f'缺少页面脚本: {script}')
+        mod = types.ModuleType(name)
+        mod.__file__ = str(script)
+        saved = sys.modules.get(name)
+        sys.modules[name] = mod
+        try:
+            yield mod
+        finally:
+            if saved is not None:
+                sys.modules[name] = saved
+            else:
+                sys.modules.pop(name, None)
+
+    def load_module(self, script: Path) -> types.ModuleType:
+        """以私有模块名执行脚本（入口块不会运行），用于读取 build.py 导出的阶段函数。"""
+        with self._fresh_module(script, f'_page_{script.parent.name}_{script.stem}') as mod, \
+                page_sandbox(script.parent, script):
+            exec(self.code_for(script), mod.__dict__)
+        return mod
+
+    def run_script(self, script: Path, cwd: Optional[Path] = None) -> None:
+        """等价于在 cwd 下执行 `python script`：以 __main__ 身份运行，非零 SystemExit 视为失败。"""
+        with self._fresh_module(script, '__main__') as mod, page_sandbox(cwd or script.parent, script):
+            try:
+                exec(self.code_for(script), mod.__dict__)
+                rc = None
+            except SystemExit as e:
+                rc = e.code
+        if rc not in (None, 0):
+            raise RuntimeError(f'{script.parent.name}/{script.name} 退出码 {rc}')
+
+    # ---- 插件 ----
+    def plugin(self, page: str) -> PagePlugin:
+        page = page_name(page)
+        page_dir = self.root / 'charts' / page
+        build = page_dir / 'build.py'
+        if build.exists():
+            mod = self.load_module(build)
+            hooks = {s: getattr(mod, s, None) for s in STAGES}
+            if not any(callable(h) for h in hooks.values()):
+                raise AttributeError(f'{build} 未提供 generate/fill/package，无法进程内执行（可改用子进程隔离）')
+            return PagePlugin(page, 'build.py', module=mod,
+                              **{s: h for s, h in hooks.items() if callable(h)})
+        if all((page_dir / f).exists() for f in FILLER_SCRIPTS.values()):
+            return PagePlugin(page, 'generate_excel/fill_from_excel',
+                              **{s: _filler_stage(f) for s, f in FILLER_SCRIPTS.items()})
+        raise FileNotFoundError(f'页面 {page} 既无 build.py 也无 generate_excel.py/fill_from_excel.py')
+
+    def run_page(self, page: str) -> List[str]:
+        """进程内执行页面插件的全部阶段，返回本次写出/更新的 output/ 下文件。"""
+        ctx = PageContext(self, page)
+        plugin = self.plugin(ctx.page)
+        out_dir = ctx.page_dir / 'output'
+        before = _snapshot(out_dir)
+        for _stage, fn in plugin.stages():
+            fn(ctx)
+        after = _snapshot(out_dir)
+        return sorted(str(p) for p, tok in after.items() if before.get(p) != tok)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+共享时间区间过滤：把月份/日期范围换算为 createdAtUtcMs 的 UTC 半开区间
+
+约定：
+- 所有页面统一按 UTC 划分日与月；
+- 区间一律为半开区间 [start_ms, end_ms)，SQL 写作 `col >= ? AND col < ?`，
+  可直接命中 (countryId, createdAtUtcMs, ...) 索引做区间查找；
+- 禁止在 WHERE 中对时间列套用 strftime()/datetime()/substr()（每行求值且无法用索引）；
+- 月份发现改为 MIN/MAX 定界 + 逐月 EXISTS 探测，均为区间查找。
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, List, Optional, Sequence, Tuple
+
+TIME_COLUMN = 'createdAtUtcMs'
+DAY_MS = 86400000
+
+
+def to_date(v) -> date:
+    """配置中的日期值（date/datetime/'YYYY-MM-DD'）统一为 date；类型不支持时报错。"""
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    if isinstance(v, str):
+        return datetime.strptime(v.strip(), '%Y-%m-%d').date()
+    raise TypeError(f'不支持的日期类型: {type(v)}')
+
+
+def _utc_ms(d: date) -> int:
+    return int(datetime(d.year, d.month, d.day, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def _parse_month(ym: str) -> Tuple[int, int]:
+    try:
+        y, m = (int(x) for x in str(ym).strip().split('-'))
+    except Exception:
+        raise ValueError(f'月份格式应为 YYYY-MM: {ym}')
+    if not 1 <= m <= 12:
+        raise ValueError(f'月份格式应为 YYYY-MM: {ym}')
+    return y, m
+
+
+def _next_month(y: int, m: int) -> Tuple[int, int]:
+    return (y + 1, 1) if m == 12 else (y, m + 1)
+
+
+def day_bounds_ms(start, end) -> Tuple[int, int]:
+    """日期范围 [start, end]（含首尾，UTC 日）→ 半开区间 [start_ms, end_ms)。"""
+    s, e = to_date(start), to_date(end)
+    if e < s:
+        raise ValueError(f'结束日期早于开始日期: {s} > {e}')
+    return _utc_ms(s), _utc_ms(e + timedelta(days=1))
+
+
+def month_bounds_ms(ym: str) -> Tuple[int, int]:
+    """UTC 月份 → 半开区间 [月初, 次月初) 的毫秒时间戳。"""
+    y, m = _parse_month(ym)
+    ny, nm = _next_month(y, m)
+    return _utc_ms(date(y, m, 1)), _utc_ms(date(ny, nm, 1))
+
+
+def month_span(ym: str) -> Tuple[date, date]:
+    """YYYY-MM → (月首日, 月末日)。"""
+    y, m = _parse_month(ym)
+    ny, nm = _next_month(y, m)
+    return date(y, m, 1), date(ny, nm, 1) - timedelta(days=1)
+
+
+def months_between(start, end) -> List[str]:
+    """返回 [start, end] 覆盖的 YYYY-MM 列表（含首尾月份）。"""
+    s, e = to_date(start), to_date(end)
+    y, m = s.year, s.month
+    out = []
+    while (y, m) <= (e.year, e.month):
+        out.append(f'{y:04d}-{m:02d}')
+        y, m = _next_month(y, m)
+    return out
+
+
+def ms_to_date(ms: int) -> date:
+    """毫秒时间戳 → UTC 日期。"""
+    return date(1970, 1, 1) + timedelta(days=int(ms) // DAY_MS)
+
+
+def ms_to_month(ms: int) -> str:
+    return ms_to_date(ms).strftime('%Y-%m')
+
+
+def range_clause(column: str = TIME_COLUMN) -> str:
+    """半开区间 SQL 片段（两个位置参数）。"""
+    return f'{column} >= ? AND {column} < ?'
+
+
+def discover_months(con: sqlite3.Connection, table: str, where_sql: str = '', params: Sequence[Any] = (),
+                    column: str = TIME_COLUMN) -> List[str]:
+    """发现满足过滤条件且有数据的月份（升序）。
+
+    - 先以 MIN/MAX 定出时间边界；
+    - 再对边界内每个月做一次 `EXISTS(... col >= ? AND col < ?)` 探测；
+    两步均在 (过滤列, 时间列) 索引上做区间查找，不对每行求值日期函数。
+    where_sql 为不含 WHERE 关键字的附加条件，使用位置参数 params。
+    """
+    cond = f'({where_sql}) AND ' if where_sql else ''
+    row = con.execute(
+        f'SELECT MIN({column}), MAX({column}) FROM {table} WHERE {cond}{column} IS NOT NULL',
+        list(params)).fetchone()
+    if not row or row[0] is None:
+        return []
+    lo, hi = ms_to_date(row[0]), ms_to_date(row[1])
+    probe = f'SELECT EXISTS(SELECT 1 FROM {table} WHERE {cond}{range_clause(column)})'
+    months = []
+    for ym in months_between(lo, hi):
+        s, e = month_bounds_ms(ym)
+        if con.execute(probe, list(params) + [s, e]).fetchone()[0]:
+            months.append(ym)
+    return months
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+单页 PPTX 构建引擎：一次解析原始模板，在同一进程内输出多个页面的单页 PPTX
+
+背景：
+- charts/p8 … p31 的 build.py 是 15 份近乎相同的脚本（仅 SLIDE_NO、注释与少量策略不同），
+  每页各起一个 Python 进程、导入 lxml/yaml、两次读取根配置并重新打开、解析 LRTBH.pptx。
+
+做法：
+- DeckTemplate 打开原始模板一次：presentation.xml、presentation.xml.rels、[Content_Types].xml
+  只解析一次，关系图解析结果在各页依赖闭包（tools/slide_closure.py）之间共享；
+- build_slide(spec)：沿依赖闭包输出单页 PPTX，未改动部件原样拷贝压缩字节（tools/zip_rawcopy.py），
+  presentation/Content_Types/图表等替换部件按压缩策略写入；指定幻灯片重命名为 slide1；
+- 逐页差异由页面 config.yaml 的 `slide_build` 节声明（未声明取默认值）：
+  - strict_micro_template：必须使用页面微模板（template/ppt/charts 与 embeddings），缺失即报错；
+    否则缺失时回退到根模板解压目录（project.template_root）；
+  - merge_unzipped_charts：页面微模板之外，再以模板解压目录中的图表补齐缺失项；
+  - require_charts：本页幻灯片引用的图表及其关系必须存在于替换来源中，缺失即报错（否则沿用模板原图表）；
+  - embed_glob：打包的嵌入式 xlsx 文件匹配模式（默认 `Microsoft_Office_Excel_Binary_Worksheet*.xlsx`）；
+- 页面 build.py 为薄封装：导出插件阶段 generate（make_data.py）/ fill（chartN/fill.py）/ package（本页单页 PPTX），
+  由编排器在进程内调用（tools/page_plugin.py）；直接运行时 run_page() 另写页级日志（logs/build.log）。
+
+用法：
+    python tools/slide_build.py                 # 构建全部带 build.py 的页面
+    python tools/slide_build.py 8 12 14         # 仅构建指定幻灯片
+    python charts/p14/build.py                  # 单页入口（薄封装）
+"""
+
+from __future__ import annotations
+
+import atexit
+import copy
+import re
+import sys
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from lxml import etree as ET
+
+from page_config import load_page_config
+from slide_closure import prune_content_types, slide_closure
+from zip_rawcopy import ZipComposer
+
+ROOT = Path(__file__).resolve().parents[1]
+CHARTS_ROOT = ROOT / 'charts'
+
+NS_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+NS_CT = 'http://schemas.openxmlformats.org/package/2006/content-types'
+NS_P = 'http://schemas.openxmlformats.org/presentationml/2006/main'
+NS_R = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+CT_SLIDE = 'application/vnd.openxmlformats-officedocument.presentationml.slide+xml'
+CT_APP = 'application/vnd.openxmlformats-officedocument.extended-properties+xml'
+CT_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+DEFAULT_EMBED_GLOB = 'Microsoft_Office_Excel_Binary_Worksheet*.xlsx'
+_SPEC_KEYS = {'strict_micro_template', 'merge_unzipped_charts', 'require_charts', 'embed_glob'}
+
+APP_XML = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Properties xmlns="http://schemas.openxmlformats.org/officeDocument/2006/extended-properties" xmlns:vt="http://schemas.openxmlformats.org/officeDocument/2006/docPropsVTypes">
+<Application>Microsoft Office PowerPoint</Application>
+<PresentationFormat>Widescreen</PresentationFormat>
+<TotalTime>0</TotalTime>
+<Words>0</Words>
+<Slides>1</Slides>
+<Notes>0</Notes>
+<HiddenSlides>0</HiddenSlides>
+<MMClips>0</MMClips>
+<ScaleCrop>false</ScaleCrop>
+<LinksUpToDate>false</LinksUpToDate>
+<SharedDoc>false</SharedDoc>
+<HyperlinksChanged>false</HyperlinksChanged>
+<AppVersion>16.0000</AppVersion>
+</Properties>'''
+
+
+def _resolve(p: str, base: Path = ROOT) -> Path:
+    rp = Path(p)
+    return rp if rp.is_absolute() else base / p
+
+
+def load_project_paths(root: Path = ROOT) -> Dict[str, Path]:
+    """根 config.yaml 的原始模板与模板解压目录。"""
+    cfg = load_page_config(root / 'config.yaml')
+    proj = cfg.get('project') or {}
+    return {
+        'original_ppt': _resolve(proj.get('original_ppt', 'input/LRTBH.pptx'), root),
+        'template_root': _resolve(proj.get('template_root', 'input/LRTBH-unzip'), root),
+    }
+
+
+class SlideSpec:
+    """单页构建参数（来自页面 config.yaml 的 slide_build 节）。"""
+
+    def __init__(self, slide_no: int, page_dir: Path, strict_micro_template: bool = False,
+                 merge_unzipped_charts: bool = False, require_charts: bool = False,
+                 embed_glob: str = DEFAULT_EMBED_GLOB):
+        self.slide_no = int(slide_no)
+        self.page_dir = Path(page_dir)
+        self.strict_micro_template = bool(strict_micro_template)
+        self.merge_unzipped_charts = bool(merge_unzipped_charts)
+        self.require_charts = bool(require_charts)
+        self.embed_glob = embed_glob
+        self.out = self.page_dir / 'output' / f'p{self.slide_no}.pptx'
+
+    @classmethod
+    def for_page(cls, slide_no: int, charts_root: Path = CHARTS_ROOT) -> 'SlideSpec':
+        page_dir = charts_root / f'p{int(slide_no)}'
+        if not page_dir.is_dir():
+            raise FileNotFoundError(f'页面目录不存在: {page_dir}')
+        cfg_path = page_dir / 'config.yaml'
+        cfg = load_page_config(cfg_path) if cfg_path.exists() else {}
+        opts = cfg.get('slide_build') or {}
+        unknown = set(opts) - _SPEC_KEYS
+        if unknown:
+            raise ValueError(f'{cfg_path} 的 slide_build 节包含未知键: {sorted(unknown)}')
+        return cls(slide_no, page_dir, **opts)
+
+    @property
+    def micro_template(self) -> Path:
+        return self.page_dir / 'template' / 'ppt'
+
+
+class DeckTemplate:
+    """原始模板：共享的 presentation/rels/Content_Types 解析结果与关系图缓存。"""
+
+    def __init__(self, path: Path, unzipped: Path):
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f'原始模板不存在: {self.path}')
+        self.unzipped = Path(unzipped)
+        self.zip = zipfile.ZipFile(self.path, 'r')
+        self.infos = {i.filename: i for i in self.zip.infolist()}
+        self.pres_rels = ET.fromstring(self.zip.read('ppt/_rels/presentation.xml.rels'))
+        self.pres = ET.fromstring(self.zip.read('ppt/presentation.xml'))
+        self.content_types = ET.fromstring(self.zip.read('[Content_Types].xml'))
+        self.has_app_xml = 'docProps/app.xml' in self.infos
+        self.rels_cache: Dict[str, list] = {}
+
+    def close(self) -> None:
+        self.zip.close()
+
+    def __enter__(self) -> 'DeckTemplate':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---- presentation / Content_Types 过滤 ----
+    def filter_pres_rels(self, slide_no: int):
+        """仅保留指向本页幻灯片（重定向为 slide1）与非 slide 的关系。"""
+        new_root = ET.Element('Relationships', xmlns=NS_REL)
+        slide_rel_id = None
+        for rel in self.pres_rels.findall('{%s}Relationship' % NS_REL):
+            t = rel.get('Target') or ''
+            typ = rel.get('Type') or ''
+            if typ.endswith('/slide') and t == f'slides/slide{slide_no}.xml':
+                slide_rel_id = rel.get('Id')
+                e = ET.SubElement(new_root, 'Relationship')
+                for k, v in rel.attrib.items():
+                    e.set(k, v)
+                e.set('Target', 'slides/slide1.xml')
+            elif not typ.endswith('/slide'):
+                e = ET.SubElement(new_root, 'Relationship')
+                for k, v in rel.attrib.items():
+                    e.set(k, v)
+        return ET.tostring(new_root, xml_declaration=True, encoding='UTF-8', standalone="yes"), slide_rel_id
+
+    def filter_pres_xml(self, slide_rel_id: Optional[str]) -> bytes:
+        """sldIdLst 仅保留本页幻灯片。"""
+        tree = copy.deepcopy(self.pres)
+        sld_id_lst = tree.find('{%s}sldIdLst' % NS_P)
+        if sld_id_lst is None:
+            sld_id_lst = ET.SubElement(tree, '{%s}sldIdLst' % NS_P)
+        for ch in list(sld_id_lst):
+            sld_id_lst.remove(ch)
+        ET.SubElement(sld_id_lst, '{%s}sldId' % NS_P, attrib={'id': '256', '{%s}id' % NS_R: slide_rel_id or 'rId1'})
+        return ET.tostring(tree, xml_declaration=True, encoding='UTF-8', standalone="yes")
+
+    def filter_content_types(self, embed_files: List[str]) -> bytes:
+        """移除全部 slide 覆盖项后添加 slide1，补齐 docProps/app.xml 与嵌入 xlsx 覆盖项。"""
+        ct = copy.deepcopy(self.content_types)
+        for o in list(ct.findall('{%s}Override' % NS_CT)):
+            if (o.get('PartName') or '').startswith('/ppt/slides/slide'):
+                ct.remove(o)
+        ET.SubElement(ct, '{%s}Override' % NS_CT, PartName='/ppt/slides/slide1.xml', ContentType=CT_SLIDE)
+        if not any(o.get('PartName') == '/docProps/app.xml' for o in ct.findall('{%s}Override' % NS_CT)):
+            ET.SubElement(ct, '{%s}Override' % NS_CT, PartName='/docProps/app.xml', ContentType=CT_APP)
+        for nm in embed_files:
+            ET.SubElement(ct, '{%s}Override' % NS_CT, PartName=f'/ppt/embeddings/{nm}', ContentType=CT_XLSX)
+        return ET.tostring(ct, xml_declaration=True, encoding='UTF-8', standalone="yes")
+
+    # ---- 替换来源 ----
+    def _unzipped_charts_dir(self) -> Path:
+        nested = self.unzipped / 'ppt' / 'charts'
+        return nested if nested.exists() else self.unzipped / 'charts'
+
+    def chart_overrides(self, spec: SlideSpec) -> Dict[str, bytes]:
+        """图表与关系替换来源：{'chartN.xml': bytes, 'rels:chartN.xml.rels': bytes}。"""
+        page_charts = spec.micro_template / 'charts'
+        dirs: List[Path] = []
+        if page_charts.exists():
+            if spec.strict_micro_template and not (page_charts / '_rels').exists():
+                raise FileNotFoundError(f'[p{spec.slide_no}] 缺少图表关系微模板目录: {page_charts / "_rels"}')
+            dirs.append(page_charts)
+            if spec.merge_unzipped_charts:
+                dirs.append(self._unzipped_charts_dir())
+        elif spec.strict_micro_template:
+            raise FileNotFoundError(f'[p{spec.slide_no}] 缺少图表微模板目录: {page_charts}')
+        else:
+            dirs.append(self._unzipped_charts_dir())
+        out: Dict[str, bytes] = {}
+        for d in dirs:
+            if not d.exists():
+                continue
+            for f in sorted(d.glob('chart*.xml')):
+                out.setdefault(f.name, f.read_bytes())
+            for f in sorted((d / '_rels').glob('chart*.xml.rels')):
+                out.setdefault(f'rels:{f.name}', f.read_bytes())
+        return out
+
+    def embed_dir(self, spec: SlideSpec) -> Path:
+        page_embed = spec.micro_template / 'embeddings'
+        if page_embed.exists():
+            return page_embed
+        if spec.strict_micro_template:
+            raise FileNotFoundError(f'[p{spec.slide_no}] 缺少嵌入式微模板目录: {page_embed}')
+        return self.unzipped / 'ppt' / 'embeddings'
+
+    @staticmethod
+    def _override_for(name: str, overrides: Dict[str, bytes]) -> Optional[bytes]:
+        """图表/图表关系部件的替换内容；无替换时返回 None（沿用模板）。"""
+        base = name.rsplit('/', 1)[-1]
+        if name.startswith('ppt/charts/chart') and name.endswith('.xml'):
+            return overrides.get(base)
+        if name.startswith('ppt/charts/_rels/chart') and name.endswith('.xml.rels'):
+            return overrides.get(f'rels:{base}')
+        return None
+
+    # ---- 单页输出 ----
+    def build_slide(self, spec: SlideSpec, log=print) -> Path:
+        n = spec.slide_no
+        slide_part = f'ppt/slides/slide{n}.xml'
+        slide_rels = f'ppt/slides/_rels/slide{n}.xml.rels'
+        overrides = self.chart_overrides(spec)
+        embed_dir = self.embed_dir(spec)
+        embed_files = sorted(f.name for f in embed_dir.glob(spec.embed_glob)) if embed_dir.exists() else []
+        closure = slide_closure(self.zip, n, rels_cache=self.rels_cache)
+        if spec.require_charts:
+            used = [nm.rsplit('/', 1)[-1] for nm in closure.names
+                    if nm.startswith('ppt/charts/chart') and nm.endswith('.xml')]
+            missing = [c for c in used if c not in overrides]
+            missing_rels = [f'{c}.rels' for c in used
+                            if f'ppt/charts/_rels/{c}.rels' in closure and f'rels:{c}.rels' not in overrides]
+            if missing or missing_rels:
+                raise FileNotFoundError(
+                    f'[p{n}] Page micro-template charts/rels missing: charts={missing}, rels={missing_rels}')
+        pres_rels_xml, slide_rel_id = self.filter_pres_rels(n)
+        replaced = {
+            'ppt/_rels/presentation.xml.rels': pres_rels_xml,
+            'ppt/presentation.xml': self.filter_pres_xml(slide_rel_id),
+            '[Content_Types].xml': prune_content_types(self.filter_content_types(embed_files), closure.excluded),
+        }
+        spec.out.parent.mkdir(parents=True, exist_ok=True)
+        with ZipComposer(spec.out, zin_path=self.path) as z:
+            for name in closure.names:
+                if name in replaced:
+                    z.write(name, replaced[name])
+                elif name == slide_part:
+                    z.copy(self.infos[name], 'ppt/slides/slide1.xml')
+                elif name == slide_rels:
+                    z.copy(self.infos[name], 'ppt/slides/_rels/slide1.xml.rels')
+                elif name.startswith('ppt/embeddings/Microsoft_Office_Excel_Binary_Worksheet') and name.endswith('.xlsb'):
+                    # 跳过模板中的 xlsb，避免与新生成的 xlsx 冲突
+                    continue
+                else:
+                    data = self._override_for(name, overrides)
+                    if data is not None:
+                        z.write(name, data)
+                    else:
+                        z.copy(self.infos[name])
+            if not self.has_app_xml:
+                z.write('docProps/app.xml', APP_XML.encode('utf-8'))
+            for nm in embed_files:
+                z.write(f'ppt/embeddings/{nm}', (embed_dir / nm).read_bytes())
+        log(f'Built {spec.out}')
+        return spec.out
+
+
+def build_slides(slide_nos: Iterable[int], root: Path = ROOT, log=print) -> List[Path]:
+    """一次打开原始模板，依次输出各页单页 PPTX。"""
+    specs = [SlideSpec.for_page(n, root / 'charts') for n in slide_nos]
+    paths = load_project_paths(root)
+    t0 = time.perf_counter()
+    with DeckTemplate(paths['original_ppt'], paths['template_root']) as deck:
+        outs = [deck.build_slide(s, log=log) for s in specs]
+    log(f'[slide_build] {len(outs)} 页，用时 {time.perf_counter() - t0:.2f}s')
+    return outs
+
+
+def page_slides(root: Path = ROOT) -> List[int]:
+    """带 build.py 的页面对应的幻灯片编号（升序）。"""
+    nums = [int(d.name[1:]) for d in (root / 'charts').glob('p*')
+            if d.is_dir() and d.name[1:].isdigit() and (d / 'build.py').exists()]
+    return sorted(nums)
+
+
+# ---- 页面薄封装入口 ----
+def init_page_logging(page_dir: Path) -> None:
+    """stdout/stderr 双写到页面 logs/build.log（保留控制台输出）。"""
+    logs_dir = page_dir / 'logs'
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    fh = open(logs_dir / 'build.log', 'a', encoding='utf-8')
+
+    class _Tee:
+        def __init__(self, *streams):
+            self.streams = streams
+
+        def write(self, data):
+            for s in self.streams:
+                try:
+                    s.write(data)
+                    s.flush()
+                except Exception:
+                    pass
+
+        def flush(self):
+            for s in self.streams:
+                try:
+                    s.flush()
+                except Exception:
+                    pass
+
+    sys.stdout = _Tee(sys.__stdout__, fh)
+    sys.stderr = _Tee(sys.__stderr__, fh)
+    print(f"[log] start {datetime.utcnow().isoformat()}Z")
+
+    def _close():
+        print(f"[log] end {datetime.utcnow().isoformat()}Z")
+        try:
+            fh.flush()
+            fh.close()
+        except Exception:
+            pass
+
+    atexit.register(_close)
+
+
+# ---- 页面插件阶段（tools/page_plugin.py）：页面 build.py 导出以下三个函数 ----
+def generate(ctx) -> None:
+    """执行页面 make_data.py（存在时）。"""
+    script = ctx.page_dir / 'make_data.py'
+    if script.exists():
+        print(f'[{ctx.page}] run make_data.py')
+        ctx.run_script(script)
+    else:
+        print(f'[{ctx.page}] skip make_data.py (not found)')
+
+
+def fill(ctx) -> None:
+    """依次执行各 chartN/fill.py（以图表目录为工作目录）。"""
+    for d in sorted(d for d in ctx.page_dir.iterdir() if d.is_dir() and re.match(r'^chart\d+$', d.name)):
+        script = d / 'fill.py'
+        if script.exists():
+            print(f'[{ctx.page}] run {script.name} in {d.name}')
+            ctx.run_script(script, d)
+        else:
+            print(f'[{ctx.page}] skip {d.name}/fill.py (not found)')
+
+
+def package(ctx) -> Path:
+    """由共享的原始模板输出本页单页 PPTX。"""
+    return ctx.deck.build_slide(SlideSpec.for_page(ctx.slide_no, ctx.root / 'charts'))
+
+
+def run_page(page_file: str) -> List[str]:
+    """页面 build.py 入口：页级日志 → 进程内执行 generate/fill/package。"""
+    from page_plugin import PageRuntime
+    page_dir = Path(page_file).resolve().parent
+    init_page_logging(page_dir)
+    runtime = PageRuntime(page_dir.parents[1])
+    try:
+        return runtime.run_page(page_dir.name)
+    finally:
+        runtime.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description='单页 PPTX 构建引擎（一次解析模板，批量输出）')
+    ap.add_argument('slides', nargs='*', type=int, help='幻灯片编号（默认：全部带 build.py 的页面）')
+    args = ap.parse_args(argv)
+    build_slides(args.slides or page_slides())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
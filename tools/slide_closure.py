@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+单页依赖闭包：从指定幻灯片出发沿关系图收集可达部件，页面构建只复制这些部件
+
+背景：
+- p8–p31 的 build() 打开完整 LRTBH.pptx，遍历全部成员并把除其它幻灯片外的所有部件写入单页 PPTX，
+  其它页面专用的图表、嵌入工作簿、图片、备注页也一并复制，单页输出体积与整份原稿相当。
+
+做法：
+- 从包关系 `_rels/.rels` 开始广度优先遍历每个部件的 `_rels/<name>.rels`：
+  - 关系目标按源部件所在目录解析（`/` 开头为包内绝对路径），External 关系跳过；
+  - Type 以 `/slide` 结尾的关系只跟随指定幻灯片（presentation 对其它页面的引用、页间超链接均不跟随）；
+  - 关系指向的包内部件不存在时严格报错；
+- 版式、母版、主题、presProps 等由 presentation/母版关系可达，保持完整；
+- prune_content_types() 删除未复制部件的 Override 项（幻灯片的 Override 仍由页面脚本自行维护）。
+
+用法：
+    with zipfile.ZipFile(TPL) as tpl:
+        closure = slide_closure(tpl, 14)
+        new_ct_xml = prune_content_types(new_ct_xml, closure.excluded)
+        for name in closure.names:   # 模板顺序
+            ...
+"""
+
+from __future__ import annotations
+
+import posixpath
+import re
+import sys
+import zipfile
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+NS_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+_REL_RE = re.compile(r'<Relationship\b[^>]*>')
+_ATTR_RE = re.compile(r'\b(Id|Type|Target|TargetMode)="([^"]*)"')
+_SLIDE_RE = re.compile(r'^ppt/slides/slide\d+\.xml$')
+
+
+def rels_part(name: str) -> str:
+    """部件对应的关系部件名；包本身（空名）对应 `_rels/.rels`。"""
+    d, b = posixpath.split(name)
+    return posixpath.join(d, '_rels', f'{b}.rels')
+
+
+def _relationships(data: bytes) -> List[Dict[str, str]]:
+    return [dict(_ATTR_RE.findall(tag)) for tag in _REL_RE.findall(data.decode('utf-8'))]
+
+
+def _resolve(source: str, target: str) -> str:
+    if target.startswith('/'):
+        return posixpath.normpath(target.lstrip('/'))
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source), target))
+
+
+class SlideClosure:
+    """指定幻灯片的依赖闭包（部件名均为模板内名称）。"""
+
+    def __init__(self, slide_part: str, parts: Set[str], order: List[str]):
+        self.slide_part = slide_part
+        self.parts = parts
+        self.names = [n for n in order if n in parts]
+        self.excluded = [n for n in order if n not in parts and not _SLIDE_RE.match(n)]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.parts
+
+
+def slide_closure(tpl: zipfile.ZipFile, slide_no: int,
+                  rels_cache: Optional[Dict[str, List[Dict[str, str]]]] = None) -> SlideClosure:
+    """沿关系图收集指定幻灯片可达的全部部件（含各自的 .rels 与 [Content_Types].xml）。
+
+    rels_cache：同一模板多次求闭包时传入同一字典，各 .rels 只解析一次。
+    """
+    order = [i.filename for i in tpl.infolist() if not i.is_dir()]
+    present = set(order)
+    slide_part = f'ppt/slides/slide{int(slide_no)}.xml'
+    if slide_part not in present:
+        raise FileNotFoundError(f'模板中不存在幻灯片: {slide_part}')
+    parts = {'[Content_Types].xml'}
+    queue = deque([''])
+    seen = {''}
+    while queue:
+        src = queue.popleft()
+        rp = rels_part(src)
+        if rp not in present:
+            continue
+        parts.add(rp)
+        if rels_cache is None:
+            rels = _relationships(tpl.read(rp))
+        else:
+            rels = rels_cache.get(rp)
+            if rels is None:
+                rels = rels_cache[rp] = _relationships(tpl.read(rp))
+        for rel in rels:
+            if rel.get('TargetMode') == 'External':
+                continue
+            target = _resolve(src, rel.get('Target', ''))
+            if rel.get('Type', '').endswith('/slide') and target != slide_part:
+                continue
+            if target not in present:
+                raise FileNotFoundError(f'关系目标不存在: {rp} → {target}')
+            if target not in seen:
+                seen.add(target)
+                parts.add(target)
+                queue.append(target)
+    if slide_part not in parts:
+        raise ValueError(f'幻灯片未被 presentation 关系引用: {slide_part}')
+    return SlideClosure(slide_part, parts, order)
+
+
+def prune_content_types(ct_xml: Union[bytes, str], excluded: Iterable[str]) -> Union[bytes, str]:
+    """删除 excluded 部件的 Override 项；输入为 bytes 时返回 bytes，其余格式保持不变。"""
+    drop = {'/' + n for n in excluded}
+    if not drop:
+        return ct_xml
+    is_bytes = isinstance(ct_xml, (bytes, bytearray))
+    text = ct_xml.decode('utf-8') if is_bytes else ct_xml
+
+    def repl(m: re.Match) -> str:
+        pn = re.search(r'\bPartName="([^"]+)"', m.group(0))
+        return '' if pn and pn.group(1) in drop else m.group(0)
+
+    out = re.sub(r'<Override\b[^>]*/>', repl, text)
+    return out.encode('utf-8') if is_bytes else out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description='列出指定幻灯片的依赖闭包')
+    ap.add_argument('pptx', type=Path)
+    ap.add_argument('slide_no', type=int)
+    args = ap.parse_args(argv)
+    with zipfile.ZipFile(args.pptx) as tpl:
+        closure = slide_closure(tpl, args.slide_no)
+        size = {i.filename: i.file_size for i in tpl.infolist()}
+    kept = sum(size[n] for n in closure.names)
+    dropped = sum(size[n] for n in closure.excluded)
+    for n in closure.names:
+        print(n)
+    print(f'# 保留 {len(closure.names)} 个部件 {kept}B；排除 {len(closure.excluded)} 个部件 {dropped}B', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
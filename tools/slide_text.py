@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+幻灯片文本绑定：页面声明文本占位（如 `#3` 排名、第 n 个 `NN%`）与数据的绑定，按字节偏移就地替换，不建 DOM
+
+背景：
+- p18 _update_ranking_in_slide/_update_main_percent_texts、p29 update_right_total_sov_texts 为了改几个 a:t 文本，
+  各自把整张 slide XML 解析成树、查找、再整体序列化一次（p18 对同一张幻灯片做两遍）；
+- 数量校验散落在各处且口径不一：有的要求与数据等长，有的只要求不少于数据条数。
+
+做法：
+- scan_slide_text()：单遍正则扫描 slide 字节，得到字节偏移表：
+  - 每个 a:t 的内容区间与反转义后的文本（TextRun）；
+  - 每个 p:sp 形状的 y 坐标（p:spPr 内首个 a:off@y）及其包含的文本段（TextShape）；
+  - 前缀取自根元素的命名空间声明；a:t 内出现 CDATA 或子元素时严格报错；
+- SlideTextBinding：一个占位声明：
+  - pattern 对文本（strip 后）全匹配；scope='run' 匹配单个 a:t，scope='shape' 匹配形状内文本段拼接（写入首段）；
+  - strip=False（仅 scope='run'）：对 a:t 原文全匹配，不去除首尾空白；
+  - order='document'（文档顺序）或 'y'（按形状 y 坐标自上而下，稳定排序）；
+  - values + fmt：按顺序逐个写入；exact=True 时匹配数必须等于数据条数，False 时不得少于数据条数（只写前 N 个）；
+  - fill：所有匹配统一写入同一文本（至少匹配 1 处）；
+- rewrite_slide_text()：一次扫描完成全部绑定，校验数量与重叠（同一 a:t 被多个绑定命中时报错），
+  按偏移从后往前拼接新字节，未涉及的字节（含 XML 声明与命名空间）原样保留；
+- apply_text_bindings()：读部件一次、写回一次（内容未变时不写），日志输出每个绑定的命中数；
+- 严格报错：数量不符、重叠、部件缺失时抛 SlideTextError，部件不写回。
+
+用法：
+    apply_text_bindings(pkg, 'ppt/slides/slide1.xml', [
+        SlideTextBinding('Ranking', r'#\\d+', ranks, fmt='#{}'),
+        SlideTextBinding('主趋势百分比', r'\\d+%', fill=''),
+    ], log=print)
+"""
+
+from __future__ import annotations
+
+import html
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+A_NS = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+P_NS = 'http://schemas.openxmlformats.org/presentationml/2006/main'
+
+
+class SlideTextError(RuntimeError):
+    """文本绑定失败（数量不符、重叠或文本结构不支持）。"""
+
+
+class TextRun:
+    """一个 a:t：内容字节区间 [start, end)；自闭合 <a:t/> 时 start/end 为整个标签区间。"""
+
+    __slots__ = ('start', 'end', 'text', 'self_closing', 'tag', 'shape')
+
+    def __init__(self, start: int, end: int, text: str, self_closing: bool = False, tag: bytes = b'',
+                 shape: Optional['TextShape'] = None):
+        self.start = start
+        self.end = end
+        self.text = text
+        self.self_closing = self_closing
+        self.tag = tag
+        self.shape = shape
+
+    def replacement(self, text: str) -> bytes:
+        body = escape(text).encode('utf-8')
+        if not self.self_closing:
+            return body
+        if not text:
+            return self.tag
+        open_tag = self.tag[:-2].rstrip() + b'>'
+        name = self.tag[1:].split(None, 1)[0].rstrip(b'/>')
+        return open_tag + body + b'</' + name + b'>'
+
+
+class TextShape:
+    """一个 p:sp：y 为 p:spPr 内首个 a:off@y（缺失时为 None），runs 为其中的 a:t。"""
+
+    __slots__ = ('index', 'y', 'runs')
+
+    def __init__(self, index: int):
+        self.index = index
+        self.y: Optional[int] = None
+        self.runs: List[TextRun] = []
+
+    @property
+    def text(self) -> str:
+        return ''.join(r.text.strip() for r in self.runs)
+
+
+def _prefixes(xml: bytes, uri: str) -> List[bytes]:
+    found = re.findall(rb'xmlns:([\w.-]+)\s*=\s*["\']' + re.escape(uri.encode()) + rb'["\']', xml)
+    if not found:
+        raise SlideTextError(f'slide 未声明命名空间 {uri}')
+    return sorted(set(found))
+
+
+def _tag_re(prefixes: List[bytes], local: bytes) -> bytes:
+    return rb'(?:' + b'|'.join(re.escape(p) for p in prefixes) + rb'):' + local
+
+
+def scan_slide_text(xml: bytes) -> Tuple[List[TextRun], List[TextShape]]:
+    """单遍扫描 slide 字节，返回 (全部 a:t, 全部 p:sp)。"""
+    a, p = _prefixes(xml, A_NS), _prefixes(xml, P_NS)
+    token = re.compile(
+        rb'<(?P<close>/?)(?P<name>' + _tag_re(p, rb'spPr') + rb'|' + _tag_re(p, rb'sp') + rb'|'
+        + _tag_re(a, rb'off') + rb'|' + _tag_re(a, rb't') + rb')(?=[\s/>])(?P<attrs>[^>]*)>')
+    close_t = {pre: b'</' + pre + b':t>' for pre in a}
+    runs: List[TextRun] = []
+    shapes: List[TextShape] = []
+    shape: Optional[TextShape] = None
+    in_sppr = False
+    pos = 0
+    while True:
+        m = token.search(xml, pos)
+        if m is None:
+            break
+        pos = m.end()
+        name, closing, attrs = m.group('name'), bool(m.group('close')), m.group('attrs')
+        self_closing = attrs.endswith(b'/')
+        local = name.split(b':', 1)[1]
+        if local == b'sp':
+            if closing:
+                shape = None
+            elif not self_closing:
+                shape = TextShape(len(shapes))
+                shapes.append(shape)
+        elif local == b'spPr':
+            in_sppr = not closing and not self_closing and shape is not None
+        elif local == b'off':
+            if in_sppr and not closing and shape.y is None:
+                y = re.search(rb'\by\s*=\s*["\'](-?\d+)["\']', attrs)
+                shape.y = int(y.group(1)) if y else None
+        elif not closing:
+            if self_closing:
+                run = TextRun(m.start(), m.end(), '', True, m.group(0), shape)
+            else:
+                end = xml.find(close_t[name.split(b':', 1)[0]], pos)
+                if end < 0:
+                    raise SlideTextError(f'a:t 未闭合（偏移 {m.start()}）')
+                content = xml[pos:end]
+                if b'<' in content:
+                    raise SlideTextError(f'a:t 含 CDATA 或子元素，无法按偏移替换（偏移 {m.start()}）')
+                run = TextRun(pos, end, html.unescape(content.decode('utf-8')), shape=shape)
+                pos = end
+            runs.append(run)
+            if shape is not None:
+                shape.runs.append(run)
+    return runs, shapes
+
+
+class SlideTextBinding:
+    """一个文本占位声明：pattern 全匹配的文本按顺序绑定 values（或统一写入 fill）。"""
+
+    def __init__(self, name: str, pattern: str, values: Optional[Sequence[Any]] = None, *, fmt: str = '{}',
+                 fill: Optional[str] = None, scope: str = 'run', order: str = 'document', exact: bool = True,
+                 strip: bool = True):
+        if (values is None) == (fill is None):
+            raise ValueError(f'文本绑定 {name}：values 与 fill 必须且只能提供一个')
+        if scope not in ('run', 'shape') or order not in ('document', 'y'):
+            raise ValueError(f'文本绑定 {name}：scope 取 run/shape，order 取 document/y')
+        self.name = name
+        self.pattern = re.compile(pattern)
+        self.values = list(values) if values is not None else None
+        self.fmt = fmt
+        self.fill = fill
+        self.scope = scope
+        self.order = order
+        self.exact = exact
+        self.strip = strip
+
+    def targets(self, runs: List[TextRun], shapes: List[TextShape]) -> List[TextRun]:
+        """按作用域与顺序取命中的 a:t（shape 作用域取形状首段）。"""
+        if self.scope == 'run':
+            hits = [(r.shape.y if r.shape else None, r) for r in runs
+                    if self.pattern.fullmatch(r.text.strip() if self.strip else r.text)]
+        else:
+            hits = [(s.y, s.runs[0]) for s in shapes if s.runs and self.pattern.fullmatch(s.text)]
+        if self.order == 'y':
+            hits.sort(key=lambda h: h[0] or 0)
+        return [r for _, r in hits]
+
+    def texts(self, found: int, part: str) -> List[str]:
+        """校验命中数并给出依次写入的文本。"""
+        if self.fill is not None:
+            if found == 0:
+                raise SlideTextError(f'{part}: 文本绑定 {self.name} 未命中任何文本节点')
+            return [self.fill] * found
+        need = len(self.values)
+        if (found != need) if self.exact else (found < need):
+            expect = f'{need}' if self.exact else f'至少 {need}'
+            raise SlideTextError(f'{part}: 文本绑定 {self.name} 命中 {found} 处，期望 {expect} 处（与数据数量一致）')
+        return [self.fmt.format(v) for v in self.values]
+
+
+def rewrite_slide_text(xml: bytes, bindings: Sequence[SlideTextBinding], part: str = 'slide'
+                       ) -> Tuple[bytes, Dict[str, int]]:
+    """一次扫描完成全部绑定，返回 (新字节, {绑定名: 写入数})。"""
+    runs, shapes = scan_slide_text(xml)
+    edits: Dict[int, Tuple[TextRun, str, str]] = {}
+    counts: Dict[str, int] = {}
+    for binding in bindings:
+        targets = binding.targets(runs, shapes)
+        texts = binding.texts(len(targets), part)
+        for run, text in zip(targets, texts):
+            if run.start in edits:
+                raise SlideTextError(f'{part}: 文本「{run.text}」同时被 {edits[run.start][1]} 与 {binding.name} 绑定')
+            edits[run.start] = (run, binding.name, text)
+        counts[binding.name] = len(texts)
+    out = bytearray(xml)
+    for start in sorted(edits, reverse=True):
+        run, _, text = edits[start]
+        out[run.start:run.end] = run.replacement(text)
+    return bytes(out), counts
+
+
+def apply_text_bindings(pkg, part: str, bindings: Sequence[SlideTextBinding],
+                        log: Optional[Callable[[str], None]] = None) -> Dict[str, int]:
+    """对包内幻灯片部件应用文本绑定：读一次、写回一次（内容未变时不写）。"""
+    if not pkg.exists(part):
+        raise SlideTextError(f'缺少幻灯片部件: {part}')
+    xml = pkg.read(part)
+    new, counts = rewrite_slide_text(xml, bindings, part)
+    if new != xml:
+        pkg.write(part, new)
+    if log:
+        log(f'[slide-text] {part}: ' + '，'.join(f'{name} {n} 处' for name, n in counts.items()))
+    return counts
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+只读 SQLite 连接工厂：页面生成器与共享工具统一经此打开输入数据库
+
+背景：
+- 各页面以 `sqlite3.connect(db_path)` 临时打开 Neticle / metrics 数据库，未设置任何 PRAGMA：
+  默认以读写方式打开、每次查询都要加共享锁并检查文件变更，页缓存仅约 2MB，大库反复走缓冲读；
+- 同一进程内多个阶段（索引校验、快照导出、立方体扫描、审计查询）对同一库重复建连。
+
+做法：
+- 以 URI `file:<path>?mode=ro&immutable=1` 只读打开（构建期间输入库视为不可变，免去锁与变更检测）；
+- 设置 `mmap_size`（经操作系统页缓存内存映射读取）、放大 `cache_size`、`temp_store=MEMORY`，
+  并开启 `query_only` 防止误写；
+- 同一进程、同一线程内按 (路径, inode, size, mtime) 复用连接：文件被替换（如 sidecar 重建）后自动换新连接；
+  池化连接的 close() 为空操作，调用方原有的 try/finally 关闭写法无需改动，进程退出时统一关闭。
+
+用法：
+    from sqlite_ro import connect_ro
+    con = connect_ro(db_path)
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+from urllib.parse import quote
+
+MMAP_SIZE = 1 << 30          # 1GiB：覆盖常见 Neticle 库；超出部分回退为常规读取
+CACHE_SIZE_KIB = 65536       # 64MiB 页缓存（PRAGMA cache_size 取负值表示 KiB）
+
+_pool: Dict[Tuple, 'ReadOnlyConnection'] = {}
+_lock = threading.Lock()
+
+
+class ReadOnlyConnection(sqlite3.Connection):
+    """池化的只读连接：close() 不真正关闭，由 close_all() 在进程退出时统一关闭。"""
+
+    def close(self) -> None:
+        pass
+
+    def _close(self) -> None:
+        sqlite3.Connection.close(self)
+
+
+def ro_uri(db_path) -> str:
+    """数据库路径 → 只读、不可变的 SQLite URI。"""
+    p = Path(db_path).resolve()
+    return f"file:{quote(p.as_posix())}?mode=ro&immutable=1"
+
+
+def _tune(con: sqlite3.Connection) -> None:
+    con.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+    con.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KIB}')
+    con.execute('PRAGMA temp_store=MEMORY')
+    con.execute('PRAGMA query_only=1')
+
+
+def connect_ro(db_path) -> sqlite3.Connection:
+    """返回 db_path 的只读调优连接（同进程同线程内复用）；文件不存在时报错。"""
+    p = Path(db_path).resolve()
+    if not p.exists():
+        raise FileNotFoundError(f'未找到数据库: {p}')
+    st = p.stat()
+    key = (os.getpid(), threading.get_ident(), str(p), st.st_ino, st.st_size, st.st_mtime_ns)
+    with _lock:
+        con = _pool.get(key)
+        if con is None:
+            # 同一路径的旧连接（文件已被替换）先关闭
+            for k in [k for k in _pool if k[:3] == key[:3]]:
+                _pool.pop(k)._close()
+            con = sqlite3.connect(ro_uri(p), uri=True, factory=ReadOnlyConnection, check_same_thread=False)
+            _tune(con)
+            _pool[key] = con
+    return con
+
+
+def close_all() -> int:
+    """关闭当前进程池中的全部连接；返回关闭数量。"""
+    with _lock:
+        mine = [k for k in _pool if k[0] == os.getpid()]
+        for k in mine:
+            _pool.pop(k)._close()
+    return len(mine)
+
+
+atexit.register(close_all)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+入口启动开销基准：测量各命令行入口的启动墙钟时间，并用 `python -X importtime` 列出最重的导入
+
+背景：
+- `tools/build.py` 仅合成最终稿时也在模块顶层导入 numpy（共享立方体/快照）、构建缓存、页面插件与
+  subprocess/线程池，并多次用纯 Python SafeLoader 解析根配置与全部页面配置，启动约 250ms，
+  其中真正用于合成的模块不到一半；页面脚本的 `import yaml` 在改用 page_config 后也已无用。
+
+做法：
+- 每个入口在全新解释器中运行 N 次，取中位数/最小值（不加 -X importtime，避免计时失真）；
+- 另以 `-X importtime` 运行一次，解析 stderr，按累计耗时列出顶层导入（含其依赖）；
+- compose-startup 入口导入 build 并完成合成前的全部准备（根/页面配置、输出路径、压缩策略），
+  代表“仅合成”路径在读写 ZIP 之前的固定开销；
+- --budget-ms：compose-startup 中位数超出预算时返回非零（严格报错，便于在 CI 中守住启动时间）。
+
+用法：
+    python tools/startup_bench.py                    # 全部入口，各 5 次
+    python tools/startup_bench.py --runs 10 --top 8
+    python tools/startup_bench.py --budget-ms 100    # 超出预算返回 1
+"""
+
+from __future__ import annotations
+
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+TOOLS = Path(__file__).resolve().parent
+
+_COMPOSE_STARTUP = (
+    'import sys; sys.path.insert(0, {tools!r}); import build; '
+    'build.load_out_path_and_mode(); build.load_original_ppt(); build.default_policy()'
+)
+
+ENTRIES: Dict[str, List[str]] = {
+    'python (bare)': ['-c', 'pass'],
+    'build.py --help': [str(TOOLS / 'build.py'), '--help'],
+    'compose-startup': ['-c', _COMPOSE_STARTUP.format(tools=str(TOOLS))],
+    'build_server.py --help': [str(TOOLS / 'build_server.py'), '--help'],
+    'slide_build.py --help': [str(TOOLS / 'slide_build.py'), '--help'],
+}
+BUDGET_ENTRY = 'compose-startup'
+
+
+def _run(args: List[str], importtime: bool = False) -> Tuple[float, str]:
+    cmd = [sys.executable] + (['-X', 'importtime'] if importtime else []) + args
+    t0 = time.perf_counter()
+    res = subprocess.run(cmd, cwd=str(ROOT), capture_output=True, text=True)
+    elapsed = time.perf_counter() - t0
+    if res.returncode != 0:
+        raise RuntimeError(f'入口运行失败（rc={res.returncode}）: {" ".join(cmd)}\n{res.stderr[-2000:]}')
+    return elapsed, res.stderr
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """解析 -X importtime 输出，返回顶层导入 [(模块, self_us, cumulative_us)]（按累计耗时降序）。"""
+    top = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        name = parts[2].rstrip()
+        if name.startswith('  '):   # 缩进表示被其它模块间接导入
+            continue
+        top.append((name.strip(), int(parts[0]), int(parts[1])))
+    return sorted(top, key=lambda t: -t[2])
+
+
+def bench(runs: int = 5, top: int = 6, entries: Optional[List[str]] = None, log=print) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for name in entries or list(ENTRIES):
+        if name not in ENTRIES:
+            raise KeyError(f'未知入口: {name}（可选: {", ".join(ENTRIES)}）')
+        args = ENTRIES[name]
+        times = [_run(args)[0] for _ in range(runs)]
+        med, best = statistics.median(times), min(times)
+        results[name] = {'median': med, 'min': best}
+        log(f'{name:<24} 中位 {med * 1000:7.1f}ms  最小 {best * 1000:7.1f}ms  （{runs} 次）')
+        if top > 0 and name != 'python (bare)':
+            for mod, _self_us, cum_us in parse_importtime(_run(args, importtime=True)[1])[:top]:
+                log(f'    {cum_us / 1000:7.1f}ms  {mod}')
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description='入口启动开销基准（墙钟时间 + -X importtime 顶层导入）')
+    ap.add_argument('--runs', type=int, default=5, help='每个入口运行次数（默认 5）')
+    ap.add_argument('--top', type=int, default=6, help='每个入口列出的最重顶层导入数（0 不列出）')
+    ap.add_argument('--entry', action='append', choices=list(ENTRIES), help='只测指定入口（可重复）')
+    ap.add_argument('--budget-ms', type=float, help=f'{BUDGET_ENTRY} 中位数预算（毫秒），超出时返回 1')
+    args = ap.parse_args(argv)
+    if args.runs < 1:
+        ap.error(f'--runs 必须 ≥ 1: {args.runs}')
+    entries = args.entry
+    if args.budget_ms is not None and entries and BUDGET_ENTRY not in entries:
+        entries = entries + [BUDGET_ENTRY]
+    results = bench(args.runs, args.top, entries)
+    if args.budget_ms is not None:
+        med = results[BUDGET_ENTRY]['median'] * 1000
+        if med > args.budget_ms:
+            print(f'[startup-bench] {BUDGET_ENTRY} 中位 {med:.1f}ms 超出预算 {args.budget_ms:.0f}ms', file=sys.stderr)
+            return 1
+        print(f'[startup-bench] {BUDGET_ENTRY} 中位 {med:.1f}ms，预算 {args.budget_ms:.0f}ms 内')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
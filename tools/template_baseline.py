@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+模板基线缓存：页面从模板抽取的「template」兜底数据按模板哈希持久化为 JSON，生成脚本直接读取
+
+背景：
+- generate_excel 以模板数值为基线、数据库结果覆盖；但模板基线每次运行都重新获取：p16 清空 tmp、解压整个模板、
+  解析 chart XML（必要时再用 pyxlsb 读嵌入工作簿），p18 同样 rmtree + 解压 tmp/ppt 后解析 chart XML 与 slide1.xml；
+- 这些数据只随模板变化，重复解压与解析纯属浪费，且 rmtree/解压 tmp 也是各页面运行中最慢的文件系统操作。
+
+做法：
+- 指纹沿用 tools/template_manifest.py 的 template_digest（模板内容 sha256，进程内按 size/mtime 记忆）；
+- 页面提供抽取函数 extract(source) -> 可 JSON 序列化的 dict；source 为 TemplateSource：
+  - source.manifest：模板图表清单（类别/数值缓存、公式、嵌入工作簿目标等，见 template_manifest）；
+  - source.read(part) / source.exists(part)：按需以内存 OPC 包读取部件（不解压，首次调用时才打开模板）；
+- 结果写入 `<output_root>/template_baselines/<page>-<指纹>.json`（经 write_json_atomic 写同目录唯一临时文件再替换），记录页面抽取器版本；
+  之后的运行只计算指纹并读取 JSON；同一进程内按 (页面, 指纹, 版本) 缓存；
+- 页面修改抽取逻辑时递增自己的 version，旧缓存自动失效；缓存文件损坏或版本不符时重新抽取；
+- 严格报错：模板不存在、抽取函数抛错时原样抛出，不写缓存。
+
+用法：
+    def _extract(source):
+        return {'main': source.manifest.values('ppt/charts/chart1.xml', 'val')}
+
+    baseline = load_baseline(PAGE_DIR / 'p18.pptx', 'p18', _extract, version=1)
+
+    python tools/template_baseline.py --list                   # 列出已缓存的基线
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from template_manifest import ROOT, TemplateManifest, manifest_dir, template_digest, write_json_atomic
+
+_baselines: Dict[Tuple[str, str, int], Dict[str, Any]] = {}
+
+
+def baseline_dir(root: Path = ROOT) -> Path:
+    """基线目录：与模板清单同级的 <output_root>/template_baselines/。"""
+    return manifest_dir(root).parent / 'template_baselines'
+
+
+class TemplateSource:
+    """抽取函数可用的模板视图：清单 + 按需打开的内存 OPC 包。"""
+
+    def __init__(self, template: Path, log: Optional[Callable[[str], None]] = None):
+        self.template = template
+        self.manifest = TemplateManifest.load(template, log=log)
+        self._pkg = None
+
+    @property
+    def pkg(self):
+        if self._pkg is None:
+            from opc_package import OpcPackage
+            self._pkg = OpcPackage.open(self.template)
+        return self._pkg
+
+    def read(self, part: str) -> bytes:
+        return self.pkg.read(part)
+
+    def exists(self, part: str) -> bool:
+        return self.pkg.exists(part)
+
+    def close(self) -> None:
+        if self._pkg is not None:
+            self._pkg.close()
+            self._pkg = None
+
+
+def load_baseline(template, page: str, extract: Callable[[TemplateSource], Dict[str, Any]], version: int = 1,
+                  cache_dir: Optional[Path] = None, log: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """按模板指纹取页面基线：进程内缓存 → 基线文件 → 调用 extract 重新抽取并写缓存。"""
+    template = Path(template)
+    digest = template_digest(template)
+    key = (page, digest, version)
+    hit = _baselines.get(key)
+    if hit is not None:
+        return hit
+    path = Path(cache_dir or baseline_dir()) / f'{page}-{digest}.json'
+    data = None
+    if path.exists():
+        try:
+            doc = json.loads(path.read_text(encoding='utf-8'))
+            if doc.get('version') == version and doc.get('digest') == digest:
+                data = doc['data']
+        except Exception:
+            data = None
+    if data is None:
+        source = TemplateSource(template, log=log)
+        try:
+            data = extract(source)
+        finally:
+            source.close()
+        doc = {'page': page, 'version': version, 'digest': digest, 'source': str(template), 'data': data}
+        write_json_atomic(path, doc)
+        if log:
+            log(f'[template-baseline] 生成 {path.name}（{template.name}）')
+    elif log:
+        log(f'[template-baseline] 命中 {path.name}')
+    _baselines[key] = data
+    return data
+
+
+def main(argv=None) -> int:
+    args = sys.argv[1:] if argv is None else argv
+    if args != ['--list']:
+        print('用法: python tools/template_baseline.py --list')
+        return 2
+    base = baseline_dir()
+    for path in sorted(base.glob('*.json')) if base.is_dir() else []:
+        try:
+            doc = json.loads(path.read_text(encoding='utf-8'))
+            print(f"{path.name}: page={doc.get('page')} version={doc.get('version')} keys={sorted(doc.get('data') or {})}")
+        except Exception as e:
+            print(f'{path.name}: 无法读取（{e}）')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+模板图表清单：按模板内容哈希持久化各 chart 部件的结构信息，填充脚本查清单而不是每次重新解析模板
+
+背景：
+- 图表类型、系列名、类目标签、ptCount、公式、嵌入工作簿目标与颜色只随模板变化，但各页面每次运行都重新打开并解析
+  模板 chart XML 来获取它们：p10 _create_embedded_workbook 的 _read_pie_labels/_read_series_labels 等、
+  p16 find_chart_files、p18 read_template_months、batch_make_micro_templates._detect_chart_type。
+
+做法：
+- 模板指纹：.pptx 为文件内容 sha256（同一进程内按 size/mtime 记忆）；解压目录为 ppt/charts/ 下全部部件
+  （含 _rels）的名称与内容 sha256；
+- 首次遇到某指纹时，每个 chart 部件用 tools/chart_patch.py 解析一次，记录：
+  - types：plotArea 下的图表类型（文档顺序）；external_rid：c:externalData 的 r:id；
+  - embed：图表关系中的嵌入工作簿（package/oleObject 关系或指向 embeddings/）rId 与包内目标部件名；
+  - series：图表类型、序号、c:idx、名称、填充/线条颜色、数据点（c:dPt 的 idx/颜色/文本），
+    以及各角色（tx/cat/val/xVal/yVal/bubbleSize）的引用类型、公式、ptCount、formatCode 与缓存值；
+- 清单写入根输出目录 `<output_root>/template_manifests/<指纹>.json`（先写同目录唯一临时文件再 os.replace），
+  之后的运行只计算指纹并读取 JSON；同一进程内按指纹缓存 TemplateManifest 对象；
+- 严格报错：模板不存在、查询清单中没有的部件时抛错；清单文件损坏或版本不符时重建。
+
+用法：
+    manifest = TemplateManifest.load('charts/p10/p10.pptx')
+    manifest.chart_types('ppt/charts/chart1.xml')              # ['pieChart']
+    manifest.series('ppt/charts/chart2.xml', 'lineChart')       # [{'name': ..., 'roles': {...}}, ...]
+    manifest.values('ppt/charts/chart1.xml', 'cat')             # 首个系列的类目缓存
+
+    python tools/template_manifest.py charts/p10/p10.pptx       # 打印清单摘要（必要时生成）
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import posixpath
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+MANIFEST_VERSION = 1
+CHARTS_PREFIX = 'ppt/charts/'
+ROLES = ('tx', 'cat', 'val', 'xVal', 'yVal', 'bubbleSize')
+_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_EMBED_REL_TYPES = ('/package', '/oleObject')
+
+_digest_memo: Dict[Tuple[str, int, int], str] = {}
+_manifests: Dict[str, 'TemplateManifest'] = {}
+
+
+def write_json_atomic(path: Path, data: Any) -> None:
+    """写 JSON：同目录唯一临时文件（mkstemp）写完后 os.replace，并发写同一文件时读者只会看到完整内容。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(data, ensure_ascii=False, indent=1))
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp)
+        raise
+
+
+def manifest_dir(root: Path = ROOT) -> Path:
+    """清单目录：根 config.yaml 的 project.output_root 下的 template_manifests/。"""
+    from page_config import load_page_config
+    cfg = load_page_config(root / 'config.yaml') if (root / 'config.yaml').exists() else {}
+    out = Path((cfg.get('project') or {}).get('output_root', './output'))
+    return (out if out.is_absolute() else root / out) / 'template_manifests'
+
+
+def _chart_parts(names: Iterable[str]) -> List[str]:
+    return sorted((n for n in names
+                   if n.startswith(CHARTS_PREFIX) and '/' not in n[len(CHARTS_PREFIX):] and n.endswith('.xml')),
+                  key=lambda n: (len(n), n))
+
+
+def _dir_parts(path: Path) -> List[str]:
+    charts = path / 'ppt' / 'charts'
+    if not charts.is_dir():
+        return []
+    return sorted(p.relative_to(path).as_posix() for p in charts.rglob('*') if p.is_file())
+
+
+def template_digest(path) -> str:
+    """模板指纹：.pptx 内容 sha256；目录为 ppt/charts/ 下部件名与内容的 sha256。"""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f'模板不存在: {path}')
+    if path.is_dir():
+        h = hashlib.sha256()
+        for name in _dir_parts(path):
+            h.update(name.encode('utf-8') + b'\0')
+            h.update(hashlib.sha256((path / name).read_bytes()).digest())
+        return 'dir-' + h.hexdigest()
+    st = path.stat()
+    key = (str(path.resolve()), st.st_size, st.st_mtime_ns)
+    digest = _digest_memo.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with path.open('rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        digest = _digest_memo[key] = h.hexdigest()
+    return digest
+
+
+def _embed_target(rels_xml: Optional[bytes], chart_part: str) -> Optional[Dict[str, str]]:
+    if rels_xml is None:
+        return None
+    for rel in ET.fromstring(rels_xml).iter(f'{_REL_NS}Relationship'):
+        target = rel.get('Target') or ''
+        if target and ((rel.get('Type') or '').endswith(_EMBED_REL_TYPES) or 'embeddings/' in target):
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(chart_part), target))
+            return {'rid': rel.get('Id'), 'target': target}
+    return None
+
+
+def _role_info(ser, role: str) -> Optional[Dict[str, Any]]:
+    from chart_patch import C, local_name
+    node = ser.el.find(C + role)
+    if node is None:
+        return None
+    if role == 'tx' and node.find(C + 'v') is not None:
+        return {'ref': 'v', 'formula': None, 'ptCount': 1, 'formatCode': None, 'values': [node.findtext(C + 'v')]}
+    store_parent = next((c for c in node if local_name(c) in ('strRef', 'numRef', 'strLit', 'numLit')), None)
+    if store_parent is None:
+        return None
+    ref = local_name(store_parent)
+    store = store_parent if ref.endswith('Lit') else next(
+        (c for c in store_parent if local_name(c) in ('strCache', 'numCache')), None)
+    count = store.find(C + 'ptCount') if store is not None else None
+    return {
+        'ref': ref,
+        'formula': store_parent.findtext(C + 'f'),
+        'ptCount': int(count.get('val')) if count is not None and count.get('val') is not None else None,
+        'formatCode': store.findtext(C + 'formatCode') if store is not None else None,
+        'values': ser.cache(role),
+    }
+
+
+def _point_info(dpt) -> Dict[str, Any]:
+    from chart_patch import A, C, fill_color
+    idx = dpt.find(C + 'idx')
+    texts = [t.text for t in dpt.iterfind(f'{C}tx/{C}rich//{A}t') if t.text]
+    text = ''.join(texts) if texts else dpt.findtext(f'{C}tx/{C}strRef/{C}strCache/{C}pt/{C}v')
+    return {
+        'idx': int(idx.get('val')) if idx is not None and idx.get('val') else None,
+        'fill': fill_color(dpt),
+        'line': fill_color(dpt, line=True),
+        'text': text or None,
+    }
+
+
+def describe_chart(xml: bytes, part: str, rels_xml: Optional[bytes] = None) -> Dict[str, Any]:
+    """单个 chart 部件的清单条目（部件只解析一次）。"""
+    from chart_patch import C, R_ID, ChartPatch, fill_color
+    chart = ChartPatch(xml, part)
+    ext = chart.root.find(C + 'externalData')
+    return {
+        'types': chart.chart_types,
+        'external_rid': ext.get(R_ID) if ext is not None else None,
+        'embed': _embed_target(rels_xml, part),
+        'series': [{
+            'chart_type': ser.chart_type,
+            'index': ser.index,
+            'idx': ser.idx,
+            'name': ser.name,
+            'fill': fill_color(ser.el),
+            'line': fill_color(ser.el, line=True),
+            'roles': {role: info for role in ROLES if (info := _role_info(ser, role)) is not None},
+            'points': [_point_info(dpt) for dpt in ser.points],
+        } for ser in chart.series],
+    }
+
+
+def _rels_name(part: str) -> str:
+    return posixpath.join(posixpath.dirname(part), '_rels', posixpath.basename(part) + '.rels')
+
+
+def build_manifest(names: Iterable[str], read: Callable[[str], bytes], exists: Callable[[str], bool]) -> Dict[str, Any]:
+    """由部件列表与读取函数生成清单主体 {'charts': {部件名: 条目}}。"""
+    charts = {}
+    for part in _chart_parts(names):
+        rels = _rels_name(part)
+        charts[part] = describe_chart(read(part), part, read(rels) if exists(rels) else None)
+    return {'charts': charts}
+
+
+class TemplateManifest:
+    """一个模板（.pptx 或解压目录）的图表清单。"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self.digest: str = data['digest']
+        self.charts: Dict[str, Dict[str, Any]] = data['charts']
+
+    @classmethod
+    def load(cls, template, pkg=None, cache_dir: Optional[Path] = None, log: Optional[Callable[[str], None]] = None
+             ) -> 'TemplateManifest':
+        """按模板指纹取清单：进程内缓存 → 清单文件 → 重新生成（pkg 为已打开的同一模板 OpcPackage 时复用其部件）。"""
+        template = Path(template)
+        digest = template_digest(template)
+        hit = _manifests.get(digest)
+        if hit is not None:
+            return hit
+        path = Path(cache_dir or manifest_dir()) / f'{digest}.json'
+        data = None
+        if path.exists():
+            try:
+                data = json.loads(path.read_text(encoding='utf-8'))
+                if data.get('version') != MANIFEST_VERSION or data.get('digest') != digest:
+                    data = None
+            except Exception:
+                data = None
+        if data is None:
+            data = {'version': MANIFEST_VERSION, 'digest': digest, 'source': str(template),
+                    **cls._scan(template, pkg)}
+            write_json_atomic(path, data)
+            if log:
+                log(f'[template-manifest] 生成 {path.name}（{template.name}，{len(data["charts"])} 个图表）')
+        manifest = _manifests[digest] = cls(data)
+        return manifest
+
+    @staticmethod
+    def _scan(template: Path, pkg=None) -> Dict[str, Any]:
+        if template.is_dir():
+            return build_manifest(_dir_parts(template), lambda n: (template / n).read_bytes(),
+                                  lambda n: (template / n).is_file())
+        if pkg is not None:
+            return build_manifest(pkg.names(), pkg.read, pkg.exists)
+        from opc_package import OpcPackage
+        with OpcPackage.open(template) as own:
+            return build_manifest(own.names(), own.read, own.exists)
+
+    # ---- 查询 ----
+    @property
+    def parts(self) -> List[str]:
+        return list(self.charts)
+
+    def has(self, part: str) -> bool:
+        return part in self.charts
+
+    def chart(self, part: str) -> Dict[str, Any]:
+        try:
+            return self.charts[part]
+        except KeyError:
+            raise KeyError(f'模板清单中没有图表部件: {part}（{self.data.get("source")}）') from None
+
+    def chart_types(self, part: str) -> List[str]:
+        return list(self.chart(part)['types'])
+
+    def series(self, part: str, chart_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [s for s in self.chart(part)['series'] if chart_type is None or s['chart_type'] == chart_type]
+
+    def values(self, part: str, role: str = 'cat', series: Optional[int] = 0) -> Optional[List[Optional[str]]]:
+        """某系列（series=None 时为全部系列依次拼接）角色的缓存值；角色缺失时为 None。"""
+        targets = self.series(part) if series is None else self.series(part)[series:series + 1]
+        out = None
+        for ser in targets:
+            info = ser['roles'].get(role)
+            if info is not None and info['values'] is not None:
+                out = (out or []) + list(info['values'])
+        return out
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = sys.argv[1:] if argv is None else argv
+    if not args:
+        print('用法: python tools/template_manifest.py <模板.pptx|解压目录> [...]')
+        return 2
+    for arg in args:
+        m = TemplateManifest.load(arg, log=print)
+        print(f'{arg}: {m.digest}')
+        for part, info in m.charts.items():
+            names = [s['name'] for s in info['series']]
+            embed = (info['embed'] or {}).get('target')
+            print(f'  {part}: {"/".join(info["types"]) or "-"} 系列 {len(names)} {names} 嵌入 {embed}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
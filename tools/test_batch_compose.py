@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+验证批量构建的单元格合成（tools/batch_build.py run_cell）：
+- 两个不同国家的单元格（p10，同一月份）各自合成最终稿；
+- 最终稿中 slide10 引用的图表部件取自本单元格的页面产物：两个单元格之间不同，且与各自 p10 输出一致。
+
+原始模板以 p10 微模板为底，追加 slide10（图表关系指向 chart101/chart102）构造，不依赖 input/LRTBH.pptx；
+页面数据读取 p10 配置的 neticle_db（缺失时失败）。
+
+使用说明：
+  python3 tools/test_batch_compose.py
+
+任一断言失败时以退出码 1 结束。
+"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'tools'))
+
+from batch_build import BatchCell, run_cell  # noqa: E402
+
+PAGE = ROOT / 'charts' / 'p10'
+MASTER_CHARTS = {'chart1.xml': 'chart101.xml', 'chart2.xml': 'chart102.xml'}
+
+
+def _make_master(path: Path) -> None:
+    """p10 微模板 + slide10：关系 Id 与 p10 slide1 相同，图表部件改名为 chart101/chart102。"""
+    with zipfile.ZipFile(PAGE / 'p10.pptx') as src, zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as out:
+        for info in src.infolist():
+            out.writestr(info.filename, src.read(info.filename))
+        rels = src.read('ppt/slides/_rels/slide1.xml.rels')
+        for old, new in MASTER_CHARTS.items():
+            rels = rels.replace(f'../charts/{old}"'.encode(), f'../charts/{new}"'.encode())
+            out.writestr(f'ppt/charts/{new}', src.read(f'ppt/charts/{old}'))
+        out.writestr('ppt/slides/slide10.xml', src.read('ppt/slides/slide1.xml'))
+        out.writestr('ppt/slides/_rels/slide10.xml.rels', rels)
+
+
+def _charts(deck: Path, names) -> dict:
+    with zipfile.ZipFile(deck) as z:
+        return {n: z.read(f'ppt/charts/{n}') for n in names}
+
+
+def test_cells_compose_own_charts() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_p = Path(tmp)
+        template = tmp_p / 'LRTBH.pptx'
+        _make_master(template)
+        decks = {}
+        for country in (39, 40):
+            res = run_cell(str(ROOT), BatchCell(country, '2025-08'), ['p10'], str(tmp_p / 'batch'),
+                           template=str(template), unzipped=str(tmp_p / 'unzip'))
+            assert res['ok'], res['error'] or [p['error'] for p in res['pages'] if not p['ok']]
+            final = _charts(Path(res['deck']), MASTER_CHARTS.values())
+            page_out = next((tmp_p / 'batch' / res['cell'] / 'pages' / 'p10').glob('*.pptx'))
+            page = _charts(page_out, MASTER_CHARTS)
+            for old, new in MASTER_CHARTS.items():
+                assert final[new] == page[old], f'{res["cell"]} 的 {new} 与本单元格 p10 输出的 {old} 不一致'
+            decks[country] = final
+        for name in MASTER_CHARTS.values():
+            assert decks[39][name] != decks[40][name], f'国家 39 与 40 的最终稿 {name} 相同'
+
+
+def main() -> int:
+    try:
+        test_cells_compose_own_charts()
+    except AssertionError as e:
+        print(f'[test] FAIL {e}')
+        return 1
+    print('[test] 全部通过')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+验证 tools/build.py 逐页构建前的数据准备范围（data_prep_pages）：
+- 默认（未指定 --pages）覆盖声明 neticle_db 的数据页 p10/p13/p16/p18/p29；--pages 只取交集；
+- 对默认页面集构建覆盖索引 sidecar 并校验：每个数据页的每个 (countryId, 月份) 都有对应的立方体扫描查询，
+  且全部页面查询均为索引区间查找（prepare_indexes 遇全表扫描严格报错）。
+
+页面数据读取各页配置的 neticle_db（缺失时失败）。
+
+使用说明：
+  python3 tools/test_build_prep.py
+
+任一断言失败时以退出码 1 结束。
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'tools'))
+
+from build import data_prep_pages  # noqa: E402
+from neticle_cube import plan_from_configs  # noqa: E402
+from neticle_index import page_queries, prepare_indexes  # noqa: E402
+
+DATA_PAGES = {'p10', 'p13', 'p16', 'p18', 'p29'}
+
+
+def test_default_scope() -> None:
+    pages = data_prep_pages(None)
+    assert DATA_PAGES <= set(pages), f'默认数据准备页面缺少 {sorted(DATA_PAGES - set(pages))}'
+    assert data_prep_pages(['p10', 'p14']) == ['p10'], '--pages 应与数据页取交集'
+    assert data_prep_pages(['p14']) == [], '不含数据页时应无需准备'
+
+
+def test_default_run_verifies_data_pages() -> None:
+    pages = data_prep_pages(None)
+    prepare_indexes(ROOT, pages, log=lambda msg: None)
+    labels = {q['label'] for q in page_queries(ROOT, pages)}
+    for page in sorted(DATA_PAGES):
+        plan = plan_from_configs(ROOT, [page])
+        assert plan, f'{page} 未声明可用的 neticle_db / countryId / 统计区间'
+        for db, by_country in plan.items():
+            assert db.exists(), f'{page} 的数据库不存在: {db}'
+            for country, months in by_country.items():
+                for m in months:
+                    assert f'cube scan countryId={country} month={m}' in labels, \
+                        f'{page} 的切片 countryId={country} month={m} 未被校验'
+
+
+def main() -> int:
+    for test in (test_default_scope, test_default_run_verifies_data_pages):
+        try:
+            test()
+        except AssertionError as e:
+            print(f'[test] FAIL {test.__name__}: {e}')
+            return 1
+        print(f'[test] ok   {test.__name__}')
+    print('[test] 全部通过')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
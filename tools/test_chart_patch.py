@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+验证图表编辑事务（tools/chart_patch.py ChartTransaction）的「每个 chart 部件只解析一次、只写回一次」：
+- 事务语义：多项操作只序列化/写回一次；严格模式失败不写回；keep_going 记录失败继续；
+  only_if_changed 无改动不写回；提交后不能再添加操作、不能重复提交；
+- 端到端：在进程内用 P16 填充器更新全部图表（基于页面目录下已提交的模板与 p16_data.xlsx，不写出 PPT），
+  断言每个 ppt/charts/chart*.xml 在包内恰好写回一次。
+
+使用说明：
+  python3 tools/test_chart_patch.py
+
+任一断言失败时以退出码 1 结束。
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+import sys
+import warnings
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'tools'))
+
+from lxml import etree  # noqa: E402
+from chart_patch import ChartEditError, ChartPatch, ChartTransaction  # noqa: E402
+from opc_package import OpcPackage  # noqa: E402
+
+P16_DIR = ROOT / 'charts' / 'p16'
+TEMPLATE = P16_DIR / 'p16.pptx'
+
+
+def _boom(chart: ChartPatch) -> None:
+    raise ValueError('boom')
+
+
+def _raises(fn) -> Exception | None:
+    try:
+        fn()
+    except Exception as e:
+        return e
+    return None
+
+
+def test_transaction_semantics() -> None:
+    with OpcPackage.open(TEMPLATE) as pkg:
+        parts = pkg.glob('ppt/charts/chart*.xml')
+        assert parts, '模板不含图表部件'
+
+        part = parts[0]
+        tx = ChartTransaction(pkg, part)
+        tx.add('缩放', ChartPatch.auto_scale_value_axes, major_unit=True)
+        tx.add('扩展', ChartPatch.remove_extensions)
+        tx.add('外部数据', lambda c: c.bind_workbook(create=False))
+        assert tx.commit() is True, '严格事务提交后应写回'
+        assert tx.chart.serializations == 1, '三项操作应只序列化一次'
+        assert pkg.write_counts[part] == 1, '三项操作应只写回一次'
+
+        assert isinstance(_raises(lambda: tx.add('迟到', ChartPatch.remove_extensions)), RuntimeError), \
+            '提交后添加操作应报错'
+        assert isinstance(_raises(tx.commit), RuntimeError), '重复提交应报错'
+
+        strict_part = parts[1]
+        tx = ChartTransaction(pkg, strict_part).add('失败', _boom).add('扩展', ChartPatch.remove_extensions)
+        err = _raises(tx.commit)
+        assert isinstance(err, ChartEditError) and err.label == '失败' and isinstance(err.__cause__, ValueError), \
+            '严格模式应抛 ChartEditError（含操作名与原始异常）'
+        assert pkg.write_counts[strict_part] == 0, '严格模式失败时部件不应写回'
+
+        tx = ChartTransaction(pkg, strict_part, keep_going=True, only_if_changed=True)
+        tx.add('失败', _boom).add('无改动', lambda c: False).add('无删除', lambda c: 0)
+        assert tx.commit() is False and len(tx.errors) == 1, 'keep_going 应记录失败并继续'
+        assert pkg.write_counts[strict_part] == 0, 'only_if_changed 无改动时不应写回'
+
+        tx = ChartTransaction(pkg, strict_part, keep_going=True, only_if_changed=True)
+        tx.add('失败', _boom).add('有改动', lambda c: True)
+        assert tx.commit() is True and pkg.write_counts[strict_part] == 1, 'keep_going 有改动时应写回一次'
+
+
+def test_empty_element_counts_as_change() -> None:
+    with OpcPackage.open(TEMPLATE) as pkg:
+        part = pkg.glob('ppt/charts/chart*.xml')[0]
+        tx = ChartTransaction(pkg, part, only_if_changed=True)
+        # 返回新建的空元素（无子节点，真值测试为 False）：仍视为有改动
+        tx.add('新增空元素', lambda c: etree.SubElement(c.root, 'dummy'))
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', FutureWarning)
+            assert tx.commit() is True, '返回空元素的操作应视为有改动'
+        assert pkg.write_counts[part] == 1, '返回空元素时应写回一次'
+
+
+def test_p16_fill_writes_each_chart_once() -> None:
+    spec = importlib.util.spec_from_file_location('p16_fill_from_excel', P16_DIR / 'fill_from_excel.py')
+    mod = importlib.util.module_from_spec(spec)
+    cwd = os.getcwd()
+    os.chdir(P16_DIR)
+    try:
+        spec.loader.exec_module(mod)
+        filler = mod.P16PPTFiller()
+        main_trend, channel = filler.load_excel_data()
+        assert main_trend is not None and channel is not None, 'P16 读取 p16_data.xlsx 失败'
+        assert filler.open_ppt_template(), 'P16 打开模板失败'
+        assert filler.update_all_charts(main_trend, channel), 'P16 图表更新失败'
+        charts = filler.pkg.glob('ppt/charts/chart*.xml')
+        counts = {name: filler.pkg.write_counts[name] for name in charts}
+        filler.pkg.close()
+        assert charts and all(n == 1 for n in counts.values()), f'P16 每个图表部件应恰好写回一次: {counts}'
+    finally:
+        os.chdir(cwd)
+
+
+def main() -> int:
+    if not TEMPLATE.exists():
+        print(f'[test] 缺少模板: {TEMPLATE}')
+        return 1
+    for test in (test_transaction_semantics, test_empty_element_counts_as_change, test_p16_fill_writes_each_chart_once):
+        try:
+            test()
+        except AssertionError as e:
+            print(f'[test] FAIL {test.__name__}: {e}')
+            return 1
+        print(f'[test] ok   {test.__name__}')
+    print('[test] 全部通过')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+验证幻灯片文本绑定（tools/slide_text.py）：
+- 偏移扫描与 lxml 解析得到的 a:t 文本一致（p18/p29 模板 slide1）；
+- 绑定语义：exact 数量校验、exact=False 只写前 N 个、fill 至少命中 1 处、按 y 排序的形状作用域、
+  同一 a:t 被两个绑定命中时报错；
+- 替换只改动目标文本：结果与用 lxml 修改同样节点后的 C14N 一致；特殊字符按 XML 转义写入。
+
+使用说明：
+  python3 tools/test_slide_text.py
+
+任一断言失败时以退出码 1 结束。
+"""
+
+from __future__ import annotations
+
+import sys
+import zipfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'tools'))
+
+from lxml import etree  # noqa: E402
+from slide_text import SlideTextBinding, SlideTextError, rewrite_slide_text, scan_slide_text  # noqa: E402
+
+A_T = '{http://schemas.openxmlformats.org/drawingml/2006/main}t'
+SLIDES = {page: ROOT / 'charts' / page / f'{page}.pptx' for page in ('p18', 'p29')}
+
+
+def _slide(page: str) -> bytes:
+    with zipfile.ZipFile(SLIDES[page]) as z:
+        return z.read('ppt/slides/slide1.xml')
+
+
+def _c14n(xml: bytes) -> bytes:
+    return etree.tostring(etree.fromstring(xml), method='c14n')
+
+
+def _raises(fn) -> bool:
+    try:
+        fn()
+    except SlideTextError:
+        return True
+    return False
+
+
+def test_scan_matches_lxml() -> None:
+    for page in SLIDES:
+        xml = _slide(page)
+        runs, _ = scan_slide_text(xml)
+        expect = [t.text or '' for t in etree.fromstring(xml).iter(A_T)]
+        assert [r.text for r in runs] == expect, f'{page} slide1 偏移扫描文本与 lxml 不一致'
+
+
+def test_p18_bindings() -> None:
+    xml = _slide('p18')
+    ranks = [1, 2, 3, 4, 5, 6]
+    new, counts = rewrite_slide_text(xml, [
+        SlideTextBinding('rank', r'#\d+', ranks, fmt='#{}', strip=False),
+        SlideTextBinding('pct', r'\d+%', fill=''),
+    ])
+    root = etree.fromstring(xml)
+    hits = [t for t in root.iter(A_T) if (t.text or '').startswith('#') and (t.text or '')[1:].isdigit()]
+    for t, r in zip(hits, ranks):
+        t.text = f'#{r}'
+    for t in root.iter(A_T):
+        if (t.text or '').strip().endswith('%') and (t.text or '').strip()[:-1].isdigit():
+            t.text = ''
+    assert counts == {'rank': 6, 'pct': 18}, f'p18 命中数 {counts}'
+    assert _c14n(new) == etree.tostring(root, method='c14n'), 'p18 替换结果与 lxml 修改不一致'
+    assert _raises(lambda: rewrite_slide_text(xml, [SlideTextBinding('rank', r'#\d+', ranks[:5])])), \
+        'exact 数量不符时应报错'
+    assert _raises(lambda: rewrite_slide_text(xml, [SlideTextBinding('x', r'never', fill='')])), \
+        'fill 未命中时应报错'
+    assert _raises(lambda: rewrite_slide_text(xml, [SlideTextBinding('a', r'\d+%', fill=''),
+                                                    SlideTextBinding('b', r'3\d%', fill='')])), \
+        '同一文本被两个绑定命中时应报错'
+
+
+def test_p29_shape_order() -> None:
+    xml = _slide('p29')
+    _, shapes = scan_slide_text(xml)
+    pct = sorted((s for s in shapes if s.text.endswith('%') and s.text[:-1].isdigit()), key=lambda s: s.y or 0)
+    values = [10, 20, 30]
+    new, _ = rewrite_slide_text(xml, [
+        SlideTextBinding('sov', r'\d+%', values, fmt='{}%', scope='shape', order='y', exact=False)])
+    _, after = scan_slide_text(new)
+    got = [after[s.index].text for s in pct]
+    assert got[:3] == ['10%', '20%', '30%'] and got[3:] == [s.text for s in pct[3:]], \
+        f'p29 应按 y 自上而下写入前 N 个，其余保持原样（{got}）'
+    assert _raises(lambda: rewrite_slide_text(xml, [
+        SlideTextBinding('sov', r'\d+%', list(range(len(pct) + 1)), scope='shape', exact=False)])), \
+        'exact=False 时候选少于数据条数应报错'
+
+
+def test_escape_and_self_closing() -> None:
+    xml = (b'<p:sld xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+           b'xmlns:p="http://schemas.openxmlformats.org/presentationml/2006/main"><p:sp><p:txBody>'
+           b'<a:p><a:r><a:t/></a:r><a:r><a:t>A &amp; B</a:t></a:r></a:p></p:txBody></p:sp></p:sld>')
+    new, _ = rewrite_slide_text(xml, [SlideTextBinding('ab', r'A & B', ['<x> & y'])])
+    texts = [t.text for t in etree.fromstring(new).iter(A_T)]
+    assert texts == [None, '<x> & y'], f'反转义匹配、转义写入（{texts}）'
+    new, _ = rewrite_slide_text(xml, [SlideTextBinding('s', r'A & B', ['7%'], scope='shape')])
+    texts = [t.text for t in etree.fromstring(new).iter(A_T)]
+    assert texts == ['7%', 'A & B'], f'形状作用域写入首段（自闭合 a:t 展开）（{texts}）'
+    padded = xml.replace(b'>A &amp; B<', b'> A &amp; B<')
+    assert rewrite_slide_text(padded, [SlideTextBinding('ab', r'A & B', fill='')])[1] == {'ab': 1}, \
+        '默认 strip 后匹配'
+    assert _raises(lambda: rewrite_slide_text(padded, [SlideTextBinding('ab', r'A & B', fill='', strip=False)])), \
+        'strip=False 时应按原文匹配（首尾空白不去除）'
+
+
+def main() -> int:
+    missing = [str(p) for p in SLIDES.values() if not p.exists()]
+    if missing:
+        print(f'[test] 缺少模板: {missing}')
+        return 1
+    for test in (test_scan_matches_lxml, test_p18_bindings, test_p29_shape_order, test_escape_and_self_closing):
+        try:
+            test()
+        except AssertionError as e:
+            print(f'[test] FAIL {test.__name__}: {e}')
+            return 1
+        print(f'[test] ok   {test.__name__}')
+    print('[test] 全部通过')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+按部件选择压缩方式：已压缩内容 STORE，XML 等文本按可调级别 deflate
+
+背景：
+- 各打包路径（compose_final、p8–p31 build()、各 filler 的 PPTX 写出、微模板预览打包）一律 ZIP_DEFLATED，
+  ppt/media 下的 PNG/JPEG、嵌入字体与 xlsx 本身已是压缩格式，再 deflate 只耗 CPU，体积几乎不变（常常更大）；
+- XML 部件的压缩级别固定为 zlib 默认值，无法在“体积/速度”之间调整。
+
+做法：
+- CompressionPolicy.choose(name) 按扩展名返回 (compress_type, compresslevel)：
+  - store_extensions（png/jpeg/fntdata/xlsx/… 已压缩格式）→ ZIP_STORED；
+  - xml_extensions（xml/rels/vml）→ ZIP_DEFLATED，级别 xml_level；
+  - 其余 → ZIP_DEFLATED，级别 other_level；
+- 配置：根 config.yaml 的可选 `packaging` 节（xml_level / other_level / store_extensions），
+  未配置的键取默认值；取值非法时严格报错；
+- PolicyZipFile：zipfile.ZipFile 子类，writestr()/write() 未显式指定 compress_type 时按策略选择；
+  ZipComposer（tools/zip_rawcopy.py）的 write() 同样按策略选择；原样拷贝的成员保持源压缩方式不变。
+
+用法：
+    from zip_policy import PolicyZipFile, default_policy
+    with PolicyZipFile(out_pptx, 'w') as z:
+        z.writestr('ppt/media/image1.png', png_bytes)   # STORED
+        z.writestr('ppt/slides/slide1.xml', xml_bytes)  # DEFLATED(xml_level)
+
+    python tools/zip_policy.py bench                     # 对页面模板与原始 PPT 做基准
+    python tools/zip_policy.py bench some.pptx --repeat 5
+"""
+
+from __future__ import annotations
+
+import io
+import posixpath
+import sys
+import time
+import zipfile
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# 已压缩格式：图片、嵌入字体、OOXML 嵌入对象、音视频与归档。
+# 不含 .xlsb：模板中的 xlsb 内部成员为 STORED，整体再 deflate 仍可压缩到约 1/3。
+STORE_EXTENSIONS = frozenset({
+    '.png', '.jpg', '.jpeg', '.gif', '.wdp', '.jxr', '.fntdata', '.odttf',
+    '.xlsx', '.xlsm', '.docx', '.pptx', '.zip',
+    '.mp3', '.m4a', '.mp4', '.mov', '.wmv', '.avi',
+})
+XML_EXTENSIONS = frozenset({'.xml', '.rels', '.vml'})
+DEFAULT_XML_LEVEL = 6
+DEFAULT_OTHER_LEVEL = 6
+
+
+class CompressionPolicy:
+    """部件名 → (compress_type, compresslevel)。"""
+
+    def __init__(self, xml_level: int = DEFAULT_XML_LEVEL, other_level: int = DEFAULT_OTHER_LEVEL,
+                 store_extensions: Iterable[str] = STORE_EXTENSIONS):
+        for key, lvl in (('xml_level', xml_level), ('other_level', other_level)):
+            if not isinstance(lvl, int) or not 0 <= lvl <= 9:
+                raise ValueError(f'packaging.{key} 必须为 0–9 的整数: {lvl!r}')
+        self.xml_level = xml_level
+        self.other_level = other_level
+        self.store_extensions: FrozenSet[str] = frozenset(
+            e.lower() if e.startswith('.') else '.' + e.lower() for e in store_extensions)
+
+    def choose(self, name: str) -> Tuple[int, Optional[int]]:
+        ext = posixpath.splitext(name)[1].lower()
+        if ext in self.store_extensions:
+            return zipfile.ZIP_STORED, None
+        if ext in XML_EXTENSIONS:
+            return zipfile.ZIP_DEFLATED, self.xml_level
+        return zipfile.ZIP_DEFLATED, self.other_level
+
+    def __repr__(self) -> str:
+        return (f'CompressionPolicy(xml_level={self.xml_level}, other_level={self.other_level}, '
+                f'store={sorted(self.store_extensions)})')
+
+
+# 对照组：全部 deflate（默认级别），即引入策略之前各打包路径的行为
+ALL_DEFLATE = CompressionPolicy(store_extensions=())
+
+_default: Optional[CompressionPolicy] = None
+
+
+def load_policy(config_path: Path = ROOT / 'config.yaml') -> CompressionPolicy:
+    """从 config.yaml 的 packaging 节构造策略（节缺失时全部取默认值）。"""
+    cfg = {}
+    if Path(config_path).exists():
+        from page_config import load_page_config
+        cfg = load_page_config(config_path).get('packaging') or {}
+    if not isinstance(cfg, dict):
+        raise ValueError(f'config.yaml 的 packaging 节必须为映射: {cfg!r}')
+    unknown = set(cfg) - {'xml_level', 'other_level', 'store_extensions'}
+    if unknown:
+        raise ValueError(f'config.yaml 的 packaging 节包含未知键: {sorted(unknown)}')
+    return CompressionPolicy(
+        xml_level=cfg.get('xml_level', DEFAULT_XML_LEVEL),
+        other_level=cfg.get('other_level', DEFAULT_OTHER_LEVEL),
+        store_extensions=cfg.get('store_extensions', STORE_EXTENSIONS),
+    )
+
+
+def default_policy() -> CompressionPolicy:
+    """进程内共享的默认策略（首次调用时读取根 config.yaml）。"""
+    global _default
+    if _default is None:
+        _default = load_policy()
+    return _default
+
+
+class PolicyZipFile(zipfile.ZipFile):
+    """writestr()/write() 未显式指定 compress_type 时按 CompressionPolicy 选择压缩方式。"""
+
+    def __init__(self, file, mode: str = 'r', policy: Optional[CompressionPolicy] = None, **kwargs):
+        kwargs.setdefault('compression', zipfile.ZIP_DEFLATED)
+        super().__init__(file, mode, **kwargs)
+        self.policy = policy or default_policy()
+
+    def writestr(self, zinfo_or_arcname, data, compress_type=None, compresslevel=None):
+        if compress_type is None and not isinstance(zinfo_or_arcname, zipfile.ZipInfo):
+            compress_type, level = self.policy.choose(zinfo_or_arcname)
+            compresslevel = level if compresslevel is None else compresslevel
+        super().writestr(zinfo_or_arcname, data, compress_type=compress_type, compresslevel=compresslevel)
+
+    def write(self, filename, arcname=None, compress_type=None, compresslevel=None):
+        if compress_type is None:
+            name = str(arcname if arcname is not None else filename).replace('\\', '/')
+            compress_type, level = self.policy.choose(name)
+            compresslevel = level if compresslevel is None else compresslevel
+        super().write(filename, arcname, compress_type=compress_type, compresslevel=compresslevel)
+
+
+# ---- 基准 ----
+def _category(name: str, policy: CompressionPolicy) -> str:
+    ext = posixpath.splitext(name)[1].lower()
+    if ext in policy.store_extensions:
+        return 'stored'
+    return 'xml' if ext in XML_EXTENSIONS else 'other'
+
+
+def bench_members(members: List[Tuple[str, bytes]], policy: CompressionPolicy, repeat: int = 3) -> Dict[str, float]:
+    """把成员写入内存 ZIP，返回最快一次的耗时与输出字节数。"""
+    best, size = None, 0
+    for _ in range(repeat):
+        buf = io.BytesIO()
+        t0 = time.perf_counter()
+        with PolicyZipFile(buf, 'w', policy=policy) as z:
+            for name, data in members:
+                z.writestr(name, data)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+        size = buf.tell()
+    return {'seconds': best, 'bytes': size}
+
+
+def bench(paths: List[Path], policy: CompressionPolicy, repeat: int = 3, log=print) -> Dict[str, float]:
+    """对比“全部 deflate”与策略写出同一批成员的耗时与体积。"""
+    total = {'base_seconds': 0.0, 'policy_seconds': 0.0, 'base_bytes': 0, 'policy_bytes': 0}
+    for p in paths:
+        with zipfile.ZipFile(p) as zin:
+            members = [(i.filename, zin.read(i)) for i in zin.infolist() if not i.is_dir()]
+        raw: Dict[str, int] = {}
+        for name, data in members:
+            cat = _category(name, policy)
+            raw[cat] = raw.get(cat, 0) + len(data)
+        base = bench_members(members, ALL_DEFLATE, repeat)
+        pol = bench_members(members, policy, repeat)
+        total['base_seconds'] += base['seconds']
+        total['policy_seconds'] += pol['seconds']
+        total['base_bytes'] += base['bytes']
+        total['policy_bytes'] += pol['bytes']
+        log(f'{p.name}: 成员 {len(members)} 个（原始 stored={raw.get("stored", 0)}B xml={raw.get("xml", 0)}B '
+            f'other={raw.get("other", 0)}B）；全部 deflate {base["bytes"]}B/{base["seconds"] * 1000:.1f}ms → '
+            f'策略 {pol["bytes"]}B/{pol["seconds"] * 1000:.1f}ms')
+    delta_b = total['policy_bytes'] - total['base_bytes']
+    saved_t = total['base_seconds'] - total['policy_seconds']
+    pct_b = (delta_b / total['base_bytes'] * 100) if total['base_bytes'] else 0.0
+    pct_t = (saved_t / total['base_seconds'] * 100) if total['base_seconds'] else 0.0
+    log(f'合计：体积 {total["base_bytes"]}B → {total["policy_bytes"]}B（{delta_b:+d}B，{pct_b:+.1f}%），'
+        f'写出耗时 {total["base_seconds"] * 1000:.1f}ms → {total["policy_seconds"] * 1000:.1f}ms'
+        f'（节省 {saved_t * 1000:.1f}ms，{pct_t:.1f}%）；{policy!r}')
+    return total
+
+
+def _default_bench_paths() -> List[Path]:
+    paths = sorted(ROOT.glob('charts/p*/p*.pptx'))
+    from page_config import load_page_config
+    cfg = load_page_config(ROOT / 'config.yaml')
+    orig = (cfg.get('project') or {}).get('original_ppt')
+    if orig:
+        op = Path(orig) if Path(orig).is_absolute() else ROOT / orig
+        if op.exists():
+            paths.insert(0, op)
+    return paths
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description='部件压缩策略（STORE 已压缩内容 / 可调 deflate 级别）')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+    bp = sub.add_parser('bench', help='对比全部 deflate 与压缩策略的写出耗时与体积')
+    bp.add_argument('pptx', nargs='*', type=Path, help='参与基准的 PPTX（默认：原始 PPT 与 charts/pXX 模板）')
+    bp.add_argument('--repeat', type=int, default=3, help='每组重复次数，取最快一次（默认 3）')
+    bp.add_argument('--xml-level', type=int, help='覆盖 packaging.xml_level')
+    args = ap.parse_args(argv)
+    policy = default_policy()
+    if args.xml_level is not None:
+        policy = CompressionPolicy(args.xml_level, policy.other_level, policy.store_extensions)
+    paths = args.pptx or _default_bench_paths()
+    if not paths:
+        raise FileNotFoundError('未找到可用于基准的 PPTX')
+    for p in paths:
+        if not p.exists():
+            raise FileNotFoundError(f'未找到 PPTX: {p}')
+    bench(paths, policy, repeat=args.repeat)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+原样拷贝式 ZIP 合成：未改动的成员直接拷贝压缩字节，仅对替换的部件重新压缩
+
+背景：
+- compose_final 以 `zin.read(name)` 解压模板 PPTX 的每个成员，再以 ZIP_DEFLATED `writestr` 重新压缩，
+  ppt/media 下的图片、未替换的内嵌工作簿等也都要解压 + 重压，合成最终稿以 CPU 为主；
+- 标准库 zipfile 没有“原样拷贝压缩数据”的公开接口。
+
+做法：
+- ZipComposer 自行写出 ZIP 结构（本地文件头、数据、中央目录、目录结束记录）：
+  - copy()：按源中央目录记录定位本地文件头，原样拷贝压缩字节，CRC、压缩/原始大小、压缩方式沿用源记录；
+    源成员使用数据描述符（flag bit 3）时，改为把 CRC 与大小直接写入新的本地文件头；
+  - write()：仅对新内容计算 CRC 并按 raw deflate 压缩（或 STORED）；未显式指定压缩方式时按
+    CompressionPolicy（tools/zip_policy.py）选择：已压缩格式 STORED，XML 按 packaging.xml_level；
+- threads > 1 时 write() 把 CRC 计算与 deflate 提交到线程池（zlib 在压缩期间释放 GIL），
+  copy()/write() 按调用顺序排队，压缩完成后依次追加到输出，成员顺序与单线程一致；
+- 不支持加密成员与 ZIP64（超过 4GiB 或 65535 个成员）：遇到时严格报错。
+
+用法：
+    with zipfile.ZipFile(template) as zin, ZipComposer(out_path, zin_path=template) as zc:
+        for info in zin.infolist():
+            zc.copy(info)
+        zc.write('ppt/charts/chart1.xml', data)
+
+    ZipComposer(out_path, zin_path=template, threads=4)   # 多线程压缩，输出字节与单线程相同
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+import time
+import zipfile
+import zlib
+from collections import deque
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Callable, Deque, List, Optional, Tuple
+
+from zip_policy import CompressionPolicy, default_policy
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+_LOCAL_SIG = b'PK\x03\x04'
+_CENTRAL_SIG = b'PK\x01\x02'
+_EOCD_SIG = b'PK\x05\x06'
+_LOCAL_FMT = '<4s2B4HL2L2H'
+_CENTRAL_FMT = '<4s4B4HL2L5H2L'
+_EOCD_FMT = '<4s4H2LH'
+_LOCAL_SIZE = struct.calcsize(_LOCAL_FMT)
+_ZIP32_MAX = 0xFFFFFFFF
+_FLAG_ENCRYPTED = 0x01
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_VERSION = 20
+_CREATE_SYSTEM = 3           # 与 zipfile 在 POSIX 上一致
+_DEFAULT_ATTR = 0o600 << 16  # 与 zipfile.writestr 一致
+
+
+def _dos_time(date_time: Tuple[int, int, int, int, int, int]) -> Tuple[int, int]:
+    y, mo, d, h, mi, s = date_time
+    if y < 1980:
+        y, mo, d, h, mi, s = 1980, 1, 1, 0, 0, 0
+    return (h << 11) | (mi << 5) | (s // 2), ((y - 1980) << 9) | (mo << 5) | d
+
+
+def resolve_threads(threads: Optional[int]) -> int:
+    """线程数：None/1 为单线程，0 为 CPU 核数，负数严格报错。"""
+    if threads is None:
+        return 1
+    if threads < 0:
+        raise ValueError(f'压缩线程数不能为负: {threads}')
+    return threads or (os.cpu_count() or 1)
+
+
+def _compress(data: bytes, compress_type: int, level: int) -> Tuple[bytes, int]:
+    """返回 (压缩后数据, CRC32)；可在工作线程中执行。"""
+    crc = zlib.crc32(data) & 0xFFFFFFFF
+    if compress_type == zipfile.ZIP_DEFLATED:
+        co = zlib.compressobj(level, zlib.DEFLATED, -15)
+        return co.compress(data) + co.flush(), crc
+    return data, crc
+
+
+def _encode_name(name: str, flags: int) -> Tuple[bytes, int]:
+    try:
+        return name.encode('ascii'), flags & ~_FLAG_UTF8
+    except UnicodeEncodeError:
+        return name.encode('utf-8'), flags | _FLAG_UTF8
+
+
+class _Entry:
+    __slots__ = ('name', 'flags', 'method', 'date_time', 'crc', 'csize', 'usize', 'offset', 'attr')
+
+    def __init__(self, name, flags, method, date_time, crc, csize, usize, offset, attr):
+        self.name, self.flags, self.method, self.date_time = name, flags, method, date_time
+        self.crc, self.csize, self.usize, self.offset, self.attr = crc, csize, usize, offset, attr
+
+
+class ZipComposer:
+    """写出 ZIP：copy() 原样拷贝源成员压缩字节，write() 压缩新内容。"""
+
+    def __init__(self, out_path, zin_path=None, policy: Optional[CompressionPolicy] = None,
+                 threads: Optional[int] = 1):
+        self.out_path = Path(out_path)
+        self.policy = policy or default_policy()
+        self.threads = resolve_threads(threads)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        if self.threads > 1:
+            # 线程池仅在并行压缩时导入（concurrent.futures 连带 threading/logging，串行合成不需要）
+            from concurrent.futures import ThreadPoolExecutor
+            self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='zip-deflate')
+        # 待写出的成员（按调用顺序）：(future 或 None, 写出函数)
+        self._queue: Deque[Tuple[Optional[Future], Callable[[], None]]] = deque()
+        self._src: Optional[BinaryIO] = open(zin_path, 'rb') if zin_path else None
+        self._out: BinaryIO = open(self.out_path, 'wb')
+        self._entries: List[_Entry] = []
+        self._names = set()
+        self.copied = 0
+        self.written = 0
+        self.copied_bytes = 0
+        self.deflated_bytes = 0
+        self.stored_bytes = 0
+
+    # ---- 上下文管理 ----
+    def __enter__(self) -> 'ZipComposer':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._close_files()
+
+    def _close_files(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        for f in (self._src, self._out):
+            if f is not None and not f.closed:
+                f.close()
+
+    # ---- 成员写入 ----
+    def _claim(self, name: str) -> None:
+        if name in self._names:
+            raise ValueError(f'ZIP 成员重复: {name}')
+        self._names.add(name)
+
+    def _enqueue(self, future: Optional[Future], emit: Callable[[], None]) -> None:
+        """单线程时立即写出；多线程时排队，并写出队首已完成的成员。"""
+        if self._pool is None:
+            emit()
+            return
+        self._queue.append((future, emit))
+        self._drain(block=False)
+
+    def _drain(self, block: bool) -> None:
+        while self._queue:
+            future, emit = self._queue[0]
+            if future is not None and not block and not future.done():
+                return
+            self._queue.popleft()
+            emit()
+
+    def _add(self, name: str, flags: int, method: int, date_time, crc: int, csize: int, usize: int,
+             attr: int, payload) -> None:
+        if csize > _ZIP32_MAX or usize > _ZIP32_MAX:
+            raise ValueError(f'成员超过 4GiB，不支持 ZIP64: {name}')
+        offset = self._out.tell()
+        if offset > _ZIP32_MAX:
+            raise ValueError('ZIP 超过 4GiB，不支持 ZIP64')
+        fname, flags = _encode_name(name, flags & ~_FLAG_DATA_DESCRIPTOR)
+        dostime, dosdate = _dos_time(date_time)
+        self._out.write(struct.pack(_LOCAL_FMT, _LOCAL_SIG, _VERSION, 0, flags, method, dostime, dosdate,
+                                    crc, csize, usize, len(fname), 0))
+        self._out.write(fname)
+        payload(self._out)
+        self._entries.append(_Entry(name, flags, method, date_time, crc, csize, usize, offset, attr))
+
+    def copy(self, info: zipfile.ZipInfo, name: Optional[str] = None) -> None:
+        """原样拷贝源 ZIP 中的成员（压缩字节、CRC、大小、压缩方式均不变）。"""
+        if self._src is None:
+            raise RuntimeError('未指定源 ZIP（zin_path），无法原样拷贝')
+        if info.flag_bits & _FLAG_ENCRYPTED:
+            raise ValueError(f'不支持拷贝加密成员: {info.filename}')
+        name = name or info.filename
+        self._claim(name)
+        src = self._src
+
+        def payload(out: BinaryIO) -> None:
+            src.seek(info.header_offset)
+            head = src.read(_LOCAL_SIZE)
+            if len(head) != _LOCAL_SIZE or head[:4] != _LOCAL_SIG:
+                raise ValueError(f'本地文件头损坏: {info.filename}')
+            fields = struct.unpack(_LOCAL_FMT, head)
+            src.seek(info.header_offset + _LOCAL_SIZE + fields[10] + fields[11])
+            remaining = info.compress_size
+            while remaining:
+                chunk = src.read(min(remaining, 1 << 20))
+                if not chunk:
+                    raise ValueError(f'成员数据截断: {info.filename}')
+                out.write(chunk)
+                remaining -= len(chunk)
+
+        self._enqueue(None, lambda: self._add(name, info.flag_bits, info.compress_type, info.date_time,
+                                              info.CRC, info.compress_size, info.file_size,
+                                              info.external_attr, payload))
+        self.copied += 1
+        self.copied_bytes += info.compress_size
+
+    def write(self, name: str, data: bytes, compress_type: Optional[int] = None,
+              compresslevel: Optional[int] = None,
+              date_time: Optional[Tuple[int, int, int, int, int, int]] = None) -> None:
+        """写入新内容：计算 CRC，按 raw deflate 压缩（或 STORED 原样存储）；未指定时按策略选择。"""
+        if compress_type is None:
+            compress_type, level = self.policy.choose(name)
+            compresslevel = level if compresslevel is None else compresslevel
+        if compress_type not in (zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED):
+            raise ValueError(f'不支持的压缩方式: {compress_type}')
+        level = self.policy.xml_level if compresslevel is None else compresslevel
+        date_time = date_time or time.localtime(time.time())[:6]
+        self._claim(name)
+        if self._pool is None:
+            future = None
+            result = _compress(data, compress_type, level)
+        else:
+            future = self._pool.submit(_compress, data, compress_type, level)
+
+        def emit() -> None:
+            body, crc = future.result() if future is not None else result
+            self._add(name, 0, compress_type, date_time, crc, len(body), len(data), _DEFAULT_ATTR,
+                      lambda out: out.write(body))
+
+        self._enqueue(future, emit)
+        self.written += 1
+        if compress_type == zipfile.ZIP_STORED:
+            self.stored_bytes += len(data)
+        else:
+            self.deflated_bytes += len(data)
+
+    # ---- 结束 ----
+    def close(self) -> None:
+        if self._out.closed:
+            return
+        try:
+            self._drain(block=True)
+        except BaseException:
+            self._close_files()
+            raise
+        if len(self._entries) > 0xFFFF:
+            self._close_files()
+            raise ValueError('成员数超过 65535，不支持 ZIP64')
+        cd_start = self._out.tell()
+        for e in self._entries:
+            fname, flags = _encode_name(e.name, e.flags)
+            dostime, dosdate = _dos_time(e.date_time)
+            self._out.write(struct.pack(_CENTRAL_FMT, _CENTRAL_SIG, _VERSION, _CREATE_SYSTEM, _VERSION, 0,
+                                        flags, e.method, dostime, dosdate, e.crc, e.csize, e.usize,
+                                        len(fname), 0, 0, 0, 0, e.attr, e.offset))
+            self._out.write(fname)
+        cd_size = self._out.tell() - cd_start
+        if cd_start > _ZIP32_MAX:
+            self._close_files()
+            raise ValueError('ZIP 超过 4GiB，不支持 ZIP64')
+        n = len(self._entries)
+        self._out.write(struct.pack(_EOCD_FMT, _EOCD_SIG, 0, 0, n, n, cd_size, cd_start, 0))
+        self._close_files()